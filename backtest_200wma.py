@@ -13,9 +13,15 @@ from datetime import datetime, timedelta
 import time
 import os
 import pickle
+import argparse
 import warnings
+from functools import partial
 warnings.filterwarnings('ignore')
 
+from backtest_runner import run_tickers, add_workers_arg
+from results_store import ResultsStore
+from benchmark import get_benchmark
+
 # === RATE LIMITING & CACHING ===
 CACHE_DIR = '/Users/rara/clawd/trading/cache'
 RATE_LIMIT_DELAY = 0.5  # seconds between API calls
@@ -201,66 +207,32 @@ def backtest_200wma_strategy(ticker, hold_weeks=26, tolerance=0.02):
     return trades
 
 
-# Global SPY cache for fast lookups
-_spy_data = None
-
-def load_spy_data(years=15):
-    """Pre-load SPY data once for all comparisons."""
-    global _spy_data
-    if _spy_data is not None:
-        return _spy_data
-    
-    # Try cache first
-    cached = load_from_cache('SPY', '1d_full')
-    if cached is not None:
-        _spy_data = cached
-        return _spy_data
-    
-    print("  Pre-loading SPY data (one-time)...")
-    rate_limit()
-    
-    try:
-        end = datetime.now()
-        start = end - timedelta(days=years*365)
-        spy = yf.download('SPY', start=start, end=end, interval='1d', progress=False)
-        if isinstance(spy.columns, pd.MultiIndex):
-            spy.columns = spy.columns.get_level_values(0)
-        
-        save_to_cache('SPY', spy, '1d_full')
-        _spy_data = spy
-        return _spy_data
-    except:
-        return None
-
 def get_spy_returns(start_date, end_date):
-    """Get SPY return for the same period using pre-loaded data."""
-    spy = load_spy_data()
-    if spy is None or len(spy) < 2:
-        return 0
+    """
+    SPY return for the same period (dates may be arrays).
     
-    try:
-        # Convert to datetime if needed
-        start_date = pd.to_datetime(start_date)
-        end_date = pd.to_datetime(end_date)
-        
-        # Find closest dates in SPY data
-        mask = (spy.index >= start_date) & (spy.index <= end_date)
-        period_data = spy.loc[mask]
-        
-        if len(period_data) < 2:
-            # Try expanding the window slightly
-            mask = (spy.index >= start_date - timedelta(days=7)) & (spy.index <= end_date + timedelta(days=7))
-            period_data = spy.loc[mask]
-        
-        if len(period_data) < 2:
-            return 0
-        
-        return (period_data['Close'].iloc[-1] - period_data['Close'].iloc[0]) / period_data['Close'].iloc[0] * 100
-    except:
-        return 0
+    Uses the bars inside [start, end], widening by a week each side when
+    that holds fewer than 2 bars.
+    """
+    spy = get_benchmark()
+    if spy is None:
+        return 0 if np.ndim(start_date) == 0 else np.zeros(len(start_date))
+    
+    exact = spy.period_return(start_date, end_date, default=np.nan)
+    padded = spy.period_return(start_date, end_date, pad_days=7)
+    out = np.where(np.isnan(exact), padded, exact)
+    return float(out) if np.ndim(out) == 0 else out
+
+
+def backtest_ticker(ticker, hold_weeks=26, tolerance=0.02):
+    """Runner worker: (progress status, trades) for one stock."""
+    trades = backtest_200wma_strategy(ticker, hold_weeks, tolerance)
+    if trades:
+        return f"{len(trades)} trades", trades
+    return "no signals", None
 
 
-def run_full_backtest(hold_weeks=26, tolerance=0.02):
+def run_full_backtest(hold_weeks=26, tolerance=0.02, workers=1):
     """Run backtest across all quality stocks."""
     print(f"\n{'='*70}")
     print(f"  200-WEEK MA BACKTEST")
@@ -270,19 +242,15 @@ def run_full_backtest(hold_weeks=26, tolerance=0.02):
     print(f"{'='*70}\n")
     
     # Pre-load SPY data once (instead of per-trade)
-    load_spy_data()
+    get_benchmark()
     
     all_trades = []
     
     print(f"Testing {len(QUALITY_UNIVERSE)} stocks...")
-    for i, ticker in enumerate(QUALITY_UNIVERSE):
-        print(f"  [{i+1}/{len(QUALITY_UNIVERSE)}] {ticker}...", end=' ')
-        trades = backtest_200wma_strategy(ticker, hold_weeks, tolerance)
+    worker = partial(backtest_ticker, hold_weeks=hold_weeks, tolerance=tolerance)
+    for ticker, trades in run_tickers(worker, QUALITY_UNIVERSE, workers=workers):
         if trades:
             all_trades.extend(trades)
-            print(f"{len(trades)} trades")
-        else:
-            print("no signals")
     
     if not all_trades:
         print("\nNo trades found!")
@@ -295,11 +263,7 @@ def run_full_backtest(hold_weeks=26, tolerance=0.02):
     
     # Calculate SPY comparison for each trade
     print("\nCalculating SPY comparison...")
-    spy_returns = []
-    for _, row in df.iterrows():
-        spy_ret = get_spy_returns(row['entry_date'], row['exit_date'])
-        spy_returns.append(spy_ret)
-    df['spy_return_pct'] = spy_returns
+    df['spy_return_pct'] = get_spy_returns(df['entry_date'], df['exit_date'])
     df['alpha'] = df['return_pct'] - df['spy_return_pct']
     
     # Results
@@ -376,28 +340,35 @@ def run_full_backtest(hold_weeks=26, tolerance=0.02):
     print(f"Annual Alpha: {strategy_annual - spy_annual:.2f}%")
     
     # Save results
-    results_file = '/Users/rara/clawd/trading/backtest_200wma_results.csv'
-    df.to_csv(results_file, index=False)
-    print(f"\nDetailed results saved to: {results_file}")
+    store = ResultsStore()
+    run_id = store.add_run('backtest_200wma', params={'hold_weeks': hold_weeks, 'tolerance': tolerance},
+                           stats={'trades': total_trades, 'win_rate': (df['return_pct'] > 0).mean() * 100,
+                                  'avg_return': avg_return, 'median_return': df['return_pct'].median(),
+                                  'avg_spy_return': avg_spy, 'annual_alpha': strategy_annual - spy_annual},
+                           trades=df, start=df['entry_date'].min(), end=df['exit_date'].max())
+    store.close()
+    print(f"\nDetailed results saved as run {run_id} in {store.path}")
     
     return df
 
 
-def test_different_parameters():
+def test_different_parameters(workers=1):
     """Test different holding periods and tolerances."""
     print("\n" + "="*70)
     print("  PARAMETER SENSITIVITY ANALYSIS")
     print("="*70 + "\n")
     
     results = []
+    store = ResultsStore()
     
     for hold_weeks in [13, 26, 52]:  # 3mo, 6mo, 1yr
         for tolerance in [0.01, 0.02, 0.03, 0.05]:  # 1%, 2%, 3%, 5%
             print(f"\nTesting: {hold_weeks} weeks hold, {tolerance*100}% tolerance...")
             
             all_trades = []
-            for ticker in QUALITY_UNIVERSE[:15]:  # Subset for speed
-                trades = backtest_200wma_strategy(ticker, hold_weeks, tolerance)
+            worker = partial(backtest_ticker, hold_weeks=hold_weeks, tolerance=tolerance)
+            for ticker, trades in run_tickers(worker, QUALITY_UNIVERSE[:15],  # Subset for speed
+                                              workers=workers, progress=False):
                 if trades:
                     all_trades.extend(trades)
             
@@ -411,6 +382,10 @@ def test_different_parameters():
                     'avg_return': df['return_pct'].mean(),
                     'median_return': df['return_pct'].median()
                 })
+                store.add_run('backtest_200wma', params={'hold_weeks': hold_weeks, 'tolerance': tolerance,
+                                                         'universe': 'QUALITY_UNIVERSE[:15]'},
+                              stats=results[-1], label='optimize')
+    store.close()
     
     if results:
         results_df = pd.DataFrame(results)
@@ -427,10 +402,13 @@ def test_different_parameters():
 
 
 if __name__ == '__main__':
-    import sys
+    parser = argparse.ArgumentParser(description='200-week MA backtest')
+    parser.add_argument('--optimize', action='store_true', help='Parameter sensitivity analysis')
+    add_workers_arg(parser)
+    args = parser.parse_args()
     
-    if len(sys.argv) > 1 and sys.argv[1] == '--optimize':
-        test_different_parameters()
+    if args.optimize:
+        test_different_parameters(workers=args.workers)
     else:
         # Default: 26-week hold, 2% tolerance
-        df = run_full_backtest(hold_weeks=26, tolerance=0.02)
+        df = run_full_backtest(hold_weeks=26, tolerance=0.02, workers=args.workers)
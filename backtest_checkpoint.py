@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Backtest Checkpoint - per-ticker partial results that survive a crashed run
+
+- One pickle per finished ticker under CACHE_DIR/checkpoints/<run name>,
+  written atomically (temp file + rename) as soon as the ticker completes
+- A restarted run loads the finished tickers and only runs the rest; the
+  final results are merged from the checkpoint files in ticker order
+- Keyed by the run parameters and a hash of the script's source: a run with
+  different settings or edited code starts over instead of mixing results
+- Tickers that raised (result None) are not checkpointed, so they are retried
+- The checkpoint is removed once a run completes, so the next run is fresh
+
+Usage:
+    from backtest_checkpoint import Checkpoint, add_checkpoint_args
+
+    ckpt = Checkpoint.for_script(__file__, start=START_DATE, end=END_DATE)
+    results = run_tickers(backtest_ticker, tickers, workers=8, checkpoint=ckpt)
+    ckpt.clear()                                # after the summary is written
+"""
+import argparse
+import hashlib
+import os
+import pickle
+import shutil
+
+from data_utils import CACHE_DIR
+
+CHECKPOINT_DIR = os.path.join(CACHE_DIR, 'checkpoints')
+KEY_FILE = '_key'
+
+
+def add_checkpoint_args(parser: argparse.ArgumentParser):
+    """Add the standard --fresh / --no-checkpoint flags to a script's parser."""
+    parser.add_argument('--fresh', action='store_true',
+                        help='Discard results of an interrupted run and start over')
+    parser.add_argument('--no-checkpoint', action='store_true',
+                        help='Do not write per-ticker checkpoints')
+    return parser
+
+
+def run_key(script_file, **params):
+    """Hash of the script's source and the run parameters."""
+    h = hashlib.sha1()
+    try:
+        with open(script_file, 'rb') as f:
+            h.update(f.read())
+    except OSError:
+        h.update(os.path.basename(script_file).encode())
+    for name in sorted(params):
+        h.update(f"{name}={params[name]!r};".encode())
+    return h.hexdigest()
+
+
+class Checkpoint:
+    """Per-ticker result store for one named run."""
+
+    def __init__(self, name, key='', root=CHECKPOINT_DIR, fresh=False):
+        self.name = name
+        self.key = key
+        self.path = os.path.join(root, name)
+        if fresh or self._stored_key() != key:
+            self.clear()
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, KEY_FILE), 'w') as f:
+            f.write(key)
+
+    @classmethod
+    def for_script(cls, script_file, fresh=False, root=CHECKPOINT_DIR, **params):
+        """Checkpoint named after the script, keyed by its source and params."""
+        name = os.path.splitext(os.path.basename(script_file))[0]
+        return cls(name, run_key(script_file, **params), root=root, fresh=fresh)
+
+    def _stored_key(self):
+        try:
+            with open(os.path.join(self.path, KEY_FILE)) as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _file(self, ticker):
+        safe = "".join(c if c.isalnum() or c in '-_' else '_' for c in str(ticker))
+        return os.path.join(self.path, f"{safe}.pkl")
+
+    def load(self, tickers):
+        """{ticker: result} for every ticker already finished in this run."""
+        done = {}
+        for ticker in tickers:
+            try:
+                with open(self._file(ticker), 'rb') as f:
+                    done[ticker] = pickle.load(f)
+            except FileNotFoundError:
+                continue
+            except Exception:
+                # Truncated / unreadable file: run the ticker again
+                continue
+        return done
+
+    def save(self, ticker, result):
+        """Record a finished ticker (results of failed tickers are skipped)."""
+        if result is None:
+            return
+        path = self._file(ticker)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    def clear(self):
+        """Remove every checkpoint file of this run."""
+        shutil.rmtree(self.path, ignore_errors=True)
@@ -9,6 +9,7 @@ import json
 from .data_loader import DataLoader
 from .pattern_detector import PatternDetector
 from .trade_simulator import TradeSimulator
+from results_store import ResultsStore
 
 class BacktestEngine:
     """Main backtesting engine."""
@@ -100,7 +101,7 @@ class BacktestEngine:
                         continue
                     
                     # Check if already in this stock
-                    if any(t.ticker == ticker for t in simulator.open_trades):
+                    if simulator.has_position(ticker):
                         continue
                     
                     # Entry signal on next day's open
@@ -154,7 +155,7 @@ class BacktestEngine:
                 'stop_loss_pct': self.stop_loss_pct
             },
             'metrics': metrics,
-            'trades': [t.to_dict() for t in simulator.closed_trades],
+            'trades': simulator.trade_dicts(),
             'equity_curve': simulator.equity_curve,
             'pattern_signals': pattern_signals
         }
@@ -181,23 +182,24 @@ class BacktestEngine:
         print(f"Final Equity: ${metrics['final_equity']:,.2f}")
         print(f"{'='*60}\n")
     
-    def save_results(self, results, filename=None):
-        """Save results to JSON file."""
-        if filename is None:
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            filename = f"backtest_results_{timestamp}.json"
-        
-        results_dir = Path(__file__).parent.parent / 'results' / 'runs'
-        results_dir.mkdir(parents=True, exist_ok=True)
-        
-        filepath = results_dir / filename
-        
-        with open(filepath, 'w') as f:
-            json.dump(results, f, indent=2, default=str)
+    def save_results(self, results, label=None):
+        """Save config, metrics, trades and equity curve as one run in the results store."""
+        config = results['config']
+        store = ResultsStore()
+        run_id = store.add_run(
+            'backtest_core_engine',
+            params=config,
+            stats=results['metrics'],
+            trades=results['trades'],
+            equity={e['date']: e['equity'] for e in results['equity_curve']},
+            label=label,
+            start=config['start_date'],
+            end=config['end_date'],
+        )
+        store.close()
         
-        print(f"Results saved to: {filepath}")
-        return filepath
-
+        print(f"Results saved as run {run_id} in {store.path}")
+        return run_id
 
 if __name__ == '__main__':
     # Test run
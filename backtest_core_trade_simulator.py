@@ -7,7 +7,11 @@ import numpy as np
 from datetime import datetime, timedelta
 
 class Trade:
-    """Represents a single trade."""
+    """Represents a single open (or just closed) trade."""
+    
+    __slots__ = ('ticker', 'pattern', 'entry_date', 'entry_price', 'position_size', 'shares',
+                 'stop_loss_pct', 'stop_loss_price', 'exit_date', 'exit_price', 'exit_reason',
+                 'return_pct', 'return_dollars', 'hold_days')
     
     def __init__(self, ticker, pattern, entry_date, entry_price, position_size, stop_loss_pct=0.08):
         self.ticker = ticker
@@ -55,6 +59,114 @@ class Trade:
         }
 
 
+# One row per closed trade; strings are interned into TradeLedger.names
+TRADE_DTYPE = np.dtype([
+    ('ticker', np.int32),
+    ('pattern', np.int32),
+    ('exit_reason', np.int32),
+    ('hold_days', np.int32),
+    ('entry_date', 'M8[s]'),
+    ('exit_date', 'M8[s]'),
+    ('entry_price', np.float64),
+    ('exit_price', np.float64),
+    ('shares', np.int64),
+    ('position_size', np.float64),
+    ('stop_loss_price', np.float64),
+    ('return_pct', np.float64),
+    ('return_dollars', np.float64),
+])
+
+EQUITY_DTYPE = np.dtype([
+    ('date', 'M8[s]'),
+    ('equity', np.float64),
+    ('cash', np.float64),
+    ('open_positions', np.int32),
+])
+
+
+def _to_datetime64(date):
+    return np.datetime64(pd.Timestamp(date).value, 'ns').astype('M8[s]')
+
+
+class _Growable:
+    """Structured array with amortized O(1) append (capacity doubles)."""
+    
+    def __init__(self, dtype, capacity=256):
+        self.data = np.zeros(capacity, dtype=dtype)
+        self.n = 0
+    
+    def append(self):
+        """Index of a new (zeroed) row; may replace self.data."""
+        if self.n == len(self.data):
+            grown = np.zeros(len(self.data) * 2, dtype=self.data.dtype)
+            grown[:self.n] = self.data
+            self.data = grown
+        self.n += 1
+        return self.n - 1
+    
+    def view(self):
+        return self.data[:self.n]
+    
+    def __len__(self):
+        return self.n
+
+
+class TradeLedger:
+    """Closed trades as one structured array instead of an object per trade."""
+    
+    def __init__(self, capacity=256):
+        self.rows = _Growable(TRADE_DTYPE, capacity)
+        self.names = []         # interned tickers / patterns / exit reasons
+        self._codes = {}
+    
+    def _code(self, name):
+        code = self._codes.get(name)
+        if code is None:
+            code = self._codes[name] = len(self.names)
+            self.names.append(name)
+        return code
+    
+    def add(self, trade):
+        i = self.rows.append()
+        self.rows.data[i] = (
+            self._code(trade.ticker), self._code(trade.pattern), self._code(trade.exit_reason),
+            trade.hold_days, _to_datetime64(trade.entry_date), _to_datetime64(trade.exit_date),
+            trade.entry_price, trade.exit_price, trade.shares, trade.position_size,
+            trade.stop_loss_price, trade.return_pct, trade.return_dollars)
+    
+    def __len__(self):
+        return len(self.rows)
+    
+    def trade(self, i):
+        """Row i rebuilt as a closed Trade."""
+        r = self.rows.view()[i]
+        t = Trade.__new__(Trade)
+        t.ticker = self.names[r['ticker']]
+        t.pattern = self.names[r['pattern']]
+        t.entry_date = pd.Timestamp(r['entry_date'])
+        t.entry_price = float(r['entry_price'])
+        t.position_size = float(r['position_size'])
+        t.shares = int(r['shares'])
+        t.stop_loss_price = float(r['stop_loss_price'])
+        t.stop_loss_pct = 1 - t.stop_loss_price / t.entry_price
+        t.exit_date = pd.Timestamp(r['exit_date'])
+        t.exit_price = float(r['exit_price'])
+        t.exit_reason = self.names[r['exit_reason']]
+        t.return_pct = float(r['return_pct'])
+        t.return_dollars = float(r['return_dollars'])
+        t.hold_days = int(r['hold_days'])
+        return t
+    
+    def to_frame(self):
+        """Closed trades as a DataFrame (returns as fractions)."""
+        v = self.rows.view()
+        names = np.array(self.names, dtype=object)
+        df = pd.DataFrame({k: v[k] for k in TRADE_DTYPE.names})
+        for col in ('ticker', 'pattern', 'exit_reason'):
+            df[col] = names[v[col]] if len(v) else []
+        return df
+
+
 class TradeSimulator:
     """Simulates trade execution with realistic constraints."""
     
@@ -67,13 +179,54 @@ class TradeSimulator:
         self.commission = commission
         self.slippage_pct = slippage_pct
         
-        self.open_trades = []
-        self.closed_trades = []
-        self.equity_curve = []
+        self._open = {}                 # ticker -> open Trade
+        self.ledger = TradeLedger()
+        self._equity = _Growable(EQUITY_DTYPE)
+        
+        # Running metrics, updated on every exit / equity record
+        self._wins = 0
+        self._losses = 0
+        self._win_pct_sum = 0.0
+        self._loss_pct_sum = 0.0
+        self._gross_profit = 0.0
+        self._gross_loss = 0.0
+        self._hold_days_sum = 0
+        self._peak = None
+        self._max_drawdown = 0.0
+    
+    @property
+    def open_trades(self):
+        """Open trades in entry order."""
+        return list(self._open.values())
+    
+    @property
+    def closed_trades(self):
+        """Closed trades rebuilt from the ledger (prefer ledger.to_frame() for analysis)."""
+        return [self.ledger.trade(i) for i in range(len(self.ledger))]
+    
+    @property
+    def equity_curve(self):
+        """Equity records as dicts, like the old per-day list."""
+        return [{'date': pd.Timestamp(r['date']), 'equity': float(r['equity']), 'cash': float(r['cash']),
+                 'open_positions': int(r['open_positions'])} for r in self._equity.view()]
+    
+    def has_position(self, ticker):
+        return ticker in self._open
+    
+    def trade_dicts(self):
+        """Closed trades in Trade.to_dict() form."""
+        return [self.ledger.trade(i).to_dict() for i in range(len(self.ledger))]
+    
+    def equity_frame(self):
+        """Equity curve as a date-indexed DataFrame."""
+        v = self._equity.view()
+        return pd.DataFrame({'equity': v['equity'], 'cash': v['cash'],
+                             'open_positions': v['open_positions']},
+                            index=pd.DatetimeIndex(v['date'], name='date'))
         
     def can_enter_trade(self):
         """Check if we can enter a new trade."""
-        if len(self.open_trades) >= self.max_positions:
+        if len(self._open) >= self.max_positions:
             return False
         
         position_size = self.cash * self.max_position_pct
@@ -84,12 +237,12 @@ class TradeSimulator:
     
     def enter_trade(self, ticker, pattern, date, price, stop_loss_pct=0.08):
         """
-        Enter a new trade.
+        Enter a new trade (one open position per ticker).
         
         Returns:
             Trade object if entered, None if rejected
         """
-        if not self.can_enter_trade():
+        if ticker in self._open or not self.can_enter_trade():
             return None
         
         # Calculate position size (% of available cash)
@@ -105,7 +258,7 @@ class TradeSimulator:
         total_cost = trade.shares * fill_price + self.commission
         self.cash -= total_cost
         
-        self.open_trades.append(trade)
+        self._open[ticker] = trade
         return trade
     
     def exit_trade(self, trade, date, price, reason):
@@ -120,9 +273,23 @@ class TradeSimulator:
         proceeds = trade.shares * fill_price - self.commission
         self.cash += proceeds
         
-        # Move to closed trades
-        self.open_trades.remove(trade)
-        self.closed_trades.append(trade)
+        # Move to the ledger
+        del self._open[trade.ticker]
+        self.ledger.add(trade)
+        self._count_closed(trade)
+    
+    def _count_closed(self, trade):
+        if trade.return_pct > 0:
+            self._wins += 1
+            self._win_pct_sum += trade.return_pct * 100
+        elif trade.return_pct < 0:
+            self._losses += 1
+            self._loss_pct_sum += trade.return_pct * 100
+        if trade.return_dollars > 0:
+            self._gross_profit += trade.return_dollars
+        elif trade.return_dollars < 0:
+            self._gross_loss -= trade.return_dollars
+        self._hold_days_sum += trade.hold_days
     
     def update_positions(self, date, price_data):
         """
@@ -134,7 +301,7 @@ class TradeSimulator:
         """
         trades_to_exit = []
         
-        for trade in self.open_trades:
+        for trade in self._open.values():
             if trade.ticker not in price_data:
                 continue
             
@@ -163,7 +330,7 @@ class TradeSimulator:
         """Calculate current portfolio value."""
         value = self.cash
         
-        for trade in self.open_trades:
+        for trade in self._open.values():
             if trade.ticker in price_data:
                 _, _, _, close, _ = price_data[trade.ticker]
                 value += trade.shares * close
@@ -173,55 +340,38 @@ class TradeSimulator:
     def record_equity(self, date, price_data):
         """Record current equity for equity curve."""
         equity = self.get_portfolio_value(date, price_data)
-        self.equity_curve.append({
-            'date': date,
-            'equity': equity,
-            'cash': self.cash,
-            'open_positions': len(self.open_trades)
-        })
+        i = self._equity.append()
+        self._equity.data[i] = (_to_datetime64(date), equity, self.cash, len(self._open))
+        
+        if self._peak is None or equity > self._peak:
+            self._peak = equity
+        if self._peak:
+            self._max_drawdown = min(self._max_drawdown, (equity - self._peak) / self._peak)
     
     def get_metrics(self):
-        """Calculate performance metrics."""
-        if len(self.closed_trades) == 0:
+        """Performance metrics from the running totals (no per-trade rebuild)."""
+        total_trades = len(self.ledger)
+        if total_trades == 0:
             return None
         
-        trades_df = pd.DataFrame([t.to_dict() for t in self.closed_trades])
-        
-        total_trades = len(trades_df)
-        winning_trades = len(trades_df[trades_df['return_pct'] > 0])
-        losing_trades = len(trades_df[trades_df['return_pct'] < 0])
-        
-        win_rate = winning_trades / total_trades
-        avg_win = trades_df[trades_df['return_pct'] > 0]['return_pct'].mean() if winning_trades > 0 else 0
-        avg_loss = trades_df[trades_df['return_pct'] < 0]['return_pct'].mean() if losing_trades > 0 else 0
-        
-        total_return = trades_df['return_dollars'].sum()
-        total_return_pct = total_return / self.initial_capital
-        
-        # Drawdown
-        equity_df = pd.DataFrame(self.equity_curve)
-        equity_df['peak'] = equity_df['equity'].cummax()
-        equity_df['drawdown'] = (equity_df['equity'] - equity_df['peak']) / equity_df['peak']
-        max_drawdown = equity_df['drawdown'].min()
-        
-        # Profit factor
-        gross_profit = trades_df[trades_df['return_dollars'] > 0]['return_dollars'].sum() if winning_trades > 0 else 0
-        gross_loss = abs(trades_df[trades_df['return_dollars'] < 0]['return_dollars'].sum()) if losing_trades > 0 else 1
-        profit_factor = gross_profit / gross_loss if gross_loss > 0 else 0
+        winning_trades = self._wins
+        losing_trades = self._losses
+        gross_loss = self._gross_loss if losing_trades > 0 else 1
+        total_return = self._gross_profit - self._gross_loss
         
         return {
             'total_trades': total_trades,
             'winning_trades': winning_trades,
             'losing_trades': losing_trades,
-            'win_rate': win_rate,
-            'avg_win_pct': avg_win,
-            'avg_loss_pct': avg_loss,
+            'win_rate': winning_trades / total_trades,
+            'avg_win_pct': self._win_pct_sum / winning_trades if winning_trades > 0 else 0,
+            'avg_loss_pct': self._loss_pct_sum / losing_trades if losing_trades > 0 else 0,
             'total_return_dollars': total_return,
-            'total_return_pct': total_return_pct,
-            'max_drawdown': max_drawdown,
-            'profit_factor': profit_factor,
-            'avg_hold_days': trades_df['hold_days'].mean(),
-            'final_equity': equity_df['equity'].iloc[-1] if len(equity_df) > 0 else self.cash
+            'total_return_pct': total_return / self.initial_capital,
+            'max_drawdown': self._max_drawdown,
+            'profit_factor': self._gross_profit / gross_loss if gross_loss > 0 else 0,
+            'avg_hold_days': self._hold_days_sum / total_trades,
+            'final_equity': float(self._equity.data['equity'][len(self._equity) - 1]) if len(self._equity) else self.cash
         }
 
 
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+Batched Exit Engine - first-passage exit resolution shared by all backtests
+
+An ExitPolicy describes the exit rules declaratively; resolve_exits() takes
+arrays of entries for one ticker and finds every trade's exit at once by
+scanning blocks of forward bars as (trades x bars) matrices.
+
+Stops:   fixed, trailing, atr, breakeven, stepped, atr_tight_wide, hard_trail
+Exits:   profit target, stale-trade exit, max hold (time stop)
+Basis:   'close' checks closes only, 'range' checks lows (stops) / highs (targets)
+
+The comparisons mirror the arithmetic of the original per-bar loops, so the
+resolved exits (bar, reason, price) are identical to the old simulators.
+"""
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+# Exit reason codes
+NO_EXIT = 0
+STOP = 1      # initial / hard stop
+TRAIL = 2     # trailing or ratcheted stop (after it moved off the initial level)
+TARGET = 3    # profit target
+STALE = 4     # no new high for stale_days and still below stale_floor
+TIME = 5      # max hold reached
+
+REASON_NAMES = {NO_EXIT: None, STOP: 'stop', TRAIL: 'trail', TARGET: 'target',
+                STALE: 'time_exit', TIME: 'time'}
+
+STOP_KINDS = ('none', 'fixed', 'trailing', 'atr', 'breakeven', 'stepped',
+              'atr_tight_wide', 'hard_trail')
+
+DEFAULT_MILESTONES = ((0.05, 0.0), (0.10, 0.05), (0.15, 0.10), (0.20, 0.15))
+
+MAX_BLOCK = 1024
+
+
+@dataclass(frozen=True)
+class ExitPolicy:
+    """
+    Declarative exit rules.
+
+    stop:             one of STOP_KINDS
+    stop_pct:         initial stop distance (trailing distance for 'trailing',
+                      'breakeven' and the hard stop for 'hard_trail')
+    trail_pct:        trailing distance from the high for 'hard_trail'
+    atr_mult:         ATR multiple of the trailing leg ('atr', 'atr_tight_wide')
+    atr_mult_initial: ATR multiple of the initial stop ('atr_tight_wide')
+    atr_fallback:     'atr' stop as a fraction of the high while ATR is NaN
+    profit_trigger:   gain that locks breakeven / switches to the wide ATR trail
+    breakeven_level:  stop as a multiple of entry once breakeven is locked
+    milestones:       (gain trigger, new stop) pairs for 'stepped'
+    target_pct:       profit target (None = no target)
+    max_hold:         max bars after entry (None = hold until an exit fires)
+    clip_hold:        exit at the last bar when fewer than max_hold bars remain;
+                      otherwise such trades are dropped
+    stale_days:       exit after this many bars without a new high ...
+    stale_floor:      ... while price is below entry * stale_floor
+    basis:            'close' or 'range'
+    direction:        'long' or 'short' (short supports 'fixed' stops only)
+    """
+    stop: str = 'fixed'
+    stop_pct: float = 0.10
+    trail_pct: float = 0.10
+    atr_mult: float = 2.5
+    atr_mult_initial: float = 1.5
+    atr_fallback: float = 0.90
+    profit_trigger: float = 0.05
+    breakeven_level: float = 1.001
+    milestones: Tuple[Tuple[float, float], ...] = DEFAULT_MILESTONES
+    target_pct: Optional[float] = None
+    max_hold: Optional[int] = None
+    clip_hold: bool = True
+    stale_days: Optional[int] = None
+    stale_floor: float = 1.02
+    basis: str = 'close'
+    direction: str = 'long'
+
+    def __post_init__(self):
+        if self.stop not in STOP_KINDS:
+            raise ValueError(f"Unknown stop kind: {self.stop}")
+        if self.basis not in ('close', 'range'):
+            raise ValueError(f"Unknown basis: {self.basis}")
+        if self.direction not in ('long', 'short'):
+            raise ValueError(f"Unknown direction: {self.direction}")
+        if self.direction == 'short' and self.stop not in ('none', 'fixed'):
+            raise ValueError("Short trades support fixed stops only")
+
+
+@dataclass
+class ExitBatch:
+    """Resolved exits, one entry per trade (exit_idx == -1 means no exit)."""
+    entry_idx: np.ndarray
+    exit_idx: np.ndarray
+    reason: np.ndarray
+    exit_price: np.ndarray
+    ret: np.ndarray
+
+    def __len__(self):
+        return len(self.exit_idx)
+
+    @property
+    def exited(self):
+        return self.exit_idx >= 0
+
+    @property
+    def hold_bars(self):
+        return np.where(self.exited, self.exit_idx - self.entry_idx, -1)
+
+    def reasons(self, names=None):
+        """Reason codes as strings, using `names` to override REASON_NAMES."""
+        table = dict(REASON_NAMES)
+        if names:
+            table.update(names)
+        return [table[int(c)] for c in self.reason]
+
+
+def _running_max(carry, block):
+    """Inclusive running max along bars, seeded with the carried value."""
+    return np.maximum.accumulate(np.concatenate([carry[:, None], block], axis=1), axis=1)[:, 1:]
+
+
+def _running_any(carry, block):
+    return np.logical_or.accumulate(np.concatenate([carry[:, None], block], axis=1), axis=1)[:, 1:]
+
+
+def resolve_exits(close, entry_idx, entry_price, policy, high=None, low=None, atr=None,
+                  stop_level=None, target_level=None, block=32):
+    """
+    Resolve the exit of every trade in one batch.
+
+    Args:
+        close, high, low, atr: bar arrays of one ticker (high/low for 'range')
+        entry_idx: bar index of each entry; exits are checked from entry_idx + 1
+        entry_price: fill price of each entry
+        policy: ExitPolicy
+        stop_level, target_level: optional per-trade price levels replacing
+            the pct-based fixed stop / target ('range' basis)
+        block: forward bars examined in the first pass (doubles every pass)
+
+    Returns:
+        ExitBatch in the same order as the entries
+    """
+    close = np.asarray(close, dtype=float)
+    n = len(close)
+    entry_idx = np.asarray(entry_idx, dtype=np.int64).reshape(-1)
+    entry = np.asarray(entry_price, dtype=float).reshape(-1)
+    m = len(entry_idx)
+
+    exit_idx = np.full(m, -1, dtype=np.int64)
+    reason = np.zeros(m, dtype=np.int8)
+    exit_price = np.full(m, np.nan)
+    ret = np.full(m, np.nan)
+    if m == 0:
+        return ExitBatch(entry_idx, exit_idx, reason, exit_price, ret)
+
+    p = policy
+    use_range = p.basis == 'range'
+    short = p.direction == 'short'
+    hi = np.asarray(high, dtype=float) if use_range else close
+    lo = np.asarray(low, dtype=float) if use_range else close
+    atr = np.asarray(atr, dtype=float) if atr is not None else None
+    if p.stop in ('atr', 'atr_tight_wide') and atr is None:
+        raise ValueError(f"'{p.stop}' stop needs an atr array")
+    stop_level = None if stop_level is None else np.asarray(stop_level, dtype=float).reshape(-1)
+    target_level = None if target_level is None else np.asarray(target_level, dtype=float).reshape(-1)
+
+    remaining = n - 1 - entry_idx
+    horizon = remaining if p.max_hold is None else np.minimum(p.max_hold, remaining)
+
+    # State carried from one block of bars to the next
+    highest = entry.copy()                      # running high (incl. entry price)
+    last_high = np.zeros(m, dtype=np.int64)     # offset of the last strict new high
+    latched = np.zeros(m, dtype=bool)           # breakeven locked / in profit
+    best_gain = np.full(m, -np.inf)             # best close gain ('stepped')
+    entry_atr = None
+    if p.stop == 'atr_tight_wide':
+        entry_atr = atr[entry_idx]
+        entry_atr = np.where(np.isnan(entry_atr), entry * 0.02, entry_atr)
+
+    active = np.flatnonzero(horizon >= 1)
+    start = 1
+    width = max(1, int(block))
+    while active.size:
+        a = active
+        offs = np.arange(start, start + width)
+        pos = np.minimum(entry_idx[a, None] + offs, n - 1)
+        valid = offs <= horizon[a, None]
+        e = entry[a, None]
+        c = close[pos]
+        h = hi[pos]
+        l = lo[pos]
+
+        masks, codes = [], []
+        H = None
+        if p.stop in ('trailing', 'atr', 'breakeven', 'atr_tight_wide', 'hard_trail') or p.stale_days:
+            H = _running_max(highest[a], h)
+
+        # ── Stops (checked before the target on the same bar) ──
+        probe = h if short else l
+        if p.stop == 'fixed':
+            if stop_level is not None:
+                s = stop_level[a, None]
+                masks.append(probe >= s if short else probe <= s)
+            elif short:
+                masks.append((probe - e) / e >= p.stop_pct)
+            elif use_range:
+                masks.append((probe - e) / e <= -p.stop_pct)
+            else:
+                masks.append(probe <= e * (1 - p.stop_pct))
+            codes.append(STOP)
+        elif p.stop == 'trailing':
+            masks.append(probe <= H * (1 - p.stop_pct))
+            codes.append(TRAIL)
+        elif p.stop == 'atr':
+            A = atr[pos]
+            stop = np.where(np.isnan(A), H * p.atr_fallback, H - (A * p.atr_mult))
+            masks.append(probe <= stop)
+            codes.append(TRAIL)
+        elif p.stop == 'breakeven':
+            L = _running_any(latched[a], h >= e * (1 + p.profit_trigger))
+            stop = np.where(L, np.maximum(e * p.breakeven_level, H * (1 - p.stop_pct)),
+                            e * (1 - p.stop_pct))
+            masks.append(probe <= stop)
+            codes.append(np.where(L, TRAIL, STOP))
+        elif p.stop == 'stepped':
+            G = _running_max(best_gain[a], (c - e) / e)
+            level = np.full(G.shape, -p.stop_pct)
+            for trigger, new_stop in p.milestones:
+                level = np.where(G >= trigger, np.maximum(level, new_stop), level)
+            masks.append(probe <= e * (1 + level))
+            codes.append(np.where(level > -p.stop_pct, TRAIL, STOP))
+        elif p.stop == 'atr_tight_wide':
+            L = _running_any(latched[a], h >= e * (1 + p.profit_trigger))
+            A = atr[pos]
+            ea = entry_atr[a, None]
+            trail = H - (np.where(np.isnan(A), ea, A) * p.atr_mult)
+            stop = np.where(L, trail, e - (ea * p.atr_mult_initial))
+            masks.append(probe <= stop)
+            codes.append(np.where(L, TRAIL, STOP))
+        elif p.stop == 'hard_trail':
+            masks.append((probe - e) / e <= -p.stop_pct)
+            codes.append(STOP)
+            masks.append((H > e) & ((probe - H) / H <= -p.trail_pct))
+            codes.append(TRAIL)
+
+        # ── Target ──
+        tprobe = l if short else h
+        if target_level is not None:
+            t = target_level[a, None]
+            masks.append(tprobe <= t if short else tprobe >= t)
+            codes.append(TARGET)
+        elif p.target_pct is not None:
+            if short:
+                masks.append((e - tprobe) / e >= p.target_pct)
+            elif use_range:
+                masks.append((tprobe - e) / e >= p.target_pct)
+            else:
+                masks.append(tprobe >= e * (1 + p.target_pct))
+            codes.append(TARGET)
+
+        # ── Stale trade: no new high for stale_days bars and below the floor ──
+        if p.stale_days:
+            prev_high = np.concatenate([highest[a, None], H[:, :-1]], axis=1)
+            marks = np.where(h > prev_high, offs, 0)
+            last = _running_max(last_high[a], marks)
+            masks.append(((offs - last) >= p.stale_days) & (c < e * p.stale_floor))
+            codes.append(STALE)
+
+        if masks:
+            code = np.select(masks, codes, NO_EXIT).astype(np.int8)
+            code[~valid] = NO_EXIT
+        else:
+            code = np.zeros(pos.shape, dtype=np.int8)
+
+        hit = code != NO_EXIT
+        first = hit.argmax(axis=1)
+        rows = np.arange(len(a))
+        done = hit[rows, first]
+        if done.any():
+            r, col = rows[done], first[done]
+            idx = a[done]
+            exit_idx[idx] = entry_idx[idx] + offs[col]
+            reason[idx] = code[r, col]
+            exit_price[idx], ret[idx] = _exit_fills(p, reason[idx], entry[idx], c[r, col], l[r, col],
+                                                    None if stop_level is None else stop_level[idx],
+                                                    None if target_level is None else target_level[idx])
+
+        more = ~done & (horizon[a] >= start + width)
+        if more.any():
+            keep = a[more]
+            if H is not None:
+                highest[keep] = H[more, -1]
+            if p.stop in ('breakeven', 'atr_tight_wide'):
+                latched[keep] = L[more, -1]
+            if p.stop == 'stepped':
+                best_gain[keep] = G[more, -1]
+            if p.stale_days:
+                last_high[keep] = last[more, -1]
+        active = a[more]
+        start += width
+        width = min(width * 2, MAX_BLOCK)
+
+    # ── Time stop for trades that never exited ──
+    if p.max_hold is not None:
+        open_ = exit_idx < 0
+        t = entry_idx + p.max_hold
+        if p.clip_hold:
+            t = np.minimum(t, n - 1)
+        else:
+            open_ &= t <= n - 1
+        idx = np.flatnonzero(open_)
+        if idx.size:
+            exit_idx[idx] = t[idx]
+            reason[idx] = TIME
+            px = close[t[idx]]
+            exit_price[idx] = px
+            ret[idx] = (entry[idx] - px) / entry[idx] if short else (px - entry[idx]) / entry[idx]
+
+    return ExitBatch(entry_idx, exit_idx, reason, exit_price, ret)
+
+
+def _exit_fills(p, code, entry, c, l, stop_level, target_level):
+    """Fill price and return of the trades that exited inside the scan."""
+    short = p.direction == 'short'
+    if p.basis == 'close':
+        return c, ((entry - c) if short else (c - entry)) / entry
+
+    price = np.array(c, dtype=float)
+    ret = np.full(len(code), np.nan)
+    is_stop, is_trail, is_target = code == STOP, code == TRAIL, code == TARGET
+
+    if stop_level is not None:
+        price[is_stop] = stop_level[is_stop]
+    else:
+        pct = p.stop_pct if short else -p.stop_pct
+        ret[is_stop] = -p.stop_pct
+        price[is_stop] = entry[is_stop] * (1 + pct)
+    if target_level is not None:
+        price[is_target] = target_level[is_target]
+    elif p.target_pct is not None:
+        pct = -p.target_pct if short else p.target_pct
+        ret[is_target] = p.target_pct
+        price[is_target] = entry[is_target] * (1 + pct)
+    if is_trail.any():
+        # hard_trail: filled at the bar's low, never worse than the hard stop
+        trail_ret = np.maximum((l[is_trail] - entry[is_trail]) / entry[is_trail], -p.stop_pct)
+        ret[is_trail] = trail_ret
+        price[is_trail] = entry[is_trail] * (1 + trail_ret)
+
+    levels = np.isnan(ret)
+    if levels.any():
+        # Level fills (explicit stop/target levels, stale exits at the close)
+        ret[levels] = ((entry[levels] - price[levels]) if short else (price[levels] - entry[levels])) / entry[levels]
+    return price, ret
+
+
+def true_range_atr(high, low, close, period=14):
+    """ATR as the rolling mean of true range (first bar's true range is 0)."""
+    high = np.asarray(high, dtype=float)
+    low = np.asarray(low, dtype=float)
+    close = np.asarray(close, dtype=float)
+    tr = np.zeros(len(close))
+    if len(close) > 1:
+        prev = close[:-1]
+        tr[1:] = np.maximum(np.maximum(high[1:] - low[1:], np.abs(high[1:] - prev)),
+                            np.abs(low[1:] - prev))
+    return pd.Series(tr).rolling(period).mean().values
@@ -6,373 +6,104 @@ Test different stop loss approaches on the same signals
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
+import argparse
 import warnings
 warnings.filterwarnings('ignore')
 
 from sp500_top200 import SP500_TOP200
 from data_utils import get_stock_data, load_from_cache, save_to_cache
-from backtest_patterns_sp500 import detect_patterns, get_spy_regime, get_spy_return
+from backtest_patterns_sp500 import get_signal_cache, get_spy_regime, get_spy_return
+from backtest_exits import ExitPolicy, resolve_exits, true_range_atr, STOP, TRAIL
+from backtest_runner import run_tickers, add_workers_arg
 
 PROFIT_TARGET = 0.20  # 20% target for all strategies
 
 
 def calculate_atr(df, period=14):
     """Calculate Average True Range"""
-    high = df['High'].values
-    low = df['Low'].values
-    close = df['Close'].values
-    
-    tr = np.zeros(len(df))
-    for i in range(1, len(df)):
-        tr[i] = max(
-            high[i] - low[i],
-            abs(high[i] - close[i-1]),
-            abs(low[i] - close[i-1])
-        )
-    
-    atr = pd.Series(tr).rolling(period).mean().values
-    return atr
+    return true_range_atr(df['High'].values, df['Low'].values, df['Close'].values, period)
 
 
-def simulate_fixed_stop(df, signals, stop_pct=0.10):
-    """Strategy 1: Fixed percentage stop loss"""
+def _simulate(df, signals, policy, reason_names, atr=None):
+    """Resolve all signals of one stock with the batched exit engine."""
+    if not signals:
+        return []
+
     close = df['Close'].values
+    batch = resolve_exits(close,
+                          [sig['idx'] for sig in signals],
+                          [sig['price'] for sig in signals],
+                          policy, atr=atr)
     trades = []
     
-    for sig in signals:
-        entry_idx = sig['idx']
+    for sig, exit_idx, exit_reason in zip(signals, batch.exit_idx, batch.reasons(reason_names)):
+        if exit_idx < 0:
+            continue
         entry_price = sig['price']
-        stop_price = entry_price * (1 - stop_pct)
-        target_price = entry_price * (1 + PROFIT_TARGET)
-        
-        exit_idx = None
-        exit_reason = None
-        
-        for j in range(entry_idx + 1, len(close)):
-            if close[j] <= stop_price:
-                exit_idx = j
-                exit_reason = 'stop'
-                break
-            if close[j] >= target_price:
-                exit_idx = j
-                exit_reason = 'target'
-                break
-        
-        if exit_idx:
-            trades.append({
-                'entry_date': sig['date'],
-                'entry_price': entry_price,
-                'exit_date': df.index[exit_idx],
-                'exit_price': close[exit_idx],
-                'return_pct': (close[exit_idx] - entry_price) / entry_price * 100,
-                'exit_reason': exit_reason,
-                'hold_days': (df.index[exit_idx] - sig['date']).days
-            })
+        trades.append({
+            'entry_date': sig['date'],
+            'entry_price': entry_price,
+            'exit_date': df.index[exit_idx],
+            'exit_price': close[exit_idx],
+            'return_pct': (close[exit_idx] - entry_price) / entry_price * 100,
+            'exit_reason': exit_reason,
+            'hold_days': (df.index[exit_idx] - sig['date']).days
+        })
     
     return trades
 
 
+def simulate_fixed_stop(df, signals, stop_pct=0.10):
+    """Strategy 1: Fixed percentage stop loss"""
+    policy = ExitPolicy(stop='fixed', stop_pct=stop_pct, target_pct=PROFIT_TARGET)
+    return _simulate(df, signals, policy, {STOP: 'stop'})
+
+
 def simulate_trailing_stop(df, signals, stop_pct=0.10):
     """Strategy 2: Simple trailing stop"""
-    close = df['Close'].values
-    trades = []
-    
-    for sig in signals:
-        entry_idx = sig['idx']
-        entry_price = sig['price']
-        highest = entry_price
-        target_price = entry_price * (1 + PROFIT_TARGET)
-        
-        exit_idx = None
-        exit_reason = None
-        
-        for j in range(entry_idx + 1, len(close)):
-            if close[j] > highest:
-                highest = close[j]
-            
-            stop_price = highest * (1 - stop_pct)
-            
-            if close[j] <= stop_price:
-                exit_idx = j
-                exit_reason = 'trailing_stop'
-                break
-            if close[j] >= target_price:
-                exit_idx = j
-                exit_reason = 'target'
-                break
-        
-        if exit_idx:
-            trades.append({
-                'entry_date': sig['date'],
-                'entry_price': entry_price,
-                'exit_date': df.index[exit_idx],
-                'exit_price': close[exit_idx],
-                'return_pct': (close[exit_idx] - entry_price) / entry_price * 100,
-                'exit_reason': exit_reason,
-                'hold_days': (df.index[exit_idx] - sig['date']).days
-            })
-    
-    return trades
+    policy = ExitPolicy(stop='trailing', stop_pct=stop_pct, target_pct=PROFIT_TARGET)
+    return _simulate(df, signals, policy, {TRAIL: 'trailing_stop'})
 
 
 def simulate_atr_trailing(df, signals, atr_mult=2.5):
     """Strategy 3: ATR-based trailing stop (Chandelier Exit)"""
-    close = df['Close'].values
-    atr = calculate_atr(df)
-    trades = []
-    
-    for sig in signals:
-        entry_idx = sig['idx']
-        entry_price = sig['price']
-        highest = entry_price
-        target_price = entry_price * (1 + PROFIT_TARGET)
-        
-        exit_idx = None
-        exit_reason = None
-        
-        for j in range(entry_idx + 1, len(close)):
-            if close[j] > highest:
-                highest = close[j]
-            
-            # Chandelier: highest high - ATR * multiplier
-            stop_price = highest - (atr[j] * atr_mult) if not np.isnan(atr[j]) else highest * 0.90
-            
-            if close[j] <= stop_price:
-                exit_idx = j
-                exit_reason = 'atr_stop'
-                break
-            if close[j] >= target_price:
-                exit_idx = j
-                exit_reason = 'target'
-                break
-        
-        if exit_idx:
-            trades.append({
-                'entry_date': sig['date'],
-                'entry_price': entry_price,
-                'exit_date': df.index[exit_idx],
-                'exit_price': close[exit_idx],
-                'return_pct': (close[exit_idx] - entry_price) / entry_price * 100,
-                'exit_reason': exit_reason,
-                'hold_days': (df.index[exit_idx] - sig['date']).days
-            })
-    
-    return trades
+    # Chandelier: highest close - ATR * multiplier (10% below the high until ATR is available)
+    policy = ExitPolicy(stop='atr', atr_mult=atr_mult, target_pct=PROFIT_TARGET)
+    return _simulate(df, signals, policy, {TRAIL: 'atr_stop'}, atr=calculate_atr(df))
 
 
 def simulate_time_hybrid(df, signals, stop_pct=0.10, stale_days=20):
     """Strategy 4: Time + Price hybrid - exit stale trades"""
-    close = df['Close'].values
-    trades = []
-    
-    for sig in signals:
-        entry_idx = sig['idx']
-        entry_price = sig['price']
-        highest = entry_price
-        target_price = entry_price * (1 + PROFIT_TARGET)
-        days_since_new_high = 0
-        
-        exit_idx = None
-        exit_reason = None
-        
-        for j in range(entry_idx + 1, len(close)):
-            if close[j] > highest:
-                highest = close[j]
-                days_since_new_high = 0
-            else:
-                days_since_new_high += 1
-            
-            stop_price = highest * (1 - stop_pct)
-            
-            # Fixed stop
-            if close[j] <= stop_price:
-                exit_idx = j
-                exit_reason = 'stop'
-                break
-            
-            # Target
-            if close[j] >= target_price:
-                exit_idx = j
-                exit_reason = 'target'
-                break
-            
-            # Time exit: no new high for N days AND below breakeven
-            if days_since_new_high >= stale_days and close[j] < entry_price * 1.02:
-                exit_idx = j
-                exit_reason = 'time_exit'
-                break
-        
-        if exit_idx:
-            trades.append({
-                'entry_date': sig['date'],
-                'entry_price': entry_price,
-                'exit_date': df.index[exit_idx],
-                'exit_price': close[exit_idx],
-                'return_pct': (close[exit_idx] - entry_price) / entry_price * 100,
-                'exit_reason': exit_reason,
-                'hold_days': (df.index[exit_idx] - sig['date']).days
-            })
-    
-    return trades
+    # Time exit: no new high for N days AND below breakeven (+2%)
+    policy = ExitPolicy(stop='trailing', stop_pct=stop_pct, target_pct=PROFIT_TARGET,
+                        stale_days=stale_days, stale_floor=1.02)
+    return _simulate(df, signals, policy, {TRAIL: 'stop'})
 
 
 def simulate_breakeven_lock(df, signals, initial_stop=0.10, breakeven_trigger=0.05):
     """Strategy 5: Move to breakeven after 5% gain, then trail"""
-    close = df['Close'].values
-    trades = []
-    
-    for sig in signals:
-        entry_idx = sig['idx']
-        entry_price = sig['price']
-        highest = entry_price
-        target_price = entry_price * (1 + PROFIT_TARGET)
-        stop_price = entry_price * (1 - initial_stop)
-        breakeven_locked = False
-        
-        exit_idx = None
-        exit_reason = None
-        
-        for j in range(entry_idx + 1, len(close)):
-            if close[j] > highest:
-                highest = close[j]
-            
-            # Lock in breakeven after 5% gain
-            if not breakeven_locked and close[j] >= entry_price * (1 + breakeven_trigger):
-                stop_price = entry_price * 1.001  # Tiny profit
-                breakeven_locked = True
-            
-            # After breakeven, trail at 10% from high
-            if breakeven_locked:
-                trailing_stop = highest * (1 - initial_stop)
-                stop_price = max(stop_price, trailing_stop)
-            
-            if close[j] <= stop_price:
-                exit_idx = j
-                exit_reason = 'breakeven_stop' if breakeven_locked else 'initial_stop'
-                break
-            if close[j] >= target_price:
-                exit_idx = j
-                exit_reason = 'target'
-                break
-        
-        if exit_idx:
-            trades.append({
-                'entry_date': sig['date'],
-                'entry_price': entry_price,
-                'exit_date': df.index[exit_idx],
-                'exit_price': close[exit_idx],
-                'return_pct': (close[exit_idx] - entry_price) / entry_price * 100,
-                'exit_reason': exit_reason,
-                'hold_days': (df.index[exit_idx] - sig['date']).days
-            })
-    
-    return trades
+    # After the trigger the stop is max(entry * 1.001, highest * (1 - initial_stop))
+    policy = ExitPolicy(stop='breakeven', stop_pct=initial_stop, profit_trigger=breakeven_trigger,
+                        breakeven_level=1.001, target_pct=PROFIT_TARGET)
+    return _simulate(df, signals, policy, {STOP: 'initial_stop', TRAIL: 'breakeven_stop'})
 
 
 def simulate_stepped_trail(df, signals, initial_stop=0.10):
     """Strategy 6: Stepped trailing - ratchet up at milestones"""
-    close = df['Close'].values
-    trades = []
-    
     # Milestones: at each gain level, set stop at previous level
-    milestones = [(0.05, 0.0), (0.10, 0.05), (0.15, 0.10), (0.20, 0.15)]
-    
-    for sig in signals:
-        entry_idx = sig['idx']
-        entry_price = sig['price']
-        target_price = entry_price * (1 + PROFIT_TARGET)
-        stop_pct = -initial_stop  # Negative = below entry
-        
-        exit_idx = None
-        exit_reason = None
-        
-        for j in range(entry_idx + 1, len(close)):
-            current_gain = (close[j] - entry_price) / entry_price
-            
-            # Check milestones
-            for trigger, new_stop in milestones:
-                if current_gain >= trigger:
-                    stop_pct = max(stop_pct, new_stop)
-            
-            stop_price = entry_price * (1 + stop_pct)
-            
-            if close[j] <= stop_price:
-                exit_idx = j
-                exit_reason = 'stepped_stop'
-                break
-            if close[j] >= target_price:
-                exit_idx = j
-                exit_reason = 'target'
-                break
-        
-        if exit_idx:
-            trades.append({
-                'entry_date': sig['date'],
-                'entry_price': entry_price,
-                'exit_date': df.index[exit_idx],
-                'exit_price': close[exit_idx],
-                'return_pct': (close[exit_idx] - entry_price) / entry_price * 100,
-                'exit_reason': exit_reason,
-                'hold_days': (df.index[exit_idx] - sig['date']).days
-            })
-    
-    return trades
+    milestones = ((0.05, 0.0), (0.10, 0.05), (0.15, 0.10), (0.20, 0.15))
+    policy = ExitPolicy(stop='stepped', stop_pct=initial_stop, milestones=milestones,
+                        target_pct=PROFIT_TARGET)
+    return _simulate(df, signals, policy, {STOP: 'stepped_stop', TRAIL: 'stepped_stop'})
 
 
 def simulate_atr_initial_trailing(df, signals, atr_mult_initial=1.5, atr_mult_trail=2.5):
     """Strategy 7: Tighter initial ATR stop, wider trailing after profit"""
-    close = df['Close'].values
-    atr = calculate_atr(df)
-    trades = []
-    
-    for sig in signals:
-        entry_idx = sig['idx']
-        entry_price = sig['price']
-        entry_atr = atr[entry_idx] if not np.isnan(atr[entry_idx]) else entry_price * 0.02
-        highest = entry_price
-        target_price = entry_price * (1 + PROFIT_TARGET)
-        in_profit = False
-        
-        exit_idx = None
-        exit_reason = None
-        
-        for j in range(entry_idx + 1, len(close)):
-            if close[j] > highest:
-                highest = close[j]
-            
-            # Switch to wider trail after reaching 5% profit
-            if close[j] >= entry_price * 1.05:
-                in_profit = True
-            
-            if in_profit:
-                # Wider trailing from high
-                current_atr = atr[j] if not np.isnan(atr[j]) else entry_atr
-                stop_price = highest - (current_atr * atr_mult_trail)
-            else:
-                # Tighter initial stop from entry
-                stop_price = entry_price - (entry_atr * atr_mult_initial)
-            
-            if close[j] <= stop_price:
-                exit_idx = j
-                exit_reason = 'atr_trail' if in_profit else 'atr_initial'
-                break
-            if close[j] >= target_price:
-                exit_idx = j
-                exit_reason = 'target'
-                break
-        
-        if exit_idx:
-            trades.append({
-                'entry_date': sig['date'],
-                'entry_price': entry_price,
-                'exit_date': df.index[exit_idx],
-                'exit_price': close[exit_idx],
-                'return_pct': (close[exit_idx] - entry_price) / entry_price * 100,
-                'exit_reason': exit_reason,
-                'hold_days': (df.index[exit_idx] - sig['date']).days
-            })
-    
-    return trades
+    # Entry ATR falls back to 2% of price; switches to the wide trail at +5%
+    policy = ExitPolicy(stop='atr_tight_wide', atr_mult_initial=atr_mult_initial,
+                        atr_mult=atr_mult_trail, profit_trigger=0.05, target_pct=PROFIT_TARGET)
+    return _simulate(df, signals, policy, {STOP: 'atr_initial', TRAIL: 'atr_trail'},
+                     atr=calculate_atr(df))
 
 
 STRATEGIES = {
@@ -387,7 +118,37 @@ STRATEGIES = {
 }
 
 
-def run_comparison():
+def backtest_ticker(ticker):
+    """Runner worker: (progress status, {strategy: trades}) for one stock."""
+    df = get_stock_data(ticker, period='15y', interval='1d', cache_ttl=24)
+    if df is None or len(df) < 300:
+        return "skip", None
+    
+    # Get signals
+    signals = get_signal_cache().signals(ticker, df)
+    if not signals:
+        return "no signals", None
+    
+    # Filter bull market signals
+    dates = pd.DatetimeIndex([s['date'] for s in signals])
+    bull = get_spy_regime(dates - timedelta(days=7), dates)
+    bull_signals = [s for s, b in zip(signals, bull) if b]
+    if not bull_signals:
+        return "no bull signals", None
+    
+    # Test each strategy
+    results = {}
+    for name, strategy_func in STRATEGIES.items():
+        trades = strategy_func(df, bull_signals)
+        for t in trades:
+            t['ticker'] = ticker
+        results[name] = trades
+    
+    trade_counts = [len(trades) for trades in results.values()]
+    return f"{min(trade_counts)}-{max(trade_counts)} trades", results
+
+
+def run_comparison(workers=1):
     """Compare all loss management strategies"""
     print(f"\n{'='*70}")
     print(f"  LOSS MANAGEMENT STRATEGY COMPARISON")
@@ -399,36 +160,10 @@ def run_comparison():
     
     all_results = {name: [] for name in STRATEGIES.keys()}
     
-    for i, ticker in enumerate(test_stocks):
-        print(f"  [{i+1}/{len(test_stocks)}] {ticker}...", end=' ', flush=True)
-        
-        df = get_stock_data(ticker, period='15y', interval='1d', cache_ttl=24)
-        if df is None or len(df) < 300:
-            print("skip")
-            continue
-        
-        # Get signals
-        signals = detect_patterns(df)
-        if not signals:
-            print("no signals")
-            continue
-        
-        # Filter bull market signals
-        bull_signals = [s for s in signals if get_spy_regime(s['date'] - timedelta(days=7), s['date'])]
-        if not bull_signals:
-            print("no bull signals")
-            continue
-        
-        # Test each strategy
-        trade_counts = []
-        for name, strategy_func in STRATEGIES.items():
-            trades = strategy_func(df, bull_signals)
-            for t in trades:
-                t['ticker'] = ticker
-            all_results[name].extend(trades)
-            trade_counts.append(len(trades))
-        
-        print(f"{min(trade_counts)}-{max(trade_counts)} trades")
+    for ticker, results in run_tickers(backtest_ticker, test_stocks, workers=workers):
+        if results:
+            for name, trades in results.items():
+                all_results[name].extend(trades)
     
     # Calculate results
     print(f"\n{'='*70}")
@@ -444,11 +179,7 @@ def run_comparison():
         df_trades = pd.DataFrame(trades)
         
         # Get SPY returns for alpha calculation
-        spy_returns = []
-        for _, row in df_trades.iterrows():
-            spy_ret = get_spy_return(row['entry_date'], row['exit_date'])
-            spy_returns.append(spy_ret)
-        df_trades['spy_return'] = spy_returns
+        df_trades['spy_return'] = get_spy_return(df_trades['entry_date'], df_trades['exit_date'])
         df_trades['alpha'] = df_trades['return_pct'] - df_trades['spy_return']
         
         win_rate = (df_trades['return_pct'] > 0).mean() * 100
@@ -495,4 +226,7 @@ def run_comparison():
 
 
 if __name__ == '__main__':
-    run_comparison()
+    parser = argparse.ArgumentParser(description='Loss management strategy comparison')
+    add_workers_arg(parser)
+    args = parser.parse_args()
+    run_comparison(workers=args.workers)
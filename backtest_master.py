@@ -15,6 +15,12 @@ import numpy as np
 from datetime import datetime
 import json, sys
 
+from backtest_exits import ExitPolicy, resolve_exits
+from signal_cache import SignalCache
+from results_store import ResultsStore
+
+PATTERN_VERSION = 1   # bump when detect_patterns() changes meaning
+
 UNIVERSE = [
     'NVDA', 'AAPL', 'MSFT', 'GOOGL', 'META', 'AMZN', 'TSLA', 'AMD', 'AVGO', 'CRM',
     'PLTR', 'NET', 'SNOW', 'DDOG', 'CRWD', 'ZS', 'MDB', 'PANW', 'NOW', 'SHOP',
@@ -27,7 +33,7 @@ UNIVERSE = [
 ]
 
 
-def detect_patterns(df):
+def detect_patterns(df, start=0):
     """Vectorized pattern detection. Returns list of (index, pattern_names, volume_ratio)."""
     close = df['Close'].values
     volume = df['Volume'].values
@@ -41,7 +47,7 @@ def detect_patterns(df):
 
     signals = []
 
-    for i in range(252, n):
+    for i in range(max(252, start), n):
         pats = []
         vol_ratio = volume[i] / vol_50[i] if vol_50[i] > 0 else 1.0
 
@@ -117,40 +123,101 @@ def detect_patterns(df):
     return signals
 
 
+def download_universe(end_date, start_date='2020-01-01', tickers=UNIVERSE):
+    """Download daily bars for every ticker with more than a year of history."""
+    all_data = {}
+    for i, t in enumerate(tickers):
+        try:
+            df = yf.download(t, start=start_date, end=end_date, progress=False)
+            if isinstance(df.columns, pd.MultiIndex):
+                df.columns = df.columns.get_level_values(0)
+            if len(df) > 252:
+                all_data[t] = df
+            sys.stdout.write(f"\r  {i+1}/{len(tickers)}: {t}     ")
+            sys.stdout.flush()
+        except:
+            pass
+    return all_data
+
+
+def download_spy(end_date, start_date='2020-01-01'):
+    """Daily SPY bars for the market regime filters."""
+    spy = yf.download('SPY', start=start_date, end=end_date, progress=False)
+    if isinstance(spy.columns, pd.MultiIndex):
+        spy.columns = spy.columns.get_level_values(0)
+    return spy
+
+
+def detect_all(all_data, scan_start, room=15, cache=True):
+    """
+    Detect patterns once per stock. Keeps signals from scan_start on with room to trade.
+    Signals persist in the signal cache, so reruns on the same bars skip detection.
+    """
+    signal_cache = SignalCache('master', detect_patterns, PATTERN_VERSION, enabled=cache)
+    all_signals = {}  # ticker -> list of signal dicts
+    for ticker, df in all_data.items():
+        sys.stdout.write(f"\r  {ticker}...              ")
+        sys.stdout.flush()
+        sigs = signal_cache.signals(ticker, df)
+        # Filter to our backtest window and ensure room for trades
+        all_signals[ticker] = [dict(s, ticker=ticker) for s in sigs
+                               if s['date'] >= scan_start and s['idx'] + room < len(df)]
+    if cache:
+        sys.stdout.write(f"\r  {signal_cache.summary()}          ")
+    return all_signals
+
+
+def fixed_policy(stop_loss, profit_target, max_hold):
+    """Hard stop on the low, fixed target on the high, time exit at max_hold."""
+    return ExitPolicy(stop='fixed', stop_pct=stop_loss, target_pct=profit_target,
+                      max_hold=max_hold, basis='range')
+
+
+def trailing_policy(stop_loss, trail_pct, max_hold):
+    """Hard stop plus a trailing stop from the highest high once in profit."""
+    return ExitPolicy(stop='hard_trail', stop_pct=stop_loss, trail_pct=trail_pct,
+                      max_hold=max_hold, basis='range')
+
+
+def _single(batch):
+    return float(batch.ret[0]), batch.reasons()[0], int(batch.hold_bars[0])
+
+
 def simulate_trade(close, high, low, entry_idx, entry_price, stop_loss, profit_target, max_hold):
     """Simulate a single trade. Returns (return_pct, exit_reason, hold_days)."""
-    n = len(close)
-    for j in range(1, min(max_hold + 1, n - entry_idx)):
-        loss = (low[entry_idx + j] - entry_price) / entry_price
-        if loss <= -stop_loss:
-            return -stop_loss, 'stop', j
-        gain = (high[entry_idx + j] - entry_price) / entry_price
-        if gain >= profit_target:
-            return profit_target, 'target', j
-    # Time exit
-    end_idx = min(entry_idx + max_hold, n - 1)
-    ret = (close[end_idx] - entry_price) / entry_price
-    return ret, 'time', min(max_hold, n - entry_idx - 1)
+    policy = fixed_policy(stop_loss, profit_target, max_hold)
+    return _single(resolve_exits(close, [entry_idx], [entry_price], policy, high=high, low=low))
 
 
 def simulate_trailing(close, high, low, entry_idx, entry_price, stop_loss, trail_pct, max_hold):
     """Simulate trade with trailing stop."""
-    n = len(close)
-    highest = entry_price
-    for j in range(1, min(max_hold + 1, n - entry_idx)):
-        highest = max(highest, high[entry_idx + j])
-        # Initial hard stop
-        loss = (low[entry_idx + j] - entry_price) / entry_price
-        if loss <= -stop_loss:
-            return -stop_loss, 'stop', j
-        # Trailing stop from highest point
-        trail_loss = (low[entry_idx + j] - highest) / highest
-        if trail_loss <= -trail_pct and highest > entry_price:
-            ret = (low[entry_idx + j] - entry_price) / entry_price
-            return max(ret, -stop_loss), 'trail', j
-    end_idx = min(entry_idx + max_hold, n - 1)
-    ret = (close[end_idx] - entry_price) / entry_price
-    return ret, 'time', min(max_hold, n - entry_idx - 1)
+    policy = trailing_policy(stop_loss, trail_pct, max_hold)
+    return _single(resolve_exits(close, [entry_idx], [entry_price], policy, high=high, low=low))
+
+
+def batch_trades(all_data, all_signals, policy, keep=None):
+    """
+    Resolve every cached signal that passes keep(signal, df) under one exit
+    policy. Returns (signal, return, hold_days) tuples in ticker/signal order,
+    like the old per-trade loops.
+    """
+    trades = []
+    for ticker, sigs in all_signals.items():
+        df = all_data[ticker]
+        if keep is not None:
+            sigs = [s for s in sigs if keep(s, df)]
+        if not sigs:
+            continue
+        batch = resolve_exits(df['Close'].values, [s['idx'] for s in sigs],
+                              [s['entry_price'] for s in sigs], policy,
+                              high=df['High'].values, low=df['Low'].values)
+        trades.extend(zip(sigs, batch.ret.tolist(), batch.hold_bars.tolist()))
+    return trades
+
+
+def batch_returns(all_data, all_signals, policy, keep=None):
+    """Returns of batch_trades() only."""
+    return [r for _, r, _ in batch_trades(all_data, all_signals, policy, keep)]
 
 
 def calc_stats(returns):
@@ -213,23 +280,10 @@ def run():
 
     # ── DOWNLOAD DATA ──
     print("📥 Downloading data...")
-    all_data = {}
-    for i, t in enumerate(UNIVERSE):
-        try:
-            df = yf.download(t, start='2020-01-01', end=end_date, progress=False)
-            if isinstance(df.columns, pd.MultiIndex):
-                df.columns = df.columns.get_level_values(0)
-            if len(df) > 252:
-                all_data[t] = df
-            sys.stdout.write(f"\r  {i+1}/{len(UNIVERSE)}: {t}     ")
-            sys.stdout.flush()
-        except:
-            pass
+    all_data = download_universe(end_date)
 
     # Download SPY for market regime
-    spy = yf.download('SPY', start='2020-01-01', end=end_date, progress=False)
-    if isinstance(spy.columns, pd.MultiIndex):
-        spy.columns = spy.columns.get_level_values(0)
+    spy = download_spy(end_date)
     spy_close = spy['Close']
     spy_ma50 = spy_close.rolling(50).mean()
     spy_ma200 = spy_close.rolling(200).mean()
@@ -238,20 +292,24 @@ def run():
 
     # ── DETECT PATTERNS (once) ──
     print("🔍 Detecting patterns across all stocks...")
-    all_signals = {}  # ticker -> list of signal dicts
-    total_sigs = 0
-    for ticker, df in all_data.items():
-        sys.stdout.write(f"\r  {ticker}...              ")
-        sys.stdout.flush()
-        sigs = detect_patterns(df)
-        # Filter to our backtest window and ensure room for trades
-        sigs = [s for s in sigs if s['date'] >= scan_start and s['idx'] + 15 < len(df)]
-        all_signals[ticker] = sigs
-        total_sigs += len(sigs)
+    all_signals = detect_all(all_data, scan_start)
+    total_sigs = sum(len(sigs) for sigs in all_signals.values())
     print(f"\n  ✅ {total_sigs} pattern signals cached\n")
 
     results = {}
 
+    # Every config of every test becomes a run in the results store
+    store = ResultsStore()
+
+    def record(test, st, trades, **params):
+        if st:
+            store.add_run('backtest_master', params={'test': test, **params}, stats=st,
+                          trades=[{'ticker': s['ticker'], 'entry_date': s['date'],
+                                   'entry_price': s['entry_price'], 'patterns': s['patterns'],
+                                   'ret': r, 'hold_days': h, 'vol_ratio': s['vol_ratio']}
+                                  for s, r, h in trades],
+                          start=start_date, end=end_date)
+
     # ════════════════════════════════════════════════════════
     # TEST 1: Stop Loss / Profit Target Grid
     # ════════════════════════════════════════════════════════
@@ -268,14 +326,10 @@ def run():
 
     for sl in stops:
         for pt in targets:
-            rets = []
-            for ticker, sigs in all_signals.items():
-                df = all_data[ticker]
-                c, h, l = df['Close'].values, df['High'].values, df['Low'].values
-                for s in sigs:
-                    r, _, _ = simulate_trade(c, h, l, s['idx'], s['entry_price'], sl, pt, max_hold)
-                    rets.append(r)
+            trades = batch_trades(all_data, all_signals, fixed_policy(sl, pt, max_hold))
+            rets = [r for _, r, _ in trades]
             st = calc_stats(rets)
+            record('stop_target', st, trades, stop_loss=sl, profit_target=pt, max_hold=max_hold)
             if st:
                 label = f"{sl*100:.0f}%/{pt*100:.0f}%"
                 t1_rows.append([label, str(st['trades']), f"{st['win_rate']}%",
@@ -308,21 +362,19 @@ def run():
         'SPY < 50MA': lambda d: spy_close.asof(d) < spy_ma50.asof(d),
     }
 
+    def passes(filt, s):
+        try:
+            return bool(filt(s['date']))
+        except:
+            return False
+
     t2_rows = []
     for name, filt in regimes.items():
-        rets = []
-        for ticker, sigs in all_signals.items():
-            df = all_data[ticker]
-            c, h, l = df['Close'].values, df['High'].values, df['Low'].values
-            for s in sigs:
-                try:
-                    if not filt(s['date']):
-                        continue
-                except:
-                    continue
-                r, _, _ = simulate_trade(c, h, l, s['idx'], s['entry_price'], sl, pt, mh)
-                rets.append(r)
+        trades = batch_trades(all_data, all_signals, fixed_policy(sl, pt, mh),
+                              keep=lambda s, df, filt=filt: passes(filt, s))
+        rets = [r for _, r, _ in trades]
         st = calc_stats(rets)
+        record('regime', st, trades, regime=name, stop_loss=sl, profit_target=pt, max_hold=mh)
         if st:
             t2_rows.append([name, str(st['trades']), f"{st['win_rate']}%",
                            f"{st['avg_return']}%", f"{st['profit_factor']}x",
@@ -344,16 +396,11 @@ def run():
     t3_rows = []
 
     for vt in vol_thresholds:
-        rets = []
-        for ticker, sigs in all_signals.items():
-            df = all_data[ticker]
-            c, h, l = df['Close'].values, df['High'].values, df['Low'].values
-            for s in sigs:
-                if s['vol_ratio'] < vt:
-                    continue
-                r, _, _ = simulate_trade(c, h, l, s['idx'], s['entry_price'], sl, pt, mh)
-                rets.append(r)
+        trades = batch_trades(all_data, all_signals, fixed_policy(sl, pt, mh),
+                              keep=lambda s, df: s['vol_ratio'] >= vt)
+        rets = [r for _, r, _ in trades]
         st = calc_stats(rets)
+        record('volume', st, trades, min_vol_ratio=vt, stop_loss=sl, profit_target=pt, max_hold=mh)
         if st:
             t3_rows.append([f"≥{vt}x avg", str(st['trades']), f"{st['win_rate']}%",
                            f"{st['avg_return']}%", f"{st['profit_factor']}x",
@@ -375,16 +422,11 @@ def run():
     hold_periods = [15, 30, 45, 60, 90]
     t4a_rows = []
     for mh in hold_periods:
-        rets = []
-        for ticker, sigs in all_signals.items():
-            df = all_data[ticker]
-            c, h, l = df['Close'].values, df['High'].values, df['Low'].values
-            for s in sigs:
-                if s['idx'] + mh >= len(df):
-                    continue
-                r, _, _ = simulate_trade(c, h, l, s['idx'], s['entry_price'], sl, pt, mh)
-                rets.append(r)
+        trades = batch_trades(all_data, all_signals, fixed_policy(sl, pt, mh),
+                              keep=lambda s, df: s['idx'] + mh < len(df))
+        rets = [r for _, r, _ in trades]
         st = calc_stats(rets)
+        record('hold', st, trades, stop_loss=sl, profit_target=pt, max_hold=mh)
         if st:
             t4a_rows.append([f"{mh} days", str(st['trades']), f"{st['win_rate']}%",
                             f"{st['avg_return']}%", f"{st['profit_factor']}x",
@@ -399,16 +441,11 @@ def run():
     t4b_rows = []
     mh = 60
     for tp in trail_pcts:
-        rets = []
-        for ticker, sigs in all_signals.items():
-            df = all_data[ticker]
-            c, h, l = df['Close'].values, df['High'].values, df['Low'].values
-            for s in sigs:
-                if s['idx'] + mh >= len(df):
-                    continue
-                r, _, _ = simulate_trailing(c, h, l, s['idx'], s['entry_price'], sl, tp, mh)
-                rets.append(r)
+        trades = batch_trades(all_data, all_signals, trailing_policy(sl, tp, mh),
+                              keep=lambda s, df: s['idx'] + mh < len(df))
+        rets = [r for _, r, _ in trades]
         st = calc_stats(rets)
+        record('trailing', st, trades, stop_loss=sl, trail_pct=tp, max_hold=mh)
         if st:
             t4b_rows.append([f"{tp*100:.0f}% trail", str(st['trades']), f"{st['win_rate']}%",
                             f"{st['avg_return']}%", f"{st['profit_factor']}x",
@@ -432,18 +469,14 @@ def run():
     # By number of simultaneous patterns
     for n_pats in [1, 2, 3]:
         label = f"Exactly {n_pats}" if n_pats < 3 else f"{n_pats}+ patterns"
-        rets = []
-        for ticker, sigs in all_signals.items():
-            df = all_data[ticker]
-            c, h, l = df['Close'].values, df['High'].values, df['Low'].values
-            for s in sigs:
-                if n_pats < 3 and s['num_patterns'] != n_pats:
-                    continue
-                if n_pats >= 3 and s['num_patterns'] < n_pats:
-                    continue
-                r, _, _ = simulate_trade(c, h, l, s['idx'], s['entry_price'], sl, pt, mh)
-                rets.append(r)
+        if n_pats < 3:
+            keep = lambda s, df: s['num_patterns'] == n_pats
+        else:
+            keep = lambda s, df: s['num_patterns'] >= n_pats
+        trades = batch_trades(all_data, all_signals, fixed_policy(sl, pt, mh), keep=keep)
+        rets = [r for _, r, _ in trades]
         st = calc_stats(rets)
+        record('patterns', st, trades, patterns=label, stop_loss=sl, profit_target=pt, max_hold=mh)
         if st:
             t5_rows.append([label, str(st['trades']), f"{st['win_rate']}%",
                            f"{st['avg_return']}%", f"{st['profit_factor']}x",
@@ -452,16 +485,11 @@ def run():
     # By specific pattern
     pat_names = ['Pocket Pivot', 'Flat Base', 'VCP', 'Breakout', 'Cup w/ Handle']
     for pn in pat_names:
-        rets = []
-        for ticker, sigs in all_signals.items():
-            df = all_data[ticker]
-            c, h, l = df['Close'].values, df['High'].values, df['Low'].values
-            for s in sigs:
-                if pn not in s['patterns']:
-                    continue
-                r, _, _ = simulate_trade(c, h, l, s['idx'], s['entry_price'], sl, pt, mh)
-                rets.append(r)
+        trades = batch_trades(all_data, all_signals, fixed_policy(sl, pt, mh),
+                              keep=lambda s, df: pn in s['patterns'])
+        rets = [r for _, r, _ in trades]
         st = calc_stats(rets)
+        record('patterns', st, trades, patterns=pn, stop_loss=sl, profit_target=pt, max_hold=mh)
         if st:
             t5_rows.append([pn, str(st['trades']), f"{st['win_rate']}%",
                            f"{st['avg_return']}%", f"{st['profit_factor']}x",
@@ -475,15 +503,12 @@ def run():
         ('PP+Breakout', ['Pocket Pivot', 'Breakout']),
     ]
     for name, required in combos:
-        rets = []
-        for ticker, sigs in all_signals.items():
-            df = all_data[ticker]
-            c, h, l = df['Close'].values, df['High'].values, df['Low'].values
-            for s in sigs:
-                if all(p in s['patterns'] for p in required):
-                    r, _, _ = simulate_trade(c, h, l, s['idx'], s['entry_price'], sl, pt, mh)
-                    rets.append(r)
+        trades = batch_trades(all_data, all_signals, fixed_policy(sl, pt, mh),
+                              keep=lambda s, df: all(p in s['patterns'] for p in required))
+        rets = [r for _, r, _ in trades]
         st = calc_stats(rets)
+        if st and st['trades'] >= 10:
+            record('patterns', st, trades, patterns=name, stop_loss=sl, profit_target=pt, max_hold=mh)
         if st and st['trades'] >= 10:
             t5_rows.append([name, str(st['trades']), f"{st['win_rate']}%",
                            f"{st['avg_return']}%", f"{st['profit_factor']}x",
@@ -516,7 +541,8 @@ def run():
             'results': {k: str(v) for k, v in results.items()},
             'total_signals': total_sigs
         }, f, indent=2, default=str)
-    print(f"\n  💾 Saved to backtest_master_results.json")
+    store.close()
+    print(f"\n  💾 Saved to backtest_master_results.json ({store.path})")
     print(f"\n{'#'*70}\n")
 
 
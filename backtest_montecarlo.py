@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Monte Carlo / Bootstrap Analysis of backtest trades
+
+- Resamples the trade sequence (plain or circular block bootstrap) into a
+  (trials x trades) matrix and evaluates every path at once with numpy
+- Equity compounds each trade at a fixed fraction of equity
+  (system.py sizing: 2% risk / 10% stop = 20% of equity per position)
+- Reports confidence bands for CAGR, max drawdown and final equity, plus
+  risk of ruin (probability the drawdown ever reaches the ruin level)
+
+calc_stats() / TradeSimulator.get_metrics() describe the one historical path;
+this shows how much of that was luck of the ordering.
+
+Usage:
+    python3 backtest_montecarlo.py                     # system.py rules, 100k trials
+    python3 backtest_montecarlo.py --block 10 --ruin 0.30
+    python3 backtest_montecarlo.py --trials 20000 --years 3 --seed 7
+
+    # Any list of trade returns (fractions):
+    mc = simulate_paths(returns, hold_days=holds)
+    print_report(mc)
+"""
+import argparse
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from backtest_master import (download_universe, download_spy, detect_all,
+                             fixed_policy, batch_trades)
+from backtest_optimal import calc_stats
+from system import STOP_LOSS, PROFIT_TARGET, MAX_HOLD_DAYS, RISK_PER_TRADE, MAX_POSITIONS
+
+PERCENTILES = (5, 25, 50, 75, 95)
+CHUNK_CELLS = 4_000_000    # trials x trades evaluated per chunk
+
+
+@dataclass
+class MonteCarloResult:
+    """Per-trial outcomes of a bootstrap run."""
+    trials: int
+    trades: int             # trades per path
+    years: float            # calendar years one path represents
+    block: int
+    ruin_dd: float
+    cagr: np.ndarray
+    max_dd: np.ndarray
+    final: np.ndarray       # final equity multiple
+    ruined: np.ndarray      # drawdown reached ruin_dd
+
+    @property
+    def risk_of_ruin(self):
+        return float(self.ruined.mean())
+
+    def bands(self, percentiles=PERCENTILES):
+        """{metric: {percentile: value}}"""
+        return {name: dict(zip(percentiles, np.percentile(values, percentiles)))
+                for name, values in (('cagr', self.cagr), ('max_dd', self.max_dd), ('final', self.final))}
+
+
+def system_fraction():
+    """Fraction of equity per position under system.py sizing (capped by max positions)."""
+    return min(RISK_PER_TRADE / STOP_LOSS, 1.0 / MAX_POSITIONS)
+
+
+def bootstrap_indices(rng, n, trials, length, block=1):
+    """
+    Resampled trade indices, shape (trials, length).
+
+    block=1 draws trades independently; block>1 draws circular blocks of
+    consecutive trades, keeping streaks / regime clustering intact.
+    """
+    dtype = np.uint16 if n <= np.iinfo(np.uint16).max else np.int32
+    if block <= 1:
+        return rng.integers(0, n, size=(trials, length), dtype=dtype)
+    n_blocks = -(-length // block)
+    starts = rng.integers(0, n, size=(trials, n_blocks, 1), dtype=np.int32)
+    idx = (starts + np.arange(block, dtype=np.int32)) % n
+    return idx.reshape(trials, n_blocks * block)[:, :length]
+
+
+def simulate_paths(returns, hold_days=None, trials=100_000, length=None, block=1,
+                   fraction=None, positions=MAX_POSITIONS, trades_per_year=None,
+                   ruin_dd=0.50, seed=None):
+    """
+    Bootstrap equity paths from per-trade returns.
+
+    Args:
+        returns: per-trade returns as fractions (0.2 = +20%)
+        hold_days: per-trade holding bars, used to estimate trades/year as
+            positions * 252 / mean hold (or pass trades_per_year)
+        trials: number of resampled paths
+        length: trades per path (default: as many as the sample)
+        block: bootstrap block length (1 = plain bootstrap)
+        fraction: equity fraction per trade (default: system.py sizing)
+        ruin_dd: drawdown that counts as ruin
+        seed: RNG seed for reproducible bands
+    """
+    r = np.asarray(returns, dtype=float)
+    r = r[~np.isnan(r)]
+    if len(r) == 0:
+        raise ValueError("No trades to resample")
+    length = int(length or len(r))
+    fraction = system_fraction() if fraction is None else fraction
+    if trades_per_year is None:
+        avg_hold = float(np.mean(hold_days)) if hold_days is not None and len(hold_days) else 20.0
+        trades_per_year = positions * 252 / max(avg_hold, 1.0)
+    years = length / trades_per_year
+
+    # Work in log equity: compounding becomes a cumsum, drawdown a difference.
+    # float32 halves memory traffic; error over a few thousand trades is ~1e-4
+    log_growth = np.log1p(np.maximum(fraction * r, -0.999999)).astype(np.float32)
+    rng = np.random.default_rng(seed)
+
+    log_final = np.empty(trials)
+    log_dd = np.empty(trials)
+    step = max(1, CHUNK_CELLS // length)
+    for lo in range(0, trials, step):
+        hi = min(lo + step, trials)
+        path = log_growth[bootstrap_indices(rng, len(r), hi - lo, length, block)]
+        np.cumsum(path, axis=1, out=path)
+        peak = np.maximum.accumulate(path, axis=1)
+        np.maximum(peak, 0.0, out=peak)             # starting equity counts as a peak
+        np.subtract(peak, path, out=peak)
+        log_dd[lo:hi] = peak.max(axis=1)
+        log_final[lo:hi] = path[:, -1]
+
+    final = np.exp(log_final)
+    max_dd = -np.expm1(-log_dd)
+    cagr = final ** (1.0 / years) - 1 if years > 0 else np.full(trials, np.nan)
+    return MonteCarloResult(trials=trials, trades=length, years=years, block=block,
+                            ruin_dd=ruin_dd, cagr=cagr, max_dd=max_dd, final=final,
+                            ruined=max_dd >= ruin_dd)
+
+
+def system_trades(start_date='2021-01-01', end_date='2026-01-31'):
+    """Trades of the system.py rules on the master universe: returns and hold days."""
+    scan_start = pd.Timestamp(start_date)
+
+    print("📥 Downloading data...")
+    all_data = download_universe(end_date)
+    spy = download_spy(end_date)
+    bull = spy['Close'] > spy['Close'].rolling(200).mean()
+    print(f"\n  ✅ {len(all_data)} stocks + SPY\n")
+
+    print("🔍 Detecting patterns...")
+    all_signals = detect_all(all_data, scan_start)
+    print()
+
+    # SPY > 200MA; Breakout's volume rule is already part of detection
+    policy = fixed_policy(STOP_LOSS, PROFIT_TARGET, MAX_HOLD_DAYS)
+    trades = batch_trades(all_data, all_signals, policy,
+                          keep=lambda s, df: bool(bull.asof(s['date'])))
+    trades.sort(key=lambda t: t[0]['date'])   # chronological sequence
+    return [r for _, r, _ in trades], [h for _, _, h in trades]
+
+
+def print_report(mc, returns=None):
+    """Confidence bands table."""
+    bands = mc.bands()
+    print(f"\n{'='*70}")
+    print(f"  MONTE CARLO — {mc.trials:,} trials x {mc.trades:,} trades "
+          f"(~{mc.years:.1f} yrs, {'block ' + str(mc.block) if mc.block > 1 else 'plain'} bootstrap)")
+    print(f"{'='*70}")
+    if returns is not None:
+        st = calc_stats(list(returns))
+        if st:
+            print(f"  Sample: {st['trades']} trades | {st['win_rate']}% win | {st['avg_return']}% avg | {st['profit_factor']}x PF\n")
+
+    header = ' | '.join(f"{'P' + str(p):>8}" for p in PERCENTILES)
+    print(f"  {'Metric':<14} | {header}")
+    print(f"  {'-'*14}-+-{'-' * len(header)}")
+    fmt = {'cagr': ('CAGR', lambda v: f"{v*100:>7.1f}%"),
+           'max_dd': ('Max drawdown', lambda v: f"{v*100:>7.1f}%"),
+           'final': ('Final equity', lambda v: f"{v:>7.2f}x")}
+    for key, (name, f) in fmt.items():
+        print(f"  {name:<14} | " + ' | '.join(f(bands[key][p]) for p in PERCENTILES))
+
+    print(f"\n  Risk of ruin (drawdown ≥ {mc.ruin_dd*100:.0f}%): {mc.risk_of_ruin*100:.2f}%")
+    print(f"  P(losing money):              {(mc.final < 1).mean()*100:.2f}%")
+    print(f"  P(drawdown ≥ 25%):            {(mc.max_dd >= 0.25).mean()*100:.2f}%")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Monte Carlo bootstrap of system.py trades')
+    parser.add_argument('--trials', type=int, default=100_000)
+    parser.add_argument('--block', type=int, default=1, help='Block bootstrap length (1 = plain)')
+    parser.add_argument('--years', type=float, default=None,
+                        help='Path length in years (default: the backtest period)')
+    parser.add_argument('--ruin', type=float, default=0.50, help='Drawdown that counts as ruin')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    print(f"\n{'#'*70}")
+    print(f"#  MONTE CARLO — system.py rules: {STOP_LOSS*100:.0f}% stop / {PROFIT_TARGET*100:.0f}% target / "
+          f"{MAX_HOLD_DAYS}d / {MAX_POSITIONS} positions")
+    print(f"{'#'*70}\n")
+
+    start_date, end_date = '2021-01-01', '2026-01-31'
+    returns, holds = system_trades(start_date, end_date)
+
+    # Signals overlap, so the sample holds more trades than 5 slots could take;
+    # a path is as many trades as the slots turn over in the period
+    tpy = MAX_POSITIONS * 252 / max(np.mean(holds), 1.0)
+    years = args.years or (pd.Timestamp(end_date) - pd.Timestamp(start_date)).days / 365.25
+    length = max(1, int(round(years * tpy)))
+
+    t0 = time.time()
+    mc = simulate_paths(returns, holds, trials=args.trials, length=length, block=args.block,
+                        ruin_dd=args.ruin, trades_per_year=tpy, seed=args.seed)
+    print_report(mc, returns)
+    print(f"\n  ⏱  {time.time() - t0:.1f}s\n")
@@ -9,6 +9,10 @@ import numpy as np
 from datetime import datetime
 import json, sys
 
+from backtest_exits import resolve_exits
+from backtest_master import fixed_policy, trailing_policy, batch_trades, batch_returns
+from signal_cache import SignalCache
+
 UNIVERSE = [
     'NVDA', 'AAPL', 'MSFT', 'GOOGL', 'META', 'AMZN', 'TSLA', 'AMD', 'AVGO', 'CRM',
     'PLTR', 'NET', 'SNOW', 'DDOG', 'CRWD', 'ZS', 'MDB', 'PANW', 'NOW', 'SHOP',
@@ -21,7 +25,7 @@ UNIVERSE = [
 ]
 
 
-def detect_patterns(df):
+def detect_patterns(df, start=0):
     close = df['Close'].values
     volume = df['Volume'].values
     high = df['High'].values if 'High' in df.columns else close
@@ -32,7 +36,7 @@ def detect_patterns(df):
     vol_50 = pd.Series(volume).rolling(50).mean().values
     signals = []
 
-    for i in range(252, n):
+    for i in range(max(252, start), n):
         pats = []
         vol_ratio = volume[i] / vol_50[i] if vol_50[i] > 0 else 1.0
 
@@ -105,22 +109,8 @@ def detect_patterns(df):
 
 def simulate_trade(close, high, low, idx, entry, stop, trail, max_hold):
     """8% or 10% hard stop + trailing stop, no fixed profit target."""
-    n = len(close)
-    highest = entry
-    for j in range(1, min(max_hold + 1, n - idx)):
-        highest = max(highest, high[idx + j])
-        # Hard stop
-        loss = (low[idx + j] - entry) / entry
-        if loss <= -stop:
-            return -stop, 'stop', j
-        # Trailing stop (only activates once profitable)
-        if highest > entry:
-            trail_loss = (low[idx + j] - highest) / highest
-            if trail_loss <= -trail:
-                ret = max((low[idx + j] - entry) / entry, -stop)
-                return ret, 'trail', j
-    end = min(idx + max_hold, n - 1)
-    return (close[end] - entry) / entry, 'time', min(max_hold, n - idx - 1)
+    b = resolve_exits(close, [idx], [entry], trailing_policy(stop, trail, max_hold), high=high, low=low)
+    return float(b.ret[0]), b.reasons()[0], int(b.hold_bars[0])
 
 
 def simulate_with_hedge(close, high, low, spy_c, spy_h, spy_l, spy_idx_map,
@@ -131,70 +121,71 @@ def simulate_with_hedge(close, high, low, spy_c, spy_h, spy_l, spy_idx_map,
     hedge_type: 'spy_put', 'spy_short', 'portfolio_put'
     hedge_pct: fraction of position allocated to hedge (e.g., 0.03 = 3%)
     """
-    n = len(close)
-    highest = entry
-    trade_ret = None
-    hold_days = 0
-
-    for j in range(1, min(max_hold + 1, n - idx)):
-        highest = max(highest, high[idx + j])
-        loss = (low[idx + j] - entry) / entry
-        if loss <= -stop:
-            trade_ret = -stop
-            hold_days = j
-            break
-        if highest > entry:
-            trail_loss = (low[idx + j] - highest) / highest
-            if trail_loss <= -trail:
-                trade_ret = max((low[idx + j] - entry) / entry, -stop)
-                hold_days = j
-                break
-        hold_days = j
-
-    if trade_ret is None:
-        end = min(idx + max_hold, n - 1)
-        trade_ret = (close[end] - entry) / entry
-        hold_days = min(max_hold, n - idx - 1)
-
-    # Calculate hedge P&L
-    hedge_ret = 0
-    if hedge_type == 'spy_put':
-        # Simplified: buy ATM put on SPY, costs ~hedge_pct of position
-        # If SPY drops X%, put gains ~3x (leverage of ATM 30-day put)
-        spy_i = spy_idx_map.get(date)
-        if spy_i is not None and spy_i + hold_days < len(spy_c):
-            spy_change = (spy_c[spy_i + hold_days] - spy_c[spy_i]) / spy_c[spy_i]
-            if spy_change < 0:
-                # Put profits: ~3x leverage on SPY decline, minus premium decay
-                put_gain = abs(spy_change) * 3 - 0.03 * (hold_days / 30)  # theta decay
-                hedge_ret = hedge_pct * max(put_gain, -1)  # can't lose more than premium
-            else:
-                # Put expires worthless (lose premium, scaled by time)
-                time_decay = min(1.0, hold_days / 30)
-                hedge_ret = -hedge_pct * time_decay
-
-    elif hedge_type == 'spy_short':
-        # Short SPY as hedge (inverse exposure)
-        spy_i = spy_idx_map.get(date)
-        if spy_i is not None and spy_i + hold_days < len(spy_c):
-            spy_change = (spy_c[spy_i + hold_days] - spy_c[spy_i]) / spy_c[spy_i]
-            hedge_ret = -spy_change * hedge_pct  # profit when SPY drops
-
-    elif hedge_type == 'portfolio_put':
-        # Buy put on the actual stock (protective put)
-        stock_change = trade_ret
-        if stock_change < -0.05:
-            # Put kicks in below 5% loss
-            put_gain = abs(stock_change + 0.05) * 2.5 - 0.04 * (hold_days / 30)
-            hedge_ret = hedge_pct * max(put_gain, -1)
-        else:
-            time_decay = min(1.0, hold_days / 30)
-            hedge_ret = -hedge_pct * time_decay
+    trade_ret, _, hold_days = simulate_trade(close, high, low, idx, entry, stop, trail, max_hold)
+    spy_i = spy_idx_map.get(date)
+    spy_change = np.nan
+    if spy_i is not None and spy_i + hold_days < len(spy_c):
+        spy_change = (spy_c[spy_i + hold_days] - spy_c[spy_i]) / spy_c[spy_i]
+    hedge_ret, net_ret = hedge_overlay([trade_ret], [hold_days], [spy_change],
+                                       [(hedge_type, hedge_pct)])
+    return trade_ret, float(hedge_ret[0, 0]), float(net_ret[0, 0]), hold_days
 
-    # Net position: (1 - hedge_pct) * trade return + hedge return
-    net_ret = (1 - hedge_pct) * trade_ret + hedge_ret
 
-    return trade_ret, hedge_ret, net_ret, hold_days
+def spy_forward_change(spy_dates, spy_c, dates, hold_days):
+    """
+    SPY change (fraction) from each trade's signal date over its hold.
+    NaN when SPY has no bar on the date or the hold runs past the data.
+    """
+    spy_dates = np.asarray(spy_dates, dtype='M8[ns]')
+    dates = np.asarray(pd.to_datetime(np.asarray(dates)), dtype='M8[ns]')
+    hold_days = np.asarray(hold_days, dtype=np.int64)
+    spy_c = np.asarray(spy_c, dtype=float)
+    pos = np.searchsorted(spy_dates, dates)
+    found = pos < len(spy_dates)
+    found[found] = spy_dates[pos[found]] == dates[found]
+    end = pos + hold_days
+    ok = found & (end < len(spy_c))
+    change = np.full(len(dates), np.nan)
+    change[ok] = (spy_c[end[ok]] - spy_c[pos[ok]]) / spy_c[pos[ok]]
+    return change
+
+
+def hedge_overlay(trade_ret, hold_days, spy_change, hedge_configs):
+    """
+    Hedge P&L of every (hedge config, trade) pair on top of already-resolved trades.
+
+    hedge_configs: (hedge_type, hedge_pct) pairs; hedge_type None = no hedge,
+    'spy_put', 'spy_short' or 'portfolio_put'. spy_change is NaN where SPY
+    can't be priced (SPY hedges then return 0).
+    Returns (hedge_ret, net_ret), each configs x trades.
+    """
+    r = np.asarray(trade_ret, dtype=float)[None, :]
+    hold = np.asarray(hold_days, dtype=float)[None, :]
+    spy = np.asarray(spy_change, dtype=float)[None, :]
+    types = np.array([t or '' for t, _ in hedge_configs])[:, None]
+    pct = np.array([p for _, p in hedge_configs], dtype=float)[:, None]
+    time_decay = np.minimum(1.0, hold / 30)
+    priced = ~np.isnan(spy)
+
+    with np.errstate(invalid='ignore'):
+        # SPY put: ~3x leverage on a SPY decline minus theta, else the premium
+        # decays with time; can't lose more than the premium
+        spy_put = np.where(spy < 0,
+                           pct * np.maximum(np.abs(spy) * 3 - 0.03 * (hold / 30), -1),
+                           -pct * time_decay)
+        spy_put = np.where(priced, spy_put, 0)
+        # Short SPY (inverse exposure): profit when SPY drops
+        spy_short = np.where(priced, -spy * pct, 0)
+    # Protective put on the stock itself, kicks in below a 5% loss
+    portfolio_put = np.where(r < -0.05,
+                             pct * np.maximum(np.abs(r + 0.05) * 2.5 - 0.04 * (hold / 30), -1),
+                             -pct * time_decay)
+
+    hedge_ret = np.select([types == 'spy_put', types == 'spy_short', types == 'portfolio_put'],
+                          [spy_put, spy_short, portfolio_put], 0.0)
+    # Net position: (1 - hedge_pct) * trade return + hedge return
+    net_ret = (1 - pct) * r + hedge_ret
+    return hedge_ret, net_ret
 
 
 def calc_stats(returns):
@@ -261,15 +252,16 @@ def run():
 
     # Detect patterns
     print("🔍 Detecting patterns...")
+    signal_cache = SignalCache('optimal', detect_patterns)
     all_signals = {}
     total = 0
     for ticker, df in all_data.items():
         sys.stdout.write(f"\r  {ticker}...          ")
         sys.stdout.flush()
-        sigs = [s for s in detect_patterns(df) if s['date'] >= scan_start and s['idx'] + 90 < len(df)]
+        sigs = [s for s in signal_cache.signals(ticker, df) if s['date'] >= scan_start and s['idx'] + 90 < len(df)]
         all_signals[ticker] = sigs
         total += len(sigs)
-    print(f"\n  ✅ {total} signals\n")
+    print(f"\n  ✅ {total} signals ({signal_cache.summary()})\n")
 
     # ════════════════════════════════════════════════
     # PART A: 10% vs 15% stop comparison
@@ -293,27 +285,29 @@ def run():
     print(f"\n  {'Config':<32} | {'Trades':>6} | {'Win%':>6} | {'AvgRet':>7} | {'PF':>6} | {'MaxDD':>6} | {'Sharpe':>6}")
     print(f"  {'-'*32}-+-{'-'*6}-+-{'-'*6}-+-{'-'*7}-+-{'-'*6}-+-{'-'*6}-+-{'-'*6}")
 
+    def bull(s):
+        """SPY > 200MA filter (signals without SPY history pass)."""
+        spy_i = spy_idx_map.get(s['date'])
+        if spy_i and spy_i < len(spy_ma200) and not np.isnan(spy_ma200[spy_i]):
+            return spy_close[spy_i] > spy_ma200[spy_i]
+        return True
+
+    def bear(s):
+        """SPY <= 200MA (signals without SPY history are excluded)."""
+        spy_i = spy_idx_map.get(s['date'])
+        if spy_i is None or spy_i >= len(spy_ma200) or np.isnan(spy_ma200[spy_i]):
+            return False
+        return spy_close[spy_i] <= spy_ma200[spy_i]
+
     best_config = (None, 0)
     for name, stop, trail_or_tgt, max_hold in configs:
-        rets = []
-        for ticker, sigs in all_signals.items():
-            df = all_data[ticker]
-            c, h, l = df['Close'].values, df['High'].values, df['Low'].values
-            for s in sigs:
-                # SPY > 200MA filter
-                spy_i = spy_idx_map.get(s['date'])
-                if spy_i and spy_i < len(spy_ma200) and not np.isnan(spy_ma200[spy_i]):
-                    if spy_close[spy_i] <= spy_ma200[spy_i]:
-                        continue
-                # Volume filter
-                if s['vol_ratio'] < 1.5:
-                    continue
-                if trail_or_tgt is None:
-                    # Fixed 20% target mode
-                    r, _, _ = simulate_fixed(c, h, l, s['idx'], s['entry_price'], stop, 0.20, max_hold)
-                else:
-                    r, _, _ = simulate_trade(c, h, l, s['idx'], s['entry_price'], stop, trail_or_tgt, max_hold)
-                rets.append(r)
+        if trail_or_tgt is None:
+            # Fixed 20% target mode
+            policy = fixed_policy(stop, 0.20, max_hold)
+        else:
+            policy = trailing_policy(stop, trail_or_tgt, max_hold)
+        rets = batch_returns(all_data, all_signals, policy,
+                             keep=lambda s, df: bull(s) and s['vol_ratio'] >= 1.5)
 
         st = calc_stats(rets)
         if st:
@@ -348,34 +342,23 @@ def run():
     print(f"\n  {'Hedge':<18} | {'Trades':>6} | {'Win%':>6} | {'AvgRet':>7} | {'PF':>6} | {'MaxDD':>6} | {'Sharpe':>6} | {'AvgHedge':>8}")
     print(f"  {'-'*18}-+-{'-'*6}-+-{'-'*6}-+-{'-'*7}-+-{'-'*6}-+-{'-'*6}-+-{'-'*6}-+-{'-'*8}")
 
-    for name, h_type, h_pct in hedge_configs:
-        net_rets = []
-        hedge_rets = []
-        for ticker, sigs in all_signals.items():
-            df = all_data[ticker]
-            c, h, l = df['Close'].values, df['High'].values, df['Low'].values
-            for s in sigs:
-                spy_i = spy_idx_map.get(s['date'])
-                if spy_i and spy_i < len(spy_ma200) and not np.isnan(spy_ma200[spy_i]):
-                    if spy_close[spy_i] <= spy_ma200[spy_i]:
-                        continue
-                if s['vol_ratio'] < 1.5:
-                    continue
-
-                if h_type is None:
-                    r, _, _ = simulate_trade(c, h, l, s['idx'], s['entry_price'], stop, trail, max_hold)
-                    net_rets.append(r)
-                    hedge_rets.append(0)
-                else:
-                    tr, hr, nr, _ = simulate_with_hedge(
-                        c, h, l, spy_close, spy_high, spy_low, spy_idx_map,
-                        s['idx'], s['entry_price'], stop, trail, max_hold,
-                        s['date'], h_type, h_pct)
-                    net_rets.append(nr)
-                    hedge_rets.append(hr)
-
-        st = calc_stats(net_rets)
-        avg_hedge = np.mean(hedge_rets) * 100 if hedge_rets else 0
+    def hedge_overlay_trades(trades, configs):
+        """hedge_overlay() of batch_trades() output for (name, type, pct) configs."""
+        rets = [r for _, r, _ in trades]
+        holds = [hold for _, _, hold in trades]
+        spy_change = spy_forward_change(spy.index, spy_close, [s['date'] for s, _, _ in trades], holds)
+        return hedge_overlay(rets, holds, spy_change, [(t, p) for _, t, p in configs])
+
+    # Trade paths do not depend on the hedge: resolve them once
+    bull_trades = batch_trades(all_data, all_signals, trailing_policy(stop, trail, max_hold),
+                               keep=lambda s, df: bull(s) and s['vol_ratio'] >= 1.5)
+
+    # Every hedge config is one row of an array formula over the trades
+    hedge_rets, net_rets = hedge_overlay_trades(bull_trades, hedge_configs)
+
+    for k, (name, h_type, h_pct) in enumerate(hedge_configs):
+        st = calc_stats(net_rets[k].tolist())
+        avg_hedge = np.mean(hedge_rets[k]) * 100 if bull_trades else 0
         if st:
             print(f"  {name:<18} | {st['trades']:>6} | {st['win_rate']:>5.1f}% | {st['avg_return']:>6.2f}% | {st['profit_factor']:>5.2f}x | {st['max_drawdown']:>5.1f}% | {st['sharpe']:>5.2f} | {avg_hedge:>7.2f}%")
 
@@ -399,32 +382,14 @@ def run():
     print(f"\n  {'Hedge':<24} | {'Trades':>6} | {'Win%':>6} | {'AvgRet':>7} | {'PF':>6} | {'MaxDD':>6}")
     print(f"  {'-'*24}-+-{'-'*6}-+-{'-'*6}-+-{'-'*7}-+-{'-'*6}-+-{'-'*6}")
 
-    for name, h_type, h_pct in bear_configs:
-        net_rets = []
-        for ticker, sigs in all_signals.items():
-            df = all_data[ticker]
-            c, h, l = df['Close'].values, df['High'].values, df['Low'].values
-            for s in sigs:
-                # ONLY bear market trades
-                spy_i = spy_idx_map.get(s['date'])
-                if spy_i is None or spy_i >= len(spy_ma200) or np.isnan(spy_ma200[spy_i]):
-                    continue
-                if spy_close[spy_i] > spy_ma200[spy_i]:
-                    continue  # skip bull trades
-                if s['vol_ratio'] < 1.5:
-                    continue
-
-                if h_type is None:
-                    r, _, _ = simulate_trade(c, h, l, s['idx'], s['entry_price'], stop, trail, max_hold)
-                    net_rets.append(r)
-                else:
-                    _, _, nr, _ = simulate_with_hedge(
-                        c, h, l, spy_close, spy_high, spy_low, spy_idx_map,
-                        s['idx'], s['entry_price'], stop, trail, max_hold,
-                        s['date'], h_type, h_pct)
-                    net_rets.append(nr)
-
-        st = calc_stats(net_rets)
+    # ONLY bear market trades
+    bear_trades = batch_trades(all_data, all_signals, trailing_policy(stop, trail, max_hold),
+                               keep=lambda s, df: bear(s) and s['vol_ratio'] >= 1.5)
+
+    _, net_rets = hedge_overlay_trades(bear_trades, bear_configs)
+
+    for k, (name, h_type, h_pct) in enumerate(bear_configs):
+        st = calc_stats(net_rets[k].tolist())
         if st:
             print(f"  {name:<24} | {st['trades']:>6} | {st['win_rate']:>5.1f}% | {st['avg_return']:>6.2f}% | {st['profit_factor']:>5.2f}x | {st['max_drawdown']:>5.1f}%")
 
@@ -451,21 +416,8 @@ def run():
     print(f"  {'-'*20}-+-{'-'*6}-+-{'-'*6}-+-{'-'*7}-+-{'-'*6}-+-{'-'*6}-+-{'-'*6}")
 
     for name, filt in filters:
-        rets = []
-        for ticker, sigs in all_signals.items():
-            df = all_data[ticker]
-            c, h, l = df['Close'].values, df['High'].values, df['Low'].values
-            for s in sigs:
-                if not filt(s):
-                    continue
-                spy_i = spy_idx_map.get(s['date'])
-                if spy_i and spy_i < len(spy_ma200) and not np.isnan(spy_ma200[spy_i]):
-                    if spy_close[spy_i] <= spy_ma200[spy_i]:
-                        continue
-                if s['vol_ratio'] < 1.5:
-                    continue
-                r, _, _ = simulate_trade(c, h, l, s['idx'], s['entry_price'], stop, trail, max_hold)
-                rets.append(r)
+        rets = batch_returns(all_data, all_signals, trailing_policy(stop, trail, max_hold),
+                             keep=lambda s, df: filt(s) and bull(s) and s['vol_ratio'] >= 1.5)
         st = calc_stats(rets)
         if st:
             print(f"  {name:<20} | {st['trades']:>6} | {st['win_rate']:>5.1f}% | {st['avg_return']:>6.2f}% | {st['profit_factor']:>5.2f}x | {st['max_drawdown']:>5.1f}% | {st['sharpe']:>5.2f}")
@@ -477,16 +429,8 @@ def run():
 
 def simulate_fixed(close, high, low, idx, entry, stop, target, max_hold):
     """Fixed stop/target (no trailing)."""
-    n = len(close)
-    for j in range(1, min(max_hold + 1, n - idx)):
-        loss = (low[idx+j] - entry) / entry
-        if loss <= -stop:
-            return -stop, 'stop', j
-        gain = (high[idx+j] - entry) / entry
-        if gain >= target:
-            return target, 'target', j
-    end = min(idx + max_hold, n - 1)
-    return (close[end] - entry) / entry, 'time', min(max_hold, n - idx - 1)
+    b = resolve_exits(close, [idx], [entry], fixed_policy(stop, target, max_hold), high=high, low=low)
+    return float(b.ret[0]), b.reasons()[0], int(b.hold_bars[0])
 
 
 if __name__ == '__main__':
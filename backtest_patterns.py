@@ -8,8 +8,19 @@ Strategies:
 3. VCP (Volatility Contraction Pattern)
 4. Flat Base
 5. Pocket Pivot
+
+Optimization (optimize_all): pattern signals are computed once per ticker,
+then every (ticker, strategy, take-profit/stop-loss) combination is run as
+its own job on a process pool; strategies read the precomputed signals
+instead of re-detecting patterns in init().
+
+Usage:
+    python backtest_patterns.py                       # all strategies, default params
+    python backtest_patterns.py --optimize --workers 0
 """
 
+import argparse
+import itertools
 import pandas as pd
 import numpy as np
 from backtesting import Backtest, Strategy
@@ -17,6 +28,8 @@ from backtesting.lib import crossover
 import yfinance as yf
 from datetime import datetime, timedelta
 
+from backtest_runner import run_tickers, add_workers_arg, shared
+
 # EMA function (replacing talib)
 def EMA(data, period):
     return pd.Series(data).ewm(span=period, adjust=False).mean().values
@@ -169,14 +182,27 @@ def detect_pocket_pivot(data, lookback=10):
 # BACKTESTING STRATEGIES
 # =============================================================================
 
-class BreakoutStrategy(Strategy):
+class PatternStrategy(Strategy):
+    """Base: pattern signals come from optimize_all's precomputed set when available"""
+    ticker = None       # set by optimize_all jobs to find the precomputed signals
+    
+    def pattern(self, detect, *args):
+        """detect(data, *args) as an array, precomputed when available."""
+        signals = (shared() or {}).get(self.ticker, {}).get('signals', {})
+        key = (detect.__name__, args)
+        if key in signals:
+            return signals[key]
+        return np.asarray(detect(self.data.df, *args))
+
+
+class BreakoutStrategy(PatternStrategy):
     """Breakout above recent highs with volume"""
     lookback = 20
     take_profit = 0.20  # 20%
     stop_loss = 0.10    # 10%
     
     def init(self):
-        self.breakout_signal = self.I(detect_breakout, self.data.df, self.lookback)
+        self.breakout_signal = self.I(self.pattern, detect_breakout, self.lookback)
         self.ema_200 = self.I(EMA, self.data.Close, period=200)
     
     def next(self):
@@ -191,7 +217,7 @@ class BreakoutStrategy(Strategy):
             )
 
 
-class CupWithHandleStrategy(Strategy):
+class CupWithHandleStrategy(PatternStrategy):
     """Cup with Handle pattern"""
     cup_length = 30
     handle_length = 10
@@ -199,7 +225,7 @@ class CupWithHandleStrategy(Strategy):
     stop_loss = 0.10
     
     def init(self):
-        self.signal = self.I(detect_cup_with_handle, self.data.df, self.cup_length, self.handle_length)
+        self.signal = self.I(self.pattern, detect_cup_with_handle, self.cup_length, self.handle_length)
         self.ema_200 = self.I(EMA, self.data.Close, period=200)
     
     def next(self):
@@ -213,7 +239,7 @@ class CupWithHandleStrategy(Strategy):
             )
 
 
-class VCPStrategy(Strategy):
+class VCPStrategy(PatternStrategy):
     """Volatility Contraction Pattern"""
     contractions = 3
     lookback = 50
@@ -221,7 +247,7 @@ class VCPStrategy(Strategy):
     stop_loss = 0.10
     
     def init(self):
-        self.signal = self.I(detect_vcp, self.data.df, self.contractions, self.lookback)
+        self.signal = self.I(self.pattern, detect_vcp, self.contractions, self.lookback)
         self.ema_200 = self.I(EMA, self.data.Close, period=200)
     
     def next(self):
@@ -235,7 +261,7 @@ class VCPStrategy(Strategy):
             )
 
 
-class FlatBaseStrategy(Strategy):
+class FlatBaseStrategy(PatternStrategy):
     """Flat Base breakout"""
     lookback = 30
     max_range = 0.15
@@ -243,7 +269,7 @@ class FlatBaseStrategy(Strategy):
     stop_loss = 0.10
     
     def init(self):
-        self.signal = self.I(detect_flat_base, self.data.df, self.lookback, self.max_range)
+        self.signal = self.I(self.pattern, detect_flat_base, self.lookback, self.max_range)
         self.ema_200 = self.I(EMA, self.data.Close, period=200)
     
     def next(self):
@@ -257,14 +283,14 @@ class FlatBaseStrategy(Strategy):
             )
 
 
-class PocketPivotStrategy(Strategy):
+class PocketPivotStrategy(PatternStrategy):
     """Pocket Pivot volume signal"""
     lookback = 10
     take_profit = 0.20
     stop_loss = 0.10
     
     def init(self):
-        self.signal = self.I(detect_pocket_pivot, self.data.df, self.lookback)
+        self.signal = self.I(self.pattern, detect_pocket_pivot, self.lookback)
         self.ema_200 = self.I(EMA, self.data.Close, period=200)
     
     def next(self):
@@ -278,14 +304,14 @@ class PocketPivotStrategy(Strategy):
             )
 
 
-class CombinedPatternStrategy(Strategy):
+class CombinedPatternStrategy(PatternStrategy):
     """Combined: Breakout + Cup w/ Handle (best performers)"""
     take_profit = 0.20
     stop_loss = 0.10
     
     def init(self):
-        self.breakout = self.I(detect_breakout, self.data.df, 20)
-        self.cup_handle = self.I(detect_cup_with_handle, self.data.df, 30, 10)
+        self.breakout = self.I(self.pattern, detect_breakout, 20)
+        self.cup_handle = self.I(self.pattern, detect_cup_with_handle, 30, 10)
         self.ema_200 = self.I(EMA, self.data.Close, period=200)
     
     def next(self):
@@ -299,6 +325,34 @@ class CombinedPatternStrategy(Strategy):
             )
 
 
+STRATEGIES = [
+    BreakoutStrategy,
+    CupWithHandleStrategy,
+    VCPStrategy,
+    FlatBaseStrategy,
+    PocketPivotStrategy,
+    CombinedPatternStrategy
+]
+
+# Pattern signals the strategies use with their default parameters
+PATTERN_SIGNALS = [
+    (detect_breakout, (20,)),
+    (detect_cup_with_handle, (30, 10)),
+    (detect_vcp, (3, 50)),
+    (detect_flat_base, (30, 0.15)),
+    (detect_pocket_pivot, (10,)),
+]
+
+# Optimization grid
+TAKE_PROFITS = [i/100 for i in range(10, 30, 5)]  # 10-25%
+STOP_LOSSES = [i/100 for i in range(5, 15, 2)]    # 5-13%
+
+
+def param_grid():
+    """(take_profit, stop_loss) pairs with take profit above stop loss"""
+    return [(tp, sl) for tp, sl in itertools.product(TAKE_PROFITS, STOP_LOSSES) if tp > sl]
+
+
 # =============================================================================
 # RUN BACKTEST
 # =============================================================================
@@ -337,8 +391,8 @@ def run_optimization(ticker, strategy_class, cash=25000):
     bt = Backtest(data, strategy_class, cash=cash, commission=0.001)
     
     stats = bt.optimize(
-        take_profit=[i/100 for i in range(10, 30, 5)],  # 10-25%
-        stop_loss=[i/100 for i in range(5, 15, 2)],     # 5-13%
+        take_profit=TAKE_PROFITS,
+        stop_loss=STOP_LOSSES,
         maximize='Equity Final [$]',
         constraint=lambda param: param.take_profit > param.stop_loss
     )
@@ -352,16 +406,78 @@ def run_optimization(ticker, strategy_class, cash=25000):
     return stats, bt
 
 
+def precompute_signals(data):
+    """{(detector name, args): signal array} for every PATTERN_SIGNALS entry"""
+    return {(detect.__name__, args): np.asarray(detect(data, *args))
+            for detect, args in PATTERN_SIGNALS}
+
+
+def _optimize_job(job, cash=25000, commission=0.001):
+    """Runner worker: one (ticker, strategy, take_profit, stop_loss) backtest"""
+    ticker, strategy_name, take_profit, stop_loss = job
+    strategy = next(s for s in STRATEGIES if s.__name__ == strategy_name)
+    bt = Backtest(shared()[ticker]['data'], strategy, cash=cash, commission=commission)
+    stats = bt.run(ticker=ticker, take_profit=take_profit, stop_loss=stop_loss)
+    return f"{stats['# Trades']} trades", {
+        'Ticker': ticker,
+        'Strategy': strategy_name,
+        'Take Profit': take_profit,
+        'Stop Loss': stop_loss,
+        'Equity Final': stats['Equity Final [$]'],
+        'Return': stats['Return [%]'],
+        'Win Rate': stats['Win Rate [%]'],
+        'Max Drawdown': stats['Max. Drawdown [%]'],
+        'Trades': stats['# Trades'],
+        'Sharpe': stats.get('Sharpe Ratio', 0)
+    }
+
+
+def optimize_all(tickers, strategies=STRATEGIES, workers=1, cash=25000):
+    """
+    Optimize take profit / stop loss of every strategy on every ticker.
+    
+    Data is downloaded and pattern signals detected once per ticker; the
+    (ticker x strategy x parameter) backtests then run on `workers`
+    processes. Returns the best combination (max final equity) per
+    ticker and strategy.
+    """
+    panel = {}
+    for ticker in tickers:
+        print(f"Preparing {ticker}...", end=' ', flush=True)
+        try:
+            data = get_data(ticker)
+            panel[ticker] = {'data': data, 'signals': precompute_signals(data)}
+            print(f"{len(data)} bars")
+        except Exception as e:
+            print(f"error - {e}")
+    
+    jobs = [(ticker, strategy.__name__, tp, sl)
+            for ticker in panel for strategy in strategies for tp, sl in param_grid()]
+    print(f"\nRunning {len(jobs)} backtests ({len(panel)} tickers x "
+          f"{len(strategies)} strategies x {len(param_grid())} parameter sets)...")
+    
+    runs = [row for _, row in run_tickers(_optimize_job, jobs, workers=workers,
+                                          progress=False, shared=panel) if row]
+    if not runs:
+        print("\nNo results!")
+        return pd.DataFrame()
+    
+    df = pd.DataFrame(runs)
+    # First grid entry wins ties, like Backtest.optimize
+    best = df.loc[df.groupby(['Ticker', 'Strategy'], sort=False)['Equity Final'].idxmax()]
+    best = best.reset_index(drop=True)
+    
+    print("\n" + "="*60)
+    print("BEST PARAMETERS")
+    print("="*60)
+    print(best.to_string(index=False))
+    
+    return best
+
+
 def run_all_strategies(tickers, cash=25000):
     """Run all strategies across multiple tickers"""
-    strategies = [
-        BreakoutStrategy,
-        CupWithHandleStrategy,
-        VCPStrategy,
-        FlatBaseStrategy,
-        PocketPivotStrategy,
-        CombinedPatternStrategy
-    ]
+    strategies = STRATEGIES
     
     results = []
     
@@ -407,12 +523,21 @@ def run_all_strategies(tickers, cash=25000):
 
 
 if __name__ == "__main__":
-    # Test tickers
-    tickers = ['AAPL', 'MSFT', 'GOOGL', 'NVDA', 'META']
-    
-    # Run all strategies
-    results = run_all_strategies(tickers)
-    
-    # Save results
-    results.to_csv('/Users/rara/clawd/trading/backtest_results.csv', index=False)
-    print("\nResults saved to backtest_results.csv")
+    parser = argparse.ArgumentParser(description='Pattern strategy backtest (backtesting.py)')
+    parser.add_argument('tickers', nargs='*', default=['AAPL', 'MSFT', 'GOOGL', 'NVDA', 'META'])
+    parser.add_argument('--optimize', action='store_true',
+                        help='Optimize take profit / stop loss of every strategy')
+    add_workers_arg(parser)
+    args = parser.parse_args()
+    
+    if args.optimize:
+        best = optimize_all(args.tickers, workers=args.workers)
+        best.to_csv('/Users/rara/clawd/trading/backtest_optimization.csv', index=False)
+        print("\nResults saved to backtest_optimization.csv")
+    else:
+        # Run all strategies
+        results = run_all_strategies(args.tickers)
+        
+        # Save results
+        results.to_csv('/Users/rara/clawd/trading/backtest_results.csv', index=False)
+        print("\nResults saved to backtest_results.csv")
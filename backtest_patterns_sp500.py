@@ -5,6 +5,9 @@ Compare our automated pattern system vs the 200-week MA strategy
 
 Patterns: Cup w/ Handle, Breakout, VCP, Flat Base, Pocket Pivot
 Rules: 10% stop / 20% target / 60d max hold / SPY > 200MA filter
+
+Finished tickers are checkpointed; an interrupted run picks up where it
+stopped (--fresh to start over).
 """
 import yfinance as yf
 import pandas as pd
@@ -13,19 +16,27 @@ from datetime import datetime, timedelta
 import time
 import os
 import pickle
+import argparse
 import warnings
 warnings.filterwarnings('ignore')
 
 from sp500_top200 import SP500_TOP200
-from data_utils import get_stock_data, rate_limit, load_from_cache, save_to_cache, CACHE_DIR
+from data_utils import get_stock_data, CACHE_DIR
+from backtest_exits import ExitPolicy, resolve_exits, TRAIL, TIME
+from backtest_runner import run_tickers, add_workers_arg
+from backtest_checkpoint import Checkpoint, add_checkpoint_args
+from signal_cache import SignalCache
+from results_store import ResultsStore
+from benchmark import get_benchmark
 
 # Strategy parameters
 TRAILING_STOP = 0.10   # 10% trailing stop
 PROFIT_TARGET = 0.20   # 20% target
 MAX_HOLD_DAYS = None   # No max hold limit
+LOOKBACK = 252         # bars before a signal bar that detect_patterns reads
 
 
-def detect_patterns(df):
+def detect_patterns(df, start=0):
     """
     Detect all 5 patterns. Returns list of signals.
     Each signal: (date, patterns[], volume_ratio)
@@ -46,7 +57,7 @@ def detect_patterns(df):
     
     signals = []
     
-    for i in range(252, n):
+    for i in range(max(252, start), n):
         pats = []
         vol_ratio = volume[i] / vol_50[i] if vol_50[i] > 0 else 1.0
         
@@ -134,58 +145,43 @@ def detect_patterns(df):
     return signals
 
 
+_signal_cache = None
+
+
+def get_signal_cache():
+    """Disk cache of detected signals (keyed by bars + detector source), created on first use."""
+    global _signal_cache
+    if _signal_cache is None:
+        # Bars come from a rolling 15y window: cached signals are matched by date
+        _signal_cache = SignalCache('sp500', detect_patterns, lookback=LOOKBACK)
+    return _signal_cache
+
+
 def simulate_trades(df, signals, trailing_stop_pct=TRAILING_STOP, target_pct=PROFIT_TARGET, max_days=MAX_HOLD_DAYS):
     """
     Simulate trades from signals with trailing stop.
     Returns list of completed trades.
     """
+    if not signals:
+        return []
+
     close = df['Close'].values
+    policy = ExitPolicy(stop='trailing', stop_pct=trailing_stop_pct, target_pct=target_pct,
+                        max_hold=max_days, clip_hold=False)
+    batch = resolve_exits(close,
+                          [sig['idx'] for sig in signals],
+                          [sig['price'] for sig in signals],
+                          policy)
+    reasons = batch.reasons({TRAIL: 'trailing_stop', TIME: 'max_hold'})
     trades = []
-    
-    for sig in signals:
-        entry_idx = sig['idx']
+
+    for sig, exit_idx, exit_reason in zip(signals, batch.exit_idx, reasons):
+        # Open at end of data (no max hold) -> not a completed trade
+        if exit_idx < 0:
+            continue
+
         entry_price = sig['price']
         entry_date = sig['date']
-        
-        # Initialize trailing stop from entry price
-        highest_price = entry_price
-        stop_price = entry_price * (1 - trailing_stop_pct)
-        target_price = entry_price * (1 + target_pct)
-        
-        exit_idx = None
-        exit_reason = None
-        
-        # Simulate forward (no max day limit if max_days is None)
-        end_idx = len(close) if max_days is None else min(entry_idx + max_days + 1, len(close))
-        
-        for j in range(entry_idx + 1, end_idx):
-            price = close[j]
-            
-            # Update trailing stop if new high
-            if price > highest_price:
-                highest_price = price
-                stop_price = highest_price * (1 - trailing_stop_pct)
-            
-            # Check trailing stop
-            if price <= stop_price:
-                exit_idx = j
-                exit_reason = 'trailing_stop'
-                break
-            
-            # Check target
-            if price >= target_price:
-                exit_idx = j
-                exit_reason = 'target'
-                break
-        
-        # Max hold exit (only if max_days is set)
-        if exit_idx is None and max_days is not None and entry_idx + max_days < len(close):
-            exit_idx = entry_idx + max_days
-            exit_reason = 'max_hold'
-        
-        if exit_idx is None:
-            continue
-        
         exit_price = close[exit_idx]
         exit_date = df.index[exit_idx]
         pct_return = (exit_price - entry_price) / entry_price * 100
@@ -205,55 +201,56 @@ def simulate_trades(df, signals, trailing_stop_pct=TRAILING_STOP, target_pct=PRO
 
 
 def get_spy_regime(start_date, end_date):
-    """Check if SPY was above 200 MA during the period."""
-    cache_key = 'SPY_daily_full'
-    spy = load_from_cache(cache_key, max_age_hours=24)
-    
+    """Check if SPY was above 200 MA during the period (dates may be arrays)."""
+    spy = get_benchmark()
     if spy is None:
-        rate_limit()
-        spy = yf.download('SPY', period='15y', interval='1d', progress=False)
-        if isinstance(spy.columns, pd.MultiIndex):
-            spy.columns = spy.columns.get_level_values(0)
-        save_to_cache(cache_key, spy)
-    
-    if spy is None or len(spy) < 200:
-        return True  # Assume bull if no data
-    
-    spy['MA200'] = spy['Close'].rolling(200).mean()
-    
-    try:
-        mask = (spy.index >= pd.to_datetime(start_date)) & (spy.index <= pd.to_datetime(end_date))
-        period = spy.loc[mask]
-        if len(period) > 0:
-            return period['Close'].iloc[0] > period['MA200'].iloc[0]
-    except:
-        pass
-    
-    return True
+        # Assume bull if no data
+        return True if np.ndim(start_date) == 0 else np.ones(len(start_date), dtype=bool)
+    return spy.regime(start_date, end_date)
 
 
 def get_spy_return(start_date, end_date):
-    """Get SPY return for comparison."""
-    cache_key = 'SPY_daily_full'
-    spy = load_from_cache(cache_key, max_age_hours=24)
-    
+    """Get SPY return for comparison (dates may be arrays)."""
+    spy = get_benchmark()
     if spy is None:
-        return 0
-    
-    try:
-        start_date = pd.to_datetime(start_date)
-        end_date = pd.to_datetime(end_date)
-        mask = (spy.index >= start_date - timedelta(days=7)) & (spy.index <= end_date + timedelta(days=7))
-        period = spy.loc[mask]
-        if len(period) >= 2:
-            return (period['Close'].iloc[-1] - period['Close'].iloc[0]) / period['Close'].iloc[0] * 100
-    except:
-        pass
-    
-    return 0
+        return 0 if np.ndim(start_date) == 0 else np.zeros(len(start_date))
+    return spy.period_return(start_date, end_date, pad_days=7)
+
+
+def backtest_ticker(ticker):
+    """Runner worker: (progress status, trades) for one stock."""
+    # Get data with caching
+    df = get_stock_data(ticker, period='15y', interval='1d', cache_ttl=24)
+    
+    if df is None or len(df) < 300:
+        return "insufficient data", None
+    
+    # Detect patterns
+    signals = get_signal_cache().signals(ticker, df)
+    
+    if not signals:
+        return "no signals", None
+    
+    # Filter by SPY regime (only trade in bull markets)
+    dates = pd.DatetimeIndex([sig['date'] for sig in signals])
+    bull = get_spy_regime(dates - timedelta(days=7), dates)
+    bull_signals = [sig for sig, b in zip(signals, bull) if b]
+    
+    if not bull_signals:
+        return f"{len(signals)} signals (all in bear market)", None
+    
+    # Simulate trades
+    trades = simulate_trades(df, bull_signals)
+    
+    if not trades:
+        return f"{len(bull_signals)} signals, 0 complete trades", None
+    
+    for t in trades:
+        t['ticker'] = ticker
+    return f"{len(trades)} trades", trades
 
 
-def run_backtest():
+def run_backtest(workers=1, fresh=False, checkpoint=True):
     """Run pattern backtest on S&P 500 top 200."""
     print(f"\n{'='*70}")
     print(f"  PATTERN-BASED SYSTEM BACKTEST — S&P 500 TOP 200")
@@ -271,47 +268,21 @@ def run_backtest():
     
     print(f"\nTesting {len(SP500_TOP200)} stocks...")
     
-    for i, ticker in enumerate(SP500_TOP200):
-        print(f"  [{i+1}/{len(SP500_TOP200)}] {ticker}...", end=' ', flush=True)
-        
-        # Get data with caching
-        df = get_stock_data(ticker, period='15y', interval='1d', cache_ttl=24)
-        
-        if df is None or len(df) < 300:
-            print("insufficient data")
-            continue
-        
-        # Detect patterns
-        signals = detect_patterns(df)
-        
-        if not signals:
-            print("no signals")
-            continue
-        
-        # Filter by SPY regime (only trade in bull markets)
-        bull_signals = []
-        for sig in signals:
-            if get_spy_regime(sig['date'] - timedelta(days=7), sig['date']):
-                bull_signals.append(sig)
-        
-        if not bull_signals:
-            print(f"{len(signals)} signals (all in bear market)")
-            continue
-        
-        # Simulate trades
-        trades = simulate_trades(df, bull_signals)
-        
+    ckpt = None
+    if checkpoint:
+        ckpt = Checkpoint.for_script(__file__, fresh=fresh, trailing_stop=TRAILING_STOP,
+                                     profit_target=PROFIT_TARGET, max_hold=MAX_HOLD_DAYS,
+                                     universe=SP500_TOP200)
+    
+    for ticker, trades in run_tickers(backtest_ticker, SP500_TOP200, workers=workers, checkpoint=ckpt):
         if trades:
-            for t in trades:
-                t['ticker'] = ticker
             all_trades.extend(trades)
             stocks_with_signals += 1
-            print(f"{len(trades)} trades")
-        else:
-            print(f"{len(bull_signals)} signals, 0 complete trades")
     
     if not all_trades:
         print("\nNo trades generated!")
+        if ckpt:
+            ckpt.clear()
         return
     
     # Convert to DataFrame
@@ -321,11 +292,7 @@ def run_backtest():
     
     # Calculate SPY comparison
     print("\nCalculating SPY comparison...")
-    spy_returns = []
-    for _, row in df_trades.iterrows():
-        spy_ret = get_spy_return(row['entry_date'], row['exit_date'])
-        spy_returns.append(spy_ret)
-    df_trades['spy_return'] = spy_returns
+    df_trades['spy_return'] = get_spy_return(df_trades['entry_date'], df_trades['exit_date'])
     df_trades['alpha'] = df_trades['return_pct'] - df_trades['spy_return']
     
     # Results
@@ -416,12 +383,25 @@ def run_backtest():
     print(f"Est. Annual Alpha: {(avg_return - avg_spy) * trades_per_year:.2f}%")
     
     # Save results
-    results_file = '/Users/rara/clawd/trading/backtest_patterns_sp500_results.csv'
-    df_trades.to_csv(results_file, index=False)
-    print(f"\nDetailed results saved to: {results_file}")
+    store = ResultsStore()
+    run_id = store.add_run('backtest_patterns_sp500',
+                           params={'trailing_stop': TRAILING_STOP, 'profit_target': PROFIT_TARGET,
+                                   'max_hold': MAX_HOLD_DAYS, 'universe': len(SP500_TOP200)},
+                           stats={'trades': len(df_trades), 'win_rate': (df_trades['return_pct'] > 0).mean() * 100,
+                                  'avg_return': avg_return, 'median_return': df_trades['return_pct'].median(),
+                                  'avg_spy_return': avg_spy, 'avg_hold_days': avg_hold},
+                           trades=df_trades, start=df_trades['entry_date'].min(), end=df_trades['exit_date'].max())
+    store.close()
+    print(f"\nDetailed results saved as run {run_id} in {store.path}")
+    if ckpt:
+        ckpt.clear()
     
     return df_trades
 
 
 if __name__ == '__main__':
-    run_backtest()
+    parser = argparse.ArgumentParser(description='Pattern backtest on S&P 500 top 200')
+    add_workers_arg(parser)
+    add_checkpoint_args(parser)
+    args = parser.parse_args()
+    run_backtest(workers=args.workers, fresh=args.fresh, checkpoint=not args.no_checkpoint)
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Portfolio Backtest - capital-constrained replay of the cached signals
+
+- Every signal's exit is resolved up front (batched per ticker), so the
+  portfolio pass only has to decide which signals get a slot
+- One walk over the signals in calendar order: exits free their slot and
+  cash before the day's entries, same-day signals are taken in score_signal()
+  order (as system.py ranks them), at most max_positions open, one per ticker
+- Sizing follows system.py: risk / stop of book equity per position,
+  capped by 1 / max_positions and by available cash
+- Daily mark-to-market equity curve from the aligned close matrix
+
+backtest_master / calc_stats treat every signal as its own trade; this shows
+what the 5-slot account actually would have done with them.
+
+Usage:
+    python3 backtest_portfolio.py                       # system.py rules
+    python3 backtest_portfolio.py --positions 8 --no-spy-filter
+
+    # On cached signals:
+    market = Market.from_data(all_data)
+    cands = build_candidates(market, all_data, all_signals, fixed_policy(0.10, 0.20, 60))
+    res = simulate_portfolio(market, cands, max_positions=5)
+    print_report(res)
+"""
+import argparse
+import heapq
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from backtest_exits import resolve_exits
+from backtest_master import download_universe, download_spy, detect_all, fixed_policy
+from backtest_optimal import calc_stats
+from results_store import ResultsStore
+from system import (STOP_LOSS, PROFIT_TARGET, MAX_HOLD_DAYS, RISK_PER_TRADE, MAX_POSITIONS,
+                    score_signal)
+
+# Pattern tiers as assigned by system.PatternDetector.scan()
+PATTERN_TIERS = {'Breakout': 1, 'Cup w/ Handle': 1, 'VCP': 2, 'Flat Base': 2, 'Pocket Pivot': 3}
+
+
+def signal_score(sig):
+    """score_signal() for a backtest_master signal dict."""
+    pats = [{'name': p, 'tier': PATTERN_TIERS.get(p, 3)} for p in sig['patterns']]
+    return score_signal(pats, sig['vol_ratio'], sig['num_patterns'])
+
+
+@dataclass
+class Market:
+    """Closes of every ticker on one shared trading calendar (forward-filled)."""
+    dates: pd.DatetimeIndex
+    tickers: List[str]
+    close: np.ndarray          # (tickers, days)
+    positions: Dict[str, np.ndarray]   # ticker -> calendar position of each of its bars
+
+    @classmethod
+    def from_data(cls, all_data):
+        tickers = list(all_data)
+        dates = pd.DatetimeIndex(sorted(set().union(*(df.index for df in all_data.values()))))
+        close = np.zeros((len(tickers), len(dates)))
+        positions = {}
+        for k, t in enumerate(tickers):
+            s = all_data[t]['Close'].reindex(dates).ffill()
+            close[k] = s.fillna(0.0).values
+            positions[t] = dates.get_indexer(all_data[t].index)
+        return cls(dates, tickers, close, positions)
+
+
+@dataclass
+class Candidates:
+    """Every tradeable signal with its resolved exit, in calendar positions."""
+    ticker: np.ndarray         # (signals,) index into Market.tickers
+    entry_day: np.ndarray
+    exit_day: np.ndarray
+    entry_price: np.ndarray
+    ret: np.ndarray
+    score: np.ndarray
+    patterns: List[str]
+
+    def __len__(self):
+        return len(self.ticker)
+
+
+def build_candidates(market, all_data, all_signals, policy, keep=None):
+    """
+    Resolve every signal passing keep(signal, df) under `policy`, on each
+    ticker's own OHLC bars. Trades still open at the end of the data are
+    marked at the last close.
+    """
+    cols = {k: [] for k in ('ticker', 'entry_day', 'exit_day', 'entry_price', 'ret', 'score')}
+    patterns = []
+    for k, t in enumerate(market.tickers):
+        df = all_data[t]
+        sigs = all_signals.get(t) or []
+        if keep is not None:
+            sigs = [s for s in sigs if keep(s, df)]
+        if not sigs:
+            continue
+        entry_price = np.array([s['entry_price'] for s in sigs], dtype=float)
+        batch = resolve_exits(df['Close'].values, [s['idx'] for s in sigs], entry_price, policy,
+                              high=df['High'].values, low=df['Low'].values)
+        _collect(cols, patterns, k, sigs, market.positions[t], batch, market.close[k], entry_price)
+    return _finish(cols, patterns)
+
+
+def _collect(cols, patterns, k, sigs, row, batch, close, entry_price):
+    exit_day = np.where(batch.exited, row[np.maximum(batch.exit_idx, 0)], len(close) - 1)
+    ret = np.where(batch.exited, batch.ret, close[-1] / entry_price - 1)
+    cols['ticker'].append(np.full(len(sigs), k))
+    cols['entry_day'].append(row[batch.entry_idx])
+    cols['exit_day'].append(exit_day)
+    cols['entry_price'].append(entry_price)
+    cols['ret'].append(ret)
+    cols['score'].append(np.array([signal_score(s) for s in sigs]))
+    patterns.extend(s['pattern_str'] for s in sigs)
+
+
+def _finish(cols, patterns):
+    if not cols['ticker']:
+        empty = np.array([], dtype=int)
+        return Candidates(empty, empty, empty, np.array([]), np.array([]), empty, [])
+    return Candidates(patterns=patterns, **{k: np.concatenate(v) for k, v in cols.items()})
+
+
+@dataclass
+class PortfolioResult:
+    dates: pd.DatetimeIndex
+    equity: np.ndarray         # daily mark-to-market equity
+    open_positions: np.ndarray # positions held at each close
+    trades: List[dict]         # taken trades in entry order
+    skipped: Dict[str, int]    # signals not taken, by reason
+    initial_capital: float
+
+    def stats(self):
+        """Portfolio-level stats (percentages, like calc_stats)."""
+        eq = self.equity
+        years = max((self.dates[-1] - self.dates[0]).days / 365.25, 1e-9)
+        daily = np.diff(eq) / eq[:-1]
+        peak = np.maximum.accumulate(eq)
+        rets = [t['ret'] for t in self.trades]
+        st = calc_stats(rets) or {}
+        return {
+            'final_equity': round(float(eq[-1]), 2),
+            'total_return': round((eq[-1] / self.initial_capital - 1) * 100, 1),
+            'cagr': round(((eq[-1] / self.initial_capital) ** (1 / years) - 1) * 100, 1),
+            'max_drawdown': round(float(((peak - eq) / peak).max()) * 100, 1),
+            'sharpe': round(float(daily.mean() / daily.std() * np.sqrt(252)), 2) if daily.std() > 0 else 0,
+            'exposure': round(float((self.open_positions > 0).mean()) * 100, 1),
+            'avg_positions': round(float(self.open_positions.mean()), 2),
+            'trades': len(rets),
+            'win_rate': st.get('win_rate', 0),
+            'avg_return': st.get('avg_return', 0),
+            'profit_factor': st.get('profit_factor', 0),
+        }
+
+
+def simulate_portfolio(market, cands, max_positions=MAX_POSITIONS, risk_pct=RISK_PER_TRADE,
+                       stop_pct=STOP_LOSS, initial_capital=100_000.0, rank=True, start=None):
+    """
+    Replay candidates through a capital-constrained account.
+
+    Entries fill at the signal close; exits free their slot and cash on the
+    exit bar, before that day's entries. rank=False takes same-day signals
+    in ticker order instead of by score. The equity curve starts at `start`
+    (default: the first calendar day).
+    """
+    fraction = min(risk_pct / stop_pct, 1.0 / max_positions)
+    n_days = len(market.dates)
+    score = cands.score if rank else np.zeros(len(cands))
+    order = np.lexsort((cands.ticker, -score, cands.entry_day))
+
+    cash = initial_capital
+    book = initial_capital              # cash + cost basis of open positions
+    open_heap = []                      # (exit_day, seq, ticker, cost, proceeds)
+    held = set()
+    taken, costs = [], []
+    skipped = {'slots_full': 0, 'already_held': 0, 'no_cash': 0}
+    cash_delta = np.zeros(n_days + 1)
+
+    for i in order.tolist():
+        day = cands.entry_day[i]
+        while open_heap and open_heap[0][0] <= day:
+            _, _, t, cost, proceeds = heapq.heappop(open_heap)
+            cash += proceeds
+            book += proceeds - cost
+            held.discard(t)
+        t = cands.ticker[i]
+        if t in held:
+            skipped['already_held'] += 1
+            continue
+        if len(open_heap) >= max_positions:
+            skipped['slots_full'] += 1
+            continue
+        cost = min(book * fraction, cash)
+        if cost <= 0.01 * book:
+            skipped['no_cash'] += 1
+            continue
+        proceeds = cost * (1 + cands.ret[i])
+        cash -= cost
+        held.add(t)
+        heapq.heappush(open_heap, (cands.exit_day[i], i, t, cost, proceeds))
+        cash_delta[day] -= cost
+        cash_delta[cands.exit_day[i]] += proceeds
+        taken.append(i)
+        costs.append(cost)
+
+    # Mark to market: cash steps plus each open position's shares x close
+    held_value = np.zeros(n_days)
+    open_count = np.zeros(n_days + 1, dtype=int)
+    for i, cost in zip(taken, costs):
+        e, x, k = cands.entry_day[i], cands.exit_day[i], cands.ticker[i]
+        held_value[e:x] += cost / cands.entry_price[i] * market.close[k, e:x]
+        open_count[e] += 1
+        open_count[x] -= 1
+    equity = initial_capital + np.cumsum(cash_delta[:n_days]) + held_value
+
+    trade_rows = [{
+        'ticker': market.tickers[cands.ticker[i]],
+        'entry_date': str(market.dates[cands.entry_day[i]].date()),
+        'exit_date': str(market.dates[cands.exit_day[i]].date()),
+        'patterns': cands.patterns[i],
+        'entry_price': float(cands.entry_price[i]),
+        'score': int(cands.score[i]),
+        'ret': float(cands.ret[i]),
+        'cost': round(float(cost), 2),
+        'pnl': round(float(cost * cands.ret[i]), 2),
+    } for i, cost in zip(taken, costs)]
+
+    first = market.dates.searchsorted(pd.Timestamp(start)) if start is not None else 0
+    return PortfolioResult(market.dates[first:], equity[first:], np.cumsum(open_count[:n_days])[first:],
+                           trade_rows, skipped, initial_capital)
+
+
+def print_report(res, title='PORTFOLIO'):
+    """Portfolio stats and skipped-signal breakdown."""
+    st = res.stats()
+    print(f"\n{'='*70}")
+    print(f"  {title}: {res.dates[0]:%Y-%m-%d} → {res.dates[-1]:%Y-%m-%d}")
+    print(f"{'='*70}")
+    print(f"  Equity:       ${res.initial_capital:,.0f} → ${st['final_equity']:,.0f} "
+          f"({st['total_return']:+.1f}%, {st['cagr']:.1f}% CAGR)")
+    print(f"  Max drawdown: {st['max_drawdown']}% | Sharpe: {st['sharpe']} | "
+          f"Exposure: {st['exposure']}% | Avg positions: {st['avg_positions']}")
+    print(f"  Trades:       {st['trades']} | {st['win_rate']}% win | {st['avg_return']}% avg | "
+          f"{st['profit_factor']}x PF")
+    print(f"  Skipped:      " + ', '.join(f"{v} {k.replace('_', ' ')}" for k, v in res.skipped.items()))
+
+
+def run(start_date='2021-01-01', end_date='2026-01-31', spy_filter=True, max_positions=MAX_POSITIONS):
+    print(f"\n{'#'*70}")
+    print(f"#  PORTFOLIO BACKTEST — {STOP_LOSS*100:.0f}% stop / {PROFIT_TARGET*100:.0f}% target / "
+          f"{MAX_HOLD_DAYS}d, {max_positions} positions")
+    print(f"#  {datetime.now().strftime('%Y-%m-%d %H:%M')}")
+    print(f"{'#'*70}\n")
+
+    print("📥 Downloading data...")
+    all_data = download_universe(end_date)
+    spy = download_spy(end_date)
+    print(f"\n  ✅ {len(all_data)} stocks + SPY\n")
+
+    print("🔍 Detecting patterns...")
+    all_signals = detect_all(all_data, pd.Timestamp(start_date))
+    print()
+
+    t0 = time.time()
+    market = Market.from_data(all_data)
+    keep = None
+    if spy_filter:
+        bull = spy['Close'] > spy['Close'].rolling(200).mean()
+        keep = lambda s, df: bool(bull.asof(s['date']))
+    cands = build_candidates(market, all_data, all_signals,
+                             fixed_policy(STOP_LOSS, PROFIT_TARGET, MAX_HOLD_DAYS), keep=keep)
+    t_cands = time.time() - t0
+
+    per_signal = calc_stats(cands.ret.tolist())
+    print(f"\n  Per-signal (every signal its own trade): {per_signal['trades']} trades | "
+          f"{per_signal['win_rate']}% win | {per_signal['avg_return']}% avg | {per_signal['profit_factor']}x PF")
+
+    t0 = time.time()
+    res = simulate_portfolio(market, cands, max_positions=max_positions, start=start_date)
+    t_sim = time.time() - t0
+    print_report(res, f"PORTFOLIO ({max_positions} positions, score-ranked)")
+
+    # Slot count / ranking sensitivity: each variant is one more walk
+    rows, variants = [], []
+    for n in sorted({3, 5, 8, 10, max_positions}):
+        for rank in (True, False):
+            st = simulate_portfolio(market, cands, max_positions=n, rank=rank, start=start_date).stats()
+            variants.append((f"{n} {'ranked' if rank else 'first-come'}", st))
+            rows.append([f"{n} {'ranked' if rank else 'first-come'}", f"{st['cagr']}%", f"{st['max_drawdown']}%",
+                         str(st['sharpe']), str(st['trades']), f"{st['win_rate']}%", f"{st['profit_factor']}x"])
+    print(f"\n  {'Positions':<16} | {'CAGR':>7} | {'MaxDD':>7} | {'Sharpe':>6} | {'Trades':>6} | {'Win%':>6} | {'PF':>6}")
+    print(f"  {'-'*16}-+-{'-'*7}-+-{'-'*7}-+-{'-'*6}-+-{'-'*6}-+-{'-'*6}-+-{'-'*6}")
+    for r in rows:
+        print(f"  {r[0]:<16} | {r[1]:>7} | {r[2]:>7} | {r[3]:>6} | {r[4]:>6} | {r[5]:>6} | {r[6]:>6}")
+
+    print(f"\n  ⏱  exits {t_cands:.2f}s, portfolio walk {t_sim:.3f}s")
+
+    store = ResultsStore()
+    params = {'start': start_date, 'end': end_date, 'max_positions': max_positions, 'spy_filter': spy_filter,
+              'stop_loss': STOP_LOSS, 'profit_target': PROFIT_TARGET, 'max_hold': MAX_HOLD_DAYS}
+    run_id = store.add_run('backtest_portfolio', params=params, label='score-ranked',
+                           stats={**res.stats(), **{f'skipped_{k}': v for k, v in res.skipped.items()},
+                                  **{f'per_signal_{k}': v for k, v in per_signal.items()}},
+                           trades=res.trades, equity=dict(zip(res.dates, res.equity)),
+                           start=start_date, end=end_date)
+    for label, st in variants:
+        store.add_run('backtest_portfolio', params={**params, 'max_positions': int(label.split()[0])},
+                      stats=st, label=label.split(' ', 1)[1], start=start_date, end=end_date)
+    store.close()
+    print(f"\n  💾 Saved as run {run_id} in {store.path}")
+    return res
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Capital-constrained portfolio backtest of system.py rules')
+    parser.add_argument('--start', default='2021-01-01')
+    parser.add_argument('--end', default='2026-01-31')
+    parser.add_argument('--positions', type=int, default=MAX_POSITIONS)
+    parser.add_argument('--no-spy-filter', action='store_true', help='Take signals in any market regime')
+    args = parser.parse_args()
+    run(args.start, args.end, spy_filter=not args.no_spy_filter, max_positions=args.positions)
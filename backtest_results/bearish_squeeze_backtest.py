@@ -16,107 +16,20 @@ Trade Rules:
 - Time stop: Exit after 30 bars if neither hit
 """
 import os
-import pickle
+import sys
 import pandas as pd
 import numpy as np
 from datetime import datetime
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from results_store import ResultsStore
+from squeeze_study import run_study, calculate_metrics, TIMEFRAMES
+
 CACHE_DIR = os.path.expanduser("~/clawd/trading/backtest_results/price_cache")
 OUTPUT_DIR = os.path.expanduser("~/clawd/trading/backtest_results")
 
 
-def wilder_rma(series, length):
-    """Wilder's RMA (SMMA) - matches TradingView's ta.rma()"""
-    alpha = 1.0 / length
-    return series.ewm(alpha=alpha, adjust=False).mean()
-
-
-def calculate_squeeze_series(df, bb_len=20, bb_mult=2.0, kc_len=20, kc_mult=2.0, atr_len=10):
-    """
-    Calculate Squeeze indicator for entire series.
-    Returns DataFrame with squeeze_on, squeeze_count, depth, state, momentum columns.
-    """
-    if len(df) < max(bb_len, kc_len, atr_len) + 5:
-        return None
-    
-    close = df['Close']
-    high = df['High'] if 'High' in df.columns else close
-    low = df['Low'] if 'Low' in df.columns else close
-    
-    # === Bollinger Bands (SMA basis) ===
-    bb_basis = close.rolling(bb_len).mean()
-    bb_dev = bb_mult * close.rolling(bb_len).std()
-    bb_upper = bb_basis + bb_dev
-    bb_lower = bb_basis - bb_dev
-    bb_width = bb_upper - bb_lower
-    
-    # === Keltner Channels (EMA basis, Wilder's ATR) ===
-    kc_basis = close.ewm(span=kc_len, adjust=False).mean()
-    
-    # True Range
-    prev_close = close.shift(1)
-    tr1 = high - low
-    tr2 = (high - prev_close).abs()
-    tr3 = (low - prev_close).abs()
-    tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
-    tr.iloc[0] = high.iloc[0] - low.iloc[0]
-    
-    # ATR using Wilder's RMA
-    atr = wilder_rma(tr, atr_len)
-    
-    kc_upper = kc_basis + (kc_mult * atr)
-    kc_lower = kc_basis - (kc_mult * atr)
-    kc_width = kc_upper - kc_lower
-    
-    # === Squeeze detection ===
-    squeeze_on = (bb_upper < kc_upper) & (bb_lower > kc_lower)
-    
-    # Count consecutive squeeze bars (vectorized)
-    squeeze_on_int = squeeze_on.astype(int)
-    # Create groups that reset when squeeze turns off
-    groups = (~squeeze_on).cumsum()
-    # Within each group, cumsum gives consecutive count
-    squeeze_count = squeeze_on_int.groupby(groups).cumsum()
-    
-    # Depth calculation
-    depth = (kc_width - bb_width) / kc_width
-    depth = depth.fillna(0)
-    
-    # Momentum (using 12-period rate of change as momentum proxy)
-    momentum = close.pct_change(12)
-    
-    # Create result DataFrame
-    result = pd.DataFrame({
-        'squeeze_on': squeeze_on,
-        'squeeze_count': squeeze_count,
-        'depth': depth,
-        'momentum': momentum,
-        'close': close,
-        'open': df['Open'] if 'Open' in df.columns else close,
-        'high': high,
-        'low': low
-    }, index=df.index)
-    
-    # Classify squeeze level
-    def classify_squeeze(row):
-        if not row['squeeze_on']:
-            return 'NONE'
-        if row['squeeze_count'] >= 10 and row['depth'] >= 0.25:
-            return 'HIGH'
-        if row['squeeze_count'] >= 5 and row['depth'] >= 0.10:
-            return 'MED'
-        return 'LOW'
-    
-    result['state'] = result.apply(classify_squeeze, axis=1)
-    
-    # Previous values for release detection
-    result['prev_squeeze_on'] = squeeze_on.shift(1)
-    result['prev_state'] = result['state'].shift(1)
-    
-    return result
-
-
-def run_bearish_backtest(level, all_data, timeframe='weekly'):
+def run_bearish_backtest(level, cache_dir=None, timeframe='weekly'):
     """
     Run BEARISH (short) backtest for a specific squeeze level.
     
@@ -125,192 +38,12 @@ def run_bearish_backtest(level, all_data, timeframe='weekly'):
     - Entry: short at next bar open
     - Stop: 8% ABOVE entry (we lose if price goes up)
     - Target: 20% below entry (we win if price goes down)
-    """
-    trades = []
-    
-    for ticker, df_data in all_data.items():
-        if df_data is None or len(df_data) < 50:
-            continue
-        
-        # Calculate squeeze series
-        squeeze_data = calculate_squeeze_series(df_data)
-        if squeeze_data is None:
-            continue
-        
-        # Find bearish release signals for this level
-        for i in range(2, len(squeeze_data) - 31):  # Need 30 bars forward
-            row = squeeze_data.iloc[i]
-            prev_row = squeeze_data.iloc[i-1]
-            
-            # Check for release of specific level
-            if prev_row['state'] == level and row['state'] == 'NONE':
-                # Check momentum is NEGATIVE (bearish)
-                if prev_row['momentum'] < 0:
-                    # Entry at next bar's open
-                    entry_idx = i + 1
-                    if entry_idx >= len(squeeze_data):
-                        continue
-                    
-                    entry_price = float(squeeze_data.iloc[entry_idx]['open'])
-                    entry_date = squeeze_data.index[entry_idx]
-                    
-                    # SHORT trade: stop is ABOVE, target is BELOW
-                    stop_price = entry_price * 1.08   # 8% above = stop loss
-                    target_price = entry_price * 0.80  # 20% below = target profit
-                    
-                    exit_price = None
-                    exit_date = None
-                    exit_reason = None
-                    
-                    for j in range(entry_idx + 1, min(entry_idx + 31, len(squeeze_data))):
-                        bar = squeeze_data.iloc[j]
-                        bar_date = squeeze_data.index[j]
-                        
-                        bar_high = float(bar['high'])
-                        bar_low = float(bar['low'])
-                        
-                        # SHORT: Stop is hit if price goes UP to stop level
-                        if bar_high >= stop_price:
-                            exit_price = stop_price
-                            exit_date = bar_date
-                            exit_reason = 'STOP'
-                            break
-                        
-                        # SHORT: Target hit if price goes DOWN to target level
-                        if bar_low <= target_price:
-                            exit_price = target_price
-                            exit_date = bar_date
-                            exit_reason = 'TARGET'
-                            break
-                    
-                    # Time stop if neither hit
-                    if exit_price is None:
-                        final_idx = min(entry_idx + 30, len(squeeze_data) - 1)
-                        exit_price = float(squeeze_data.iloc[final_idx]['close'])
-                        exit_date = squeeze_data.index[final_idx]
-                        exit_reason = 'TIME'
-                    
-                    # Calculate return for SHORT trade
-                    # SHORT: profit = (entry - exit) / entry
-                    # If price drops, we profit. If price rises, we lose.
-                    pct_return = (entry_price - exit_price) / entry_price * 100
-                    
-                    trades.append({
-                        'ticker': ticker,
-                        'level': level,
-                        'timeframe': timeframe,
-                        'direction': 'SHORT',
-                        'entry_date': entry_date,
-                        'entry_price': entry_price,
-                        'exit_date': exit_date,
-                        'exit_price': exit_price,
-                        'exit_reason': exit_reason,
-                        'pct_return': pct_return,
-                        'squeeze_count': prev_row['squeeze_count'],
-                        'depth': prev_row['depth'],
-                        'momentum': prev_row['momentum']
-                    })
-    
-    return trades
-
-
-def calculate_metrics(trades):
-    """Calculate backtest metrics from list of trades."""
-    if not trades:
-        return {
-            'total_trades': 0,
-            'win_rate': 0,
-            'avg_gain': 0,
-            'avg_loss': 0,
-            'sharpe': 0,
-            'profit_factor': 0,
-            'total_return': 0,
-            'max_drawdown': 0,
-            'target_exits': 0,
-            'stop_exits': 0,
-            'time_exits': 0
-        }
-    
-    returns = [t['pct_return'] for t in trades]
-    wins = [r for r in returns if r > 0]
-    losses = [r for r in returns if r <= 0]
-    
-    total_trades = len(trades)
-    win_rate = len(wins) / total_trades * 100 if total_trades > 0 else 0
-    avg_gain = np.mean(wins) if wins else 0
-    avg_loss = np.mean(losses) if losses else 0
-    
-    # Sharpe ratio (annualized)
-    if len(returns) > 1 and np.std(returns) > 0:
-        # For weekly: sqrt(52), for daily: sqrt(252)
-        ann_factor = np.sqrt(52) if trades[0].get('timeframe') == 'weekly' else np.sqrt(252)
-        sharpe = (np.mean(returns) / np.std(returns)) * ann_factor
-    else:
-        sharpe = 0
-    
-    # Profit factor
-    gross_profit = sum(wins) if wins else 0
-    gross_loss = abs(sum(losses)) if losses else 0.01
-    profit_factor = gross_profit / gross_loss if gross_loss > 0 else 0
-    
-    # Total return
-    total_return = sum(returns)
-    
-    # Max drawdown
-    cumulative = np.cumsum(returns)
-    running_max = np.maximum.accumulate(cumulative)
-    drawdowns = cumulative - running_max
-    max_drawdown = abs(min(drawdowns)) if len(drawdowns) > 0 else 0
-    
-    # Exit breakdown
-    target_exits = len([t for t in trades if t['exit_reason'] == 'TARGET'])
-    stop_exits = len([t for t in trades if t['exit_reason'] == 'STOP'])
-    time_exits = len([t for t in trades if t['exit_reason'] == 'TIME'])
     
-    return {
-        'total_trades': total_trades,
-        'win_rate': win_rate,
-        'avg_gain': avg_gain,
-        'avg_loss': avg_loss,
-        'sharpe': sharpe,
-        'profit_factor': profit_factor,
-        'total_return': total_return,
-        'max_drawdown': max_drawdown,
-        'target_exits': target_exits,
-        'stop_exits': stop_exits,
-        'time_exits': time_exits
-    }
-
-
-def load_cached_data(interval='1wk'):
-    """Load all cached price data for specified interval."""
-    all_data = {}
-    suffix = f'_{interval}.pkl'
-    
-    cache_files = [f for f in os.listdir(CACHE_DIR) if f.endswith(suffix)]
-    
-    for filename in cache_files:
-        ticker = filename.replace(suffix, '')
-        filepath = os.path.join(CACHE_DIR, filename)
-        
-        try:
-            with open(filepath, 'rb') as f:
-                df = pickle.load(f)
-            
-            # Ensure proper format
-            if isinstance(df.columns, pd.MultiIndex):
-                df.columns = df.columns.get_level_values(0)
-            
-            # Make sure index is datetime
-            if not isinstance(df.index, pd.DatetimeIndex):
-                df.index = pd.to_datetime(df.index)
-            
-            all_data[ticker] = df
-            
-        except Exception as e:
-            continue
-    
-    return all_data
+    main() gets all levels and timeframes from a single pass instead.
+    """
+    interval = {v: k for k, v in TIMEFRAMES.items()}[timeframe]
+    table, _ = run_study((interval,), cache_dir or CACHE_DIR)
+    return table[(timeframe, 'SHORT', level)]
 
 
 def main():
@@ -322,23 +55,21 @@ def main():
     print("Stop: 8% above entry | Target: 20% drop | Time: 30 bars")
     print()
     
-    # Load cached data
+    # One pass over the cached data: releases of every level and timeframe
     print("Loading cached data...")
-    weekly_data = load_cached_data('1wk')
-    daily_data = load_cached_data('1d')
-    print(f"  Weekly: {len(weekly_data)} stocks")
-    print(f"  Daily: {len(daily_data)} stocks")
+    table, loaded = run_study(('1wk', '1d'), CACHE_DIR)
+    print(f"  Weekly: {loaded['weekly']} stocks")
+    print(f"  Daily: {loaded['daily']} stocks")
     print()
     
     results = {}
     all_trades = {}
     
-    # Run backtests for each timeframe and level
-    for timeframe, data, tf_label in [('weekly', weekly_data, 'Weekly'), ('daily', daily_data, 'Daily')]:
+    for timeframe, tf_label in [('weekly', 'Weekly'), ('daily', 'Daily')]:
         for level in ['HIGH', 'MED', 'LOW']:
             key = f"{tf_label}_{level}"
             print(f"Running {tf_label} {level} bearish backtest...")
-            trades = run_bearish_backtest(level, data, timeframe=timeframe)
+            trades = table[(timeframe, 'SHORT', level)]
             all_trades[key] = trades
             metrics = calculate_metrics(trades)
             results[key] = metrics
@@ -414,12 +145,15 @@ def main():
     print(f"📊 Report saved to: {output_path}")
     
     # Save detailed trades
+    store = ResultsStore()
     for key, trades in all_trades.items():
         if trades:
-            df_trades = pd.DataFrame(trades)
-            csv_path = os.path.join(OUTPUT_DIR, f"bearish_{key.lower()}_trades.csv")
-            df_trades.to_csv(csv_path, index=False)
-            print(f"📄 Trades saved to: {csv_path}")
+            timeframe, level = key.split('_')
+            run_id = store.add_run('bearish_squeeze_backtest',
+                                   params={'level': level, 'timeframe': timeframe, 'direction': 'short'},
+                                   stats=results[key], trades=trades, label=key)
+            print(f"📄 {key} trades saved as run {run_id} in {store.path}")
+    store.close()
 
 
 def generate_markdown_report(results, all_trades, weekly_agg, daily_agg):
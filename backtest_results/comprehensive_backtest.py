@@ -15,14 +15,19 @@ Trade Rules:
 - Stop Loss: 8% below entry
 - Target: 20% gain OR hit 3:1 risk/reward
 - Time stop: Exit after 30 days if neither stop nor target hit
+
+Finished stocks are checkpointed; an interrupted run picks up where it
+stopped (--fresh to start over).
 """
 
 import yfinance as yf
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
+import argparse
 import json
 import os
+import sys
 import pickle
 import time
 import warnings
@@ -31,6 +36,11 @@ from typing import List, Dict, Optional, Tuple
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import traceback
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backtest_exits import ExitPolicy, resolve_exits, STOP, TIME
+from backtest_runner import run_tickers, add_workers_arg
+from backtest_checkpoint import Checkpoint, add_checkpoint_args
+
 warnings.filterwarnings('ignore')
 
 # === CONFIGURATION ===
@@ -333,63 +343,50 @@ def detect_cup_and_handle_signals(df: pd.DataFrame) -> List[str]:
     Cup & Handle Pattern Detection
     - Cup: U-shaped base, 12-35% depth, 7-65 weeks
     - Handle: 1-4 weeks, max 12% pullback
+    
+    Every (day, cup length) pair is checked at once: the left high, cup low,
+    right high and handle range are rolling max/min arrays over the closes
+    before each day (NaN skipped, as Series.max/min do).
     """
-    if len(df) < 100:
+    n = len(df)
+    if n < 100:
         return []
     
-    close = df['Close'].astype(float)
-    high = df['High'].astype(float)
-    low = df['Low'].astype(float)
+    close = df['Close'].astype(float).reset_index(drop=True)
+    price = close.values
     
-    signals = []
+    def trailing(window: int, how: str) -> np.ndarray:
+        """max/min of the `window` closes before each bar (NaN at bar 0)."""
+        roll = getattr(close.rolling(window, min_periods=1), how)().values
+        return np.concatenate([[np.nan], roll[:-1]])
     
-    # Slide a window looking for cup patterns
-    for end_idx in range(100, len(df)):
-        # Look back 35-200 days for cup formation
-        for cup_len in range(50, min(200, end_idx), 10):
-            start_idx = end_idx - cup_len
-            if start_idx < 0:
-                continue
-            
-            cup_data = df.iloc[start_idx:end_idx]
-            cup_close = cup_data['Close'].astype(float)
-            cup_high = cup_data['High'].astype(float)
-            
-            if len(cup_close) < 50:
-                continue
-            
-            # Find cup characteristics
-            left_high = cup_close.iloc[:10].max()
-            cup_low = cup_close.min()
-            right_high = cup_close.iloc[-15:].max()
-            
-            # Cup depth (12-35%)
-            cup_depth = (left_high - cup_low) / left_high * 100
-            if cup_depth < 12 or cup_depth > 35:
-                continue
-            
-            # Right side should recover to near left high (within 5%)
-            if right_high < left_high * 0.95:
-                continue
-            
-            # Check for handle in last 5-20 days
-            handle_data = cup_close.iloc[-20:]
-            handle_high = handle_data.max()
-            handle_low = handle_data.min()
-            handle_depth = (handle_high - handle_low) / handle_high * 100
-            
-            # Handle depth < 12%
-            if handle_depth > 12:
-                continue
-            
-            # Current price breaking above handle high
-            current_price = close.iloc[end_idx]
-            if current_price > handle_high:
-                signals.append(str(df.index[end_idx].date()))
-                break  # Only one signal per day
+    end = np.arange(n)
     
-    # Remove duplicates
-    return list(set(signals))
+    # Handle (last 20 days) and right side (last 15) don't depend on cup length
+    right_high = trailing(15, 'max')
+    handle_high = trailing(20, 'max')
+    handle_low = trailing(20, 'min')
+    handle_depth = (handle_high - handle_low) / handle_high * 100
+    breakout = (end >= 100) & ~(handle_depth > 12) & (price > handle_high)
+    
+    # Max of the first 10 closes of a cup starting at each bar
+    first10_high = close.rolling(10, min_periods=1).max().values[np.minimum(end + 9, n - 1)]
+    
+    # Look back 50-190 days for cup formation
+    cup_found = np.zeros(n, dtype=bool)
+    for cup_len in range(50, 200, 10):
+        start = end - cup_len
+        valid = start > 0
+        left_high = np.where(valid, first10_high[np.maximum(start, 0)], np.nan)
+        cup_low = trailing(cup_len, 'min')
+        
+        # Cup depth (12-35%); right side recovers to within 5% of the left high
+        cup_depth = (left_high - cup_low) / left_high * 100
+        cup_found |= valid & ~(cup_depth < 12) & ~(cup_depth > 35) & ~(right_high < left_high * 0.95)
+    
+    # Current price breaking above handle high; one signal per day
+    hits = np.flatnonzero(breakout & cup_found)
+    return [str(d.date()) for d in df.index[hits]]
 
 
 def detect_200wma_zone_signals(df_weekly: pd.DataFrame) -> List[str]:
@@ -494,99 +491,82 @@ def detect_vcp_signals(df: pd.DataFrame) -> List[str]:
 
 # === TRADE SIMULATION ===
 
-def simulate_trade(df: pd.DataFrame, signal_date: str, ticker: str, strategy: str) -> Optional[Trade]:
+def simulate_trades(df: pd.DataFrame, signal_dates: List[str], ticker: str, strategy: str) -> List[Trade]:
     """
-    Simulate a single trade with the standard rules:
+    Simulate all signals of one strategy on one stock with the standard rules:
     - Entry: Next day open after signal
     - Stop: 8% below entry
     - Target: 20% gain
     - Time stop: 30 trading days
+    Exits are resolved in one batch; signals that can't be filled are skipped.
     """
-    try:
-        signal_dt = pd.to_datetime(signal_date)
-        
-        # Find signal date index
-        if signal_dt not in df.index:
-            # Find next available date
-            future_dates = df.index[df.index >= signal_dt]
-            if len(future_dates) == 0:
-                return None
-            signal_idx = df.index.get_loc(future_dates[0])
-        else:
-            signal_idx = df.index.get_loc(signal_dt)
+    opens = df['Open'].values.astype(float)
+    filled, entries = [], []
+    
+    for signal_date in signal_dates:
+        try:
+            # Signal date, or the next available date
+            signal_idx = int(df.index.searchsorted(pd.to_datetime(signal_date)))
+        except Exception:
+            continue
+        if signal_idx >= len(df):
+            continue
         
         # Entry is next day open
         entry_idx = signal_idx + 1
         if entry_idx >= len(df):
-            return None
-        
-        entry_date = df.index[entry_idx]
-        entry_price = float(df['Open'].iloc[entry_idx])
+            continue
         
+        entry_price = float(opens[entry_idx])
         if pd.isna(entry_price) or entry_price <= 0:
-            return None
-        
-        # Calculate stop and target
-        stop_price = entry_price * (1 - STOP_LOSS_PCT)
-        target_price = entry_price * (1 + TARGET_PCT)
-        
-        # Simulate through subsequent days
-        exit_idx = None
-        exit_reason = None
-        
-        for i in range(entry_idx + 1, min(entry_idx + TIME_STOP_DAYS + 1, len(df))):
-            day_low = float(df['Low'].iloc[i])
-            day_high = float(df['High'].iloc[i])
-            day_close = float(df['Close'].iloc[i])
-            
-            # Check stop loss hit (using low)
-            if day_low <= stop_price:
-                exit_idx = i
-                exit_reason = 'stop_loss'
-                break
-            
-            # Check target hit (using high)
-            if day_high >= target_price:
-                exit_idx = i
-                exit_reason = 'target'
-                break
-        
-        # Time stop if no exit
-        if exit_idx is None:
-            exit_idx = min(entry_idx + TIME_STOP_DAYS, len(df) - 1)
-            exit_reason = 'time_stop'
-        
-        exit_date = df.index[exit_idx]
-        
-        # Determine exit price based on reason
-        if exit_reason == 'stop_loss':
-            exit_price = stop_price
-        elif exit_reason == 'target':
-            exit_price = target_price
-        else:
-            exit_price = float(df['Close'].iloc[exit_idx])
+            continue
         
+        filled.append(signal_date)
+        entries.append(entry_idx)
+    
+    if not entries:
+        return []
+    
+    entry_idx = np.array(entries)
+    entry_price = opens[entry_idx]
+    
+    # Stop checked on the low, target on the high; stop wins on the same bar
+    policy = ExitPolicy(stop='fixed', max_hold=TIME_STOP_DAYS, basis='range')
+    batch = resolve_exits(df['Close'].values, entry_idx, entry_price, policy,
+                          high=df['High'].values, low=df['Low'].values,
+                          stop_level=entry_price * (1 - STOP_LOSS_PCT),
+                          target_level=entry_price * (1 + TARGET_PCT))
+    reasons = batch.reasons({STOP: 'stop_loss', TIME: 'time_stop'})
+    
+    trades = []
+    for k, signal_date in enumerate(filled):
+        exit_idx = int(batch.exit_idx[k])
+        exit_price = float(batch.exit_price[k])
         if pd.isna(exit_price) or exit_price <= 0:
-            return None
+            continue
         
-        return_pct = (exit_price - entry_price) / entry_price * 100
-        hold_days = exit_idx - entry_idx
+        return_pct = (exit_price - entry_price[k]) / entry_price[k] * 100
         
-        return Trade(
+        trades.append(Trade(
             ticker=ticker,
             strategy=strategy,
             signal_date=signal_date,
-            entry_date=str(entry_date.date()),
-            entry_price=round(entry_price, 2),
-            exit_date=str(exit_date.date()),
+            entry_date=str(df.index[entry_idx[k]].date()),
+            entry_price=round(float(entry_price[k]), 2),
+            exit_date=str(df.index[exit_idx].date()),
             exit_price=round(exit_price, 2),
-            exit_reason=exit_reason,
-            return_pct=round(return_pct, 2),
-            hold_days=hold_days
-        )
-        
-    except Exception as e:
-        return None
+            exit_reason=reasons[k],
+            return_pct=round(float(return_pct), 2),
+            hold_days=exit_idx - int(entry_idx[k])
+        ))
+    
+    return trades
+
+
+def simulate_trade(df: pd.DataFrame, signal_date: str, ticker: str, strategy: str) -> Optional[Trade]:
+    """Simulate a single trade (see simulate_trades for the rules)."""
+    trades = simulate_trades(df, [signal_date], ticker, strategy)
+    return trades[0] if trades else None
 
 
 # === METRICS CALCULATION ===
@@ -701,44 +681,35 @@ def backtest_stock(ticker: str) -> Dict[str, List[Trade]]:
     # 1. Weekly Squeeze
     if df_weekly is not None and len(df_weekly) >= 30:
         signals = detect_weekly_squeeze_signals(df_weekly)
-        for sig in signals:
-            trade = simulate_trade(df_daily, sig, ticker, 'weekly_squeeze')
-            if trade:
-                results['weekly_squeeze'].append(trade)
+        results['weekly_squeeze'].extend(simulate_trades(df_daily, signals, ticker, 'weekly_squeeze'))
     
     # 2. Daily Squeeze
     signals = detect_daily_squeeze_signals(df_daily)
-    for sig in signals:
-        trade = simulate_trade(df_daily, sig, ticker, 'daily_squeeze')
-        if trade:
-            results['daily_squeeze'].append(trade)
+    results['daily_squeeze'].extend(simulate_trades(df_daily, signals, ticker, 'daily_squeeze'))
     
     # 3. Cup & Handle
     signals = detect_cup_and_handle_signals(df_daily)
-    for sig in signals:
-        trade = simulate_trade(df_daily, sig, ticker, 'cup_and_handle')
-        if trade:
-            results['cup_and_handle'].append(trade)
+    results['cup_and_handle'].extend(simulate_trades(df_daily, signals, ticker, 'cup_and_handle'))
     
     # 4. 200-WMA Zone
     if df_weekly is not None and len(df_weekly) >= 210:
         signals = detect_200wma_zone_signals(df_weekly)
-        for sig in signals:
-            trade = simulate_trade(df_daily, sig, ticker, '200wma_zone')
-            if trade:
-                results['200wma_zone'].append(trade)
+        results['200wma_zone'].extend(simulate_trades(df_daily, signals, ticker, '200wma_zone'))
     
     # 5. VCP
     signals = detect_vcp_signals(df_daily)
-    for sig in signals:
-        trade = simulate_trade(df_daily, sig, ticker, 'vcp')
-        if trade:
-            results['vcp'].append(trade)
+    results['vcp'].extend(simulate_trades(df_daily, signals, ticker, 'vcp'))
     
     return results
 
 
-def run_full_backtest():
+def backtest_ticker(ticker: str) -> Tuple[str, Dict[str, List[Trade]]]:
+    """Runner worker: (progress status, strategy_name -> trades) for one stock"""
+    stock_results = backtest_stock(ticker)
+    return f"{sum(len(t) for t in stock_results.values())} trades", stock_results
+
+
+def run_full_backtest(workers: int = 1, fresh: bool = False, checkpoint: bool = True):
     """Run backtest across all stocks and strategies"""
     print("\n" + "="*70)
     print("  COMPREHENSIVE STRATEGY COMPARISON BACKTEST")
@@ -756,22 +727,21 @@ def run_full_backtest():
         'vcp': []
     }
     
-    # Process each stock
-    total = len(STOCK_UNIVERSE)
-    for i, ticker in enumerate(STOCK_UNIVERSE):
-        print(f"\r[{i+1}/{total}] Processing {ticker}...", end='', flush=True)
-        
-        try:
-            stock_results = backtest_stock(ticker)
-            
-            for strategy, trades in stock_results.items():
-                all_results[strategy].extend(trades)
-                
-        except Exception as e:
-            print(f"\n  Error on {ticker}: {e}")
+    ckpt = None
+    if checkpoint:
+        ckpt = Checkpoint.for_script(__file__, fresh=fresh, start=START_DATE, end=END_DATE,
+                                     stop=STOP_LOSS_PCT, target=TARGET_PCT, time_stop=TIME_STOP_DAYS,
+                                     universe=STOCK_UNIVERSE)
+    
+    # Process each stock (errors are reported by the runner and skipped)
+    for ticker, stock_results in run_tickers(backtest_ticker, STOCK_UNIVERSE, workers=workers,
+                                             checkpoint=ckpt):
+        if stock_results is None:
             continue
+        for strategy, trades in stock_results.items():
+            all_results[strategy].extend(trades)
     
-    print(f"\n\nBacktest complete!\n")
+    print(f"\nBacktest complete!\n")
     
     # Calculate metrics for each strategy
     strategy_metrics = {}
@@ -812,6 +782,8 @@ def run_full_backtest():
     
     # Generate summary markdown
     generate_summary_markdown(strategy_metrics)
+    if ckpt:
+        ckpt.clear()
     
     return strategy_metrics
 
@@ -906,4 +878,8 @@ def generate_summary_markdown(strategy_metrics: Dict):
 
 
 if __name__ == '__main__':
-    run_full_backtest()
+    parser = argparse.ArgumentParser(description='Comprehensive strategy comparison backtest')
+    add_workers_arg(parser)
+    add_checkpoint_args(parser)
+    args = parser.parse_args()
+    run_full_backtest(workers=args.workers, fresh=args.fresh, checkpoint=not args.no_checkpoint)
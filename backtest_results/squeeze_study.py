@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+Squeeze Study: every squeeze level and direction from one pass over the panel
+
+- Cached bars are read lazily, one pickle at a time
+- Squeeze state (on, consecutive count, depth, level, momentum) is computed
+  once per ticker with array ops
+- Releases (was ON at some level, now OFF) of all levels and both directions
+  come out of one mask: positive momentum → long, negative → short
+- Exits go through the shared batched engine (backtest_exits.resolve_exits)
+
+squeeze_levels_backtest.py (weekly longs) and bearish_squeeze_backtest.py
+(weekly + daily shorts) report slices of the same trade table.
+
+Trade Rules:
+- Entry: next bar open after the release
+- Stop Loss: 8% against the entry
+- Target: 20% in favour
+- Time stop: Exit after 30 bars if neither hit
+
+Usage:
+    python3 backtest_results/squeeze_study.py               # weekly + daily, long + short
+    python3 backtest_results/squeeze_study.py --intervals 1wk
+"""
+import os
+import sys
+import pickle
+import argparse
+import pandas as pd
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backtest_exits import ExitPolicy, resolve_exits, STOP, TARGET, TIME
+
+CACHE_DIR = os.path.expanduser("~/clawd/trading/backtest_results/price_cache")
+
+LEVELS = ['HIGH', 'MED', 'LOW']
+DIRECTIONS = ['LONG', 'SHORT']
+TIMEFRAMES = {'1wk': 'weekly', '1d': 'daily'}
+
+# Level codes of the state array
+NONE, LOW, MED, HIGH = 0, 1, 2, 3
+LEVEL_NAMES = {LOW: 'LOW', MED: 'MED', HIGH: 'HIGH'}
+
+STOP_PCT = 0.08
+TARGET_PCT = 0.20
+MAX_HOLD = 30
+REASONS = {STOP: 'STOP', TARGET: 'TARGET', TIME: 'TIME'}
+
+
+def wilder_rma(series, length):
+    """Wilder's RMA (SMMA) - matches TradingView's ta.rma()"""
+    alpha = 1.0 / length
+    return series.ewm(alpha=alpha, adjust=False).mean()
+
+
+def consecutive_count(on):
+    """Length of the current run of True values at every bar."""
+    on = np.asarray(on, dtype=bool)
+    total = np.cumsum(on)
+    # running total at the last False bar; the run is everything since
+    reset = np.maximum.accumulate(np.where(on, 0, total))
+    return total - reset
+
+
+def calculate_squeeze_series(df, bb_len=20, bb_mult=2.0, kc_len=20, kc_mult=2.0, atr_len=10):
+    """
+    Calculate Squeeze indicator for entire series.
+    Returns DataFrame with squeeze_on, squeeze_count, depth, momentum, level and
+    OHLC columns (None when there are too few bars).
+    """
+    if len(df) < max(bb_len, kc_len, atr_len) + 5:
+        return None
+
+    close = df['Close']
+    high = df['High'] if 'High' in df.columns else close
+    low = df['Low'] if 'Low' in df.columns else close
+
+    # === Bollinger Bands (SMA basis) ===
+    bb_basis = close.rolling(bb_len).mean()
+    bb_dev = bb_mult * close.rolling(bb_len).std()
+    bb_upper = bb_basis + bb_dev
+    bb_lower = bb_basis - bb_dev
+    bb_width = bb_upper - bb_lower
+
+    # === Keltner Channels (EMA basis, Wilder's ATR) ===
+    kc_basis = close.ewm(span=kc_len, adjust=False).mean()
+
+    # True Range
+    prev_close = close.shift(1)
+    tr1 = high - low
+    tr2 = (high - prev_close).abs()
+    tr3 = (low - prev_close).abs()
+    tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
+    tr.iloc[0] = high.iloc[0] - low.iloc[0]
+
+    # ATR using Wilder's RMA
+    atr = wilder_rma(tr, atr_len)
+
+    kc_upper = kc_basis + (kc_mult * atr)
+    kc_lower = kc_basis - (kc_mult * atr)
+    kc_width = kc_upper - kc_lower
+
+    # === Squeeze detection ===
+    squeeze_on = ((bb_upper < kc_upper) & (bb_lower > kc_lower)).to_numpy()
+    squeeze_count = consecutive_count(squeeze_on)
+
+    # Depth calculation
+    depth = ((kc_width - bb_width) / kc_width).fillna(0).to_numpy()
+
+    # Momentum (12-period rate of change as momentum proxy)
+    momentum = close.pct_change(12).to_numpy()
+
+    # Level: HIGH = 10+ bars and 25%+ deep, MED = 5+ bars and 10%+ deep, else LOW
+    level = np.select([~squeeze_on,
+                       (squeeze_count >= 10) & (depth >= 0.25),
+                       (squeeze_count >= 5) & (depth >= 0.10)],
+                      [NONE, HIGH, MED], LOW).astype(np.int8)
+
+    return pd.DataFrame({
+        'squeeze_on': squeeze_on,
+        'squeeze_count': squeeze_count,
+        'depth': depth,
+        'momentum': momentum,
+        'level': level,
+        'open': df['Open'] if 'Open' in df.columns else close,
+        'high': high,
+        'low': low,
+        'close': close,
+    }, index=df.index)
+
+
+def release_events(sq, forward=MAX_HOLD + 1):
+    """
+    Bars where a squeeze released: level ON on the previous bar, NONE now.
+
+    Only bars 2 .. n-forward-1 qualify (room for the full time stop).
+    Returns (bar index, direction, previous bar index) arrays; direction is
+    +1 for positive momentum, -1 for negative, releases at zero are dropped.
+    """
+    level = sq['level'].to_numpy()
+    momentum = sq['momentum'].to_numpy()
+    n = len(level)
+    i = np.arange(2, max(2, n - forward))
+    i = i[(level[i] == NONE) & (level[i - 1] != NONE)]
+    prev = i - 1
+    direction = np.where(momentum[prev] > 0, 1, np.where(momentum[prev] < 0, -1, 0))
+    keep = direction != 0
+    return i[keep], direction[keep], prev[keep]
+
+
+def simulate_releases(ticker, df, timeframe='weekly', stop_pct=STOP_PCT, target_pct=TARGET_PCT,
+                      max_hold=MAX_HOLD):
+    """
+    Trades of every squeeze release of one ticker, all levels, both directions.
+
+    Entry at the next bar's open; the stop is checked before the target
+    within a bar; the time stop exits at the close max_hold bars later.
+    """
+    if df is None or len(df) < 50:
+        return []
+    sq = calculate_squeeze_series(df)
+    if sq is None:
+        return []
+
+    bars, direction, prev = release_events(sq, forward=max_hold + 1)
+    if len(bars) == 0:
+        return []
+
+    entry_idx = bars + 1
+    entry = sq['open'].to_numpy(dtype=float)[entry_idx]
+    close = sq['close'].to_numpy(dtype=float)
+    high = sq['high'].to_numpy(dtype=float)
+    low = sq['low'].to_numpy(dtype=float)
+
+    exit_idx = np.empty(len(bars), dtype=np.int64)
+    exit_price = np.empty(len(bars))
+    reason = np.empty(len(bars), dtype=np.int8)
+    for sign, side in ((1, 'long'), (-1, 'short')):
+        sel = np.flatnonzero(direction == sign)
+        if not len(sel):
+            continue
+        e = entry[sel]
+        policy = ExitPolicy(stop='fixed', stop_pct=stop_pct, target_pct=target_pct,
+                            max_hold=max_hold, basis='range', direction=side)
+        batch = resolve_exits(close, entry_idx[sel], e, policy, high=high, low=low,
+                              stop_level=e * (1 - sign * stop_pct),
+                              target_level=e * (1 + sign * target_pct))
+        exit_idx[sel] = batch.exit_idx
+        exit_price[sel] = batch.exit_price
+        reason[sel] = batch.reason
+
+    # Percent returns with the per-trade loops' arithmetic
+    pct_return = np.where(direction > 0, (exit_price - entry) / entry, (entry - exit_price) / entry) * 100
+
+    level = sq['level'].to_numpy()[prev]
+    count = sq['squeeze_count'].to_numpy()[prev]
+    depth = sq['depth'].to_numpy()[prev]
+    momentum = sq['momentum'].to_numpy()[prev]
+    dates = sq.index
+    return [{
+        'ticker': ticker,
+        'level': LEVEL_NAMES[int(level[k])],
+        'timeframe': timeframe,
+        'direction': 'LONG' if direction[k] > 0 else 'SHORT',
+        'entry_date': dates[entry_idx[k]],
+        'entry_price': entry[k],
+        'exit_date': dates[exit_idx[k]],
+        'exit_price': exit_price[k],
+        'exit_reason': REASONS[int(reason[k])],
+        'pct_return': pct_return[k],
+        'squeeze_count': int(count[k]),
+        'depth': depth[k],
+        'momentum': momentum[k],
+    } for k in range(len(bars))]
+
+
+def iter_cached_data(interval='1wk', cache_dir=None):
+    """Yield (ticker, bars) from the price cache, unpickling one file at a time."""
+    cache_dir = cache_dir or CACHE_DIR
+    suffix = f'_{interval}.pkl'
+
+    for filename in os.listdir(cache_dir):
+        if not filename.endswith(suffix):
+            continue
+        ticker = filename.replace(suffix, '')
+        try:
+            with open(os.path.join(cache_dir, filename), 'rb') as f:
+                df = pickle.load(f)
+
+            # Ensure proper format
+            if isinstance(df.columns, pd.MultiIndex):
+                df.columns = df.columns.get_level_values(0)
+
+            # Make sure index is datetime
+            if not isinstance(df.index, pd.DatetimeIndex):
+                df.index = pd.to_datetime(df.index)
+        except Exception as e:
+            print(f"Error loading {filename}: {e}")
+            continue
+
+        yield ticker, df
+
+
+def run_study(intervals=('1wk', '1d'), cache_dir=None, **rules):
+    """
+    One pass over the cached panel.
+
+    Returns ({(timeframe, direction, level): [trades]} for every combination,
+    each list in (ticker, bar) order; {timeframe: stocks loaded}).
+    """
+    table = {(TIMEFRAMES[iv], d, lvl): [] for iv in intervals for d in DIRECTIONS for lvl in LEVELS}
+    loaded = {}
+    for interval in intervals:
+        timeframe = TIMEFRAMES[interval]
+        loaded[timeframe] = 0
+        for ticker, df in iter_cached_data(interval, cache_dir):
+            loaded[timeframe] += 1
+            for t in simulate_releases(ticker, df, timeframe, **rules):
+                table[(timeframe, t['direction'], t['level'])].append(t)
+    return table, loaded
+
+
+def calculate_metrics(trades):
+    """Calculate backtest metrics from list of trades."""
+    if not trades:
+        return {
+            'total_trades': 0,
+            'win_rate': 0,
+            'avg_gain': 0,
+            'avg_loss': 0,
+            'sharpe': 0,
+            'profit_factor': 0,
+            'total_return': 0,
+            'max_drawdown': 0,
+            'target_exits': 0,
+            'stop_exits': 0,
+            'time_exits': 0
+        }
+
+    returns = np.array([t['pct_return'] for t in trades], dtype=float)
+    wins = returns[returns > 0]
+    losses = returns[returns <= 0]
+
+    total_trades = len(trades)
+    win_rate = len(wins) / total_trades * 100 if total_trades > 0 else 0
+    avg_gain = np.mean(wins) if len(wins) else 0
+    avg_loss = np.mean(losses) if len(losses) else 0
+
+    # Sharpe ratio (annualized): sqrt(52) for weekly, sqrt(252) for daily
+    if len(returns) > 1 and np.std(returns) > 0:
+        ann_factor = np.sqrt(52) if trades[0].get('timeframe', 'weekly') == 'weekly' else np.sqrt(252)
+        sharpe = (np.mean(returns) / np.std(returns)) * ann_factor
+    else:
+        sharpe = 0
+
+    # Profit factor
+    gross_profit = sum(wins) if len(wins) else 0
+    gross_loss = abs(sum(losses)) if len(losses) else 0.01
+    profit_factor = gross_profit / gross_loss if gross_loss > 0 else 0
+
+    # Total return
+    total_return = sum(returns)
+
+    # Max drawdown
+    cumulative = np.cumsum(returns)
+    running_max = np.maximum.accumulate(cumulative)
+    drawdowns = cumulative - running_max
+    max_drawdown = abs(min(drawdowns)) if len(drawdowns) > 0 else 0
+
+    # Exit breakdown
+    reasons = [t['exit_reason'] for t in trades]
+
+    return {
+        'total_trades': total_trades,
+        'win_rate': win_rate,
+        'avg_gain': avg_gain,
+        'avg_loss': avg_loss,
+        'sharpe': sharpe,
+        'profit_factor': profit_factor,
+        'total_return': total_return,
+        'max_drawdown': max_drawdown,
+        'target_exits': reasons.count('TARGET'),
+        'stop_exits': reasons.count('STOP'),
+        'time_exits': reasons.count('TIME')
+    }
+
+
+def print_matrix(table):
+    """Timeframe x direction x level comparison table."""
+    print(f"{'Timeframe':<10} {'Dir':<6} {'Level':<6} {'Trades':>7} {'Win%':>7} {'AvgGain':>8} "
+          f"{'AvgLoss':>8} {'Sharpe':>7} {'PF':>6} {'Tgt/Stp/Time':>14}")
+    print("-" * 86)
+    for (timeframe, direction, level), trades in table.items():
+        m = calculate_metrics(trades)
+        exits = f"{m['target_exits']}/{m['stop_exits']}/{m['time_exits']}"
+        print(f"{timeframe:<10} {direction:<6} {level:<6} {m['total_trades']:>7} {m['win_rate']:>6.1f}% "
+              f"{m['avg_gain']:>7.1f}% {m['avg_loss']:>7.1f}% {m['sharpe']:>7.2f} "
+              f"{m['profit_factor']:>6.2f} {exits:>14}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Squeeze release study: all levels, both directions')
+    parser.add_argument('--intervals', nargs='+', default=['1wk', '1d'], choices=list(TIMEFRAMES))
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    args = parser.parse_args()
+
+    print("=" * 86)
+    print("SQUEEZE RELEASE STUDY — 8% stop / 20% target / 30 bars")
+    print("=" * 86)
+    table, loaded = run_study(args.intervals, args.cache_dir)
+    for timeframe, n in loaded.items():
+        print(f"  {timeframe.capitalize()}: {n} stocks")
+    print()
+    print_matrix(table)
@@ -24,9 +24,15 @@ from pathlib import Path
 from dataclasses import dataclass
 from typing import List, Dict, Optional, Tuple
 from enum import Enum
+import os
+import sys
 import warnings
 warnings.filterwarnings('ignore')
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backtest_exits import ExitPolicy, resolve_exits, STOP
+from strat_engine import frame_codes, combo_masks, hammer_mask, shooter_mask, trailing_count
+
 # === Strat Scenario Detection ===
 
 class Scenario(Enum):
@@ -56,18 +62,7 @@ def get_scenario(curr_high, curr_low, curr_close, curr_open,
 
 def add_scenarios(df: pd.DataFrame) -> pd.DataFrame:
     """Add scenario column to dataframe"""
-    scenarios = []
-    for i in range(len(df)):
-        if i == 0:
-            scenarios.append(None)
-        else:
-            s = get_scenario(
-                df['High'].iloc[i], df['Low'].iloc[i],
-                df['Close'].iloc[i], df['Open'].iloc[i],
-                df['High'].iloc[i-1], df['Low'].iloc[i-1]
-            )
-            scenarios.append(s)
-    df['Scenario'] = scenarios
+    df['Scenario'] = [Scenario(c) if c else None for c in frame_codes(df)]
     return df
 
 def detect_hammer(row) -> bool:
@@ -113,264 +108,155 @@ class Trade:
     risk_pct: float = None
     days_held: int = None
 
-def simulate_trade(df: pd.DataFrame, entry_idx: int, 
-                   direction: str, stop_price: float, 
-                   target_price: float, max_days: int = 20,
-                   max_stop_pct: float = 0.08) -> Optional[Dict]:
+def simulate_trades(df: pd.DataFrame, entry_idx: List[int],
+                    direction: str, stop_price: List[float],
+                    target_price: List[float], max_days: int = 20,
+                    max_stop_pct: float = 0.08) -> List[Optional[Dict]]:
     """
-    Simulate a trade from entry_idx+1 (next day open)
-    Returns trade result dict or None if can't enter
+    Simulate a batch of same-direction trades, each from entry_idx+1 (next day open)
+    Returns one trade result dict per entry, or None where it can't enter
     """
-    if entry_idx + 1 >= len(df):
-        return None
+    results = [None] * len(entry_idx)
+    n = len(df)
+    opens = df['Open'].values
     
-    entry_bar = df.iloc[entry_idx + 1]
-    entry_price = entry_bar['Open']
-    entry_date = df.index[entry_idx + 1]
+    # Entries that can be filled
+    picks = [k for k, i in enumerate(entry_idx)
+             if i + 1 < n and not pd.isna(opens[i + 1]) and opens[i + 1] > 0]
+    if not picks:
+        return results
     
-    if pd.isna(entry_price) or entry_price <= 0:
-        return None
+    bar_idx = np.array([entry_idx[k] + 1 for k in picks])
+    entry_price = opens[bar_idx].astype(float)
+    stop = np.array([stop_price[k] for k in picks], dtype=float)
     
-    # Calculate risk and adjust stop if needed
+    # Calculate risk and adjust stop if needed, then recalc target at 2:1
     if direction == 'long':
-        risk_pct = (entry_price - stop_price) / entry_price
-        if risk_pct <= 0:  # Invalid stop (above entry)
-            return None
-        if risk_pct > max_stop_pct:
-            stop_price = entry_price * (1 - max_stop_pct)
-            risk_pct = max_stop_pct
-        # Recalc target at 2:1
-        target_price = entry_price * (1 + 2 * risk_pct)
+        risk_pct = (entry_price - stop) / entry_price
+        capped = risk_pct > max_stop_pct
+        stop = np.where(capped, entry_price * (1 - max_stop_pct), stop)
+        risk_pct = np.where(capped, max_stop_pct, risk_pct)
+        target = entry_price * (1 + 2 * risk_pct)
     else:  # short
-        risk_pct = (stop_price - entry_price) / entry_price
-        if risk_pct <= 0:  # Invalid stop (below entry)
-            return None
-        if risk_pct > max_stop_pct:
-            stop_price = entry_price * (1 + max_stop_pct)
-            risk_pct = max_stop_pct
-        target_price = entry_price * (1 - 2 * risk_pct)
-    
-    # Simulate forward
-    for days_held in range(1, max_days + 1):
-        bar_idx = entry_idx + 1 + days_held
-        if bar_idx >= len(df):
-            break
-        
-        bar = df.iloc[bar_idx]
-        bar_date = df.index[bar_idx]
-        
-        if direction == 'long':
-            # Check stop first (conservative)
-            if bar['Low'] <= stop_price:
-                return {
-                    'entry_date': str(entry_date),
-                    'entry_price': entry_price,
-                    'exit_date': str(bar_date),
-                    'exit_price': stop_price,
-                    'exit_reason': 'stop',
-                    'pnl_pct': -risk_pct,
-                    'risk_pct': risk_pct,
-                    'days_held': days_held
-                }
-            # Check target
-            if bar['High'] >= target_price:
-                pnl = (target_price - entry_price) / entry_price
-                return {
-                    'entry_date': str(entry_date),
-                    'entry_price': entry_price,
-                    'exit_date': str(bar_date),
-                    'exit_price': target_price,
-                    'exit_reason': 'target',
-                    'pnl_pct': pnl,
-                    'risk_pct': risk_pct,
-                    'days_held': days_held
-                }
-        else:  # short
-            if bar['High'] >= stop_price:
-                return {
-                    'entry_date': str(entry_date),
-                    'entry_price': entry_price,
-                    'exit_date': str(bar_date),
-                    'exit_price': stop_price,
-                    'exit_reason': 'stop',
-                    'pnl_pct': -risk_pct,
-                    'risk_pct': risk_pct,
-                    'days_held': days_held
-                }
-            if bar['Low'] <= target_price:
-                pnl = (entry_price - target_price) / entry_price
-                return {
-                    'entry_date': str(entry_date),
-                    'entry_price': entry_price,
-                    'exit_date': str(bar_date),
-                    'exit_price': target_price,
-                    'exit_reason': 'target',
-                    'pnl_pct': pnl,
-                    'risk_pct': risk_pct,
-                    'days_held': days_held
-                }
-    
-    # Time stop - exit at close
-    if bar_idx < len(df):
-        bar = df.iloc[bar_idx]
-        exit_price = bar['Close']
-        if direction == 'long':
-            pnl = (exit_price - entry_price) / entry_price
-        else:
-            pnl = (entry_price - exit_price) / entry_price
-        return {
-            'entry_date': str(entry_date),
-            'entry_price': entry_price,
-            'exit_date': str(df.index[bar_idx]),
-            'exit_price': exit_price,
-            'exit_reason': 'time',
+        risk_pct = (stop - entry_price) / entry_price
+        capped = risk_pct > max_stop_pct
+        stop = np.where(capped, entry_price * (1 + max_stop_pct), stop)
+        risk_pct = np.where(capped, max_stop_pct, risk_pct)
+        target = entry_price * (1 - 2 * risk_pct)
+    
+    # Invalid stop (wrong side of entry)
+    ok = ~(risk_pct <= 0)
+    
+    # Stop checked first (conservative); time stop only if the full hold fits in the data
+    policy = ExitPolicy(stop='fixed', max_hold=max_days, clip_hold=False,
+                        basis='range', direction=direction)
+    batch = resolve_exits(df['Close'].values, bar_idx[ok], entry_price[ok], policy,
+                          high=df['High'].values, low=df['Low'].values,
+                          stop_level=stop[ok], target_level=target[ok])
+    reasons = batch.reasons({STOP: 'stop'})
+    
+    for j, k in enumerate(np.flatnonzero(ok)):
+        exit_idx = batch.exit_idx[j]
+        if exit_idx < 0:
+            continue
+        pnl = -risk_pct[k] if reasons[j] == 'stop' else batch.ret[j]
+        results[picks[k]] = {
+            'entry_date': str(df.index[bar_idx[k]]),
+            'entry_price': entry_price[k],
+            'exit_date': str(df.index[exit_idx]),
+            'exit_price': batch.exit_price[j],
+            'exit_reason': reasons[j],
             'pnl_pct': pnl,
-            'risk_pct': risk_pct,
-            'days_held': max_days
+            'risk_pct': risk_pct[k],
+            'days_held': int(exit_idx - bar_idx[k])
         }
     
-    return None
+    return results
+
+
+def simulate_trade(df: pd.DataFrame, entry_idx: int, 
+                   direction: str, stop_price: float, 
+                   target_price: float, max_days: int = 20,
+                   max_stop_pct: float = 0.08) -> Optional[Dict]:
+    """
+    Simulate a trade from entry_idx+1 (next day open)
+    Returns trade result dict or None if can't enter
+    """
+    return simulate_trades(df, [entry_idx], direction, [stop_price], [target_price],
+                           max_days, max_stop_pct)[0]
 
 # === Pattern Detection & Trade Generation ===
 
+# Pattern rules in the order they are checked on a bar:
+# (pattern, direction, stop source, target source); the sources are
+# (bar offset, column[, multiplier]) with offset 0 = signal bar
+PATTERN_RULES = [
+    ('2-1-2 Cont', 'long', (1, 'Low'), (0, 'High', 1.16)),
+    ('2-1-2 Cont', 'short', (1, 'High'), (0, 'Low', 0.84)),
+    ('3-1-2 Rev', 'long', (0, 'Low'), (2, 'High')),
+    ('3-1-2 Rev', 'short', (0, 'High'), (2, 'Low')),
+    ('2-2 Cont', 'long', (1, 'Low'), (0, 'High', 1.16)),
+    ('2-2 Cont', 'short', (1, 'High'), (0, 'Low', 0.84)),
+    ('1-2 Break', 'long', (1, 'Low'), (0, 'High', 1.16)),
+    ('1-2 Break', 'short', (1, 'High'), (0, 'Low', 0.84)),
+    ('Hammer', 'long', (0, 'Low'), (0, 'High', 1.16)),
+    ('Shooter', 'short', (0, 'High'), (0, 'Low', 0.84)),
+]
+
+
 def find_pattern_trades(df: pd.DataFrame, ticker: str) -> List[Trade]:
     """Find all pattern trades in a dataframe"""
+    n = len(df)
+    o, h, l, c = (df[col].values.astype(float) for col in ('Open', 'High', 'Low', 'Close'))
+    cols = {'High': h, 'Low': l}
+    
+    # Every rule's signal mask over all bars at once
+    combos = combo_masks(frame_codes(df))
+    down_bars = trailing_count(c < o, 5)
+    up_bars = trailing_count(c > o, 5)
+    signals = {(name, side): mask for name, sides in combos.items() for side, mask in sides.items()}
+    # Hammer after a downtrend / shooter after an uptrend (2+ such bars of the last 5)
+    signals[('Hammer', 'long')] = hammer_mask(o, h, l, c) & (down_bars >= 2)
+    signals[('Shooter', 'short')] = shooter_mask(o, h, l, c) & (up_bars >= 2)
+    
+    def level(idx, source):
+        offset, col = source[0], source[1]
+        value = cols[col][idx - offset]
+        return value * source[2] if len(source) > 2 else value
+    
+    # Candidates in bar order, rules in PATTERN_RULES order within a bar
+    # (need lookback and forward space: bars 4 .. n-2)
+    bars, rules, stops, targets = [], [], [], []
+    for r, (name, side, stop_src, target_src) in enumerate(PATTERN_RULES):
+        idx = np.flatnonzero(signals[(name, side)][4:n - 1]) + 4
+        bars.append(idx)
+        rules.append(np.full(len(idx), r))
+        stops.append(level(idx, stop_src))
+        targets.append(level(idx, target_src))
+    bars, rules, stops, targets = (np.concatenate(x) for x in (bars, rules, stops, targets))
+    
+    candidates = []  # (signal idx, pattern, direction, stop, target)
+    for k in np.lexsort((rules, bars)):
+        name, side = PATTERN_RULES[rules[k]][:2]
+        candidates.append((int(bars[k]), name, side, stops[k], targets[k]))
+    
+    # Resolve the exits in one batch per direction, keep trades in signal order
+    results = [None] * len(candidates)
+    for direction in ('long', 'short'):
+        picks = [k for k, c in enumerate(candidates) if c[2] == direction]
+        batch = simulate_trades(df, [candidates[k][0] for k in picks], direction,
+                                [candidates[k][3] for k in picks],
+                                [candidates[k][4] for k in picks])
+        for k, result in zip(picks, batch):
+            results[k] = result
+    
     trades = []
-    df = add_scenarios(df.copy())
-    
-    for i in range(4, len(df) - 1):  # Need lookback and forward space
-        row = df.iloc[i]
-        prev1 = df.iloc[i-1]
-        prev2 = df.iloc[i-2]
-        prev3 = df.iloc[i-3]
-        
-        s0 = df['Scenario'].iloc[i]
-        s1 = df['Scenario'].iloc[i-1]
-        s2 = df['Scenario'].iloc[i-2]
-        
-        if s0 is None or s1 is None:
-            continue
-        
-        # 1. 2-1-2 Continuation
-        # Bullish: 2U → 1 → 2U
-        if s2 == Scenario.UP and s1 == Scenario.INSIDE and s0 == Scenario.UP:
-            stop = prev1['Low']  # Inside bar low
-            target = row['High'] * 1.16  # Will be recalculated
-            result = simulate_trade(df, i, 'long', stop, target)
-            if result:
-                trades.append(Trade(
-                    ticker=ticker, pattern='2-1-2 Cont', direction='long',
-                    **result
-                ))
-        
-        # Bearish: 2D → 1 → 2D
-        if s2 == Scenario.DOWN and s1 == Scenario.INSIDE and s0 == Scenario.DOWN:
-            stop = prev1['High']
-            target = row['Low'] * 0.84
-            result = simulate_trade(df, i, 'short', stop, target)
-            if result:
-                trades.append(Trade(
-                    ticker=ticker, pattern='2-1-2 Cont', direction='short',
-                    **result
-                ))
-        
-        # 2. 3-1-2 Reversal
-        # Bullish: 3D → 1 → 2U
-        if s2 == Scenario.OUTSIDE_DOWN and s1 == Scenario.INSIDE and s0 == Scenario.UP:
-            stop = row['Low']
-            target = prev2['High']
-            result = simulate_trade(df, i, 'long', stop, target)
-            if result:
-                trades.append(Trade(
-                    ticker=ticker, pattern='3-1-2 Rev', direction='long',
-                    **result
-                ))
-        
-        # Bearish: 3U → 1 → 2D
-        if s2 == Scenario.OUTSIDE_UP and s1 == Scenario.INSIDE and s0 == Scenario.DOWN:
-            stop = row['High']
-            target = prev2['Low']
-            result = simulate_trade(df, i, 'short', stop, target)
-            if result:
-                trades.append(Trade(
-                    ticker=ticker, pattern='3-1-2 Rev', direction='short',
-                    **result
-                ))
-        
-        # 3. 2-2 Continuation
-        # Bullish: 2U → 2U
-        if s1 == Scenario.UP and s0 == Scenario.UP:
-            stop = prev1['Low']
-            target = row['High'] * 1.16
-            result = simulate_trade(df, i, 'long', stop, target)
-            if result:
-                trades.append(Trade(
-                    ticker=ticker, pattern='2-2 Cont', direction='long',
-                    **result
-                ))
-        
-        # Bearish: 2D → 2D
-        if s1 == Scenario.DOWN and s0 == Scenario.DOWN:
-            stop = prev1['High']
-            target = row['Low'] * 0.84
-            result = simulate_trade(df, i, 'short', stop, target)
-            if result:
-                trades.append(Trade(
-                    ticker=ticker, pattern='2-2 Cont', direction='short',
-                    **result
-                ))
-        
-        # 4. 1-2 Breakout
-        # Bullish: 1 → 2U
-        if s1 == Scenario.INSIDE and s0 == Scenario.UP:
-            stop = prev1['Low']  # Inside bar low
-            target = row['High'] * 1.16
-            result = simulate_trade(df, i, 'long', stop, target)
-            if result:
-                trades.append(Trade(
-                    ticker=ticker, pattern='1-2 Break', direction='long',
-                    **result
-                ))
-        
-        # Bearish: 1 → 2D
-        if s1 == Scenario.INSIDE and s0 == Scenario.DOWN:
-            stop = prev1['High']
-            target = row['Low'] * 0.84
-            result = simulate_trade(df, i, 'short', stop, target)
-            if result:
-                trades.append(Trade(
-                    ticker=ticker, pattern='1-2 Break', direction='short',
-                    **result
-                ))
-        
-        # 5. Hammer (bullish reversal)
-        if detect_hammer(row):
-            # Must be after downtrend (at least 2 down bars in last 5)
-            recent_down = sum(1 for j in range(max(0, i-5), i) 
-                             if df['Close'].iloc[j] < df['Open'].iloc[j])
-            if recent_down >= 2:
-                stop = row['Low']
-                target = row['High'] * 1.16
-                result = simulate_trade(df, i, 'long', stop, target)
-                if result:
-                    trades.append(Trade(
-                        ticker=ticker, pattern='Hammer', direction='long',
-                        **result
-                    ))
-        
-        # 6. Shooter (bearish reversal)
-        if detect_shooter(row):
-            recent_up = sum(1 for j in range(max(0, i-5), i)
-                          if df['Close'].iloc[j] > df['Open'].iloc[j])
-            if recent_up >= 2:
-                stop = row['High']
-                target = row['Low'] * 0.84
-                result = simulate_trade(df, i, 'short', stop, target)
-                if result:
-                    trades.append(Trade(
-                        ticker=ticker, pattern='Shooter', direction='short',
-                        **result
-                    ))
+    for (_, pattern, direction, _, _), result in zip(candidates, results):
+        if result:
+            trades.append(Trade(
+                ticker=ticker, pattern=pattern, direction=direction,
+                **result
+            ))
     
     return trades
 
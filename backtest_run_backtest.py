@@ -66,7 +66,7 @@ def main():
                        help='Quick test: 10 stocks, 1 year')
     
     parser.add_argument('--save', type=str,
-                       help='Save results to custom filename')
+                       help='Label for the run in the results store')
     
     args = parser.parse_args()
     
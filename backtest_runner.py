@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Backtest Runner - fan per-ticker backtest work out to a process pool
+
+- Each ticker is handled by a worker function: worker(ticker) -> (status, result)
+- Workers run in separate processes; the on-disk bar cache (and anything the
+  parent loaded before the pool started, on fork platforms) is shared read-only
+- Results are merged back in the order of the input tickers, so the output is
+  identical to a serial run no matter which worker finishes first
+- workers=1 runs everything in-process (no pool)
+- shared=... hands one read-only object (e.g. preloaded bars) to every worker
+  once per process instead of once per task; workers read it with shared()
+- checkpoint=... (backtest_checkpoint.Checkpoint) saves each ticker's result
+  as it finishes and skips tickers an interrupted run already completed
+
+Usage:
+    from backtest_runner import run_tickers, add_workers_arg
+
+    results = run_tickers(partial(backtest_ticker, hold=26), tickers, workers=16)
+    for ticker, trades in results:
+        ...
+"""
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+
+def default_workers():
+    """All cores, leaving one for the parent process."""
+    return max(1, (os.cpu_count() or 1) - 1)
+
+
+def add_workers_arg(parser: argparse.ArgumentParser, default: int = 1):
+    """Add the standard --workers flag to a script's argument parser."""
+    parser.add_argument('--workers', type=int, default=default,
+                        help=f'Worker processes (default: {default}, '
+                             f'0 = all cores [{default_workers()}])')
+    return parser
+
+
+def resolve_workers(workers):
+    """Normalize a --workers value (None/0 = all cores)."""
+    if not workers:
+        return default_workers()
+    return max(1, int(workers))
+
+
+_shared = None
+
+
+def _install_shared(obj):
+    global _shared
+    _shared = obj
+
+
+def shared():
+    """The object passed as run_tickers(shared=...), inside a worker."""
+    return _shared
+
+
+def _pool_context():
+    # fork shares the parent's loaded data copy-on-write; macOS/Windows
+    # default to spawn, where workers re-import the script and read the cache
+    if sys.platform.startswith('linux'):
+        return mp.get_context('fork')
+    return mp.get_context()
+
+
+def _run_one(worker, ticker):
+    """Executed inside a worker process."""
+    start = time.time()
+    status, result = worker(ticker)
+    return os.getpid(), time.time() - start, status, result
+
+
+def run_tickers(worker, tickers, workers=1, progress=True, label='', shared=None,
+                checkpoint=None):
+    """
+    Run worker(ticker) for every ticker and merge results deterministically.
+
+    Args:
+        worker: picklable callable (module-level function or functools.partial)
+            returning (status, result); status is the progress text
+        tickers: tickers in the order results should be merged
+        workers: process count (1 = serial, 0/None = all cores)
+        progress: print a line per finished ticker and a per-worker summary
+        label: prefix for progress lines
+        shared: read-only object made available to workers via shared()
+        checkpoint: store with load(tickers) / save(ticker, result); finished
+            tickers are loaded from it instead of being run again
+
+    Returns:
+        list of (ticker, result) in input order
+    """
+    tickers = list(tickers)
+    total = len(tickers)
+    results = [None] * total
+    prefix = f"{label} " if label else ''
+
+    pending = list(range(total))
+    if checkpoint is not None:
+        done = checkpoint.load(tickers)
+        for i, ticker in enumerate(tickers):
+            if ticker in done:
+                results[i] = done[ticker]
+        pending = [i for i in pending if tickers[i] not in done]
+        if progress and done:
+            print(f"  {prefix}Resuming: {total - len(pending)}/{total} tickers loaded from checkpoint")
+    workers = min(resolve_workers(workers), max(len(pending), 1))
+
+    if workers == 1:
+        _install_shared(shared)
+        for n, i in enumerate(pending, start=total - len(pending)):
+            ticker = tickers[i]
+            if progress:
+                print(f"  {prefix}[{n+1}/{total}] {ticker}...", end=' ', flush=True)
+            try:
+                _, _, status, result = _run_one(worker, ticker)
+            except Exception as e:
+                status, result = f"error: {e}", None
+            results[i] = result
+            if checkpoint is not None:
+                checkpoint.save(ticker, result)
+            if progress:
+                print(status)
+        return list(zip(tickers, results))
+
+    if progress:
+        print(f"  {prefix}Running {len(pending)} tickers on {workers} workers...")
+
+    worker_ids = {}     # pid -> worker number (in order of first result)
+    worker_stats = {}   # worker number -> [tickers, seconds]
+    start = time.time()
+    done = total - len(pending)
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context(),
+                             initializer=_install_shared, initargs=(shared,)) as pool:
+        futures = {pool.submit(_run_one, worker, tickers[i]): i for i in pending}
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                pid, elapsed, status, result = future.result()
+            except Exception as e:
+                pid, elapsed, status, result = None, 0.0, f"error: {e}", None
+            results[i] = result
+            if checkpoint is not None:
+                checkpoint.save(tickers[i], result)
+            done += 1
+
+            wid = worker_ids.setdefault(pid, len(worker_ids) + 1) if pid else 0
+            stats = worker_stats.setdefault(wid, [0, 0.0])
+            stats[0] += 1
+            stats[1] += elapsed
+            if progress:
+                print(f"  {prefix}[{done}/{total}] w{wid:<2} {tickers[i]}... {status}", flush=True)
+
+    if progress:
+        wall = time.time() - start
+        busy = sum(s[1] for s in worker_stats.values())
+        print(f"  {prefix}Done in {wall:.1f}s ({busy:.1f}s of work, {busy / wall if wall else 0:.1f}x)")
+        for wid in sorted(worker_stats):
+            count, secs = worker_stats[wid]
+            print(f"    w{wid:<2} {count:>4} tickers  {secs:>7.1f}s")
+
+    return list(zip(tickers, results))
@@ -18,6 +18,8 @@ from datetime import datetime, timedelta
 import json
 import sys
 
+from results_store import ResultsStore
+
 # Stock universe (same as money_scanner.py)
 UNIVERSE = [
     'NVDA', 'AAPL', 'MSFT', 'GOOGL', 'META', 'AMZN', 'TSLA', 'AMD', 'AVGO', 'CRM',
@@ -274,6 +276,15 @@ def run_backtest():
         json.dump(output, f, indent=2, default=str)
     
     print(f"\nResults saved to backtest_score_results.json")
+
+    # One run per threshold; the unfiltered run carries every trade (returns are fractions)
+    store = ResultsStore()
+    for threshold, stats in results.items():
+        store.add_run('backtest_score_filter', params={**output['parameters'], 'min_score': threshold},
+                      stats=stats, trades=all_trades if threshold == 0 else None, pct=False,
+                      start=start_date, end=end_date)
+    store.close()
+    print(f"Trades saved to {store.path}")
     
     # Summary insight
     if 80 in results and 0 in results:
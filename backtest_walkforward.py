@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Walk-Forward Optimization for the master backtest
+
+- Patterns are detected once; every exit config in the grid is resolved once
+  per signal, giving an outcome matrix (signals x configs)
+- Folds: rolling or anchored train windows, each followed by a test window
+- Each fold picks the best config on its train window (only trades closed
+  before the test window starts) and trades it on the test window
+- Out-of-sample trades of all folds are stitched into one equity curve
+
+Every fold reuses the same detections and outcome matrix, so a 20-fold run
+costs about the same as one full grid.
+
+Usage:
+    python3 backtest_walkforward.py                        # 24m train / 3m test, rolling
+    python3 backtest_walkforward.py --anchored --test-months 2
+    python3 backtest_walkforward.py --metric avg_return --spy-filter --workers 8
+"""
+import argparse
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from functools import partial
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from backtest_exits import resolve_exits
+from backtest_master import (download_universe, download_spy, detect_all,
+                             fixed_policy, trailing_policy)
+from backtest_optimal import calc_stats
+from backtest_runner import run_tickers, add_workers_arg, shared
+from results_store import ResultsStore
+
+METRICS = ('profit_factor', 'avg_return', 'sharpe')
+
+
+@dataclass
+class Fold:
+    train_start: pd.Timestamp
+    train_end: pd.Timestamp     # exclusive; also the test start
+    test_end: pd.Timestamp      # exclusive
+
+    @property
+    def test_start(self):
+        return self.train_end
+
+    def label(self):
+        return f"{self.train_start:%Y-%m}→{self.train_end:%Y-%m} | {self.test_start:%Y-%m}→{self.test_end:%Y-%m}"
+
+
+@dataclass
+class Outcomes:
+    """Exit of every signal under every config of the grid."""
+    labels: List[str]
+    tickers: np.ndarray       # (signals,)
+    entry_date: np.ndarray    # (signals,) datetime64
+    exit_date: np.ndarray     # (signals, configs) datetime64
+    ret: np.ndarray           # (signals, configs)
+
+
+def default_grid():
+    """(label, ExitPolicy) pairs: the master stop/target grid plus trailing stops."""
+    grid = []
+    for mh in [30, 60, 90]:
+        for sl in [0.05, 0.08, 0.10, 0.12, 0.15]:
+            for pt in [0.15, 0.20, 0.25, 0.30, 0.40]:
+                grid.append((f"{sl*100:.0f}%/{pt*100:.0f}% {mh}d", fixed_policy(sl, pt, mh)))
+        for sl in [0.08, 0.10, 0.15]:
+            for tp in [0.08, 0.10, 0.12, 0.15]:
+                grid.append((f"{sl*100:.0f}% +{tp*100:.0f}%trail {mh}d", trailing_policy(sl, tp, mh)))
+    return grid
+
+
+def make_folds(start, end, train_months=24, test_months=3, anchored=False):
+    """Consecutive test windows after a train window that rolls (or grows when anchored)."""
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    folds = []
+    train_start = start
+    test_start = start + pd.DateOffset(months=train_months)
+    while test_start < end:
+        test_end = min(test_start + pd.DateOffset(months=test_months), end)
+        folds.append(Fold(train_start, test_start, test_end))
+        test_start = test_end
+        if not anchored:
+            train_start = test_start - pd.DateOffset(months=train_months)
+    return folds
+
+
+def _ticker_outcomes(ticker, grid):
+    """Runner worker: resolve one stock's signals under every config."""
+    all_data, all_signals = shared()
+    sigs = all_signals.get(ticker) or []
+    if not sigs:
+        return "no signals", None
+    df = all_data[ticker]
+    close, high, low = df['Close'].values, df['High'].values, df['Low'].values
+    idx = [s['idx'] for s in sigs]
+    entry = [s['entry_price'] for s in sigs]
+
+    ret = np.full((len(sigs), len(grid)), np.nan)
+    exit_date = np.full((len(sigs), len(grid)), np.datetime64('NaT'), dtype='datetime64[ns]')
+    dates = df.index.values
+    for j, (_, policy) in enumerate(grid):
+        batch = resolve_exits(close, idx, entry, policy, high=high, low=low)
+        ok = batch.exited
+        ret[ok, j] = batch.ret[ok]
+        exit_date[ok, j] = dates[batch.exit_idx[ok]]
+    return f"{len(sigs)} signals", (ret, exit_date)
+
+
+def precompute_outcomes(all_data, all_signals, grid, workers=1):
+    """Outcome matrix for all signals, resolved per stock on the runner's pool."""
+    worker = partial(_ticker_outcomes, grid=grid)
+    tickers, entry_dates, rets, exits = [], [], [], []
+    for ticker, result in run_tickers(worker, list(all_signals), workers=workers,
+                                      shared=(all_data, all_signals)):
+        if result is None:
+            continue
+        ret, exit_date = result
+        sigs = all_signals[ticker]
+        tickers.extend([ticker] * len(sigs))
+        entry_dates.extend(s['date'] for s in sigs)
+        rets.append(ret)
+        exits.append(exit_date)
+
+    n_cfg = len(grid)
+    return Outcomes(
+        labels=[label for label, _ in grid],
+        tickers=np.array(tickers),
+        entry_date=np.array(entry_dates, dtype='datetime64[ns]'),
+        exit_date=np.vstack(exits) if exits else np.empty((0, n_cfg), dtype='datetime64[ns]'),
+        ret=np.vstack(rets) if rets else np.empty((0, n_cfg)),
+    )
+
+
+def score_configs(ret, mask, metric='profit_factor', min_trades=30):
+    """Metric of every config over the masked trades (-inf below min_trades)."""
+    mask = mask & ~np.isnan(ret)
+    count = mask.sum(axis=0)
+    r = np.where(mask, ret, 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if metric == 'profit_factor':
+            gw = np.where(r > 0, r, 0.0).sum(axis=0)
+            gl = np.abs(np.where(r <= 0, r, 0.0).sum(axis=0))
+            score = gw / np.where(gl > 0, gl, 0.001)
+        elif metric == 'avg_return':
+            score = r.sum(axis=0) / count
+        elif metric == 'sharpe':
+            mean = r.sum(axis=0) / count
+            var = (np.where(mask, ret - mean, 0.0) ** 2).sum(axis=0) / count
+            std = np.sqrt(var)
+            score = np.where(std > 0, mean / std, 0.0)
+        else:
+            raise ValueError(f"Unknown metric: {metric}")
+    return np.where(count >= min_trades, score, -np.inf)
+
+
+def walk_forward(outcomes, folds, metric='profit_factor', min_trades=30):
+    """Optimize on each train window, trade the winner out-of-sample."""
+    ts = lambda d: np.datetime64(d, 'ns')
+    fold_rows, oos = [], []
+    for fold in folds:
+        in_train = ((outcomes.entry_date >= ts(fold.train_start))[:, None]
+                    & (outcomes.exit_date < ts(fold.test_start)))
+        scores = score_configs(outcomes.ret, in_train, metric, min_trades)
+        if not np.isfinite(scores).any():
+            fold_rows.append({'fold': fold.label(), 'best': None})
+            continue
+        best = int(np.argmax(scores))
+
+        in_test = ((outcomes.entry_date >= ts(fold.test_start))
+                   & (outcomes.entry_date < ts(fold.test_end))
+                   & ~np.isnan(outcomes.ret[:, best]))
+        train_rets = outcomes.ret[in_train[:, best], best].tolist()
+        test_rets = outcomes.ret[in_test, best].tolist()
+        for k in np.flatnonzero(in_test):
+            oos.append({
+                'ticker': str(outcomes.tickers[k]),
+                'entry_date': pd.Timestamp(outcomes.entry_date[k]),
+                'exit_date': pd.Timestamp(outcomes.exit_date[k, best]),
+                'return': float(outcomes.ret[k, best]),
+                'config': outcomes.labels[best],
+            })
+        fold_rows.append({
+            'fold': fold.label(),
+            'best': outcomes.labels[best],
+            'train': calc_stats(train_rets),
+            'test': calc_stats(test_rets),
+        })
+    oos.sort(key=lambda t: (t['exit_date'], t['entry_date'], t['ticker']))
+    return fold_rows, oos
+
+
+def run(start_date='2021-01-01', end_date='2026-01-31', train_months=24, test_months=3,
+        anchored=False, metric='profit_factor', min_trades=30, spy_filter=False, workers=1):
+    print(f"\n{'#'*70}")
+    print(f"#  WALK-FORWARD OPTIMIZATION")
+    print(f"#  {'Anchored' if anchored else 'Rolling'} {train_months}m train / {test_months}m test | metric: {metric}")
+    print(f"#  {datetime.now().strftime('%Y-%m-%d %H:%M')}")
+    print(f"{'#'*70}\n")
+
+    scan_start = pd.Timestamp(start_date)
+
+    print("📥 Downloading data...")
+    all_data = download_universe(end_date)
+    print(f"\n  ✅ {len(all_data)} stocks loaded\n")
+
+    print("🔍 Detecting patterns (once)...")
+    all_signals = detect_all(all_data, scan_start)
+    if spy_filter:
+        spy = download_spy(end_date)
+        bull = spy['Close'] > spy['Close'].rolling(200).mean()
+        all_signals = {t: [s for s in sigs if bool(bull.asof(s['date']))]
+                       for t, sigs in all_signals.items()}
+    total_sigs = sum(len(sigs) for sigs in all_signals.values())
+    print(f"\n  ✅ {total_sigs} pattern signals{' (SPY > 200MA)' if spy_filter else ''}\n")
+
+    grid = default_grid()
+    print(f"⚙️  Resolving {len(grid)} exit configs for every signal...")
+    outcomes = precompute_outcomes(all_data, all_signals, grid, workers)
+
+    folds = make_folds(start_date, end_date, train_months, test_months, anchored)
+    fold_rows, oos = walk_forward(outcomes, folds, metric, min_trades)
+
+    print(f"\n{'='*90}")
+    print(f"  FOLDS ({len(folds)})")
+    print(f"{'='*90}")
+    print(f"  {'Train | Test':<35} | {'Best config':<22} | {'IS PF':>6} | {'OOS #':>5} | {'OOS Avg':>7} | {'OOS PF':>6}")
+    print(f"  {'-'*35}-+-{'-'*22}-+-{'-'*6}-+-{'-'*5}-+-{'-'*7}-+-{'-'*6}")
+    for row in fold_rows:
+        if not row['best']:
+            print(f"  {row['fold']:<35} | {'(too few trades)':<22} |")
+            continue
+        tr, te = row['train'], row['test']
+        if te:
+            print(f"  {row['fold']:<35} | {row['best']:<22} | {tr['profit_factor']:>5.2f}x | {te['trades']:>5} | {te['avg_return']:>6.2f}% | {te['profit_factor']:>5.2f}x")
+        else:
+            print(f"  {row['fold']:<35} | {row['best']:<22} | {tr['profit_factor']:>5.2f}x | {0:>5} |")
+
+    # Stitched out-of-sample equity (trades in exit order)
+    oos_rets = [t['return'] for t in oos]
+    st = calc_stats(oos_rets)
+    print(f"\n{'='*90}")
+    print(f"  STITCHED OUT-OF-SAMPLE")
+    print(f"{'='*90}")
+    if st:
+        equity = np.cumsum(oos_rets) * 100
+        print(f"  Trades: {st['trades']} | Win: {st['win_rate']}% | Avg: {st['avg_return']}% | "
+              f"PF: {st['profit_factor']}x | MaxDD: {st['max_drawdown']}% | Sharpe: {st['sharpe']}")
+        print(f"  Equity (sum of trade returns): {equity[-1]:.1f}%")
+        # Quarter-end equity marks
+        curve = pd.Series(equity, index=pd.DatetimeIndex([t['exit_date'] for t in oos]))
+        for q, v in curve.groupby(curve.index.to_period('Q')).last().items():
+            print(f"    {q}  {v:>8.1f}%")
+    else:
+        print("  No out-of-sample trades")
+
+    # In-sample reference: best config on the whole sample, as the grid tests do
+    full = score_configs(outcomes.ret, np.ones(outcomes.ret.shape, dtype=bool), metric, min_trades)
+    if np.isfinite(full).any():
+        best = int(np.argmax(full))
+        first_test = np.datetime64(folds[0].test_start, 'ns') if folds else None
+        same_period = outcomes.entry_date >= first_test if folds else np.ones(len(outcomes.entry_date), bool)
+        ref = calc_stats(outcomes.ret[same_period & ~np.isnan(outcomes.ret[:, best]), best].tolist())
+        if ref:
+            print(f"\n  In-sample best ({outcomes.labels[best]}) over the same period: "
+                  f"{ref['avg_return']}% avg, {ref['profit_factor']}x PF  ← optimistic (fitted on it)")
+
+    settings = {'start': start_date, 'end': end_date, 'train_months': train_months,
+                'test_months': test_months, 'anchored': anchored, 'metric': metric,
+                'min_trades': min_trades, 'spy_filter': spy_filter}
+    with open('backtest_walkforward_results.json', 'w') as f:
+        json.dump({
+            'timestamp': datetime.now().isoformat(),
+            'settings': settings,
+            'folds': fold_rows,
+            'oos_stats': st,
+        }, f, indent=2, default=str)
+    store = ResultsStore()
+    run_id = store.add_run('backtest_walkforward', params=settings, stats=st, trades=oos,
+                           label='out-of-sample', start=start_date, end=end_date)
+    store.close()
+    print(f"\n  💾 Saved to backtest_walkforward_results.json (OOS trades: run {run_id} in {store.path})")
+    print(f"\n{'#'*70}\n")
+
+    return fold_rows, oos
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Walk-forward optimization of exit settings')
+    parser.add_argument('--start', default='2021-01-01', help='First signal date')
+    parser.add_argument('--end', default='2026-01-31', help='End of data')
+    parser.add_argument('--train-months', type=int, default=24)
+    parser.add_argument('--test-months', type=int, default=3)
+    parser.add_argument('--anchored', action='store_true', help='Grow the train window instead of rolling it')
+    parser.add_argument('--metric', choices=METRICS, default='profit_factor')
+    parser.add_argument('--min-trades', type=int, default=30, help='Min train trades for a config to qualify')
+    parser.add_argument('--spy-filter', action='store_true', help='Only signals with SPY above its 200MA')
+    add_workers_arg(parser)
+    args = parser.parse_args()
+
+    run(args.start, args.end, args.train_months, args.test_months, args.anchored,
+        args.metric, args.min_trades, args.spy_filter, args.workers)
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Benchmark - SPY regime flags and benchmark returns as precomputed arrays
+
+- SPY is loaded once per process (shared pickle cache, one download when stale)
+- Close, MA50/MA200 and above-MA flags are numpy arrays on the SPY trading
+  calendar, so a regime check or a benchmark return over a trade is a
+  searchsorted lookup instead of a reload + date mask per call
+- Every lookup also takes arrays of dates and answers a whole trade list at once
+
+Usage:
+    from benchmark import get_benchmark
+
+    spy = get_benchmark()
+    spy.regime(sig_date - timedelta(days=7), sig_date)        # above 200MA?
+    spy.period_return(df['entry_date'], df['exit_date'], pad_days=7)   # % per trade
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from data_utils import load_from_cache, save_to_cache, rate_limit
+
+SPY_CACHE_KEY = 'SPY_daily_full'
+MA_WINDOWS = (50, 200)
+
+
+def load_spy(period='15y', max_age_hours=24):
+    """SPY daily bars from the pickle cache, downloading when missing or stale."""
+    spy = load_from_cache(SPY_CACHE_KEY, max_age_hours=max_age_hours)
+    if spy is None:
+        import yfinance as yf
+        rate_limit()
+        spy = yf.download('SPY', period=period, interval='1d', progress=False)
+        if isinstance(spy.columns, pd.MultiIndex):
+            spy.columns = spy.columns.get_level_values(0)
+        if spy is not None and len(spy) > 0:
+            save_to_cache(SPY_CACHE_KEY, spy)
+    return spy
+
+
+def _as_ns(dates):
+    """Dates (scalar, list, Series, index) as int64 nanoseconds."""
+    if np.ndim(dates) == 0:
+        return np.int64(pd.Timestamp(dates).value)
+    return np.asarray(pd.to_datetime(np.asarray(dates)), dtype='M8[ns]').view(np.int64)
+
+
+class Benchmark:
+    """SPY series aligned to its trading calendar."""
+
+    def __init__(self, prices, ma_windows=MA_WINDOWS):
+        close = prices['Close']
+        if isinstance(close, pd.DataFrame):
+            close = close.iloc[:, 0]
+        self.dates = _as_ns(close.index)
+        self.close = close.to_numpy(dtype=np.float64)
+        self.ma = {w: close.rolling(w).mean().to_numpy() for w in ma_windows}
+        # NaN MA (warm-up) compares False, like the per-call versions did
+        self.above = {w: self.close > ma for w, ma in self.ma.items()}
+
+    def __len__(self):
+        return len(self.dates)
+
+    def index(self, dates, side='left'):
+        """Position of each date in the calendar (searchsorted)."""
+        return np.searchsorted(self.dates, _as_ns(dates), side=side)
+
+    def regime(self, start, end, window=200, default=True):
+        """
+        Was SPY above its MA on the first trading day in [start, end]?
+
+        Scalar or array dates; default when the window holds no bars.
+        """
+        if len(self) < window:
+            return default if np.ndim(start) == 0 else np.full(len(start), default)
+        above = self.above[window]
+        i = self.index(start, 'left')
+        ok = (i < len(self)) & (self.dates[np.minimum(i, len(self) - 1)] <= _as_ns(end))
+        out = np.where(ok, above[np.minimum(i, len(self) - 1)], default)
+        return bool(out) if np.ndim(out) == 0 else out
+
+    def period_return(self, start, end, pad_days=0, default=0.0):
+        """
+        % change of SPY from the first to the last bar in [start - pad, end + pad].
+
+        Scalar or array dates; default when the window holds fewer than 2 bars.
+        """
+        pad = timedelta(days=pad_days)
+        lo = pd.to_datetime(start) - pad
+        hi = pd.to_datetime(end) + pad
+        i = self.index(lo, 'left')
+        j = self.index(hi, 'right') - 1
+        ok = j > i
+        i = np.minimum(i, len(self) - 1)
+        c0, c1 = self.close[i], self.close[np.maximum(j, 0)]
+        out = np.where(ok, (c1 - c0) / c0 * 100, default)
+        return float(out) if np.ndim(out) == 0 else out
+
+
+_benchmark = None
+_loaded = False
+
+
+def get_benchmark():
+    """
+    The process-wide SPY benchmark (built on first use, None without data).
+
+    A failed load is remembered: SPY is not downloaded again on every call.
+    """
+    global _benchmark, _loaded
+    if not _loaded:
+        _loaded = True
+        try:
+            spy = load_spy()
+        except Exception as e:
+            print(f"  SPY benchmark unavailable: {e}")
+            spy = None
+        if spy is not None and len(spy) > 0:
+            _benchmark = Benchmark(spy)
+    return _benchmark
+
+
+if __name__ == '__main__':
+    spy = get_benchmark()
+    if spy is None:
+        print("No SPY data")
+    else:
+        now = datetime.now()
+        print(f"SPY: {len(spy)} bars, above 200MA now: {spy.regime(now - timedelta(days=7), now)}")
+        print(f"1y return: {spy.period_return(now - timedelta(days=365), now):.2f}%")
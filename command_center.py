@@ -14,6 +14,9 @@ import threading
 from datetime import datetime, timedelta
 from flask import Flask, render_template_string, jsonify, send_from_directory, request
 
+from scan_pipeline import run_full_scan
+from scan_stream import latest_scan_file, load_scan, read_records
+
 # ---------------------------------------------------------------------------
 # Paths
 # ---------------------------------------------------------------------------
@@ -119,7 +122,31 @@ def get_chart_files():
 
 
 def get_scan_results():
-    """Load the latest scan_results_*.txt file and parse it."""
+    """Latest scanner_v3 results: the JSONL stream, else the parsed text file."""
+    path = latest_scan_file(SCRIPT_DIR)
+    if path:
+        # Pattern setups only, as in the text report's sections
+        return [_scan_result(r) for r in load_scan(path)['results'] if r.get('patterns')]
+    return _parse_scan_text()
+
+
+def _scan_result(r):
+    """A scanner_v3 result record in the dashboard's shape."""
+    patterns = [p for p in r.get('patterns', []) if p.get('pattern')]
+    return {
+        'ticker': r['ticker'],
+        'score': r.get('score', 0),
+        'price': r.get('price'),
+        'patterns': [p['pattern'] for p in patterns],
+        'signals': r.get('signals', []),
+        'buy_points': sorted({round(p['buy_point'], 2) for p in patterns
+                              if p.get('buy_point') is not None}),
+        'rs_rating': r.get('rs_rating'),
+    }
+
+
+def _parse_scan_text():
+    """Parse the latest scan_results_*.txt (runs from before the JSONL output)."""
     txt_files = sorted(glob.glob(os.path.join(SCRIPT_DIR, 'scan_results_*.txt')), reverse=True)
     if not txt_files:
         return []
@@ -199,8 +226,13 @@ def run_scanner_bg(task_id, script_path, args=None):
             running_tasks[task_id]['finished'] = datetime.now().isoformat()
 
 
-def run_full_scan_bg():
-    """Run all scanners sequentially in background."""
+def run_full_scan_bg(force=False):
+    """
+    Run the full scan pipeline in background (independent scanners in parallel).
+
+    Scanners whose inputs haven't changed since their last run are reused
+    unless force is set.
+    """
     task_id = 'full_scan'
     with task_lock:
         running_tasks[task_id] = {
@@ -211,34 +243,28 @@ def run_full_scan_bg():
             'steps': [],
         }
 
-    scanners = [
-        ('Market Health', SCANNER_SCRIPTS.get('market_health')),
-        ('Money Scanner', SCANNER_SCRIPTS.get('money_scanner')),
-        ('Options Flow', SCANNER_SCRIPTS.get('options_flow')),
-        ('Dark Pool', SCANNER_SCRIPTS.get('dark_pool')),
-        ('Sector Rotation', SCANNER_SCRIPTS.get('sector_rotation')),
-        ('Earnings Calendar', SCANNER_SCRIPTS.get('earnings')),
-        ('Signal Matcher', SCANNER_SCRIPTS.get('signal_matcher')),
-    ]
-
-    for name, script in scanners:
-        if not script or not os.path.exists(script):
-            with task_lock:
-                running_tasks[task_id]['steps'].append(f'⚠️ {name}: script not found')
-            continue
-        try:
-            with task_lock:
-                running_tasks[task_id]['steps'].append(f'⏳ Running {name}...')
-            result = subprocess.run(
-                [sys.executable, script], capture_output=True, text=True,
-                timeout=300, cwd=SCRIPT_DIR
-            )
-            status_icon = '✅' if result.returncode == 0 else '❌'
-            with task_lock:
-                running_tasks[task_id]['steps'][-1] = f'{status_icon} {name} complete'
-        except Exception as e:
-            with task_lock:
-                running_tasks[task_id]['steps'][-1] = f'❌ {name}: {str(e)[:100]}'
+    step_index = {}
+
+    def on_event(event, stage, result):
+        with task_lock:
+            steps = running_tasks[task_id]['steps']
+            if event == 'start':
+                step_index[stage.name] = len(steps)
+                steps.append(f'⏳ Running {stage.label}...')
+            elif result.status == 'ok':
+                steps[step_index[stage.name]] = f'✅ {stage.label} complete ({result.seconds:.0f}s)'
+            elif result.status == 'skipped':
+                steps[step_index[stage.name]] = f'⏭️ {stage.label} unchanged (reused)'
+            elif result.status == 'partial':
+                steps[step_index[stage.name]] = f'⚠️ {stage.label} incomplete: {result.error[:100]}'
+            else:
+                steps[step_index[stage.name]] = f'❌ {stage.label}: {result.error[:100]}'
+
+    try:
+        run_full_scan(on_event=on_event, force=force)
+    except Exception as e:
+        with task_lock:
+            running_tasks[task_id]['error'] = str(e)[:200]
 
     with task_lock:
         running_tasks[task_id]['status'] = 'completed'
@@ -292,6 +318,23 @@ def api_data():
     })
 
 
+@app.route('/api/scan/stream')
+def api_scan_stream():
+    """
+    Records of the latest scanner_v3 JSONL after byte ?offset= (tail a
+    running scan: pass back the returned offset).
+    """
+    path = latest_scan_file(SCRIPT_DIR)
+    if not path:
+        return jsonify({'file': None, 'records': [], 'offset': 0})
+    offset = request.args.get('offset', 0, type=int)
+    file = os.path.basename(path)
+    if request.args.get('file', file) != file:
+        offset = 0      # a newer scan started: read it from the top
+    records, offset = read_records(path, offset)
+    return jsonify({'file': file, 'records': records, 'offset': offset})
+
+
 @app.route('/api/task/status')
 def api_task_status():
     """Check status of background tasks."""
@@ -304,7 +347,8 @@ def api_run_full_scan():
     with task_lock:
         if 'full_scan' in running_tasks and running_tasks['full_scan']['status'] == 'running':
             return jsonify({'error': 'Full scan already running'}), 409
-    t = threading.Thread(target=run_full_scan_bg, daemon=True)
+    force = request.args.get('force', '') in ('1', 'true')
+    t = threading.Thread(target=run_full_scan_bg, args=(force,), daemon=True)
     t.start()
     return jsonify({'status': 'started', 'task_id': 'full_scan'})
 
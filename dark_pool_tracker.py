@@ -10,11 +10,14 @@ from datetime import datetime, timedelta
 import json
 import sys
 import os
+from concurrent.futures import ThreadPoolExecutor
 from colorama import Fore, Style, init
+from scan_pipeline import in_context
 
 init(autoreset=True)
 
-OUTPUT_FILE = 'dark_pool_latest.json'
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+OUTPUT_FILE = os.path.join(SCRIPT_DIR, 'dark_pool_latest.json')
 
 DEFAULT_TICKERS = [
     'NVDA', 'AAPL', 'MSFT', 'GOOGL', 'META', 'AMZN', 'TSLA', 'AMD', 'AVGO', 'CRM',
@@ -31,7 +34,7 @@ def load_tickers(args):
     if args:
         return [t.upper() for t in args]
 
-    for path in ['money_scan_latest.json', '../completeinceptionmigrationeverything2026013101/money_scan_latest.json']:
+    for path in [os.path.join(SCRIPT_DIR, 'money_scan_latest.json'), '../completeinceptionmigrationeverything2026013101/money_scan_latest.json']:
         if os.path.exists(path):
             try:
                 with open(path) as f:
@@ -50,7 +53,7 @@ def load_tickers(args):
 def load_signal_tickers():
     """Load signal data for cross-reference."""
     signals = {}
-    for path in ['signals_latest.json', '../completeinceptionmigrationeverything2026013101/signals_latest.json']:
+    for path in [os.path.join(SCRIPT_DIR, 'signals_latest.json'), '../completeinceptionmigrationeverything2026013101/signals_latest.json']:
         if os.path.exists(path):
             try:
                 with open(path) as f:
@@ -190,8 +193,8 @@ def analyze_ticker(ticker):
         return None
 
 
-def run_scan(args=None):
-    """Run dark pool tracker scan."""
+def run_scan(args=None, workers=1):
+    """Run dark pool tracker scan (workers: tickers fetched concurrently)."""
     print(f"\n{Fore.CYAN}{'='*80}")
     print(f"{Fore.CYAN}{Style.BRIGHT}🕵️  DARK POOL TRACKER - Institutional Flow Analysis")
     print(f"{Fore.CYAN}   {datetime.now().strftime('%Y-%m-%d %H:%M')}")
@@ -205,12 +208,12 @@ def run_scan(args=None):
     print(f"\n{Fore.YELLOW}Analyzing {len(tickers)} stocks for institutional activity...{Style.RESET_ALL}\n")
 
     results = []
-    for i, ticker in enumerate(tickers):
-        sys.stdout.write(f"\r  {ticker}... ({i+1}/{len(tickers)})")
-        sys.stdout.flush()
-        r = analyze_ticker(ticker)
-        if r:
-            results.append(r)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for i, (ticker, r) in enumerate(zip(tickers, pool.map(in_context(analyze_ticker), tickers))):
+            sys.stdout.write(f"\r  {ticker}... ({i+1}/{len(tickers)})")
+            sys.stdout.flush()
+            if r:
+                results.append(r)
 
     sys.stdout.write(f"\r{' '*50}\r")
     sys.stdout.flush()
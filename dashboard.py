@@ -10,6 +10,8 @@ import glob
 import os
 from datetime import datetime
 
+from scan_stream import latest_scan_file, load_scan
+
 app = Flask(__name__)
 DATA_DIR = os.path.dirname(os.path.abspath(__file__))
 
@@ -308,7 +310,7 @@ function applyFilters() {
 
 
 def load_scan_results():
-    """Load the most recent scan results from JSON or text files."""
+    """Load the most recent scan results from JSONL, JSON or text files."""
     results = {
         'market': {
             'sp500_trend': 'Unknown',
@@ -327,6 +329,14 @@ def load_scan_results():
         'total_results': 0
     }
 
+    # scanner_v3 JSONL stream: one read, no text parsing
+    stream_file = latest_scan_file(DATA_DIR)
+    if stream_file:
+        try:
+            return _parse_stream_results(load_scan(stream_file))
+        except Exception:
+            pass
+
     # Try JSON first
     json_files = sorted(glob.glob(os.path.join(DATA_DIR, 'scan_results*.json')), reverse=True)
     if json_files:
@@ -519,6 +529,93 @@ def _parse_json_results(data):
     return result
 
 
+def _market_signal(recommendation):
+    """(signal, recommendation) shown for a scanner_v3 market recommendation."""
+    rl = recommendation.lower()
+    if '⚠️ caution' in rl:
+        return 'Caution', 'Reduce position sizes'
+    if 'green light' in rl:
+        return 'Green Light', 'Full position sizes'
+    if 'red light' in rl:
+        return 'Red Light', 'Avoid new positions'
+    return 'Unknown', ''
+
+
+def _stream_stock(r):
+    """A scanner_v3 result record in the template's stock format."""
+    fundamentals = r.get('fundamentals') or {}
+    patterns = [p['pattern'] for p in r.get('patterns', []) if p.get('pattern')]
+    buy_points = [p['buy_point'] for p in r.get('patterns', []) if p.get('buy_point') is not None]
+    eps, roe, vol = fundamentals.get('eps_growth'), fundamentals.get('roe'), r.get('volume_ratio')
+    return {
+        'ticker': r['ticker'],
+        'score': r.get('score', 0),
+        'price': r.get('price') or 0.0,
+        'buy_point': round(max(buy_points), 2) if buy_points else None,
+        'rs_rating': str(r.get('rs_rating', 0)),
+        'eps_growth': f"{eps:.0f}%" if eps else '--',
+        'roe': f"{roe:.1f}%" if roe else '--',
+        'volume_ratio': f"{vol:.1f}x" if vol else '--',
+        'patterns': [{'name': p, 'cls': _classify_pattern(p)[0]} for p in patterns],
+        'pattern_keys': [k for k in (_classify_pattern(p)[1] for p in patterns) if k],
+        'patterns_raw': patterns,
+        'sector': '',
+        'earnings_warning': bool(fundamentals.get('earnings_warning')),
+    }
+
+
+def _parse_stream_results(scan):
+    """Results of a scan_stream.load_scan() (partial while the scan runs)."""
+    result = {
+        'market': {
+            'sp500_trend': 'Unknown', 'sp500_detail': '', 'vix_value': '--',
+            'vix_level': 'Unknown', 'dist_days': 0, 'signal': 'Unknown', 'recommendation': ''
+        },
+        'breakouts': [], 'bases': [], 'pivots': [],
+        'sectors': [], 'total_stocks': 0, 'total_results': 0
+    }
+    summary = scan['summary'] or {}
+    start = scan['start'] or {}
+    result['total_stocks'] = summary.get('universe_size', start.get('universe_size', 0))
+
+    mt = summary.get('market') or {}
+    if 'sp500_price' in mt:
+        result['market']['sp500_detail'] = f"S&P 500: ${mt['sp500_price']:.2f}"
+        result['market']['sp500_trend'] = ('Uptrend' if mt.get('above_50ma') else
+                                           'Above 21-MA' if mt.get('above_21ma') else 'Unknown')
+        result['market']['dist_days'] = mt.get('distribution_days', 0)
+        result['market']['vix_value'] = f"{mt.get('vix', 0):.2f}"
+        result['market']['vix_level'] = mt.get('vix_signal', 'Unknown')
+    if mt:
+        signal, recommendation = _market_signal(mt.get('recommendation', ''))
+        result['market']['signal'] = signal
+        result['market']['recommendation'] = recommendation
+
+    stocks = [_stream_stock(r) for r in scan['results']]
+    if summary:
+        # The scanner's own segments (each stock in one section)
+        by_ticker = {s['ticker']: s for s in stocks}
+        segments = summary.get('segments', {})
+        for section, key in (('breakouts', 'breakouts'), ('bases', 'bases_forming'),
+                             ('pivots', 'pocket_pivots')):
+            result[section] = [by_ticker[t] for t in segments.get(key, []) if t in by_ticker]
+    else:
+        for stock in stocks:
+            if not stock['patterns_raw']:
+                continue
+            result[{'breakout': 'breakouts', 'base': 'bases',
+                    'pivot': 'pivots'}[_categorize_stock(stock)]].append(stock)
+
+    result['total_results'] = len(result['breakouts']) + len(result['bases']) + len(result['pivots'])
+    result['partial'] = not scan['complete']
+
+    # Sort by score descending
+    for key in ['breakouts', 'bases', 'pivots']:
+        result[key].sort(key=lambda x: x['score'], reverse=True)
+
+    return result
+
+
 def _parse_text_results(text):
     """Parse text-based scan results from scanner_v3.py output."""
     import re
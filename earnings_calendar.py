@@ -10,11 +10,14 @@ from datetime import datetime, timedelta
 import json
 import sys
 import os
+from concurrent.futures import ThreadPoolExecutor
 from colorama import Fore, Style, init
+from scan_pipeline import in_context
 
 init(autoreset=True)
 
-OUTPUT_FILE = 'earnings_calendar_latest.json'
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+OUTPUT_FILE = os.path.join(SCRIPT_DIR, 'earnings_calendar_latest.json')
 
 # Default watchlist if no JSON/args
 DEFAULT_TICKERS = [
@@ -34,7 +37,7 @@ def load_tickers(args):
         return [t.upper() for t in args]
 
     # Try money_scan_latest.json
-    for path in ['money_scan_latest.json', '../completeinceptionmigrationeverything2026013101/money_scan_latest.json']:
+    for path in [os.path.join(SCRIPT_DIR, 'money_scan_latest.json'), '../completeinceptionmigrationeverything2026013101/money_scan_latest.json']:
         if os.path.exists(path):
             try:
                 with open(path) as f:
@@ -53,7 +56,7 @@ def load_tickers(args):
 def load_signal_tickers():
     """Load tickers from signals_latest.json for cross-reference."""
     signal_tickers = set()
-    for path in ['signals_latest.json', '../completeinceptionmigrationeverything2026013101/signals_latest.json']:
+    for path in [os.path.join(SCRIPT_DIR, 'signals_latest.json'), '../completeinceptionmigrationeverything2026013101/signals_latest.json']:
         if os.path.exists(path):
             try:
                 with open(path) as f:
@@ -180,8 +183,8 @@ def analyze_earnings(ticker):
         }
 
 
-def run_scan(args=None):
-    """Run earnings calendar scan."""
+def run_scan(args=None, workers=1):
+    """Run earnings calendar scan (workers: tickers fetched concurrently)."""
     print(f"\n{Fore.CYAN}{'='*75}")
     print(f"{Fore.CYAN}{Style.BRIGHT}📅 EARNINGS CALENDAR - Proximity Checker")
     print(f"{Fore.CYAN}   {datetime.now().strftime('%Y-%m-%d %H:%M')}")
@@ -195,12 +198,12 @@ def run_scan(args=None):
     print(f"\n{Fore.YELLOW}Checking earnings for {len(tickers)} stocks...{Style.RESET_ALL}\n")
 
     results = []
-    for i, ticker in enumerate(tickers):
-        sys.stdout.write(f"\r  {ticker}... ({i+1}/{len(tickers)})")
-        sys.stdout.flush()
-        r = analyze_earnings(ticker)
-        if r:
-            results.append(r)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for i, (ticker, r) in enumerate(zip(tickers, pool.map(in_context(analyze_earnings), tickers))):
+            sys.stdout.write(f"\r  {ticker}... ({i+1}/{len(tickers)})")
+            sys.stdout.flush()
+            if r:
+                results.append(r)
 
     sys.stdout.write(f"\r{' '*50}\r")
     sys.stdout.flush()
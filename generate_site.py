@@ -3,6 +3,11 @@
 Generate static index.html for GitHub Pages
 Runs scanner on S&P 500 stocks and updates the site
 Now includes Cup & Handle pattern detection
+
+Daily and weekly bars come from two batch downloads of the universe
+(scan_prefilter); PREFILTER_GATES drop tickers that are neither in an
+uptrend nor in the 200-WMA zone before the cup / squeeze analysis.
+Run with --no-prefilter to list every ticker.
 """
 import os
 import sys
@@ -13,8 +18,17 @@ import yfinance as yf
 import pandas as pd
 import numpy as np
 
+from scan_prefilter import prefilter, min_history, above_ma, near_ma, any_of
+
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 
+# Site candidates: 200+ days of history (scan_stock's minimum), and above
+# the 200-day MA or within 10% of the 200-week MA (the 200-WMA zone)
+PREFILTER_GATES = (
+    min_history(200),
+    any_of(above_ma(200), near_ma(200, 0.10, '1wk')),
+)
+
 # Full S&P 500 (alphabetical)
 UNIVERSE = [
     'A', 'AAL', 'AAPL', 'ABBV', 'ABNB', 'ABT', 'ACGL', 'ACN', 'ADBE', 'ADI',
@@ -277,11 +291,13 @@ def detect_cup_and_handle(close, volume):
         return False, 0, 0, 0
 
 
-def scan_stock(ticker):
-    """Scan a single stock and return data."""
+def scan_stock(ticker, screen=None):
+    """Scan a single stock and return data (screen: Prefilter whose bars to use)."""
     try:
         # Daily data for price/volume analysis
-        df = yf.download(ticker, period='2y', progress=False)
+        df = screen.frame(ticker) if screen else None
+        if df is None:
+            df = yf.download(ticker, period='2y', progress=False)
         if isinstance(df.columns, pd.MultiIndex):
             df.columns = df.columns.get_level_values(0)
         if len(df) < 200:
@@ -292,7 +308,9 @@ def scan_stock(ticker):
         price = float(close.iloc[-1])
         
         # 200-WEEK SMA (need 5 years of weekly data)
-        df_weekly = yf.download(ticker, period='5y', interval='1wk', progress=False)
+        df_weekly = screen.frame(ticker, '1wk') if screen else None
+        if df_weekly is None:
+            df_weekly = yf.download(ticker, period='5y', interval='1wk', progress=False)
         if isinstance(df_weekly.columns, pd.MultiIndex):
             df_weekly.columns = df_weekly.columns.get_level_values(0)
         
@@ -992,20 +1010,27 @@ def generate_html(results):
     return html
 
 
-def main():
-    """Main entry point."""
+def main(gates=PREFILTER_GATES):
+    """Main entry point (gates: prefilter, empty = scan every ticker)."""
     print(f"🔍 Scanning {len(UNIVERSE)} S&P 500 stocks...")
     print("=" * 50)
     
+    universe, screen = UNIVERSE, None
+    if gates:
+        # Weekly bars are batch-downloaded too: scan_stock needs them for every survivor
+        screen = prefilter(UNIVERSE, gates, intervals=('1d', '1wk'))
+        print(f"  Prefilter: {screen.report()}")
+        universe = screen.passed
+    
     results = []
-    for i, ticker in enumerate(UNIVERSE):
-        result = scan_stock(ticker)
+    for i, ticker in enumerate(universe):
+        result = scan_stock(ticker, screen)
         if result:
             results.append(result)
         
         # Progress indicator
         if (i + 1) % 50 == 0:
-            print(f"  Scanned {i + 1}/{len(UNIVERSE)} stocks...")
+            print(f"  Scanned {i + 1}/{len(universe)} stocks...")
     
     print(f"\n✅ Scanned {len(results)} stocks successfully")
     
@@ -1062,4 +1087,4 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
+    main(gates=() if '--no-prefilter' in sys.argv else PREFILTER_GATES)
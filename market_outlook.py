@@ -25,6 +25,8 @@ import yfinance as yf
 import pandas as pd
 import numpy as np
 
+import strat_engine
+
 warnings.filterwarnings('ignore')
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -263,100 +265,41 @@ def calculate_strat_scenario(open_price: float, high: float, low: float, close:
         return '2D'  # Downtrend
 
 
+def _last_scenario(df: Optional[pd.DataFrame]) -> int:
+    """Strat code of the latest bar (strat_engine.NO_BAR when unavailable)."""
+    if df is None or len(df) < 2:
+        return strat_engine.NO_BAR
+    try:
+        return int(strat_engine.frame_codes(df.iloc[-2:])[-1])
+    except Exception:
+        return strat_engine.NO_BAR
+
+
 def get_timeframe_scenarios(df_daily: pd.DataFrame, df_weekly: pd.DataFrame, 
                             df_monthly: Optional[pd.DataFrame] = None) -> Dict:
     """Get Strat scenarios for all timeframes."""
-    result = {
-        'daily': None,
-        'weekly': None,
-        'monthly': None,
-        'continuity_score': 0,
-        'continuity_direction': 'MIXED',
-        'full_continuity': False,
-    }
-    
-    # Daily scenario
-    if len(df_daily) >= 2:
-        try:
-            curr = df_daily.iloc[-1]
-            prev = df_daily.iloc[-2]
-            result['daily'] = calculate_strat_scenario(
-                float(curr['Open']), float(curr['High']), float(curr['Low']), float(curr['Close']),
-                float(prev['High']), float(prev['Low'])
-            )
-        except Exception:
-            pass
-    
-    # Weekly scenario
-    if len(df_weekly) >= 2:
-        try:
-            curr = df_weekly.iloc[-1]
-            prev = df_weekly.iloc[-2]
-            result['weekly'] = calculate_strat_scenario(
-                float(curr['Open']), float(curr['High']), float(curr['Low']), float(curr['Close']),
-                float(prev['High']), float(prev['Low'])
-            )
-        except Exception:
-            pass
+    daily = _last_scenario(df_daily)
+    weekly = _last_scenario(df_weekly)
     
     # Monthly scenario (resample from daily if not provided)
-    if df_monthly is not None and len(df_monthly) >= 2:
-        try:
-            curr = df_monthly.iloc[-1]
-            prev = df_monthly.iloc[-2]
-            result['monthly'] = calculate_strat_scenario(
-                float(curr['Open']), float(curr['High']), float(curr['Low']), float(curr['Close']),
-                float(prev['High']), float(prev['Low'])
-            )
-        except Exception:
-            pass
-    elif len(df_daily) >= 44:  # Need at least 2 months of daily data
+    if (df_monthly is None or len(df_monthly) < 2) and len(df_daily) >= 44:  # Need at least 2 months of daily data
         try:
-            monthly = df_daily.resample('ME').agg({
+            df_monthly = df_daily.resample('ME').agg({
                 'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Volume': 'sum'
             }).dropna()
-            if len(monthly) >= 2:
-                curr = monthly.iloc[-1]
-                prev = monthly.iloc[-2]
-                result['monthly'] = calculate_strat_scenario(
-                    float(curr['Open']), float(curr['High']), float(curr['Low']), float(curr['Close']),
-                    float(prev['High']), float(prev['Low'])
-                )
         except Exception:
-            pass
+            df_monthly = None
+    monthly = _last_scenario(df_monthly)
     
-    # Calculate continuity
-    scenarios = [result['monthly'], result['weekly'], result['daily']]
-    valid_scenarios = [s for s in scenarios if s is not None]
-    
-    if len(valid_scenarios) >= 2:
-        bullish = sum(1 for s in valid_scenarios if s in ('2U',))
-        bearish = sum(1 for s in valid_scenarios if s in ('2D',))
-        inside = sum(1 for s in valid_scenarios if s == '1')
-        outside = sum(1 for s in valid_scenarios if s == '3')
-        
-        if bullish == len(valid_scenarios):
-            result['continuity_score'] = 3
-            result['continuity_direction'] = 'BULLISH'
-            result['full_continuity'] = True
-        elif bearish == len(valid_scenarios):
-            result['continuity_score'] = 3
-            result['continuity_direction'] = 'BEARISH'
-            result['full_continuity'] = True
-        elif bullish >= 2:
-            result['continuity_score'] = 2
-            result['continuity_direction'] = 'BULLISH'
-        elif bearish >= 2:
-            result['continuity_score'] = 2
-            result['continuity_direction'] = 'BEARISH'
-        elif inside >= 2:
-            result['continuity_score'] = 1
-            result['continuity_direction'] = 'CONSOLIDATING'
-        else:
-            result['continuity_score'] = 1
-            result['continuity_direction'] = 'MIXED'
-    
-    return result
+    score, direction, full = strat_engine.continuity(monthly, weekly, daily)
+    return {
+        'daily': strat_engine.labels(daily),
+        'weekly': strat_engine.labels(weekly),
+        'monthly': strat_engine.labels(monthly),
+        'continuity_score': score,
+        'continuity_direction': direction,
+        'full_continuity': full,
+    }
 
 
 # ==============================================================================
@@ -2,17 +2,26 @@
 """
 Money Scanner - Ranks top 10 stocks by profit probability (0-100)
 Uses CANSLIM methodology from scanner_v3.py
+Universe RS ratings come from the nightly rs_table (when built)
 """
 import yfinance as yf
 import pandas as pd
 import numpy as np
 from datetime import datetime
 import json
+import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from colorama import Fore, Style, init
 
+from rs_table import get_rs_table
+from scan_pipeline import in_context
+
 init(autoreset=True)
 
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+OUTPUT_FILE = os.path.join(SCRIPT_DIR, 'money_scan_latest.json')
+
 # Stock universe - Top 200 S&P 500 by market cap weight
 UNIVERSE = [
     # Mag 7 + Mega Caps
@@ -108,10 +117,13 @@ def score_stock(ticker):
         elif up_days >= 10:
             score += 4
         
+        table = get_rs_table()
+        
         return {
             'ticker': ticker,
             'score': min(100, int(score)),
             'price': float(price),
+            'rs_rating': table.rating(ticker) if table is not None else None,
             'perf_3m': perf_3m * 100,
             'vol_ratio': recent_vol / avg_vol if avg_vol > 0 else 0,
             'from_high': pct_from_high * 100
@@ -119,8 +131,8 @@ def score_stock(ticker):
     except:
         return None
 
-def run_scan():
-    """Run money scanner on universe."""
+def run_scan(workers=1):
+    """Run money scanner on universe (workers: concurrent downloads)."""
     print(f"\n{Fore.CYAN}{'='*60}")
     print(f"{Fore.CYAN}{Style.BRIGHT}💰 MONEY SCANNER - Profit Probability Rankings")
     print(f"{Fore.CYAN}   {datetime.now().strftime('%Y-%m-%d %H:%M')}")
@@ -128,12 +140,12 @@ def run_scan():
     print(f"{Fore.YELLOW}Scanning {len(UNIVERSE)} stocks...{Style.RESET_ALL}\n")
     
     results = []
-    for i, ticker in enumerate(UNIVERSE):
-        sys.stdout.write(f"\r  {ticker}... ({i+1}/{len(UNIVERSE)})")
-        sys.stdout.flush()
-        r = score_stock(ticker)
-        if r:
-            results.append(r)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for i, (ticker, r) in enumerate(zip(UNIVERSE, pool.map(in_context(score_stock), UNIVERSE))):
+            sys.stdout.write(f"\r  {ticker}... ({i+1}/{len(UNIVERSE)})")
+            sys.stdout.flush()
+            if r:
+                results.append(r)
     
     results.sort(key=lambda x: x['score'], reverse=True)
     top10 = results[:10]
@@ -141,7 +153,7 @@ def run_scan():
     print(f"\r{' '*50}\r")
     print(f"{Fore.WHITE}{Style.BRIGHT}TOP 10 STOCKS BY PROFIT PROBABILITY{Style.RESET_ALL}")
     print(f"{'─'*60}")
-    print(f"{'Rank':<6}{'Ticker':<8}{'Score':<10}{'Price':>10}{'3M %':>8}{'Vol':>8}{'52W':>8}")
+    print(f"{'Rank':<6}{'Ticker':<8}{'Score':<10}{'Price':>10}{'3M %':>8}{'Vol':>8}{'52W':>8}{'RS':>5}")
     print(f"{'─'*60}")
     
     for i, s in enumerate(top10):
@@ -158,14 +170,14 @@ def run_scan():
         bar = '█' * (sc // 10) + '░' * (10 - sc // 10)
         perf_clr = Fore.GREEN if s['perf_3m'] > 0 else Fore.RED
         
-        print(f"{rank:<6}{Fore.CYAN}{s['ticker']:<8}{Style.RESET_ALL}{clr}{sc:>3}/100{Style.RESET_ALL}  {bar} ${s['price']:>8.2f} {perf_clr}{s['perf_3m']:>+6.1f}%{Style.RESET_ALL} {s['vol_ratio']:>5.1f}x {s['from_high']:>5.1f}%")
+        print(f"{rank:<6}{Fore.CYAN}{s['ticker']:<8}{Style.RESET_ALL}{clr}{sc:>3}/100{Style.RESET_ALL}  {bar} ${s['price']:>8.2f} {perf_clr}{s['perf_3m']:>+6.1f}%{Style.RESET_ALL} {s['vol_ratio']:>5.1f}x {s['from_high']:>5.1f}% {s['rs_rating'] if s['rs_rating'] is not None else '-':>4}")
     
     print(f"{'─'*60}")
     print(f"\n  {Fore.GREEN}80+{Style.RESET_ALL} = High probability  {Fore.YELLOW}60-79{Style.RESET_ALL} = Watch  {Fore.RED}<60{Style.RESET_ALL} = Wait\n")
     
     # Save results
     output = {'timestamp': datetime.now().isoformat(), 'results': results}
-    with open('money_scan_latest.json', 'w') as f:
+    with open(OUTPUT_FILE, 'w') as f:
         json.dump(output, f, indent=2)
     print(f"  {Fore.GREEN}✓{Style.RESET_ALL} Saved to money_scan_latest.json\n")
     
@@ -2,14 +2,15 @@
 """
 Morning Briefing - One command, complete pre-market intelligence
 Runs all scans, matches signals, generates actionable summary
+Scans whose inputs haven't changed since the last run are reused (scan_pipeline)
 """
 
-import subprocess
 import json
 import os
-import sys
 from datetime import datetime
 
+from scan_pipeline import run_full_scan
+
 # Colors
 G = '\033[92m'  # Green
 R = '\033[91m'  # Red
@@ -23,29 +24,24 @@ RESET = '\033[0m'
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 
 
-def run_scan(script, label):
-    """Run a scanner script and return success status"""
-    print(f"  {D}Running {label}...{RESET}", end='', flush=True)
-    try:
-        result = subprocess.run(
-            [sys.executable, os.path.join(SCRIPT_DIR, script)],
-            capture_output=True, text=True, timeout=300,
-            cwd=SCRIPT_DIR
-        )
-        if result.returncode == 0:
-            print(f" {G}✓{RESET}")
-            return True
+def run_scans():
+    """Run the money / options flow scans and the signal matcher; {label: problem} of those that didn't succeed"""
+    def report(event, stage, result):
+        if event == 'start':
+            return
+        if result.status == 'ok':
+            print(f"  {D}{stage.label}...{RESET} {G}✓{RESET} {D}({result.seconds:.0f}s){RESET}", flush=True)
+        elif result.status == 'skipped':
+            print(f"  {D}{stage.label}... unchanged{RESET} {G}✓{RESET}", flush=True)
+        elif result.status == 'partial':
+            print(f"  {D}{stage.label}...{RESET} {Y}⚠ {result.error[:200]}{RESET}", flush=True)
         else:
-            print(f" {R}✗{RESET}")
-            if result.stderr:
-                print(f"    {D}{result.stderr[:200]}{RESET}")
-            return False
-    except subprocess.TimeoutExpired:
-        print(f" {Y}timeout{RESET}")
-        return False
-    except Exception as e:
-        print(f" {R}error: {e}{RESET}")
-        return False
+            color = Y if result.status == 'timeout' else R
+            print(f"  {D}{stage.label}...{RESET} {color}✗ {result.error[:200]}{RESET}", flush=True)
+
+    results = run_full_scan(only=('signals',), on_event=report)
+    return {name: f"{r.status}: {r.error}" if r.error else r.status
+            for name, r in results.items() if r.status not in ('ok', 'skipped')}
 
 
 def load_json(filename):
@@ -77,9 +73,10 @@ def main():
 
     # ── Step 1: Run all scans ──
     print(f"{B}━━━ RUNNING SCANS ━━━{RESET}")
-    scan_ok = run_scan('money_scanner.py', 'Money Scanner (Top 10 stocks)')
-    flow_ok = run_scan('options_flow_scanner.py', 'Options Flow Scanner')
-    match_ok = run_scan('signal_matcher.py', 'Signal Matcher')
+    scan_problems = run_scans()
+    if scan_problems:
+        print(f"\n  {Y}⚠️  Scans incomplete ({', '.join(scan_problems)}): "
+              f"the sections below may show older or missing data{RESET}")
 
     print()
 
@@ -288,6 +285,7 @@ def main():
         'hot_signals': signals.get('hot', []) if signals else [],
         'strong_signals': signals.get('strong', []) if signals else [],
         'top_stocks': money[:5] if money and isinstance(money, list) else [],
+        'scan_problems': scan_problems,
     }
     brief_file = os.path.join(SCRIPT_DIR, f'briefing_{timestamp}.json')
     with open(brief_file, 'w') as f:
@@ -4,9 +4,12 @@ Real-Time Options Flow Scanner
 Detects unusual options activity and smart money positioning
 """
 import json
+import os
 import yfinance as yf
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from colorama import Fore, Style, init
+from scan_pipeline import in_context
 
 init(autoreset=True)
 
@@ -39,7 +42,7 @@ UNIVERSE = [
     'CVNA', 'CAH', 'VRT', 'NBIS', 'MCK', 'GEV',
 ]
 
-FLOW_FILE = 'options_flow_latest.json'
+FLOW_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'options_flow_latest.json')
 
 def analyze_options_flow(ticker):
     """Analyze unusual options activity."""
@@ -230,8 +233,8 @@ def analyze_options_flow(ticker):
     except Exception as e:
         return None
 
-def scan_all():
-    """Scan entire universe."""
+def scan_all(workers=1):
+    """Scan entire universe (workers: tickers fetched concurrently)."""
     print(f"\n{Fore.CYAN}{'='*70}")
     print(f"{Fore.CYAN}{Style.BRIGHT}⚡ OPTIONS FLOW SCANNER")
     print(f"{Fore.CYAN}   {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
@@ -241,11 +244,11 @@ def scan_all():
     
     results = []
     
-    for ticker in UNIVERSE:
-        flow = analyze_options_flow(ticker)
-        if flow and flow['signals']:
-            results.append(flow)
-            print(f"{Fore.GREEN}✓{Style.RESET_ALL} {ticker:<6} {flow['bias']:<10} {len(flow['signals'])} signals")
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for ticker, flow in zip(UNIVERSE, pool.map(in_context(analyze_options_flow), UNIVERSE)):
+            if flow and flow['signals']:
+                results.append(flow)
+                print(f"{Fore.GREEN}✓{Style.RESET_ALL} {ticker:<6} {flow['bias']:<10} {len(flow['signals'])} signals")
     
     # Sort by top signal score
     results.sort(key=lambda x: x['signals'][0]['score'], reverse=True)
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+Results Store - every backtest run, its params, trades and equity in SQLite
+
+- runs:     one row per run (script, label, period, created, params/stats JSON)
+- run_params / run_stats: one row per numeric param / stat, indexed by
+  (key, value), so "all runs with stop_loss = 0.10 sorted by PF" is a query
+- trades:   one row per trade, indexed on ticker, entry date and run
+- trade_patterns: one row per (trade, pattern), so combo signals like
+  "Breakout,Cup w/ Handle" are found by either pattern
+- equity:   daily equity curve per run
+
+Replaces the per-run JSON/CSV dumps; query with pandas instead of parsing files.
+
+Usage:
+    from results_store import ResultsStore
+
+    store = ResultsStore()
+    run_id = store.add_run('backtest_master', params={'stop_loss': 0.10}, stats=st, trades=trades)
+
+    store.trades(pattern='Cup w/ Handle', start='2022-01-01', end='2023-01-01', losing=True)
+    store.runs('backtest_master', sort='profit_factor')
+
+    python3 results_store.py runs [script]
+    python3 results_store.py trades --pattern "Cup w/ Handle" --year 2022 --losing
+"""
+import argparse
+import json
+import os
+import sqlite3
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+RESULTS_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backtest_results.db')
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS runs (
+        run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        script TEXT NOT NULL,
+        label TEXT,
+        created TEXT NOT NULL,
+        start_date TEXT,
+        end_date TEXT,
+        params TEXT,
+        stats TEXT
+    );
+    CREATE TABLE IF NOT EXISTS run_params (
+        run_id INTEGER NOT NULL,
+        key TEXT NOT NULL,
+        value REAL,
+        text TEXT
+    );
+    CREATE TABLE IF NOT EXISTS run_stats (
+        run_id INTEGER NOT NULL,
+        key TEXT NOT NULL,
+        value REAL
+    );
+    CREATE TABLE IF NOT EXISTS trades (
+        trade_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        run_id INTEGER NOT NULL,
+        ticker TEXT,
+        patterns TEXT,
+        entry_date TEXT,
+        exit_date TEXT,
+        entry_price REAL,
+        exit_price REAL,
+        ret REAL,
+        hold_days REAL,
+        exit_reason TEXT,
+        extra TEXT
+    );
+    CREATE TABLE IF NOT EXISTS trade_patterns (
+        trade_id INTEGER NOT NULL,
+        pattern TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS equity (
+        run_id INTEGER NOT NULL,
+        date TEXT NOT NULL,
+        equity REAL,
+        PRIMARY KEY (run_id, date)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idx_runs_script ON runs(script, created);
+    CREATE INDEX IF NOT EXISTS idx_params_key ON run_params(key, value);
+    CREATE INDEX IF NOT EXISTS idx_params_run ON run_params(run_id);
+    CREATE INDEX IF NOT EXISTS idx_stats_key ON run_stats(key, value);
+    CREATE INDEX IF NOT EXISTS idx_stats_run ON run_stats(run_id);
+    CREATE INDEX IF NOT EXISTS idx_trades_run ON trades(run_id);
+    CREATE INDEX IF NOT EXISTS idx_trades_ticker ON trades(ticker, entry_date);
+    CREATE INDEX IF NOT EXISTS idx_trades_date ON trades(entry_date);
+    CREATE INDEX IF NOT EXISTS idx_patterns ON trade_patterns(pattern, trade_id);
+'''
+
+# Column names the backtest scripts use for the same trade fields
+RETURN_COLUMNS = ('ret', 'return', 'return_pct', 'pct_return', 'pnl_pct')
+FRACTION_COLUMNS = ('ret', 'return')
+PATTERN_COLUMNS = ('patterns', 'pattern_str', 'pattern')
+ENTRY_DATE_COLUMNS = ('entry_date', 'date')
+CORE_COLUMNS = {'ticker', 'entry_price', 'exit_date', 'exit_price', 'hold_days', 'exit_reason'}
+
+
+def _plain(v):
+    """JSON/SQLite friendly scalar."""
+    if isinstance(v, (np.integer,)):
+        return int(v)
+    if isinstance(v, (np.floating,)):
+        return None if np.isnan(v) else float(v)
+    if isinstance(v, (pd.Timestamp, datetime)):
+        return v.strftime('%Y-%m-%d')
+    if isinstance(v, np.bool_):
+        return bool(v)
+    return v
+
+
+def _date(v):
+    if v is None or (isinstance(v, float) and np.isnan(v)) or v is pd.NaT:
+        return None
+    if isinstance(v, str) and len(v) == 10:
+        return v
+    if isinstance(v, (pd.Timestamp, datetime)):
+        return v.strftime('%Y-%m-%d')
+    return pd.Timestamp(v).strftime('%Y-%m-%d')
+
+
+def _first(row, names):
+    for name in names:
+        if name in row and row[name] is not None:
+            return name, row[name]
+    return None, None
+
+
+def _pattern_list(v):
+    if v is None:
+        return []
+    if isinstance(v, (list, tuple)):
+        return [str(p) for p in v]
+    return [p.strip() for p in str(v).split(',') if p.strip()]
+
+
+class ResultsStore:
+    """SQLite store for backtest runs (one file, safe to open from any script)."""
+
+    def __init__(self, path=RESULTS_DB):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    # ── Writing ─────────────────────────────────────────
+
+    def add_run(self, script, params=None, stats=None, trades=None, equity=None,
+                label=None, start=None, end=None, pct=True):
+        """
+        Record one run. Returns its run_id.
+
+        Args:
+            script: name of the backtest script
+            params: {name: value} run parameters
+            stats: {name: value} summary metrics
+            trades: list of trade dicts or a DataFrame; fields are matched by
+                the names the scripts already use (return_pct, pct_return,
+                patterns, pattern, entry_date/date, ...). Unknown fields are
+                kept as JSON in trades.extra
+            equity: pd.Series or {date: value} equity curve
+            pct: returns in return_pct-style columns are percentages
+                ('ret' / 'return' are always fractions)
+        """
+        params = {k: _plain(v) for k, v in (params or {}).items()}
+        stats = {k: _plain(v) for k, v in (stats or {}).items()}
+        with self.conn:
+            cur = self.conn.execute(
+                'INSERT INTO runs (script, label, created, start_date, end_date, params, stats) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (script, label, datetime.now().isoformat(timespec='seconds'), _date(start), _date(end),
+                 json.dumps(params, default=str), json.dumps(stats, default=str)))
+            run_id = cur.lastrowid
+            self.conn.executemany(
+                'INSERT INTO run_params (run_id, key, value, text) VALUES (?, ?, ?, ?)',
+                [(run_id, k, v if isinstance(v, (int, float)) else None,
+                  None if isinstance(v, (int, float)) else v if isinstance(v, str) else json.dumps(v, default=str))
+                 for k, v in params.items()])
+            self.conn.executemany(
+                'INSERT INTO run_stats (run_id, key, value) VALUES (?, ?, ?)',
+                [(run_id, k, v) for k, v in stats.items() if isinstance(v, (int, float))])
+            if trades is not None:
+                self._add_trades(run_id, trades, pct)
+            if equity is not None:
+                items = equity.items() if hasattr(equity, 'items') else equity
+                self.conn.executemany(
+                    'INSERT OR REPLACE INTO equity (run_id, date, equity) VALUES (?, ?, ?)',
+                    [(run_id, _date(d), _plain(v)) for d, v in items])
+        return run_id
+
+    def _add_trades(self, run_id, trades, pct):
+        if isinstance(trades, pd.DataFrame):
+            trades = trades.to_dict('records')
+        # Explicit ids let trades and their patterns go in as two bulk inserts
+        next_id = self.conn.execute('SELECT COALESCE(MAX(trade_id), 0) FROM trades').fetchone()[0] + 1
+        rows, pattern_rows = [], []
+        for trade_id, t in enumerate(trades, start=next_id):
+            ret_col, ret = _first(t, RETURN_COLUMNS)
+            ret = _plain(ret)
+            if ret is not None and ret_col not in FRACTION_COLUMNS and pct:
+                ret = ret / 100
+            pat_col, pats = _first(t, PATTERN_COLUMNS)
+            pats = _pattern_list(pats)
+            date_col, entry = _first(t, ENTRY_DATE_COLUMNS)
+            used = CORE_COLUMNS | {ret_col, pat_col, date_col}
+            extra = {k: _plain(v) for k, v in t.items() if k not in used}
+            rows.append((trade_id, run_id, t.get('ticker'), ','.join(pats) or None, _date(entry),
+                         _date(t.get('exit_date')), _plain(t.get('entry_price')), _plain(t.get('exit_price')),
+                         ret, _plain(t.get('hold_days')), t.get('exit_reason'),
+                         json.dumps(extra, default=str) if extra else None))
+            pattern_rows.extend((trade_id, p) for p in pats)
+        self.conn.executemany(
+            'INSERT INTO trades (trade_id, run_id, ticker, patterns, entry_date, exit_date, entry_price, '
+            'exit_price, ret, hold_days, exit_reason, extra) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+        self.conn.executemany('INSERT INTO trade_patterns (trade_id, pattern) VALUES (?, ?)', pattern_rows)
+
+    def delete_run(self, run_id):
+        with self.conn:
+            self.conn.execute('DELETE FROM trade_patterns WHERE trade_id IN '
+                              '(SELECT trade_id FROM trades WHERE run_id = ?)', (run_id,))
+            for table in ('trades', 'equity', 'run_params', 'run_stats', 'runs'):
+                self.conn.execute(f'DELETE FROM {table} WHERE run_id = ?', (run_id,))
+
+    # ── Reading ─────────────────────────────────────────
+
+    def query(self, sql, params=()):
+        """Any SQL as a DataFrame."""
+        return pd.read_sql_query(sql, self.conn, params=params)
+
+    def runs(self, script=None, sort=None, ascending=False, latest=None):
+        """
+        Runs with params and stats expanded into columns.
+
+        sort: a stat or param column to order by; latest: only the N newest runs.
+        """
+        sql = 'SELECT run_id, script, label, created, start_date, end_date FROM runs'
+        args = ()
+        if script:
+            sql += ' WHERE script = ?'
+            args = (script,)
+        sql += ' ORDER BY run_id DESC'
+        if latest:
+            sql += f' LIMIT {int(latest)}'
+        runs = self.query(sql, args)
+        if runs.empty:
+            return runs
+        ids = ','.join(str(int(r)) for r in runs['run_id'])
+        p = self.query(f'SELECT run_id, key, COALESCE(value, text) AS v FROM run_params WHERE run_id IN ({ids})')
+        s = self.query(f'SELECT run_id, key, value AS v FROM run_stats WHERE run_id IN ({ids})')
+        for part in (p, s):
+            if not part.empty:
+                wide = part.pivot(index='run_id', columns='key', values='v')
+                for col in wide.columns:
+                    try:
+                        wide[col] = pd.to_numeric(wide[col])
+                    except (TypeError, ValueError):
+                        pass
+                runs = runs.merge(wide, left_on='run_id', right_index=True, how='left',
+                                  suffixes=('', '_param'))
+        if sort and sort in runs.columns:
+            runs = runs.sort_values(sort, ascending=ascending)
+        return runs.reset_index(drop=True)
+
+    def trades(self, run_id=None, script=None, ticker=None, pattern=None, start=None, end=None,
+               losing=None, exit_reason=None):
+        """Trades matching every given filter (start inclusive, end exclusive, on entry date)."""
+        where, args = [], []
+        if run_id is not None:
+            ids = [run_id] if np.isscalar(run_id) else list(run_id)
+            where.append(f"t.run_id IN ({','.join('?' * len(ids))})")
+            args += [int(i) for i in ids]
+        if script:
+            where.append('r.script = ?')
+            args.append(script)
+        if ticker:
+            where.append('t.ticker = ?')
+            args.append(ticker)
+        if pattern:
+            where.append('t.trade_id IN (SELECT trade_id FROM trade_patterns WHERE pattern = ?)')
+            args.append(pattern)
+        if start:
+            where.append('t.entry_date >= ?')
+            args.append(_date(start))
+        if end:
+            where.append('t.entry_date < ?')
+            args.append(_date(end))
+        if losing is not None:
+            where.append('t.ret <= 0' if losing else 't.ret > 0')
+        if exit_reason:
+            where.append('t.exit_reason = ?')
+            args.append(exit_reason)
+        sql = ('SELECT t.*, r.script, r.label FROM trades t JOIN runs r ON r.run_id = t.run_id'
+               + (' WHERE ' + ' AND '.join(where) if where else '') + ' ORDER BY t.entry_date, t.trade_id')
+        return self.query(sql, args)
+
+    def equity(self, run_id):
+        """Equity curve of a run as a date-indexed Series."""
+        df = self.query('SELECT date, equity FROM equity WHERE run_id = ? ORDER BY date', (int(run_id),))
+        return pd.Series(df['equity'].values, index=pd.to_datetime(df['date']), name=run_id)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Query stored backtest results')
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    p_runs = sub.add_parser('runs', help='List runs with params and stats')
+    p_runs.add_argument('script', nargs='?')
+    p_runs.add_argument('--sort', default=None)
+    p_runs.add_argument('--latest', type=int, default=50)
+    p_tr = sub.add_parser('trades', help='Filter trades')
+    p_tr.add_argument('--run', type=int)
+    p_tr.add_argument('--script')
+    p_tr.add_argument('--ticker')
+    p_tr.add_argument('--pattern')
+    p_tr.add_argument('--year', type=int)
+    p_tr.add_argument('--losing', action='store_true')
+    p_tr.add_argument('--winning', action='store_true')
+    args = parser.parse_args()
+
+    store = ResultsStore()
+    pd.set_option('display.width', 200)
+    pd.set_option('display.max_columns', 30)
+    if args.cmd == 'runs':
+        print(store.runs(args.script, sort=args.sort, latest=args.latest).to_string(index=False))
+    else:
+        start = end = None
+        if args.year:
+            start, end = f"{args.year}-01-01", f"{args.year + 1}-01-01"
+        losing = True if args.losing else (False if args.winning else None)
+        df = store.trades(run_id=args.run, script=args.script, ticker=args.ticker, pattern=args.pattern,
+                          start=start, end=end, losing=losing)
+        print(df.drop(columns=['extra']).to_string(index=False))
+        if len(df):
+            print(f"\n{len(df)} trades | avg {df['ret'].mean()*100:.2f}% | "
+                  f"win {(df['ret'] > 0).mean()*100:.1f}%")
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+RS Rating - IBD-style relative strength for a whole universe at once
+
+- Weighted 4-quarter rate of change (latest quarter 40%, the three before
+  20% each) from positional offsets into the close series, the same
+  quarters as CANSLIMScanner.calculate_rs_rating
+- Percentile rank = share of the universe with strictly lower performance
+  (0-99), from one sort + searchsorted instead of comparing every pair
+- performance_panel / rs_history give the weighted ROC and rating for every
+  day of a (date x ticker) close panel, for backtest filters
+
+Usage:
+    from rs_rating import weighted_performance, rs_ratings, rs_history
+
+    perf = {t: weighted_performance(df['Close']) for t, df in data.items()}
+    ratings = rs_ratings(perf)                  # {ticker: 0-99}
+    daily = rs_history(closes)                  # dates x tickers
+"""
+import numpy as np
+import pandas as pd
+
+# (start, end) bar offsets from the latest bar, most recent quarter first
+QUARTERS = ((-63, -1), (-126, -64), (-189, -127), (-252, -190))
+WEIGHTS = (0.40, 0.20, 0.20, 0.20)
+MIN_BARS = 252      # 1 year of data
+
+
+def weighted_performance(close):
+    """Weighted 4-quarter ROC of the latest bar (0 with under a year of data)."""
+    c = np.asarray(close, dtype=float)
+    if len(c) < MIN_BARS:
+        return 0
+    (s1, e1), (s2, e2), (s3, e3), (s4, e4) = QUARTERS
+    w1, w2, w3, w4 = WEIGHTS
+    return (((c[e1] / c[s1]) - 1) * w1 + ((c[e2] / c[s2]) - 1) * w2
+            + ((c[e3] / c[s3]) - 1) * w3 + ((c[e4] / c[s4]) - 1) * w4)
+
+
+def performance_panel(closes):
+    """
+    Weighted 4-quarter ROC on every day of a (date x ticker) close panel.
+
+    Offsets are rows of the panel, so tickers should share its calendar;
+    NaN until a ticker has a year of history.
+    """
+    c = closes.to_numpy(dtype=float)
+    n = len(c)
+    perf = np.full(c.shape, np.nan)
+    if n >= MIN_BARS:
+        rows = np.arange(MIN_BARS - 1, n)
+        total = 0
+        for (start, end), w in zip(QUARTERS, WEIGHTS):
+            # iloc[k] (k < 0) of the history ending at row t is row t + 1 + k
+            roc = (c[rows + 1 + end] / c[rows + 1 + start]) - 1
+            total = total + roc * w
+        perf[MIN_BARS - 1:] = total
+    return pd.DataFrame(perf, index=closes.index, columns=closes.columns)
+
+
+def percentile_ranks(perf, universe=None):
+    """
+    int(share of `universe` (default: perf itself) with strictly lower
+    performance * 100) for every value of perf.
+
+    NaN never counts as lower, and a NaN performance ranks 0.
+    """
+    perf = np.asarray(perf, dtype=float)
+    universe = perf if universe is None else np.asarray(universe, dtype=float)
+    if not len(universe):
+        return np.zeros(len(perf), dtype=int)
+    ordered = np.sort(universe)     # NaN last
+    below = np.searchsorted(ordered, perf, side='left')
+    below[np.isnan(perf)] = 0
+    return (below / len(universe) * 100).astype(int)
+
+
+def rs_ratings(performances, tickers=None):
+    """
+    {ticker: RS rating} ranked within `performances` ({ticker: weighted ROC}).
+
+    tickers: rate these instead (0 performance when missing), still ranked
+    against the whole universe.
+    """
+    if tickers is None:
+        tickers = list(performances)
+    values = [performances.get(t, 0) for t in tickers]
+    ranks = percentile_ranks(values, list(performances.values()))
+    return dict(zip(tickers, ranks.tolist()))
+
+
+def ratings_from_performance(perf):
+    """Daily RS ratings of a (date x ticker) performance panel (NaN = not rated)."""
+    below = perf.rank(axis=1, method='min') - 1
+    return np.floor(below.div(perf.count(axis=1), axis=0) * 100)
+
+
+def rs_history(closes):
+    """RS rating of every ticker on every day of a (date x ticker) close panel."""
+    return ratings_from_performance(performance_panel(closes))
+
+
+if __name__ == '__main__':
+    import time
+    rng = np.random.default_rng(0)
+    n_tickers, n_days = 5000, 300
+    closes = pd.DataFrame(100 * np.exp(np.cumsum(rng.normal(0, 0.02, (n_days, n_tickers)), axis=0)),
+                          columns=[f"T{i}" for i in range(n_tickers)])
+    start = time.time()
+    perf = performance_panel(closes).iloc[-1]
+    mid = time.time()
+    ratings = rs_ratings(perf.to_dict())
+    end = time.time()
+    daily = rs_history(closes)
+    print(f"{n_tickers} tickers: performance {(mid - start) * 1000:.1f}ms, "
+          f"ranking {(end - mid) * 1000:.1f}ms, {n_days}-day history {time.time() - end:.2f}s")
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+RS Table - nightly (date x ticker) RS ratings for a reference universe
+
+- Reference universe: S&P 500 top 200 + the scanner_v3 growth watchlist,
+  plus any extra tickers passed to the build
+- Each ticker's weighted 4-quarter ROC is computed on its own trading
+  calendar (rs_rating.performance_panel), then ranked across the universe
+  on every day
+- Stored as one pickle in the shared cache; scanners, backtests and
+  dashboards read it instead of ranking their own (often tiny) ticker lists
+- rank() places any performance, including tickers outside the universe,
+  in the universe distribution: a one-ticker scan still gets a true
+  percentile
+
+Run nightly after the close (e.g. cron: 30 17 * * 1-5 python3 rs_table.py).
+
+Usage:
+    python rs_table.py                          # build + save
+    python rs_table.py --extra IONQ RGTI        # widen the universe
+
+    from rs_table import get_rs_table
+
+    table = get_rs_table()                      # None when missing / stale; reloads a new build
+    table.rating('NVDA')                        # latest rating
+    table.ratings_on('NVDA', signal_dates)      # as of each date (backtests)
+    table.rank({'XYZ': 0.42})                   # {ticker: percentile}
+"""
+import argparse
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from data_utils import get_cache_path, get_stock_data, load_from_cache, save_to_cache
+from rs_rating import performance_panel, percentile_ranks, ratings_from_performance
+from sp500_top200 import SP500_TOP200
+
+RS_TABLE_KEY = 'rs_table'
+RS_TABLE_MAX_AGE = 36       # hours: one nightly build plus slack
+HISTORY_PERIOD = '2y'
+BARS_CACHE_TTL = 0          # hours: the nightly build always downloads fresh bars
+
+
+def reference_universe(extra=()):
+    """S&P top 200 + growth watchlist + extra, without duplicates."""
+    # Imported here: scanner_v3 reads this module
+    from scanner_v3 import DEFAULT_TICKERS
+    return list(dict.fromkeys(list(SP500_TOP200) + list(DEFAULT_TICKERS) + list(extra)))
+
+
+class RSTable:
+    """Weighted ROC and RS rating of every reference ticker on every day."""
+
+    def __init__(self, perf, rating, built=None):
+        self.perf = perf
+        self.rating_table = rating
+        self.built = built
+
+    @property
+    def tickers(self):
+        return list(self.perf.columns)
+
+    def _row(self, date=None):
+        """Position of the last row on or before date (latest by default)."""
+        if date is None:
+            return len(self.perf) - 1
+        return int(self.perf.index.searchsorted(pd.Timestamp(date), side='right')) - 1
+
+    def performance(self, date=None):
+        """Weighted ROC of every rated ticker as of date."""
+        i = self._row(date)
+        if i < 0:
+            return pd.Series(dtype=float)
+        return self.perf.iloc[i].dropna()
+
+    def rating(self, ticker, date=None):
+        """RS rating of a universe ticker as of date (None when not rated)."""
+        i = self._row(date)
+        if ticker not in self.rating_table.columns or i < 0:
+            return None
+        value = self.rating_table[ticker].iloc[i]
+        return None if pd.isna(value) else int(value)
+
+    def ratings_on(self, ticker, dates):
+        """RS rating of a universe ticker as of each date (NaN when not rated)."""
+        dates = pd.to_datetime(np.asarray(dates))
+        out = np.full(len(dates), np.nan)
+        if ticker not in self.rating_table.columns:
+            return out
+        i = self.perf.index.searchsorted(dates, side='right') - 1
+        ok = i >= 0
+        out[ok] = self.rating_table[ticker].to_numpy()[i[ok]]
+        return out
+
+    def rank(self, performances, date=None):
+        """{ticker: percentile} of weighted ROCs against the universe as of date."""
+        tickers = list(performances)
+        ranks = percentile_ranks([performances[t] for t in tickers], self.performance(date).values)
+        return dict(zip(tickers, ranks.tolist()))
+
+    def save(self):
+        save_to_cache(RS_TABLE_KEY, {'perf': self.perf, 'rating': self.rating_table,
+                                     'built': self.built})
+
+    @classmethod
+    def load(cls, max_age_hours=RS_TABLE_MAX_AGE):
+        data = load_from_cache(RS_TABLE_KEY, max_age_hours=max_age_hours)
+        if data is None:
+            return None
+        return cls(data['perf'], data['rating'], data.get('built'))
+
+
+def build_rs_table(tickers, period=HISTORY_PERIOD, progress=True, cache_ttl=BARS_CACHE_TTL):
+    """
+    Download closes and rank the universe on every day.
+
+    Bars cached earlier (a partial intraday bar, yesterday's close) are not
+    reused by default; the fresh download refreshes the shared cache.
+    """
+    panels = []
+    for i, ticker in enumerate(tickers):
+        if progress:
+            print(f"\r  {i+1}/{len(tickers)} {ticker}...     ", end='', flush=True)
+        df = get_stock_data(ticker, period=period, cache_ttl=cache_ttl)
+        if df is None or df.empty:
+            continue
+        close = df['Close'].dropna()
+        if isinstance(close, pd.DataFrame):
+            close = close.iloc[:, 0]
+        # Quarters are positional on the ticker's own calendar
+        panels.append(performance_panel(close.to_frame(ticker)))
+    if progress:
+        print()
+    perf = pd.concat(panels, axis=1).sort_index() if panels else pd.DataFrame()
+    perf = perf.dropna(how='all')
+    return RSTable(perf, ratings_from_performance(perf), built=datetime.now())
+
+
+_table = None
+_mtime = None
+
+
+def get_rs_table(max_age_hours=RS_TABLE_MAX_AGE):
+    """
+    The stored RS table, None when missing or stale.
+
+    Loaded once per process and again whenever the nightly build replaces
+    the file, so long-running processes (command center) rank on the
+    latest table; a table built more than max_age_hours ago is not returned.
+    """
+    global _table, _mtime
+    try:
+        mtime = os.path.getmtime(get_cache_path(RS_TABLE_KEY))
+    except OSError:
+        mtime = None
+    if mtime != _mtime:
+        _table = RSTable.load(max_age_hours) if mtime is not None else None
+        _mtime = mtime
+    if _table is None:
+        return None
+    built = _table.built.timestamp() if _table.built is not None else _mtime
+    if time.time() - built > max_age_hours * 3600:
+        return None
+    return _table
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build the daily RS rating table')
+    parser.add_argument('--extra', nargs='*', default=[], help='Extra tickers to rate')
+    parser.add_argument('--period', default=HISTORY_PERIOD, help=f'History to rate (default: {HISTORY_PERIOD})')
+    args = parser.parse_args()
+
+    universe = reference_universe(args.extra)
+    print(f"Building RS table for {len(universe)} tickers...")
+    table = build_rs_table(universe, period=args.period)
+    if table.perf.empty:
+        print("No data - table not saved")
+    else:
+        table.save()
+        latest = table.rating_table.iloc[-1].dropna().sort_values(ascending=False)
+        print(f"{len(table.perf)} days x {len(table.tickers)} tickers, "
+              f"{len(latest)} rated on {table.perf.index[-1].date()}")
+        print("Top 10: " + ", ".join(f"{t} {int(r)}" for t, r in latest.head(10).items()))
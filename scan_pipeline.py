@@ -0,0 +1,614 @@
+#!/usr/bin/env python3
+"""
+Scan Pipeline - the full morning scan as an in-process dependency graph
+
+- Stages declare which stages' results they need; a stage starts as soon as
+  its dependencies finish, so independent scanners run side by side:
+
+      market_health, money_scan, options_flow, sector_rotation   at once
+      dark_pool, earnings                 after money_scan
+      signals                             after money_scan + options_flow
+
+- One process: modules are imported once and results are passed in memory
+  (dark pool / earnings get the money scan's top 30, the signal matcher
+  gets the money scan and options flow). Every stage still writes its
+  *_latest.json, so the dashboards and standalone scripts are unchanged.
+- Shared data layer: inside a stage, the stage modules' `yf` resolves to
+  the run's SharedMarketData, so identical downloads and Ticker lookups
+  (sector ETFs, .info of the money scan leaders) are fetched once, even
+  when two stages ask at the same moment. The routing and the stage's
+  console capture live in a contextvar of the stage's threads; other
+  threads of the process (command center requests) still see yfinance
+  and the real stdout
+- Ticker loops inside the money, options, dark pool and earnings stages
+  run on `workers` threads each (in_context carries the stage along)
+- A stage that fails or exceeds `timeout` is reported and its dependents
+  still run (they fall back to the files, as the separate scripts did);
+  a timed-out stage is abandoned: its next data request raises, so it
+  stops instead of writing a late artefact. Console output of each stage
+  is captured in its StageResult
+- Unchanged stages are skipped: each stage fingerprints its inputs (last
+  daily bar of its universe from one 5-day batch download, config such as
+  the date, upstream *_latest.json hashes and its own source). When the
+  fingerprint and its artefact match the last successful run
+  (pipeline_state.json), the previous *_latest.json is reused. Weekend
+  runs and repeated "Run Full Scan" clicks only pay for the probes.
+- A run only counts as successful when it rewrote its artefact and its
+  result passes the stage's check (by default: not empty). The scanners
+  swallow per-ticker errors, so a network outage returns an empty scan
+  rather than raising; such a stage is reported 'partial' and is run
+  again next time instead of being skipped.
+
+Usage:
+    python scan_pipeline.py                      # full scan, 4 threads per stage
+    python scan_pipeline.py --workers 8 --timeout 600 --verbose
+    python scan_pipeline.py --force              # rerun unchanged stages too
+    python scan_pipeline.py --only signals       # signals + what it depends on
+
+    from scan_pipeline import run_full_scan
+    results = run_full_scan(on_event=lambda event, stage, result: ...)
+"""
+import argparse
+import contextvars
+import glob
+import hashlib
+import io
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass, field
+from datetime import date, datetime
+
+import pandas as pd
+import yfinance as yf
+
+from backtest_checkpoint import run_key
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+STATE_FILE = os.path.join(SCRIPT_DIR, 'pipeline_state.json')
+
+FETCH_WORKERS = 4       # threads per stage for ticker loops
+STAGE_TIMEOUT = 300     # seconds per stage (the old per-script limit)
+
+# The running stage (StageScope) of the current thread, None outside the pipeline
+_scope = contextvars.ContextVar('scan_pipeline_stage', default=None)
+
+
+def load_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+@dataclass
+class Stage:
+    """
+    One node of the pipeline: run(inputs) gets {dependency: its value}.
+
+    artefact: file the stage writes; fingerprint(inputs): key of everything
+    the stage reads (None: always run); load(artefact): the stage's value
+    from its artefact, for dependents when the stage is skipped.
+    check(value): what is wrong with a run's result ('' when it is usable;
+    None: the result must not be empty).
+    """
+    name: str
+    label: str
+    run: callable
+    deps: tuple = ()
+    artefact: str = ''
+    fingerprint: callable = None
+    load: callable = load_json
+    check: callable = None
+
+
+def check_result(stage, value):
+    """Problem with a stage's result, '' when it is usable."""
+    if stage.check is not None:
+        return stage.check(value)
+    return '' if value else 'empty result'
+
+
+@dataclass
+class StageResult:
+    name: str
+    status: str                 # 'ok', 'partial', 'skipped', 'failed' or 'timeout'
+    value: object = None
+    error: str = ''
+    seconds: float = 0.0
+    output: str = field(default='', repr=False)
+
+
+# ---------------------------------------------------------------------------
+# Shared data layer
+# ---------------------------------------------------------------------------
+class SharedMarketData:
+    """
+    yfinance stand-in shared by the stages of one run.
+
+    download() and Ticker().info / .history() / .calendar are memoized by
+    their arguments; concurrent identical requests wait for the one in
+    flight. DataFrames are copied on the way out (stages edit columns).
+    Other Ticker attributes pass through to yfinance.
+    """
+
+    def __init__(self, source=yf):
+        self.source = source
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.fetched = 0
+        self.reused = 0
+
+    def once(self, key, fetch):
+        """fetch() the first time key is asked for; its result after that."""
+        with self._lock:
+            slot = self._calls.get(key)
+            owner = slot is None
+            if owner:
+                slot = self._calls[key] = Future()
+                self.fetched += 1
+            else:
+                self.reused += 1
+        if owner:
+            try:
+                slot.set_result(fetch())
+            except Exception as e:
+                slot.set_exception(e)
+        value = slot.result()
+        if isinstance(value, (pd.DataFrame, pd.Series, dict)):
+            return value.copy()
+        return value
+
+    def download(self, tickers, **kwargs):
+        kwargs.pop('progress', None)
+        kwargs.setdefault('auto_adjust', True)     # yfinance default
+        names = tuple(tickers) if isinstance(tickers, (list, tuple)) else tickers
+        key = ('download', names, tuple(sorted(kwargs.items())))
+        return self.once(key, lambda: self.source.download(tickers, progress=False, **kwargs))
+
+    def Ticker(self, symbol):
+        return SharedTicker(self, symbol)
+
+
+class SharedTicker:
+    """yf.Ticker whose info / history / calendar come from SharedMarketData."""
+
+    def __init__(self, data, symbol):
+        self._data = data
+        self.ticker = symbol
+        self._stock = None
+
+    def _yf(self):
+        # One yfinance object per caller: they are not shared across threads
+        if self._stock is None:
+            self._stock = self._data.source.Ticker(self.ticker)
+        return self._stock
+
+    @property
+    def info(self):
+        return self._data.once(('info', self.ticker), lambda: self._yf().info)
+
+    @property
+    def calendar(self):
+        return self._data.once(('calendar', self.ticker), lambda: self._yf().calendar)
+
+    def history(self, period='1mo', **kwargs):
+        key = ('history', self.ticker, period, tuple(sorted(kwargs.items())))
+        return self._data.once(key, lambda: self._yf().history(period=period, **kwargs))
+
+    def __getattr__(self, name):
+        return getattr(self._yf(), name)
+
+
+# ---------------------------------------------------------------------------
+# Input fingerprints
+# ---------------------------------------------------------------------------
+def file_digest(path):
+    """sha1 of a file's bytes, None when it can't be read."""
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha1(f.read()).hexdigest()
+    except (OSError, TypeError):
+        return None
+
+
+def last_bars(tickers, source=yf):
+    """{ticker: (date, close, volume)} of each ticker's latest daily bar, from one batch download."""
+    tickers = sorted(set(tickers))
+    if not tickers:
+        return {}
+    df = source.download(tickers, period='5d', interval='1d', progress=False)
+    if df is None or df.empty:
+        return {}
+    close, volume = df['Close'], df['Volume']
+    if isinstance(close, pd.Series):
+        close, volume = close.to_frame(tickers[0]), volume.to_frame(tickers[0])
+    bars = {}
+    for ticker in close.columns:
+        c = close[ticker].dropna()
+        if c.empty:
+            continue
+        day = c.index[-1]
+        bars[ticker] = (day.strftime('%Y-%m-%d %H:%M'), round(float(c.iloc[-1]), 4),
+                        float(volume[ticker].get(day, 0)))
+    return bars
+
+
+def inputs_key(module, universe=(), files=(), source=yf, **config):
+    """
+    Fingerprint of a stage: its module's source, config, the latest bar of
+    every universe ticker and the contents of the files it reads.
+    """
+    return run_key(module.__file__, config=sorted(config.items()),
+                   bars=sorted(last_bars(universe, source).items()),
+                   files=[(os.path.basename(f), file_digest(f)) for f in files])
+
+
+class PipelineState:
+    """Fingerprint and artefact hash of each stage's last successful run (JSON file)."""
+
+    def __init__(self, path=STATE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            self.stages = load_json(path)
+        except (OSError, ValueError):
+            self.stages = {}
+
+    def unchanged(self, stage, key):
+        """True when stage last ran on the same inputs and its artefact is untouched."""
+        entry = self.stages.get(stage.name)
+        digest = file_digest(stage.artefact)
+        return (entry is not None and digest is not None
+                and entry.get('fingerprint') == key and entry.get('artefact') == digest)
+
+    def record(self, stage, key):
+        digest = file_digest(stage.artefact)
+        if digest is None:
+            return
+        with self._lock:
+            self.stages[stage.name] = {'fingerprint': key, 'artefact': digest,
+                                       'finished': datetime.now().isoformat()}
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, 'w') as f:
+                json.dump(self.stages, f, indent=2)
+            os.replace(tmp, self.path)
+
+
+# ---------------------------------------------------------------------------
+# Stage scope: data layer and output capture of a stage's threads
+# ---------------------------------------------------------------------------
+class StageAbandoned(RuntimeError):
+    """Raised in a timed-out stage's threads at their next data request."""
+
+
+@dataclass
+class StageScope:
+    name: str
+    data: object = None                             # SharedMarketData, None: yfinance
+    buffer: io.StringIO = field(default_factory=io.StringIO)
+    abandoned: threading.Event = field(default_factory=threading.Event)
+
+
+def in_context(fn):
+    """fn running in a copy of the caller's context, for thread pools inside a stage."""
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.copy().run(fn, *args, **kwargs)
+
+
+class RoutedYF:
+    """A stage module's `yf`: the running stage's data layer inside the pipeline, yfinance elsewhere."""
+
+    def __init__(self, source):
+        self._source = source
+
+    def __getattr__(self, name):
+        scope = _scope.get()
+        if scope is None or scope.data is None:
+            return getattr(self._source, name)
+        if scope.abandoned.is_set():
+            raise StageAbandoned(f"{scope.name} timed out")
+        return getattr(scope.data, name)
+
+
+def route_modules(modules):
+    """Give each module a RoutedYF `yf` (once; it is yfinance outside the pipeline)."""
+    for module in modules:
+        if not isinstance(module.yf, RoutedYF):
+            module.yf = RoutedYF(module.yf)
+
+
+class StageOutput:
+    """sys.stdout stand-in: writes from a stage's threads go to that stage's buffer."""
+
+    def __init__(self, fallback):
+        self.fallback = fallback
+
+    def _target(self):
+        scope = _scope.get()
+        return scope.buffer if scope is not None else self.fallback
+
+    def write(self, text):
+        return self._target().write(text)
+
+    def flush(self):
+        self._target().flush()
+
+    def __getattr__(self, name):
+        return getattr(self.fallback, name)
+
+
+_capture_lock = threading.Lock()
+_captures = 0
+
+
+def _start_capture():
+    """Install StageOutput as sys.stdout while any pipeline run is capturing."""
+    global _captures
+    with _capture_lock:
+        if _captures == 0 and not isinstance(sys.stdout, StageOutput):
+            sys.stdout = StageOutput(sys.stdout)
+        _captures += 1
+
+
+def _stop_capture():
+    global _captures
+    with _capture_lock:
+        _captures -= 1
+        if _captures == 0 and isinstance(sys.stdout, StageOutput):
+            sys.stdout = sys.stdout.fallback
+
+
+def written_since(path, start):
+    """True when path was (re)written at or after the time start."""
+    try:
+        return os.path.getmtime(path) >= start - 1     # coarse filesystem timestamps
+    except OSError:
+        return False
+
+
+def _run_stage(stage, inputs, scope, state=None, force=False):
+    token = _scope.set(scope)
+    start = time.time()
+    try:
+        key = None
+        if state is not None and stage.fingerprint and stage.artefact:
+            try:
+                key = stage.fingerprint(inputs)
+            except Exception as e:
+                print(f"Fingerprint failed, running {stage.name}: {e}")
+        if key and not force and state.unchanged(stage, key):
+            result = StageResult(stage.name, 'skipped', value=stage.load(stage.artefact))
+        else:
+            value = stage.run(inputs)
+            problem = check_result(stage, value)
+            if not problem and stage.artefact and not written_since(stage.artefact, start):
+                problem = f"{os.path.basename(stage.artefact)} not written"
+            # Only a complete run may be reused: a degraded one runs again next time
+            result = StageResult(stage.name, 'partial' if problem else 'ok', value=value, error=problem)
+            if key and not problem and not scope.abandoned.is_set():
+                state.record(stage, key)
+    except Exception as e:
+        result = StageResult(stage.name, 'failed', error=f"{type(e).__name__}: {e}")
+    finally:
+        _scope.reset(token)
+    result.seconds = time.time() - start
+    result.output = scope.buffer.getvalue()
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Scheduler
+# ---------------------------------------------------------------------------
+def run_stages(stages, timeout=STAGE_TIMEOUT, on_event=None, capture=True, state=None, force=False,
+               data=None):
+    """
+    Run stages as soon as their dependencies are done; {name: StageResult}.
+
+    on_event(event, stage, result) is called with 'start' (result None) and
+    'done'. A timed-out stage is no longer waited on; its thread can't be
+    killed, so it is marked abandoned and its next request to `data` raises.
+
+    state: PipelineState to skip stages whose fingerprint is unchanged
+    (force: run them anyway, still recording fingerprints).
+    data: data layer the stage modules' RoutedYF resolves to in the stages.
+    """
+    names = {s.name for s in stages}
+    for stage in stages:
+        missing = set(stage.deps) - names
+        if missing:
+            raise ValueError(f"{stage.name}: unknown dependencies {sorted(missing)}")
+
+    def notify(event, stage, result=None):
+        if on_event:
+            on_event(event, stage, result)
+
+    results = {}
+    waiting = list(stages)
+    pending = {}    # future -> stage
+    started = {}
+    scopes = {}
+    if capture:
+        _start_capture()
+    pool = ThreadPoolExecutor(max_workers=len(stages) or 1)
+    try:
+        while waiting or pending:
+            for stage in [s for s in waiting if all(d in results for d in s.deps)]:
+                waiting.remove(stage)
+                inputs = {d: results[d].value for d in stage.deps}
+                started[stage.name] = time.time()
+                scopes[stage.name] = StageScope(stage.name, data)
+                notify('start', stage)
+                job = pool.submit(_run_stage, stage, inputs, scopes[stage.name], state, force)
+                pending[job] = stage
+            if not pending:
+                raise ValueError(f"Dependency cycle between {[s.name for s in waiting]}")
+
+            done, _ = wait(pending, timeout=1.0, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = pending.pop(future)
+                results[stage.name] = future.result()
+                notify('done', stage, results[stage.name])
+
+            now = time.time()
+            for future, stage in list(pending.items()):
+                if now - started[stage.name] > timeout:
+                    del pending[future]
+                    scopes[stage.name].abandoned.set()
+                    results[stage.name] = StageResult(stage.name, 'timeout', error=f"> {timeout}s",
+                                                      seconds=now - started[stage.name],
+                                                      output=scopes[stage.name].buffer.getvalue())
+                    notify('done', stage, results[stage.name])
+    finally:
+        if capture:
+            _stop_capture()
+        pool.shutdown(wait=False)
+    return results
+
+
+# ---------------------------------------------------------------------------
+# The full scan
+# ---------------------------------------------------------------------------
+def full_scan_stages(workers=FETCH_WORKERS, data=yf):
+    """
+    The seven command center scanners and how their results feed each other.
+
+    data: where the fingerprint probes fetch their last bars.
+    """
+    import market_health
+    import money_scanner
+    import options_flow_scanner
+    import dark_pool_tracker
+    import sector_rotation
+    import earnings_calendar
+    import signal_matcher
+    from data_utils import get_cache_path
+    from rs_table import RS_TABLE_KEY, get_rs_table
+
+    def leaders(inputs):
+        # Same list the scripts read from money_scan_latest.json ([] -> that file)
+        return [r['ticker'] for r in (inputs['money_scan'] or [])[:30]]
+
+    def results(path):
+        return load_json(path).get('results', [])
+
+    def key(module, universe=(), files=(), **config):
+        return inputs_key(module, universe, files, source=data, **config)
+
+    market_universe = (list(market_health.INDICES) + ['^VIX'] + list(market_health.STOCK_UNIVERSE)
+                       + list(market_health.SECTOR_ETFS))
+
+    return [
+        Stage('market_health', 'Market Health', lambda inputs: market_health.run_market_health(),
+              artefact=market_health.OUTPUT_FILE,
+              check=lambda value: '' if value and value.get('indices') else 'no index data',
+              fingerprint=lambda inputs: key(market_health, market_universe)),
+        Stage('money_scan', 'Money Scanner', lambda inputs: money_scanner.run_scan(workers=workers),
+              artefact=money_scanner.OUTPUT_FILE, load=results,
+              fingerprint=lambda inputs: key(money_scanner, money_scanner.UNIVERSE,
+                                             [get_cache_path(RS_TABLE_KEY)],
+                                             rs_table=get_rs_table() is not None)),
+        Stage('options_flow', 'Options Flow', lambda inputs: options_flow_scanner.scan_all(workers=workers),
+              artefact=options_flow_scanner.FLOW_FILE, load=results,
+              fingerprint=lambda inputs: key(options_flow_scanner, options_flow_scanner.UNIVERSE)),
+        Stage('dark_pool', 'Dark Pool',
+              lambda inputs: dark_pool_tracker.run_scan(leaders(inputs), workers=workers),
+              deps=('money_scan',), artefact=dark_pool_tracker.OUTPUT_FILE, load=results,
+              fingerprint=lambda inputs: key(dark_pool_tracker,
+                                             leaders(inputs) or dark_pool_tracker.DEFAULT_TICKERS,
+                                             [money_scanner.OUTPUT_FILE])),
+        Stage('sector_rotation', 'Sector Rotation', lambda inputs: sector_rotation.run_scan(),
+              artefact=sector_rotation.OUTPUT_FILE, load=lambda path: load_json(path)['sectors'],
+              fingerprint=lambda inputs: key(sector_rotation, list(sector_rotation.SECTORS) + ['SPY'])),
+        # Days-to-earnings count down with the calendar even when prices don't move
+        Stage('earnings', 'Earnings Calendar',
+              lambda inputs: earnings_calendar.run_scan(leaders(inputs), workers=workers),
+              deps=('money_scan',), artefact=earnings_calendar.OUTPUT_FILE, load=results,
+              check=lambda value: '' if any(r.get('category') != 'UNKNOWN' for r in value or [])
+              else 'no earnings dates found',
+              fingerprint=lambda inputs: key(earnings_calendar,
+                                             leaders(inputs) or earnings_calendar.DEFAULT_TICKERS,
+                                             [money_scanner.OUTPUT_FILE], today=date.today().isoformat())),
+        Stage('signals', 'Signal Matcher',
+              lambda inputs: signal_matcher.match_signals(inputs['money_scan'], inputs['options_flow']),
+              deps=('money_scan', 'options_flow'), artefact=signal_matcher.SIGNALS_FILE,
+              # No match is a valid result (empty inputs are their stages' problem)
+              check=lambda value: '' if value is not None else 'no output',
+              # Latest scanner report, when there is one
+              fingerprint=lambda inputs: key(signal_matcher, files=[
+                  money_scanner.OUTPUT_FILE, options_flow_scanner.FLOW_FILE]
+                  + sorted(glob.glob(os.path.join(signal_matcher.SCRIPT_DIR, 'scan_results_*.txt')))[-1:])),
+    ]
+
+
+def with_dependencies(stages, names):
+    """The stages in names plus everything they depend on, in pipeline order."""
+    by_name = {s.name: s for s in stages}
+    unknown = set(names) - set(by_name)
+    if unknown:
+        raise ValueError(f"Unknown stages {sorted(unknown)}")
+    wanted, todo = set(), list(names)
+    while todo:
+        name = todo.pop()
+        if name not in wanted:
+            wanted.add(name)
+            todo.extend(by_name[name].deps)
+    return [s for s in stages if s.name in wanted]
+
+
+# Stage modules that fetch through yfinance
+FULL_SCAN_MODULES = ('market_health', 'money_scanner', 'options_flow_scanner', 'dark_pool_tracker',
+                     'sector_rotation', 'earnings_calendar')
+
+
+def run_full_scan(workers=FETCH_WORKERS, timeout=STAGE_TIMEOUT, on_event=None, data=None,
+                  force=False, only=None, state_file=STATE_FILE):
+    """
+    Run the full scan pipeline; {stage name: StageResult}.
+
+    data: SharedMarketData for the run (a fresh one by default).
+    force: rerun stages whose inputs are unchanged.
+    only: stage names to run (with their dependencies), default all.
+    """
+    data = data or SharedMarketData()
+    stages = full_scan_stages(workers, data)
+    if only:
+        stages = with_dependencies(stages, only)
+    route_modules([sys.modules[name] for name in FULL_SCAN_MODULES])
+    return run_stages(stages, timeout=timeout, on_event=on_event,
+                      state=PipelineState(state_file), force=force, data=data)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run the full scan pipeline')
+    parser.add_argument('--workers', type=int, default=FETCH_WORKERS,
+                        help=f'Threads per stage for ticker loops (default: {FETCH_WORKERS})')
+    parser.add_argument('--timeout', type=float, default=STAGE_TIMEOUT,
+                        help=f'Seconds per stage (default: {STAGE_TIMEOUT})')
+    parser.add_argument('--verbose', action='store_true', help="Print each stage's output")
+    parser.add_argument('--force', action='store_true', help='Rerun stages whose inputs are unchanged')
+    parser.add_argument('--only', nargs='+', metavar='STAGE',
+                        help='Run these stages and what they depend on')
+    args = parser.parse_args()
+
+    def report(event, stage, result):
+        if event == 'start':
+            print(f"  ⏳ {stage.label}...", flush=True)
+        else:
+            icon = {'ok': '✅', 'skipped': '⏭️ ', 'partial': '⚠️ '}.get(result.status, '❌')
+            detail = f" ({result.error})" if result.error else ''
+            print(f"  {icon} {stage.label} {result.status} in {result.seconds:.1f}s{detail}", flush=True)
+
+    start = time.time()
+    data = SharedMarketData()
+    results = run_full_scan(args.workers, args.timeout, on_event=report, data=data,
+                            force=args.force, only=args.only)
+    if args.verbose:
+        for name, result in results.items():
+            print(f"\n{'=' * 30} {name} {'=' * 30}\n{result.output}")
+    failed = [name for name, r in results.items() if r.status not in ('ok', 'skipped')]
+    skipped = sum(r.status == 'skipped' for r in results.values())
+    print(f"\nFull scan: {len(results) - len(failed)}/{len(results)} stages ok ({skipped} unchanged) "
+          f"in {time.time() - start:.1f}s ({data.fetched} fetches, {data.reused} shared)")
+    sys.exit(1 if failed else 0)
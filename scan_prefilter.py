@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Scan Prefilter - cheap vectorized gates before the expensive per-ticker scan
+
+- One batch download per bar interval for the whole universe (in chunks)
+  gives (date x ticker) panels of Open / High / Low / Close / Volume
+- A gate is a named condition evaluated for every ticker at once from the
+  panels (a boolean per ticker, no per-ticker loop)
+- Each scanner declares its own gates (PREFILTER_GATES); only tickers that
+  pass all of them go on to the expensive stage (fundamentals, pattern
+  search, squeeze), which takes its bars from the panels instead of
+  downloading them again
+- Bar windows count each ticker's own last N bars, so gaps in the shared
+  calendar (halts, late listings) don't shift them
+- A ticker missing from a panel (its chunk failed) passes, and the scanner
+  fetches it as before; a ticker without data fails
+
+Usage:
+    from scan_prefilter import prefilter, min_history, above_ma, near_high
+
+    gates = (min_history(100), above_ma(200), near_high(0.25))
+    screen = prefilter(universe, gates)
+    screen.passed                   # survivors, in universe order
+    screen.frame('NVDA')            # daily bars from the panel (None: download)
+    screen.report()                 # '3000 -> 412 tickers (above 200-bar MA: -1650, ...)'
+"""
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+PERIODS = {'1d': '2y', '1wk': '5y'}     # what the scanners download per ticker
+CHUNK = 500                             # tickers per batch download
+COLUMNS = ('Open', 'High', 'Low', 'Close', 'Volume')
+
+
+class Panel:
+    """(date x ticker) frames of one bar interval, one per OHLCV column."""
+
+    def __init__(self, columns, interval='1d'):
+        self.columns = columns
+        self.interval = interval
+
+    def __getitem__(self, column):
+        return self.columns[column]
+
+    @property
+    def tickers(self):
+        return list(self.columns['Close'].columns)
+
+    def frame(self, ticker):
+        """One ticker's bars (rows without a close dropped), None when not in the panel."""
+        if ticker not in self.columns['Close'].columns:
+            return None
+        df = pd.DataFrame({col: self.columns[col][ticker] for col in COLUMNS})
+        return df.dropna(subset=['Close'])
+
+    def last(self, column, bars):
+        """column masked to each ticker's own last `bars` bars."""
+        values = self.columns[column]
+        from_end = self.columns['Close'].notna()[::-1].cumsum()[::-1]
+        return values.where(self.columns['Close'].notna() & (from_end <= bars))
+
+    def latest(self, column='Close'):
+        """Each ticker's latest value."""
+        return self.columns[column].ffill().iloc[-1]
+
+
+def load_panel(tickers, period=None, interval='1d', source=yf, chunk=CHUNK):
+    """Batch-download bars for tickers; tickers of failed chunks are left out."""
+    period = period or PERIODS[interval]
+    parts = {col: [] for col in COLUMNS}
+    tickers = list(dict.fromkeys(tickers))
+    for i in range(0, len(tickers), chunk):
+        batch = tickers[i:i + chunk]
+        try:
+            df = source.download(batch, period=period, interval=interval, progress=False)
+        except Exception as e:
+            print(f"  Prefilter download failed for {len(batch)} tickers: {e}")
+            continue
+        if df is None or df.empty:
+            continue
+        for col in COLUMNS:
+            frame = df[col]
+            if isinstance(frame, pd.Series):
+                frame = frame.to_frame(batch[0])
+            # Tickers yfinance returned nothing for stay as empty columns
+            parts[col].append(frame.reindex(columns=batch))
+    if not parts['Close']:
+        empty = pd.DataFrame(dtype=float)
+        return Panel({col: empty for col in COLUMNS}, interval)
+    columns = {col: pd.concat(frames, axis=1).sort_index() for col, frames in parts.items()}
+    return Panel(columns, interval)
+
+
+# ---------------------------------------------------------------------------
+# Gates
+# ---------------------------------------------------------------------------
+@dataclass
+class Gate:
+    """test(panels) -> boolean Series indexed by ticker; panels: {interval: Panel}."""
+    name: str
+    test: callable
+    intervals: tuple = ('1d',)
+
+
+def min_history(bars, interval='1d'):
+    """At least `bars` bars of history."""
+    return Gate(f"{bars}+ {interval} bars",
+                lambda panels: panels[interval]['Close'].count() >= bars, (interval,))
+
+
+def above_ma(length, interval='1d'):
+    """Latest close above its `length`-bar simple moving average."""
+    def test(panels):
+        panel = panels[interval]
+        close = panel.last('Close', length)
+        ma = close.mean().where(close.count() >= length)
+        return panel.latest() > ma
+    return Gate(f"above {length}-bar MA", test, (interval,))
+
+
+def near_ma(length, max_pct, interval='1wk'):
+    """Latest close within max_pct of its `length`-bar moving average (either side)."""
+    def test(panels):
+        panel = panels[interval]
+        close = panel.last('Close', length)
+        ma = close.mean().where(close.count() >= length)
+        return ((panel.latest() - ma).abs() / ma) <= max_pct
+    return Gate(f"within {max_pct:.0%} of {length}-{interval} MA", test, (interval,))
+
+
+def near_high(max_pct, bars=252, interval='1d'):
+    """Latest close less than max_pct below the highest high of the last `bars` bars."""
+    def test(panels):
+        panel = panels[interval]
+        high = panel.last('High', bars).max()
+        return (high - panel.latest()) / high < max_pct
+    return Gate(f"within {max_pct:.0%} of {bars}-bar high", test, (interval,))
+
+
+def range_contraction(max_ratio, block=20, interval='1d'):
+    """Mean daily range (High - Low) falling over three `block`-bar blocks, last/first < max_ratio."""
+    def test(panels):
+        panel = panels[interval]
+        ranges = panel['High'] - panel['Low']
+        last_1 = panel.last('Close', block).notna()
+        last_2 = panel.last('Close', 2 * block).notna()
+        last_3 = panel.last('Close', 3 * block).notna()
+        p3 = ranges.where(last_1).mean()
+        p2 = ranges.where(last_2 & ~last_1).mean()
+        p1 = ranges.where(last_3 & ~last_2).mean()
+        enough = panel['Close'].count() >= 3 * block
+        return enough & (p1 > p2) & (p2 > p3) & (p3 / p1 < max_ratio)
+    return Gate(f"{block}-bar range contraction", test, (interval,))
+
+
+def any_of(*gates):
+    """Passes when any of gates passes."""
+    def test(panels):
+        passed = [g.test(panels) for g in gates]
+        return pd.concat(passed, axis=1).fillna(False).any(axis=1)
+    intervals = tuple(dict.fromkeys(i for g in gates for i in g.intervals))
+    return Gate(' or '.join(g.name for g in gates), test, intervals)
+
+
+# ---------------------------------------------------------------------------
+# Prefilter
+# ---------------------------------------------------------------------------
+@dataclass
+class Prefilter:
+    universe: list
+    passed: list
+    panels: dict                                    # interval -> Panel
+    removed: dict = field(default_factory=dict)     # gate name -> tickers it removed
+
+    def frame(self, ticker, interval='1d'):
+        """Bars of a ticker from the prefilter panel, None when it wasn't downloaded."""
+        panel = self.panels.get(interval)
+        return panel.frame(ticker) if panel is not None else None
+
+    def rejected(self):
+        passed = set(self.passed)
+        return [t for t in self.universe if t not in passed]
+
+    def report(self):
+        gates = ', '.join(f"{name}: -{len(tickers)}" for name, tickers in self.removed.items())
+        return f"{len(self.universe)} -> {len(self.passed)} tickers ({gates})"
+
+
+def prefilter(tickers, gates, intervals=(), source=yf):
+    """
+    Tickers passing every gate, in universe order.
+
+    intervals: extra bar intervals to download for the expensive stage
+    (panels are downloaded once per interval either way).
+    """
+    universe = list(dict.fromkeys(tickers))
+    needed = list(dict.fromkeys([i for g in gates for i in g.intervals] + list(intervals)))
+    panels = {interval: load_panel(universe, interval=interval, source=source) for interval in needed}
+
+    keep = pd.Series(True, index=universe)
+    removed = {}
+    for gate in gates:
+        loaded = set.intersection(*(set(panels[i].tickers) for i in gate.intervals))
+        result = gate.test(panels).reindex(universe)
+        # Not downloaded: left to the scanner; downloaded but no data: fails
+        result = result.where(result.index.isin(list(loaded)), True).fillna(False).astype(bool)
+        removed[gate.name] = [t for t in universe if keep[t] and not result[t]]
+        keep &= result
+    passed = [t for t in universe if keep[t]]
+    return Prefilter(universe, passed, panels, removed)
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description='Prefilter a ticker list with the CANSLIM trend gates')
+    parser.add_argument('tickers', nargs='+')
+    parser.add_argument('--max-off-high', type=float, default=0.25)
+    args = parser.parse_args()
+
+    start = time.time()
+    screen = prefilter(args.tickers, (min_history(100), above_ma(200), near_high(args.max_off_high)))
+    print(screen.report())
+    print(' '.join(screen.passed))
+    print(f"{time.time() - start:.1f}s")
@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+"""
+Scan Shards - split a large universe into shards run by independent processes
+
+- The coordinator writes the job (scanner module, universe, shard count,
+  scan parameters) to a job directory and starts local worker processes
+- Workers claim shards by creating shard_<k>.claim atomically, run the
+  scanner module's scan_shard(tickers, **params) and write the partial
+  result to shard_<k>.pkl (temp file + rename)
+- Any machine that sees the job directory (shared / network drive) can add
+  workers with `python scan_shards.py work DIR`; a running shard touches
+  its claim every HEARTBEAT seconds, and a claim untouched for STALE_CLAIM
+  seconds, or one whose local process has exited, is taken over (by the
+  coordinator's local workers too, once theirs are done)
+- When every shard is in, the module's merge_shards(universe, parts, **params)
+  builds the normal output; cross-sectional steps (RS ranking) run there on
+  the merged data, so results match a single-process scan
+- Each job gets its own subdirectory of --shard-dir (default: shards/),
+  <scanner>_<key>, keyed by the scanner source, universe, parameters and
+  scan date: rerunning an interrupted job the same day reuses the finished
+  shards. Only the files the job wrote are removed once the merge succeeds;
+  a non-empty subdirectory without a job is refused, never cleared
+
+A scanner module supports sharding by defining:
+    scan_shard(tickers, **params)        -> picklable partial result
+    merge_shards(tickers, parts, **params) -> what the scanner normally returns
+
+Usage:
+    from scan_shards import run_sharded
+
+    scanner = run_sharded('scanner_v3', tickers, shards=16)     # local cores
+    python scanner_v3.py --shards 64 --shard-dir /mnt/scans --shard-procs 8
+    python scan_shards.py work /mnt/scans                       # on another machine: every job there
+"""
+import argparse
+import importlib
+import json
+import os
+import pickle
+import socket
+import subprocess
+import sys
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from datetime import date, datetime
+
+from backtest_checkpoint import run_key
+from backtest_runner import default_workers, resolve_workers
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+SHARD_ROOT = os.path.join(SCRIPT_DIR, 'shards')
+JOB_FILE = 'job.json'
+STALE_CLAIM = 3600      # seconds without a heartbeat before a claim is taken over
+HEARTBEAT = 300         # seconds between touches of a running shard's claim
+POLL = 1.0
+MAX_RESTARTS = 2        # times dead local workers are replaced
+
+
+def add_shard_args(parser: argparse.ArgumentParser):
+    """Add the standard --shards / --shard-dir / --shard-procs flags to a script's parser."""
+    parser.add_argument('--shards', type=int,
+                        help='Split the universe into N shards run as separate processes '
+                             f'(0 = one per core [{default_workers()}])')
+    parser.add_argument('--shard-dir', help='Directory for the job (in a subdirectory of its own); share it '
+                                            'so other machines can join with: python scan_shards.py work DIR')
+    parser.add_argument('--shard-procs', type=int,
+                        help='Local worker processes (default: all cores, at most one per shard; '
+                             '-1 = none, wait for remote workers)')
+    return parser
+
+
+def split(tickers, shards):
+    """Contiguous, near-equal slices of tickers, in order."""
+    size, extra = divmod(len(tickers), shards)
+    parts, start = [], 0
+    for k in range(shards):
+        end = start + size + (1 if k < extra else 0)
+        parts.append(tickers[start:end])
+        start = end
+    return parts
+
+
+# ---------------------------------------------------------------------------
+# Job directory
+# ---------------------------------------------------------------------------
+def _path(job_dir, k, kind):
+    return os.path.join(job_dir, f"shard_{k}.{kind}")
+
+
+def load_job(job_dir):
+    with open(os.path.join(job_dir, JOB_FILE)) as f:
+        return json.load(f)
+
+
+def job_dirs(path):
+    """path when it holds a job, else its subdirectories that do (a --shard-dir)."""
+    if os.path.exists(os.path.join(path, JOB_FILE)):
+        return [path]
+    try:
+        names = sorted(os.listdir(path))
+    except OSError:
+        return []
+    return [os.path.join(path, name) for name in names
+            if os.path.exists(os.path.join(path, name, JOB_FILE))]
+
+
+def _job_files(job_dir):
+    """Files in job_dir that a job writes (job description, shard results, claims, worker logs)."""
+    try:
+        names = os.listdir(job_dir)
+    except OSError:
+        return []
+    return [os.path.join(job_dir, name) for name in names
+            if name.startswith(('shard_', JOB_FILE)) or (name.startswith('worker_') and name.endswith('.log'))]
+
+
+def remove_job(job_dir):
+    """Delete the job's own files, then its directory if nothing else is in it."""
+    for path in _job_files(job_dir):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    try:
+        os.rmdir(job_dir)
+    except OSError:
+        pass
+
+
+def create_job(scanner, tickers, shards, params=None, job_dir=None):
+    """
+    Write the job description; returns the job directory.
+
+    The job lives in <job_dir>/<scanner>_<key> (job_dir: SHARD_ROOT by
+    default). An existing job with the same key (same day) keeps its
+    finished shards (resume); a non-empty directory without a job is an
+    error rather than something to clear.
+    """
+    module = importlib.import_module(scanner)
+    params = params or {}
+    key = run_key(module.__file__, tickers=list(tickers), shards=shards, params=sorted(params.items()),
+                  day=date.today().isoformat())
+    job_dir = os.path.join(job_dir or SHARD_ROOT, f"{scanner}_{key[:12]}")
+    try:
+        job = load_job(job_dir)
+    except (OSError, ValueError):
+        job = None
+    if job is not None and job.get('key') == key:
+        for k in range(shards):
+            # Failed shards run again
+            if os.path.exists(_path(job_dir, k, 'error')):
+                for kind in ('error', 'claim'):
+                    if os.path.exists(_path(job_dir, k, kind)):
+                        os.remove(_path(job_dir, k, kind))
+        return job_dir
+    if job is None and os.path.isdir(job_dir) and os.listdir(job_dir):
+        raise FileExistsError(f"{job_dir} is not empty and holds no job; not using it")
+    remove_job(job_dir)
+    os.makedirs(job_dir, exist_ok=True)
+    job = {'key': key, 'scanner': scanner, 'shards': split(list(tickers), shards),
+           'params': params, 'created': datetime.now().isoformat()}
+    tmp = os.path.join(job_dir, f"{JOB_FILE}.{os.getpid()}.tmp")
+    with open(tmp, 'w') as f:
+        json.dump(job, f)
+    os.replace(tmp, os.path.join(job_dir, JOB_FILE))
+    return job_dir
+
+
+def _claim_dead(path):
+    """True when the claim is stale or its owner was a process on this host that has exited."""
+    try:
+        if time.time() - os.path.getmtime(path) >= STALE_CLAIM:
+            return True
+        with open(path) as f:
+            host, pid = f.read().split()[:2]
+    except (OSError, ValueError):
+        return False
+    if host != socket.gethostname():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except (PermissionError, ValueError):
+        return False
+    return False
+
+
+def claimable(job_dir, k):
+    """True when shard k has no result and no live claim."""
+    if os.path.exists(_path(job_dir, k, 'pkl')) or os.path.exists(_path(job_dir, k, 'error')):
+        return False
+    path = _path(job_dir, k, 'claim')
+    return not os.path.exists(path) or _claim_dead(path)
+
+
+def claim(job_dir, k):
+    """True when this process now owns shard k."""
+    if os.path.exists(_path(job_dir, k, 'pkl')) or os.path.exists(_path(job_dir, k, 'error')):
+        return False
+    path = _path(job_dir, k, 'claim')
+    if os.path.exists(path):
+        if not _claim_dead(path):
+            return False
+        # Owner died without a result: move its claim aside (only one taker's rename succeeds)
+        dead = f"{path}.{socket.gethostname()}.{os.getpid()}.dead"
+        try:
+            os.rename(path, dead)
+        except FileNotFoundError:
+            return False
+        if not _claim_dead(dead):
+            # Another worker took it over in between: give its claim back
+            try:
+                os.link(dead, path)
+            except FileExistsError:
+                pass
+            os.remove(dead)
+            return False
+        os.remove(dead)
+    try:
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except (FileExistsError, FileNotFoundError):     # claimed, or the job was merged and removed
+        return False
+    with os.fdopen(fd, 'w') as f:
+        f.write(f"{socket.gethostname()} {os.getpid()} {datetime.now().isoformat()}\n")
+    return True
+
+
+@contextmanager
+def _heartbeat(path, every=HEARTBEAT):
+    """Touch the claim at path while the block runs, so a long shard isn't taken for stale."""
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(every):
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+
+    thread = threading.Thread(target=beat, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def _write(path, data, mode='wb'):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, mode) as f:
+        if 'b' in mode:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        else:
+            f.write(data)
+    os.replace(tmp, path)
+
+
+def work(path, wait=0):
+    """
+    Claim and run shards until none are left; number of shards run.
+
+    path: a job directory, or a --shard-dir (every job in it).
+    """
+    deadline = time.time() + wait
+    while not job_dirs(path):
+        if time.time() >= deadline:
+            raise FileNotFoundError(f"No job in {path}")
+        time.sleep(POLL)
+    done = 0
+    for job_dir in job_dirs(path):
+        try:
+            job = load_job(job_dir)
+        except (OSError, ValueError):
+            continue        # merged and removed meanwhile
+        done += _work_job(job_dir, job)
+    return done
+
+
+def _work_job(job_dir, job):
+    """Claim and run shards of one job until none are left; number of shards run."""
+    module = importlib.import_module(job['scanner'])
+    done = 0
+    for k, tickers in enumerate(job['shards']):
+        if not claim(job_dir, k):
+            continue
+        start = time.time()
+        print(f"[shard {k + 1}/{len(job['shards'])}] {len(tickers)} tickers", flush=True)
+        try:
+            with _heartbeat(_path(job_dir, k, 'claim')):
+                part = module.scan_shard(tickers, **job['params'])
+        except Exception:
+            _write(_path(job_dir, k, 'error'), traceback.format_exc(), mode='w')
+            print(f"[shard {k + 1}] failed", flush=True)
+            continue
+        _write(_path(job_dir, k, 'pkl'), part)
+        print(f"[shard {k + 1}] done in {time.time() - start:.1f}s", flush=True)
+        done += 1
+    return done
+
+
+def _start_workers(job_dir, procs):
+    logs, workers = [], []
+    for i in range(procs):
+        log = open(os.path.join(job_dir, f"worker_{i}.log"), 'a')
+        workers.append(subprocess.Popen([sys.executable, os.path.abspath(__file__), 'work', job_dir],
+                                        stdout=log, stderr=subprocess.STDOUT, cwd=os.getcwd()))
+        logs.append(log)
+    return workers, logs
+
+
+def run_sharded(scanner, tickers, shards=0, params=None, job_dir=None, procs=None, on_shard=None):
+    """
+    Run `scanner` (module name) over tickers in shards; its merge_shards() output.
+
+    shards: number of shards (0 = one per core). procs: local worker
+    processes (None = all cores, at most one per shard; -1 = none).
+    on_shard(k, part) is called as each shard's partial result comes in.
+    """
+    tickers = list(tickers)
+    shards = max(1, min(resolve_workers(shards), len(tickers) or 1))
+    params = params or {}
+    job_dir = create_job(scanner, tickers, shards, params, job_dir)
+    module = importlib.import_module(scanner)
+    print(f"Sharded scan: {len(tickers)} tickers in {shards} shards ({job_dir})")
+
+    if procs is None or procs == 0:
+        procs = resolve_workers(procs)
+    procs = min(procs, shards)
+    workers, logs = _start_workers(job_dir, procs) if procs > 0 else ([], [])
+
+    parts = {}
+    restarts = 0
+    waiting = False
+    try:
+        while len(parts) < shards:
+            for k in range(shards):
+                if k in parts:
+                    continue
+                if os.path.exists(_path(job_dir, k, 'error')):
+                    with open(_path(job_dir, k, 'error')) as f:
+                        raise RuntimeError(f"Shard {k + 1}/{shards} failed:\n{f.read()}")
+                if os.path.exists(_path(job_dir, k, 'pkl')):
+                    with open(_path(job_dir, k, 'pkl'), 'rb') as f:
+                        parts[k] = pickle.load(f)
+                    print(f"  Shard {k + 1}/{shards} in ({len(parts)}/{shards})", flush=True)
+                    if on_shard:
+                        on_shard(k, parts[k])
+            if len(parts) < shards:
+                # Checked on every poll while no local worker runs: a local worker that died
+                # mid-shard, or a remote one whose claim went stale, leaves shards to take over
+                if procs > 0 and all(w.poll() is not None for w in workers):
+                    for log in logs:
+                        log.close()
+                    workers, logs = [], []
+                    left = [k for k in range(shards) if k not in parts and claimable(job_dir, k)]
+                    if left and restarts < MAX_RESTARTS:
+                        restarts += 1
+                        waiting = False
+                        workers, logs = _start_workers(job_dir, min(procs, len(left)))
+                    elif left:
+                        raise RuntimeError(f"Shards {[k + 1 for k in left]} were not finished "
+                                           f"(worker logs in {job_dir})")
+                    elif not waiting:
+                        waiting = True
+                        print(f"  Waiting for {shards - len(parts)} shard(s) claimed elsewhere...", flush=True)
+                time.sleep(POLL)
+    finally:
+        for w in workers:
+            if w.poll() is None:
+                w.terminate()
+        for log in logs:
+            log.close()
+
+    result = module.merge_shards(tickers, [parts[k] for k in range(shards)], **params)
+    # Done: the next run scans again instead of loading these shards
+    remove_job(job_dir)
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Sharded scan worker')
+    sub = parser.add_subparsers(dest='command')
+    p_work = sub.add_parser('work', help='Run shards of a job directory (or of every job in a '
+                                         '--shard-dir) until none are left')
+    p_work.add_argument('job_dir')
+    p_work.add_argument('--wait', type=float, default=0, help='Seconds to wait for the job to appear')
+    args = parser.parse_args()
+
+    if args.command == 'work':
+        n = work(args.job_dir, wait=args.wait)
+        print(f"{n} shard(s) run by {socket.gethostname()} {os.getpid()}")
+    else:
+        parser.print_help()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Scan Stream - typed, versioned JSONL output for scanner runs
+
+- One JSON record per line, flushed as soon as it is written, so the file
+  can be tailed while a long scan is still running
+- Record types (every record carries 'type' and 'version'):
+    start    scanner, timestamp, universe_size
+    ticker   ticker, status ('match' / 'none' / 'error'), result, error
+             (written as each ticker finishes; the score is before the
+             RS ranking pass)
+    summary  ScanSession.to_dict(): market, sectors, segments and the
+             final ranked results
+- Readers only consume complete lines (a line being written is left for
+  the next read) and skip records from a newer schema version
+- Values are made JSON-safe on write: numpy scalars -> Python numbers,
+  timestamps -> ISO strings, NaN -> null
+
+Usage:
+    from scan_stream import ScanWriter, load_scan, latest_scan_file
+
+    with ScanWriter('scan_results_2025-01-02_0930.jsonl', 'scanner_v3', universe_size=70) as out:
+        out.ticker('NVDA', result)
+        out.summary(session.to_dict())
+
+    scan = load_scan(latest_scan_file('.'))     # one read, no parsing of text
+    scan['results'], scan['complete']
+
+    records, offset = read_records(path, offset)   # tail: only new records
+"""
+import glob
+import json
+import math
+import os
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+SCHEMA_VERSION = 1
+FILE_PATTERN = 'scan_results_*.jsonl'
+
+
+def jsonable(value):
+    """Copy of value with numpy / pandas / datetime types made JSON-safe."""
+    if isinstance(value, dict):
+        return {str(k): jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        return [jsonable(v) for v in value]
+    if isinstance(value, np.ndarray):
+        return [jsonable(v) for v in value.tolist()]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if isinstance(value, (pd.Timestamp, datetime, date)):
+        return value.isoformat()
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+class ScanWriter:
+    """Appends records of one scan run to a JSONL file."""
+
+    def __init__(self, path, scanner, timestamp=None, **info):
+        self.path = path
+        self.file = open(path, 'w', encoding='utf-8')
+        timestamp = timestamp or datetime.now()
+        self.write('start', scanner=scanner, timestamp=timestamp, **info)
+
+    def write(self, record_type, **fields):
+        record = {'type': record_type, 'version': SCHEMA_VERSION}
+        record.update(jsonable(fields))
+        self.file.write(json.dumps(record) + '\n')
+        self.file.flush()
+
+    def ticker(self, ticker, result=None, error=None):
+        """One finished ticker (result None: below the criteria or failed)."""
+        status = 'error' if error else ('match' if result else 'none')
+        self.write('ticker', ticker=ticker, status=status, result=result, error=error)
+
+    def summary(self, session):
+        """Final record: a ScanSession.to_dict()."""
+        self.write('summary', **session)
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_records(path, offset=0):
+    """
+    (records, next offset) of the complete lines after byte `offset`.
+
+    Pass the returned offset to the next call to tail a running scan.
+    """
+    records = []
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        data = f.read()
+    end = data.rfind(b'\n') + 1     # a partly written last line waits
+    for line in data[:end].splitlines():
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if record.get('version', 0) > SCHEMA_VERSION:
+            continue
+        records.append(record)
+    return records, offset + end
+
+
+def load_scan(path):
+    """
+    Everything recorded for one scan:
+    {'start', 'tickers', 'summary', 'results', 'complete'}
+
+    results are the summary's final results, or the matches streamed so
+    far while the scan is still running (complete False).
+    """
+    records, _ = read_records(path)
+    scan = {'path': path, 'start': None, 'tickers': [], 'summary': None}
+    for record in records:
+        if record['type'] == 'start':
+            scan['start'] = record
+        elif record['type'] == 'ticker':
+            scan['tickers'].append(record)
+        elif record['type'] == 'summary':
+            scan['summary'] = record
+    scan['complete'] = scan['summary'] is not None
+    if scan['complete']:
+        scan['results'] = scan['summary'].get('results', [])
+    else:
+        scan['results'] = [r['result'] for r in scan['tickers'] if r.get('result')]
+    return scan
+
+
+def latest_scan_file(directory):
+    """Newest scan_results_*.jsonl in directory, None when there is none."""
+    files = sorted(glob.glob(os.path.join(directory, FILE_PATTERN)), reverse=True)
+    return files[0] if files else None
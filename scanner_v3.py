@@ -2,17 +2,77 @@
 """
 William O'Neil / Chris Kacher Stock Scanner v2
 Implements exact CANSLIM methodology with precise pattern detection
+
+Concurrent scan (--workers N): downloads and fundamentals are fetched on a
+thread pool, pattern detection runs on a process pool (at most N at a time,
+so the per-ticker timeout counts running time, not queueing). Results are
+merged in universe order, so they match a serial scan. A timed-out ticker is
+reported and its result ignored: a stuck fetch thread is abandoned (daemon,
+it can't block exit) and stuck detections are killed with the pool.
+
+Results are written as text (scan_results_*.txt) and streamed as JSONL
+(scan_results_*.jsonl, see scan_stream): one record per ticker as it
+finishes, then a summary record with the ranked results.
+
+Prefilter (scan_prefilter): one batch download of the universe, then
+PREFILTER_GATES drop tickers before fundamentals and pattern detection.
+By default they only drop what the scan would reject anyway (under 100
+bars), so the results are unchanged; --trend-template also requires the
+price above the 200-day MA and within 25% of the 52-week high, which cuts
+a large universe down but drops e.g. pocket pivots below the 200-day.
+Survivors reuse the batch bars; every ticker still counts for RS ranking.
+
+Sharded (--shards N, see scan_shards): the universe is split into N
+shards scanned by separate processes (or machines sharing --shard-dir);
+their results and RS performances are merged and ranked as one universe.
+
+Usage:
+    python scanner_v3.py                          # large_watchlist.txt or defaults
+    python scanner_v3.py NVDA PLTR --workers 8 --timeout 60
+    python scanner_v3.py --no-prefilter           # full work for every ticker
+    python scanner_v3.py --trend-template         # only leaders above the 200-day MA
+    python scanner_v3.py --shards 0               # one shard per core
 """
 
+import argparse
+import multiprocessing as mp
+import queue
+import sys
+import threading
+import time
+from collections import deque
 import yfinance as yf
 import pandas as pd
 import numpy as np
 from ta.volatility import BollingerBands, KeltnerChannel, AverageTrueRange
 from ta.trend import EMAIndicator
+from concurrent.futures import Future, wait, FIRST_COMPLETED
 from datetime import datetime
 import warnings
 warnings.filterwarnings('ignore')
 
+from backtest_runner import add_workers_arg, resolve_workers
+from rs_rating import weighted_performance, rs_ratings
+from rs_table import get_rs_table
+from scan_prefilter import prefilter, min_history, above_ma, near_high
+from scan_shards import add_shard_args, run_sharded
+from scan_stream import ScanWriter
+
+SCAN_TIMEOUT = 120  # seconds per ticker and stage (fetch / detection)
+
+# Cheap whole-universe gates before the per-ticker scan: only conditions
+# fetch_stock / analyze_stock require, so the results are unchanged
+PREFILTER_GATES = (min_history(100),)
+# Opt-in (--trend-template): leaders trade above the 200-day MA, near their highs
+TREND_TEMPLATE_GATES = (above_ma(200), near_high(0.25))
+
+
+def scan_gates(prefilter=True, trend_template=False):
+    """Prefilter gates for the command line options (empty: scan every ticker)"""
+    if not prefilter:
+        return ()
+    return PREFILTER_GATES + (TREND_TEMPLATE_GATES if trend_template else ())
+
 
 def clean_dataframe(df):
     """
@@ -37,10 +97,19 @@ def clean_dataframe(df):
 
 
 class CANSLIMScanner:
-    def __init__(self, universe):
+    def __init__(self, universe, gates=PREFILTER_GATES):
         self.universe = universe
+        self.gates = gates  # prefilter gates (empty: scan every ticker)
+        self.screen = None  # Prefilter of the last scan: panels + survivors
         self.results = []
         self.all_stocks_data = {}  # Cache for RS calculation
+        self.info_cache = {}  # yf .info per ticker, shared by fundamentals and sectors
+    
+    def get_info(self, ticker):
+        """yf.Ticker(ticker).info, fetched once per scanner"""
+        if ticker not in self.info_cache:
+            self.info_cache[ticker] = yf.Ticker(ticker).info
+        return self.info_cache[ticker]
     
     def calculate_rs_rating(self, ticker, df):
         """
@@ -50,26 +119,8 @@ class CANSLIMScanner:
         if len(df) < 252:  # Need 1 year of data
             return 0
         
-        # Define quarters (60 trading days each)
-        q1_start, q1_end = -63, -1      # 0-3 months (most recent)
-        q2_start, q2_end = -126, -64    # 3-6 months
-        q3_start, q3_end = -189, -127   # 6-9 months
-        q4_start, q4_end = -252, -190   # 9-12 months
-        
-        # Calculate ROC for each quarter
-        def calc_roc(start, end):
-            try:
-                return (df['Close'].iloc[end] / df['Close'].iloc[start]) - 1
-            except:
-                return 0
-        
-        q1_roc = calc_roc(q1_start, q1_end)
-        q2_roc = calc_roc(q2_start, q2_end)
-        q3_roc = calc_roc(q3_start, q3_end)
-        q4_roc = calc_roc(q4_start, q4_end)
-        
-        # Weighted performance (Q1 gets double weight: 40%)
-        weighted_perf = (q1_roc * 0.40) + (q2_roc * 0.20) + (q3_roc * 0.20) + (q4_roc * 0.20)
+        # Weighted 4-quarter performance (Q1 gets double weight: 40%)
+        weighted_perf = weighted_performance(df['Close'].values)
         
         # Store for universe comparison
         self.all_stocks_data[ticker] = weighted_perf
@@ -77,10 +128,24 @@ class CANSLIMScanner:
         return weighted_perf
     
     def rank_rs_ratings(self):
-        """Convert weighted performance to percentile rankings (0-100)"""
+        """
+        Convert weighted performance to percentile rankings (0-100)
+        
+        Ranked against the rs_table reference universe when a fresh table
+        exists, otherwise within the scanned universe.
+        """
         if not self.all_stocks_data:
             return
         
+        # Nightly universe table: a true percentile for any scan size
+        table = get_rs_table()
+        if table is not None:
+            ratings = table.rank({r['ticker']: self.all_stocks_data.get(r['ticker'], 0)
+                                  for r in self.results})
+            for result in self.results:
+                result['rs_rating'] = ratings[result['ticker']]
+            return
+        
         performances = list(self.all_stocks_data.values())
         
         # Need at least 20 stocks for meaningful RS rankings
@@ -105,13 +170,10 @@ class CANSLIMScanner:
                     result['rs_rating'] = 30
             return
         
+        # Percentile rank within the universe (sort + searchsorted)
+        ratings = rs_ratings(self.all_stocks_data, [r['ticker'] for r in self.results])
         for result in self.results:
-            ticker = result['ticker']
-            perf = self.all_stocks_data.get(ticker, 0)
-            
-            # Calculate percentile rank
-            rank = sum(1 for p in performances if p < perf) / len(performances) * 100
-            result['rs_rating'] = int(rank)
+            result['rs_rating'] = ratings[result['ticker']]
     
     def detect_cup_with_handle(self, df, min_weeks=7, max_weeks=65):
         """
@@ -449,7 +511,7 @@ class CANSLIMScanner:
         """Check CANSLIM fundamentals + earnings proximity"""
         try:
             stock = yf.Ticker(ticker)
-            info = stock.info
+            info = self.get_info(ticker)
             
             scores = {}
             
@@ -577,8 +639,7 @@ class CANSLIMScanner:
             score = result['score']
             
             try:
-                stock = yf.Ticker(ticker)
-                info = stock.info
+                info = self.get_info(ticker)
                 sector = info.get('sector', 'Unknown')
                 
                 if sector not in sector_scores:
@@ -606,121 +667,275 @@ class CANSLIMScanner:
         
         return sector_analysis
 
+    def fetch_stock(self, ticker):
+        """I/O part of a scan: (price history, fundamentals), or (None, None) if too short"""
+        # 2 years of data for proper RS calculation (from the prefilter batch when there)
+        df = self.screen.frame(ticker) if self.screen else None
+        if df is None:
+            df = yf.download(ticker, period='2y', progress=False)
+        
+        # Clean DataFrame using utility function
+        df = clean_dataframe(df)
+        
+        if len(df) < 100:
+            return None, None
+        
+        return df, self.check_fundamentals(ticker)
+    
     def scan_stock(self, ticker):
         """Run full CANSLIM scan on a single stock"""
+        return self._scan_stock(ticker)[0]
+    
+    def _scan_stock(self, ticker):
+        """scan_stock() as (result, error message or None)"""
         try:
-            # Download 2 years of data for proper RS calculation
-            df = yf.download(ticker, period='2y', progress=False)
-            
-            # Clean DataFrame using utility function
-            df = clean_dataframe(df)
-            
-            if len(df) < 100:
-                return None
-            
-            # Calculate RS rating (will be ranked later)
-            rs_perf = self.calculate_rs_rating(ticker, df)
-            
-            # Pattern detection
-            cup_handle = self.detect_cup_with_handle(df)
-            flat_base = self.detect_flat_base(df)
-            pocket_pivot = self.detect_pocket_pivot(df)
-            high_tight_flag = self.detect_high_tight_flag(df)
-            ascending_base = self.detect_ascending_base(df)
-            
-            # Volume analysis
-            volume_breakout, volume_ratio = self.check_volume_breakout(df)
-            
-            # Fundamentals
-            fundamentals = self.check_fundamentals(ticker)
-            
-            # Score the setup
-            score = 0
-            signals = []
-            patterns = []
-            
-            # Pattern signals
-            if cup_handle:
-                score += 4
-                signals.append(f"Cup with Handle ({cup_handle['cup_depth']:.1f}% cup, {cup_handle['handle_depth']:.1f}% handle)")
-                patterns.append(cup_handle)
-            
-            if flat_base:
-                score += 3
-                signals.append(f"Flat Base ({flat_base['correction']:.1f}% range, {flat_base['weeks']:.0f} weeks)")
-                patterns.append(flat_base)
-            
-            if pocket_pivot:
-                score += 3
-                signals.append(f"Pocket Pivot ({pocket_pivot['type']}, {pocket_pivot['volume_ratio']:.1f}x volume)")
-                patterns.append(pocket_pivot)
-            
-            if high_tight_flag:
-                score += 4  # Rare and powerful
-                signals.append(f"High Tight Flag ({high_tight_flag['prior_advance']:.1f}% advance, {high_tight_flag['consolidation_depth']:.1f}% pullback)")
-                patterns.append(high_tight_flag)
-            
-            if ascending_base:
-                score += 3
-                signals.append(f"Ascending Base ({ascending_base['num_lows']} higher lows)")
-                patterns.append(ascending_base)
-            
-            if volume_breakout:
-                score += 1
-                signals.append(f"Volume Breakout ({volume_ratio:.1f}x avg)")
-            
-            # Fundamental signals
-            if fundamentals.get('eps_growth', 0) > 25:
-                score += 2
-                signals.append(f"EPS Growth {fundamentals['eps_growth']:.0f}%")
-            
-            if fundamentals.get('roe', 0) > 17:
-                score += 1
-                signals.append(f"ROE {fundamentals['roe']:.1f}%")
-            
-            # Earnings proximity warning
-            if fundamentals.get('earnings_warning'):
-                signals.append(f"⚠️ EARNINGS IN {fundamentals.get('days_to_earnings', '?')} DAYS ({fundamentals.get('earnings_date', '?')})")
-            
-            # RS will be scored after universe ranking
-            
-            # Cap score at 12
-            score = min(score, 12)
-            
-            # Only return stocks with meaningful signals
-            if score >= 3:
-                return {
-                    'ticker': ticker,
-                    'score': score,
-                    'signals': signals,
-                    'patterns': patterns,
-                    'price': df['Close'].iloc[-1],
-                    'volume_ratio': volume_ratio,
-                    'fundamentals': fundamentals,
-                    'rs_performance': rs_perf
-                }
-            
-            return None
+            df, fundamentals = self.fetch_stock(ticker)
+            if df is None:
+                return None, None
+            return self.analyze_stock(ticker, df, fundamentals), None
             
         except Exception as e:
             print(f"Error scanning {ticker}: {e}")
-            return None
+            return None, str(e)
     
-    def scan(self):
-        """Scan entire universe"""
-        print(f"Scanning {len(self.universe)} stocks...")
-        print("This may take a few minutes...\n")
+    def analyze_stock(self, ticker, df, fundamentals):
+        """CPU part of a scan: RS, patterns and scoring on fetched data"""
+        # Calculate RS rating (will be ranked later)
+        rs_perf = self.calculate_rs_rating(ticker, df)
+        
+        # Pattern detection
+        cup_handle = self.detect_cup_with_handle(df)
+        flat_base = self.detect_flat_base(df)
+        pocket_pivot = self.detect_pocket_pivot(df)
+        high_tight_flag = self.detect_high_tight_flag(df)
+        ascending_base = self.detect_ascending_base(df)
+        
+        # Volume analysis
+        volume_breakout, volume_ratio = self.check_volume_breakout(df)
+        
+        # Score the setup
+        score = 0
+        signals = []
+        patterns = []
+        
+        # Pattern signals
+        if cup_handle:
+            score += 4
+            signals.append(f"Cup with Handle ({cup_handle['cup_depth']:.1f}% cup, {cup_handle['handle_depth']:.1f}% handle)")
+            patterns.append(cup_handle)
+        
+        if flat_base:
+            score += 3
+            signals.append(f"Flat Base ({flat_base['correction']:.1f}% range, {flat_base['weeks']:.0f} weeks)")
+            patterns.append(flat_base)
+        
+        if pocket_pivot:
+            score += 3
+            signals.append(f"Pocket Pivot ({pocket_pivot['type']}, {pocket_pivot['volume_ratio']:.1f}x volume)")
+            patterns.append(pocket_pivot)
+        
+        if high_tight_flag:
+            score += 4  # Rare and powerful
+            signals.append(f"High Tight Flag ({high_tight_flag['prior_advance']:.1f}% advance, {high_tight_flag['consolidation_depth']:.1f}% pullback)")
+            patterns.append(high_tight_flag)
+        
+        if ascending_base:
+            score += 3
+            signals.append(f"Ascending Base ({ascending_base['num_lows']} higher lows)")
+            patterns.append(ascending_base)
+        
+        if volume_breakout:
+            score += 1
+            signals.append(f"Volume Breakout ({volume_ratio:.1f}x avg)")
+        
+        # Fundamental signals
+        if fundamentals.get('eps_growth', 0) > 25:
+            score += 2
+            signals.append(f"EPS Growth {fundamentals['eps_growth']:.0f}%")
+        
+        if fundamentals.get('roe', 0) > 17:
+            score += 1
+            signals.append(f"ROE {fundamentals['roe']:.1f}%")
+        
+        # Earnings proximity warning
+        if fundamentals.get('earnings_warning'):
+            signals.append(f"⚠️ EARNINGS IN {fundamentals.get('days_to_earnings', '?')} DAYS ({fundamentals.get('earnings_date', '?')})")
+        
+        # RS will be scored after universe ranking
+        
+        # Cap score at 12
+        score = min(score, 12)
+        
+        # Only return stocks with meaningful signals
+        if score >= 3:
+            return {
+                'ticker': ticker,
+                'score': score,
+                'signals': signals,
+                'patterns': patterns,
+                'price': df['Close'].iloc[-1],
+                'volume_ratio': volume_ratio,
+                'fundamentals': fundamentals,
+                'rs_performance': rs_perf
+            }
         
-        # First pass: collect all data and RS performances
-        for i, ticker in enumerate(self.universe):
-            if (i + 1) % 10 == 0:
-                print(f"  Progress: {i+1}/{len(self.universe)}")
+        return None
+    
+    def prefilter(self, on_ticker=None):
+        """
+        Tickers passing self.gates, from one batch download of the universe.
+        
+        Rejected tickers are reported to on_ticker as finished without a
+        result; their RS performance still joins the ranking universe.
+        """
+        self.screen = prefilter(self.universe, self.gates)
+        print(f"Prefilter: {self.screen.report()}")
+        for ticker in self.screen.rejected():
+            df = self.screen.frame(ticker)
+            if df is not None and len(df) >= 252:
+                self.all_stocks_data[ticker] = weighted_performance(df['Close'].values)
+            if on_ticker:
+                on_ticker(ticker, None, None)
+        return self.screen.passed
+    
+    def _scan_concurrent(self, workers, timeout, on_ticker=None, tickers=None):
+        """
+        First pass on pools: fetches on `workers` threads, detection on up to
+        `workers` processes. Returns {index in tickers: (result, rs_perf)}.
+        
+        on_ticker(ticker, result, error) is called as each ticker finishes.
+        """
+        universe = list(self.universe if tickers is None else tickers)
+        outcomes = {}
+        pending = {}    # future -> (index, ticker, stage)
+        started = {}    # (index, stage) -> start time
+        ready = deque() # fetched (index, ticker, df, fundamentals) waiting for a free process
+        busy = set()    # detections still running, timed-out ones included
+        finished = 0
+        
+        def fetch(i, ticker):
+            started[(i, 'fetch')] = time.time()
+            return self.fetch_stock(ticker)
+        
+        io_pool = _DaemonPool(workers)
+        # Not fork: the fetch threads may hold ssl / logging / urllib3 locks
+        # when the first worker starts, and a forked child would inherit them held
+        context = mp.get_context('forkserver' if sys.platform.startswith('linux') else None)
+        cpu_pool = context.Pool(workers)
+        try:
+            for i, ticker in enumerate(universe):
+                pending[io_pool.submit(fetch, i, ticker)] = (i, ticker, 'fetch')
             
-            result = self.scan_stock(ticker)
-            if result:
-                self.results.append(result)
+            while pending or ready:
+                # Detections start only on a free process, so started[] is
+                # when they really run
+                busy = {job for job in busy if not job.done()}
+                if ready and len(busy) >= workers and not busy & pending.keys():
+                    # Every process is stuck on a timed-out detection
+                    cpu_pool.terminate()
+                    cpu_pool, busy = context.Pool(workers), set()
+                while ready and len(busy) < workers:
+                    i, ticker, df, fundamentals = ready.popleft()
+                    started[(i, 'detect')] = time.time()
+                    job = _submit(cpu_pool, _analyze_stock, ticker, df, fundamentals)
+                    pending[job] = (i, ticker, 'detect')
+                    busy.add(job)
+                
+                done, _ = wait(pending, timeout=1.0, return_when=FIRST_COMPLETED)
+                for future in done:
+                    i, ticker, stage = pending.pop(future)
+                    try:
+                        value = future.result()
+                    except Exception as e:
+                        value, stage = None, f"error: {e}"
+                    
+                    if stage == 'fetch' and value[0] is not None:
+                        ready.append((i, ticker) + tuple(value))
+                        continue
+                    
+                    result, error = None, None
+                    if stage == 'detect':
+                        result, rs_perf, error = value
+                        if error:
+                            print(f"Error scanning {ticker}: {error}")
+                        outcomes[i] = (result, rs_perf)
+                    elif stage != 'fetch':
+                        error = stage[len('error: '):]
+                        print(f"Error scanning {ticker}: {error}")
+                    if on_ticker:
+                        on_ticker(ticker, result, error)
+                    finished += 1
+                    if finished % 10 == 0:
+                        print(f"  Progress: {finished}/{len(universe)}")
+                
+                # Per-ticker timeout: stop waiting on stuck fetches / detections.
+                # The work itself keeps running (a fetch thread can't be
+                # stopped); its result is ignored
+                now = time.time()
+                for future, (i, ticker, stage) in list(pending.items()):
+                    if now - started.get((i, stage), now) > timeout:
+                        del pending[future]
+                        if stage == 'fetch':
+                            io_pool.add_thread()    # replaces the stuck one
+                        print(f"Timeout scanning {ticker} ({stage} > {timeout}s, result ignored)")
+                        if on_ticker:
+                            on_ticker(ticker, None, f"timeout ({stage} > {timeout}s)")
+                        finished += 1
+        finally:
+            io_pool.shutdown()
+            # Kills detections still running (timed out or abandoned)
+            cpu_pool.terminate()
+        
+        return outcomes
+    
+    def scan(self, workers=1, timeout=SCAN_TIMEOUT, on_ticker=None):
+        """
+        Scan entire universe
+        
+        workers > 1 (0 = all cores) fetches and detects concurrently; the
+        merged results are the same as a serial scan.
         
-        # Second pass: rank RS ratings
+        on_ticker(ticker, result, error) is called as each ticker finishes
+        (e.g. ScanWriter.ticker to stream results), before RS ranking.
+        
+        Only tickers passing the prefilter gates (if any) are scanned.
+        """
+        self.collect(workers, timeout, on_ticker)
+        return self.rank()
+    
+    def collect(self, workers=1, timeout=SCAN_TIMEOUT, on_ticker=None):
+        """First pass of scan(): results and RS performances, not ranked yet"""
+        tickers = self.prefilter(on_ticker) if self.gates else list(self.universe)
+        print(f"Scanning {len(tickers)} stocks...")
+        print("This may take a few minutes...\n")
+        
+        # First pass: collect all data and RS performances
+        if workers == 1:
+            for i, ticker in enumerate(tickers):
+                if (i + 1) % 10 == 0:
+                    print(f"  Progress: {i+1}/{len(tickers)}")
+                
+                result, error = self._scan_stock(ticker)
+                if on_ticker:
+                    on_ticker(ticker, result, error)
+                if result:
+                    self.results.append(result)
+        else:
+            workers = resolve_workers(workers)
+            print(f"Using {workers} workers ({timeout}s timeout per ticker)\n")
+            outcomes = self._scan_concurrent(workers, timeout, on_ticker, tickers)
+            # Merge in universe order, as the serial loop would
+            for i, ticker in enumerate(tickers):
+                if i not in outcomes:
+                    continue
+                result, rs_perf = outcomes[i]
+                if rs_perf is not None:
+                    self.all_stocks_data[ticker] = rs_perf
+                if result:
+                    self.results.append(result)
+    
+    def rank(self):
+        """Second pass of scan(): RS ratings across everything collected, then sort"""
         print("\nRanking relative strength...")
         self.rank_rs_ratings()
         
@@ -739,18 +954,26 @@ class CANSLIMScanner:
         
         return self.results
     
-    def print_results(self, max_results=25):
-        """Print scan results with market context and segmentation"""
+    def print_results(self, max_results=25, session=None):
+        """
+        Print scan results with market context and segmentation
+        
+        session: ScanSession to render from (a fresh one by default), so
+        repeated renders don't refetch market and sector data.
+        """
+        if session is None:
+            session = ScanSession(self)
+        
         print("\n" + "="*80)
         print("                    CANSLIM STOCK SCANNER v3")
         print("              O'Neil / Kacher Methodology - Enhanced")
-        print("                    " + datetime.now().strftime("%Y-%m-%d %H:%M"))
+        print("                    " + session.timestamp.strftime("%Y-%m-%d %H:%M"))
         print("="*80)
         
         # Market timing
         print("\n📊 MARKET TIMING")
         print("-" * 80)
-        market = self.check_market_timing()
+        market = session.market
         print(f"S&P 500: ${market.get('sp500_price', 0):.2f}")
         print(f"Above 21-day MA: {'✓' if market.get('above_21ma') else '✗'}")
         print(f"Above 50-day MA: {'✓' if market.get('above_50ma') else '✗'}")
@@ -761,7 +984,7 @@ class CANSLIMScanner:
         # Industry group analysis
         print("\n🏭 INDUSTRY GROUP STRENGTH")
         print("-" * 80)
-        sectors = self.analyze_industry_groups(self.results)
+        sectors = session.sectors
         for sector in sectors[:5]:  # Top 5 sectors
             print(f"  {sector['sector']}: Avg Score {sector['avg_score']} ({sector['count']} stocks) - {sector['strength']}")
         
@@ -769,26 +992,7 @@ class CANSLIMScanner:
             print("\nNo stocks met the criteria.")
             return
         
-        # Segment results — each stock appears in ONE section only (highest priority)
-        breakouts_now = []
-        bases_forming = []
-        pocket_pivots = []
-        seen = set()
-        
-        for r in self.results:
-            ticker = r['ticker']
-            if ticker in seen:
-                continue
-            pattern_names = [p.get('pattern') for p in r.get('patterns', [])]
-            if any(p in ['Cup with Handle', 'High Tight Flag'] for p in pattern_names):
-                breakouts_now.append(r)
-                seen.add(ticker)
-            elif any(p in ['Flat Base', 'Ascending Base'] for p in pattern_names):
-                bases_forming.append(r)
-                seen.add(ticker)
-            elif any(p == 'Pocket Pivot' for p in pattern_names):
-                pocket_pivots.append(r)
-                seen.add(ticker)
+        breakouts_now, bases_forming, pocket_pivots = session.segments
         
         # Breakouts Now
         if breakouts_now:
@@ -837,6 +1041,170 @@ class CANSLIMScanner:
             print(f"    → Buy point: ${bp:.2f}")
 
 
+class _DaemonPool:
+    """
+    Thread pool of daemon threads for the concurrent scan's fetches: a fetch
+    stuck in a download can't be stopped, but it doesn't block interpreter
+    exit the way ThreadPoolExecutor's joined workers do.
+    """
+
+    def __init__(self, workers):
+        self.jobs = queue.Queue()
+        self.threads = 0
+        for _ in range(workers):
+            self.add_thread()
+
+    def add_thread(self):
+        threading.Thread(target=self._run, daemon=True).start()
+        self.threads += 1
+
+    def _run(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            future, fn, args = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(*args))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def submit(self, fn, *args):
+        future = Future()
+        self.jobs.put((future, fn, args))
+        return future
+
+    def shutdown(self):
+        """Cancel queued jobs and let idle threads exit (stuck ones are left behind)."""
+        while True:
+            try:
+                job = self.jobs.get_nowait()
+            except queue.Empty:
+                break
+            if job is not None:
+                job[0].cancel()
+        for _ in range(self.threads):
+            self.jobs.put(None)
+
+
+def _submit(pool, fn, *args):
+    """multiprocessing pool.apply_async as a concurrent.futures Future (for wait())."""
+    future = Future()
+    future.set_running_or_notify_cancel()
+    pool.apply_async(fn, args, callback=future.set_result, error_callback=future.set_exception)
+    return future
+
+
+def _analyze_stock(ticker, df, fundamentals):
+    """Process-pool job: (result, rs_perf or None, error) for one fetched ticker"""
+    scanner = CANSLIMScanner([ticker])
+    try:
+        result, error = scanner.analyze_stock(ticker, df, fundamentals), None
+    except Exception as e:
+        result, error = None, str(e)
+    return result, scanner.all_stocks_data.get(ticker), error
+
+
+def scan_shard(tickers, workers=1, timeout=SCAN_TIMEOUT, prefilter=True, trend_template=False):
+    """scan_shards job: first pass over one shard of the universe (not RS-ranked)"""
+    scanner = CANSLIMScanner(tickers, gates=scan_gates(prefilter, trend_template))
+    outcomes = []
+    scanner.collect(workers, timeout, on_ticker=lambda *outcome: outcomes.append(outcome))
+    # .info of the results, for the sector summary
+    info = {r['ticker']: scanner.info_cache[r['ticker']] for r in scanner.results
+            if r['ticker'] in scanner.info_cache}
+    return {'results': scanner.results, 'rs': scanner.all_stocks_data,
+            'outcomes': outcomes, 'info': info}
+
+
+def merge_shards(tickers, parts, **params):
+    """scan_shards merge: a scanner holding every shard's results, RS-ranked across all of them"""
+    scanner = CANSLIMScanner(tickers)
+    for part in parts:
+        scanner.results.extend(part['results'])
+        scanner.all_stocks_data.update(part['rs'])
+        scanner.info_cache.update(part['info'])
+    scanner.rank()
+    return scanner
+
+
+class ScanSession:
+    """
+    Everything one scan run reports, computed once: market timing, sector
+    strength and result segments. Renderers (console, text file, JSON)
+    all format from the same session instead of refetching.
+    """
+    
+    def __init__(self, scanner):
+        self.scanner = scanner
+        self.timestamp = datetime.now()
+        self._market = None
+        self._sectors = None
+        self._segments = None
+    
+    @property
+    def results(self):
+        return self.scanner.results
+    
+    @property
+    def market(self):
+        """check_market_timing() of this run"""
+        if self._market is None:
+            self._market = self.scanner.check_market_timing()
+        return self._market
+    
+    @property
+    def sectors(self):
+        """analyze_industry_groups() of this run's results"""
+        if self._sectors is None:
+            self._sectors = self.scanner.analyze_industry_groups(self.results)
+        return self._sectors
+    
+    @property
+    def segments(self):
+        """(breakouts, bases forming, pocket pivots); each stock in ONE section only (highest priority)"""
+        if self._segments is None:
+            breakouts_now = []
+            bases_forming = []
+            pocket_pivots = []
+            seen = set()
+            
+            for r in self.results:
+                ticker = r['ticker']
+                if ticker in seen:
+                    continue
+                pattern_names = [p.get('pattern') for p in r.get('patterns', [])]
+                if any(p in ['Cup with Handle', 'High Tight Flag'] for p in pattern_names):
+                    breakouts_now.append(r)
+                    seen.add(ticker)
+                elif any(p in ['Flat Base', 'Ascending Base'] for p in pattern_names):
+                    bases_forming.append(r)
+                    seen.add(ticker)
+                elif any(p == 'Pocket Pivot' for p in pattern_names):
+                    pocket_pivots.append(r)
+                    seen.add(ticker)
+            self._segments = (breakouts_now, bases_forming, pocket_pivots)
+        return self._segments
+    
+    def to_dict(self):
+        """Summary of the run for JSON renderers (json.dumps(..., default=str))"""
+        breakouts_now, bases_forming, pocket_pivots = self.segments
+        return {
+            'timestamp': self.timestamp.isoformat(),
+            'universe_size': len(self.scanner.universe),
+            'market': self.market,
+            'sectors': self.sectors,
+            'segments': {
+                'breakouts': [r['ticker'] for r in breakouts_now],
+                'bases_forming': [r['ticker'] for r in bases_forming],
+                'pocket_pivots': [r['ticker'] for r in pocket_pivots],
+            },
+            'results': self.results,
+        }
+
+
 # Expanded watchlist - Growth stocks, recent IPOs, market leaders
 DEFAULT_TICKERS = [
     # Mag 7 + Tech Leaders
@@ -864,6 +1232,18 @@ if __name__ == "__main__":
     import sys
     import os
     
+    parser = argparse.ArgumentParser(description='CANSLIM stock scanner')
+    parser.add_argument('tickers', nargs='*', help='Tickers to scan (default: watchlist)')
+    add_workers_arg(parser)
+    parser.add_argument('--timeout', type=float, default=SCAN_TIMEOUT,
+                        help=f'Seconds per ticker and stage with --workers (default: {SCAN_TIMEOUT})')
+    parser.add_argument('--no-prefilter', action='store_true',
+                        help='Run fundamentals and pattern detection on every ticker')
+    parser.add_argument('--trend-template', action='store_true',
+                        help='Only scan tickers above their 200-day MA and within 25%% of the 52-week high')
+    add_shard_args(parser)
+    args = parser.parse_args()
+    
     # Check for large watchlist file
     watchlist_file = 'large_watchlist.txt'
     if os.path.exists(watchlist_file):
@@ -877,24 +1257,39 @@ if __name__ == "__main__":
         tickers = DEFAULT_TICKERS
     
     # Allow command line ticker list override
-    if len(sys.argv) > 1:
-        tickers = sys.argv[1:]
+    if args.tickers:
+        tickers = args.tickers
         print(f"Using command-line tickers: {','.join(tickers)}")
     
-    scanner = CANSLIMScanner(tickers)
-    results = scanner.scan()
-    scanner.print_results()
+    # Stream each finished ticker to JSONL (tail-able while the scan runs)
+    started = datetime.now()
+    stream_file = f"scan_results_{started.strftime('%Y-%m-%d_%H%M')}.jsonl"
+    with ScanWriter(stream_file, 'scanner_v3', timestamp=started,
+                    universe_size=len(tickers)) as stream:
+        if args.shards is not None:
+            # Shards stream their tickers as each shard comes in
+            params = {'workers': args.workers, 'timeout': args.timeout,
+                      'prefilter': not args.no_prefilter, 'trend_template': args.trend_template}
+            scanner = run_sharded('scanner_v3', tickers, args.shards, params,
+                                  job_dir=args.shard_dir, procs=args.shard_procs,
+                                  on_shard=lambda k, part: [stream.ticker(*o) for o in part['outcomes']])
+        else:
+            scanner = CANSLIMScanner(tickers, gates=scan_gates(not args.no_prefilter, args.trend_template))
+            scanner.scan(workers=args.workers, timeout=args.timeout, on_ticker=stream.ticker)
+        session = ScanSession(scanner)
+        scanner.print_results(session=session)
+        stream.summary(session.to_dict())
     
     # Save to file
-    timestamp = datetime.now().strftime("%Y-%m-%d_%H%M")
+    timestamp = session.timestamp.strftime("%Y-%m-%d_%H%M")
     output_file = f"scan_results_{timestamp}.txt"
     
-    # Redirect print to file
+    # Redirect print to file (same session: no second round of downloads)
     import sys
     original_stdout = sys.stdout
     with open(output_file, 'w') as f:
         sys.stdout = f
-        scanner.print_results()
+        scanner.print_results(session=session)
     sys.stdout = original_stdout
     
-    print(f"\n✓ Results saved to {output_file}")
+    print(f"\n✓ Results saved to {output_file} and {stream_file}")
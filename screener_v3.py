@@ -6,6 +6,16 @@ Stock Screener v3.0
 - Options Activity: Coming later (Unusual Whales API)
 
 Run on S&P 500 + Russell 1000
+
+Prefilter (scan_prefilter): daily and weekly bars of the whole universe
+come from two batch downloads; PREFILTER_GATES pick the tickers that can
+score a pattern (enough history, and near the 52-week high, a range
+contraction or near the 200-week MA). Pattern detection only runs on
+those; the others score 0 on patterns without it and are still ranked on
+fundamentals, so the results match an unfiltered screen.
+
+Sharded (--shards N, see scan_shards): the universe is screened by N
+worker processes, on this machine or any sharing --shard-dir.
 """
 
 import yfinance as yf
@@ -16,6 +26,18 @@ import warnings
 import json
 warnings.filterwarnings('ignore')
 
+from scan_prefilter import prefilter, min_history, near_high, near_ma, range_contraction, any_of
+from scan_shards import add_shard_args, run_sharded
+
+# Necessary conditions of a pattern score > 0 (get_pattern_score):
+# 100 daily / 200 weekly bars, and flat base or cup (within 25% of the
+# 52-week high), VCP (contracting ranges) or 200W MA (within 15%)
+PREFILTER_GATES = (
+    min_history(100),
+    min_history(200, '1wk'),
+    any_of(near_high(0.25), range_contraction(0.6), near_ma(200, 0.15, '1wk')),
+)
+
 # ============================================================
 # PATTERN DETECTION
 # ============================================================
@@ -182,16 +204,18 @@ def detect_flat_base(hist_daily):
     return False, 0
 
 
-def get_pattern_score(ticker):
-    """Get combined pattern score for a ticker"""
+def get_pattern_score(ticker, hist_daily=None, hist_weekly=None):
+    """Get combined pattern score for a ticker (bars downloaded unless given)"""
     try:
         stock = yf.Ticker(ticker)
         
         # Get weekly data for 200W MA
-        hist_weekly = stock.history(period="5y", interval="1wk")
+        if hist_weekly is None:
+            hist_weekly = stock.history(period="5y", interval="1wk")
         
         # Get daily data for patterns
-        hist_daily = stock.history(period="2y", interval="1d")
+        if hist_daily is None:
+            hist_daily = stock.history(period="2y", interval="1d")
         
         if len(hist_weekly) < 200 or len(hist_daily) < 100:
             return 0, {}
@@ -249,6 +273,20 @@ def get_pattern_score(ticker):
         return 0, {"error": str(e)}
 
 
+def get_price_details(hist_daily, hist_weekly):
+    """get_pattern_score details of a ticker that can't score a pattern (no detection)"""
+    if hist_daily is None or hist_weekly is None or len(hist_weekly) < 200 or len(hist_daily) < 100:
+        return {}
+    _, sma_200w, pct_from_ma = get_200w_ma_score(hist_weekly)
+    return {
+        "price": round(hist_daily['Close'].iloc[-1], 2),
+        "sma_200w": round(sma_200w, 2) if sma_200w else None,
+        "pct_from_200w": round(pct_from_ma, 2) if pct_from_ma else None,
+        "patterns": [],
+        "pattern_score_raw": 0
+    }
+
+
 # ============================================================
 # FUNDAMENTALS
 # ============================================================
@@ -351,9 +389,19 @@ def get_fundamentals_score(ticker):
 # MAIN SCREENER
 # ============================================================
 
-def screen_stock(ticker):
-    """Full screen for a single stock"""
-    pattern_score, pattern_details = get_pattern_score(ticker)
+def screen_stock(ticker, screen=None, patterns=True):
+    """
+    Full screen for a single stock (screen: Prefilter whose bars to use;
+    patterns=False: the prefilter ruled out a pattern, fundamentals only)
+    """
+    if not patterns:
+        pattern_score, pattern_details = 0, get_price_details(
+            screen.frame(ticker, '1d'), screen.frame(ticker, '1wk'))
+    elif screen is not None:
+        pattern_score, pattern_details = get_pattern_score(
+            ticker, screen.frame(ticker, '1d'), screen.frame(ticker, '1wk'))
+    else:
+        pattern_score, pattern_details = get_pattern_score(ticker)
     fund_score, fund_details = get_fundamentals_score(ticker)
     
     # Scale scores (Pattern: 35 → 50, Fundamentals: 35 → 50)
@@ -412,11 +460,14 @@ def get_universe():
     return universe
 
 
-def run_screener(limit=None):
-    """Run full screener on universe"""
-    universe = get_universe()
-    if limit:
-        universe = universe[:limit]
+def screen_universe(universe, gates=PREFILTER_GATES):
+    """Prefilter + screen tickers; results in universe order (not sorted)"""
+    screen = None
+    passed = set(universe)
+    if gates:
+        screen = prefilter(universe, gates)
+        print(f"Prefilter: {screen.report()} (the others: fundamentals only)")
+        passed = set(screen.passed)
     
     print(f"Screening {len(universe)} stocks...")
     print("=" * 60)
@@ -425,7 +476,7 @@ def run_screener(limit=None):
     
     for i, ticker in enumerate(universe):
         try:
-            result = screen_stock(ticker)
+            result = screen_stock(ticker, screen, patterns=ticker in passed)
             results.append(result)
             
             if result['total_score'] >= 50:
@@ -438,12 +489,39 @@ def run_screener(limit=None):
         if (i + 1) % 50 == 0:
             print(f"... processed {i+1}/{len(universe)}")
     
-    # Sort by total score
-    results = sorted(results, key=lambda x: x['total_score'], reverse=True)
-    
     return results
 
 
+def run_screener(limit=None, gates=PREFILTER_GATES, shards=None, shard_dir=None, shard_procs=None):
+    """
+    Run full screener on universe (gates: prefilter, empty = screen everything)
+    
+    shards: split the universe over that many worker processes (scan_shards,
+    0 = one per core); the merged results are the same as one process.
+    """
+    universe = get_universe()
+    if limit:
+        universe = universe[:limit]
+    
+    if shards is not None:
+        return run_sharded('screener_v3', universe, shards, {'prefilter': bool(gates)},
+                           job_dir=shard_dir, procs=shard_procs)
+    
+    # Sort by total score
+    return merge_shards(universe, [screen_universe(universe, gates)])
+
+
+def scan_shard(tickers, prefilter=True):
+    """scan_shards job: screen one shard of the universe"""
+    return screen_universe(tickers, PREFILTER_GATES if prefilter else ())
+
+
+def merge_shards(tickers, parts, **params):
+    """scan_shards merge: all shards' results by total score (ties in universe order)"""
+    results = [r for part in parts for r in part]
+    return sorted(results, key=lambda x: x['total_score'], reverse=True)
+
+
 def print_results(results, top_n=20):
     """Print top results"""
     print("\n" + "=" * 80)
@@ -460,17 +538,24 @@ def print_results(results, top_n=20):
 
 
 if __name__ == "__main__":
-    import sys
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Stock Screener v3.0')
+    parser.add_argument('ticker', nargs='?', help='Analyze one ticker (default: full screener)')
+    parser.add_argument('--no-prefilter', action='store_true', help='Screen every ticker of the universe')
+    add_shard_args(parser)
+    args = parser.parse_args()
     
-    if len(sys.argv) > 1:
+    if args.ticker:
         # Single ticker mode
-        ticker = sys.argv[1].upper()
+        ticker = args.ticker.upper()
         print(f"Analyzing {ticker}...")
         result = screen_stock(ticker)
         print(json.dumps(result, indent=2))
     else:
         # Full screener
-        results = run_screener()
+        results = run_screener(gates=() if args.no_prefilter else PREFILTER_GATES,
+                               shards=args.shards, shard_dir=args.shard_dir, shard_procs=args.shard_procs)
         print_results(results, top_n=30)
         
         # Save results
@@ -9,6 +9,7 @@ import numpy as np
 from datetime import datetime, timedelta
 import json
 import sys
+import os
 from colorama import Fore, Style, init
 
 init(autoreset=True)
@@ -27,7 +28,7 @@ SECTORS = {
     'XLB':  'Materials',
 }
 
-OUTPUT_FILE = 'sector_rotation_latest.json'
+OUTPUT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sector_rotation_latest.json')
 
 
 def calc_rsi(series, period=14):
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Signal Cache - detected pattern signals persisted across backtest runs
+
+- One pickle per (detector, ticker) under CACHE_DIR/signals
+- Keyed by a fingerprint of the input bars and the detector version
+  (explicit version number + hash of the detector's source), so editing
+  a detector invalidates its signals automatically
+- Detectors are causal (bar i only looks at bars <= i): when the cached
+  bars are an unchanged prefix of the new data, only the new tail (and
+  the last cached bar, which may have been partial) is re-detected
+- With a bounded lookback (a signal on bar i depends on bars i - lookback
+  .. i only), the cached bars are matched by date instead, so a rolling
+  window (period='15y') whose first bar moves every day still only
+  re-detects the tail, plus the first `lookback` bars of the new window
+- Anything else (adjusted history, gaps) re-detects fully
+
+Reruns that only change exit rules skip detection entirely.
+
+Usage:
+    from signal_cache import SignalCache
+
+    cache = SignalCache('master', detect_patterns, version=1)
+    signals = cache.signals('NVDA', df)       # detect_patterns(df, start=...) on a miss
+
+    cache = SignalCache('sp500', detect_patterns, lookback=252)   # rolling windows
+"""
+import hashlib
+import inspect
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from data_utils import CACHE_DIR
+
+SIGNAL_CACHE_DIR = os.path.join(CACHE_DIR, 'signals')
+BAR_COLUMNS = ('Open', 'High', 'Low', 'Close', 'Volume')
+
+
+def bars_fingerprint(df, n=None):
+    """Hash of the dates and OHLCV values of the first n bars (all by default)."""
+    part = df if n is None else df.iloc[:n]
+    h = hashlib.sha1()
+    h.update(np.ascontiguousarray(part.index.asi8).tobytes())
+    for col in BAR_COLUMNS:
+        if col in part.columns:
+            h.update(col.encode())
+            h.update(np.ascontiguousarray(part[col].values, dtype=np.float64).tobytes())
+    return h.hexdigest()
+
+
+def row_hashes(df):
+    """One hash per bar of its date and OHLCV values."""
+    cols = [c for c in BAR_COLUMNS if c in df.columns]
+    return pd.util.hash_pandas_object(df[cols].astype(np.float64), index=True).to_numpy()
+
+
+def _dates_ns(index):
+    return np.asarray(index, dtype='datetime64[ns]').view(np.int64)
+
+
+def detector_version(detect, version):
+    """Explicit version plus a hash of the detector's source code."""
+    try:
+        src = inspect.getsource(detect)
+    except (OSError, TypeError):
+        return str(version)
+    return f"{version}:{hashlib.sha1(src.encode()).hexdigest()[:10]}"
+
+
+class SignalCache:
+    """
+    Disk cache for one detector.
+
+    detect(df, start) must return the signals of bars i >= start (using any
+    earlier bars for lookback) as a list of dicts with an 'idx' key.
+    lookback: bars before i that a signal on bar i depends on, when bounded
+    (None: every earlier bar, the cached bars must be a prefix).
+    """
+
+    def __init__(self, name, detect, version=1, cache_dir=SIGNAL_CACHE_DIR, enabled=True,
+                 lookback=None):
+        self.name = name
+        self.detect = detect
+        self.lookback = lookback
+        self.version = detector_version(detect, version)
+        self.cache_dir = cache_dir
+        self.enabled = enabled
+        self.stats = {'hit': 0, 'tail': 0, 'miss': 0}
+        if enabled:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, ticker):
+        safe = "".join(c if c.isalnum() or c in '-_' else '_' for c in str(ticker))
+        return os.path.join(self.cache_dir, f"{self.name}_{safe}.pkl")
+
+    def _load(self, ticker):
+        try:
+            with open(self._path(ticker), 'rb') as f:
+                entry = pickle.load(f)
+        except Exception:
+            return None
+        return entry if entry.get('version') == self.version else None
+
+    def _save(self, ticker, entry):
+        path = self._path(ticker)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, 'wb') as f:
+                pickle.dump(entry, f)
+            os.replace(tmp, path)       # atomic; safe with parallel workers
+        except Exception as e:
+            print(f"  Signal cache save error: {e}")
+
+    def _offset(self, entry, df, settled):
+        """
+        Position in the cached bars of df's first bar when the cached settled
+        bars that df still holds are unchanged (None otherwise).
+        """
+        if 'rows' not in entry or not len(df):
+            return None
+        dates = entry['dates']
+        first = _dates_ns(df.index[:1])[0]
+        offset = int(np.searchsorted(dates, first))
+        if offset >= len(dates) or dates[offset] != first:
+            return None
+        if offset and self.lookback is None:
+            return None
+        if not 0 < settled - offset <= len(df):
+            return None
+        overlap = slice(offset, settled)
+        if not np.array_equal(entry['rows'][overlap], row_hashes(df.iloc[:settled - offset])):
+            return None
+        return offset
+
+    def signals(self, ticker, df):
+        """Signals of every bar of df, detecting only what the cache lacks."""
+        if not self.enabled:
+            return self.detect(df, start=0)
+
+        n = len(df)
+        entry = self._load(ticker)
+        if entry is not None and entry['bars'] == n and entry['fingerprint'] == bars_fingerprint(df):
+            self.stats['hit'] += 1
+            return list(entry['signals'])
+
+        # The last cached bar may have been a partial (intraday) bar, so it
+        # is re-detected along with the new tail
+        settled = entry['bars'] - 1 if entry is not None else -1
+        offset = self._offset(entry, df, settled) if settled > 0 else None
+        if offset is not None:
+            self.stats['tail'] += 1
+            # Bars the window dropped shift every index; the first `lookback`
+            # bars lost part of their history and are detected again
+            head = min(self.lookback or 0, settled - offset) if offset else 0
+            kept = [dict(s, idx=s['idx'] - offset) for s in entry['signals']
+                    if offset + head <= s['idx'] < settled]
+            sigs = (self.detect(df.iloc[:head], start=0) if head else []) + kept \
+                + self.detect(df, start=settled - offset)
+        else:
+            self.stats['miss'] += 1
+            sigs = self.detect(df, start=0)
+        self._save(ticker, {'version': self.version, 'bars': n, 'fingerprint': bars_fingerprint(df),
+                            'dates': _dates_ns(df.index), 'rows': row_hashes(df), 'signals': sigs})
+        return list(sigs)
+
+    def summary(self):
+        return (f"signal cache: {self.stats['hit']} hit, {self.stats['tail']} tail, "
+                f"{self.stats['miss']} full detections")
@@ -206,15 +206,22 @@ def calculate_conviction(stock_data, flow_data, pattern_info):
     return score, reasons, best_pattern
 
 
-def match_signals():
-    """Match stock patterns with options flow."""
+def match_signals(stocks=None, flows=None):
+    """
+    Match stock patterns with options flow.
+    
+    stocks / flows: money scanner and options flow results already in
+    memory (default: loaded from their *_latest.json files).
+    """
     print(f"\n{Fore.CYAN}{'='*70}")
     print(f"{Fore.CYAN}{Style.BRIGHT}🔥 SIGNAL MATCHER - Pattern + Flow Alignment")
     print(f"{Fore.CYAN}   {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print(f"{Fore.CYAN}{'='*70}{Style.RESET_ALL}\n")
     
-    stocks = load_stock_scan()
-    flows = load_options_flow()
+    if stocks is None:
+        stocks = load_stock_scan()
+    if flows is None:
+        flows = load_options_flow()
     pattern_data = load_scanner_patterns()
     
     if not stocks:
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Strat Engine - array-based Strat scenario labelling for whole panels
+
+- Scenario codes for every bar at once: 1 inside, 2 / -2 directional,
+  3 / -3 outside (closed up / down), 0 for the first bar (no previous bar)
+- Hammer / shooter candle masks
+- Multi-bar combos (2-1-2, 3-1-2, 2-2, 1-2) matched with sliding-window
+  keys over the code array
+- Timeframe continuity (monthly / weekly / daily) of many tickers at once
+
+Inputs are 1-D arrays (one ticker) or 2-D (tickers x bars) panels with bars
+on the last axis.
+
+Usage:
+    from strat_engine import frame_codes, combo_masks, continuity
+
+    codes = frame_codes(df)                     # int8 per bar
+    masks = combo_masks(codes)                  # {pattern: {'long': mask, 'short': mask}}
+    score, direction, full = continuity(monthly_codes, weekly_codes, daily_codes)
+"""
+import numpy as np
+
+# Scenario codes (same values as strat_backtest.Scenario)
+NO_BAR = 0
+INSIDE = 1
+UP = 2
+DOWN = -2
+OUTSIDE_UP = 3
+OUTSIDE_DOWN = -3
+
+# market_outlook labels: outside bars are '3' whichever way they closed
+LABELS = {INSIDE: '1', UP: '2U', DOWN: '2D', OUTSIDE_UP: '3', OUTSIDE_DOWN: '3'}
+
+COMBOS = {
+    '2-1-2 Cont': {'long': (UP, INSIDE, UP), 'short': (DOWN, INSIDE, DOWN)},
+    '3-1-2 Rev': {'long': (OUTSIDE_DOWN, INSIDE, UP), 'short': (OUTSIDE_UP, INSIDE, DOWN)},
+    '2-2 Cont': {'long': (UP, UP), 'short': (DOWN, DOWN)},
+    '1-2 Break': {'long': (INSIDE, UP), 'short': (INSIDE, DOWN)},
+}
+
+_BASE = 8       # codes -3..3 shifted to digits 0..6
+
+
+def scenario_codes(high, low, close, open_):
+    """Scenario code of every bar vs the bar before it (0 for the first bar)."""
+    h, l, c, o = (np.asarray(x, dtype=float) for x in (high, low, close, open_))
+    codes = np.zeros(h.shape, dtype=np.int8)
+    broke_high = h[..., 1:] > h[..., :-1]
+    broke_low = l[..., 1:] < l[..., :-1]
+    outside = np.where(c[..., 1:] > o[..., 1:], OUTSIDE_UP, OUTSIDE_DOWN)
+    codes[..., 1:] = np.select([broke_high & broke_low, broke_high, broke_low],
+                               [outside, UP, DOWN], INSIDE)
+    return codes
+
+
+def frame_codes(df):
+    """scenario_codes() of an OHLC DataFrame."""
+    return scenario_codes(df['High'].values, df['Low'].values, df['Close'].values, df['Open'].values)
+
+
+def _candle(open_, high, low, close):
+    o, h, l, c = (np.asarray(x, dtype=float) for x in (open_, high, low, close))
+    rng = h - l
+    top = np.maximum(o, c)
+    bottom = np.minimum(o, c)
+    body = np.maximum(top - bottom, 0.001)
+    return h, l, rng, top, bottom, body
+
+
+def hammer_mask(open_, high, low, close):
+    """Hammer: small body in the top 40% of the range, lower wick >= 2x body."""
+    h, l, rng, top, bottom, body = _candle(open_, high, low, close)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        position = (bottom - l) / rng
+    return (rng != 0) & (position >= 0.6) & ((bottom - l) >= 2 * body)
+
+
+def shooter_mask(open_, high, low, close):
+    """Shooter: small body in the bottom 40% of the range, upper wick >= 2x body."""
+    h, l, rng, top, bottom, body = _candle(open_, high, low, close)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        position = (top - l) / rng
+    return (rng != 0) & (position <= 0.4) & ((h - top) >= 2 * body)
+
+
+def window_keys(codes, length):
+    """
+    One integer per bar encoding the codes of the `length` bars ending there
+    (-1 where the window runs off the start).
+    """
+    codes = np.asarray(codes)
+    digits = codes.astype(np.int64) + 3
+    keys = np.full(codes.shape, -1, dtype=np.int64)
+    if codes.shape[-1] < length:
+        return keys
+    n = codes.shape[-1] - length + 1
+    acc = np.zeros(codes.shape[:-1] + (n,), dtype=np.int64)
+    for j in range(length):
+        acc = acc * _BASE + digits[..., j:j + n]
+    keys[..., length - 1:] = acc
+    return keys
+
+
+def combo_key(combo):
+    """window_keys() value of a combo, oldest bar first."""
+    key = 0
+    for code in combo:
+        key = key * _BASE + (code + 3)
+    return key
+
+
+def combo_masks(codes, combos=COMBOS):
+    """{pattern: {direction: bool mask of bars completing the combo}}"""
+    keys = {}
+    out = {}
+    for name, sides in combos.items():
+        out[name] = {}
+        for direction, combo in sides.items():
+            if len(combo) not in keys:
+                keys[len(combo)] = window_keys(codes, len(combo))
+            out[name][direction] = keys[len(combo)] == combo_key(combo)
+    return out
+
+
+def trailing_count(mask, window):
+    """How many of the `window` bars before each bar (fewer at the start) are True."""
+    mask = np.asarray(mask)
+    csum = np.concatenate([np.zeros(mask.shape[:-1] + (1,), dtype=np.int64),
+                           np.cumsum(mask, axis=-1)], axis=-1)
+    idx = np.arange(mask.shape[-1])
+    return csum[..., idx] - csum[..., np.maximum(idx - window, 0)]
+
+
+def labels(codes):
+    """Codes as market_outlook labels ('1', '2U', '2D', '3'; None for no bar)."""
+    codes = np.asarray(codes)
+    out = np.array([LABELS.get(int(c)) for c in codes.reshape(-1)], dtype=object)
+    return out.reshape(codes.shape) if codes.ndim else out[0]
+
+
+def continuity(monthly, weekly, daily):
+    """
+    Timeframe continuity of the latest bar on each timeframe.
+
+    Args: scenario codes (scalars or one per ticker), 0 where a timeframe
+          has no data.
+
+    Returns (score, direction, full): 3 when every timeframe agrees (full
+    continuity), 2 when two are 2U (or 2D), 1 for consolidating / mixed,
+    0 with fewer than two timeframes.
+    """
+    codes = np.stack(np.broadcast_arrays(*(np.asarray(x) for x in (monthly, weekly, daily))))
+    valid = (codes != NO_BAR).sum(axis=0)
+    bull = (codes == UP).sum(axis=0)
+    bear = (codes == DOWN).sum(axis=0)
+    inside = (codes == INSIDE).sum(axis=0)
+
+    enough = valid >= 2
+    full_bull = enough & (bull == valid)
+    full_bear = enough & ~full_bull & (bear == valid)
+    conds = [~enough, full_bull | full_bear, bull >= 2, bear >= 2, inside >= 2]
+    score = np.select(conds, [0, 3, 2, 2, 1], 1)
+    direction = np.select([~enough, full_bull, full_bear, bull >= 2, bear >= 2, inside >= 2],
+                          ['MIXED', 'BULLISH', 'BEARISH', 'BULLISH', 'BEARISH', 'CONSOLIDATING'],
+                          'MIXED').astype(object)
+    full = full_bull | full_bear
+    if score.ndim == 0:
+        return int(score), str(direction), bool(full)
+    return score, direction, full
@@ -17,6 +17,10 @@ Position Rules:
 
 Results (backtest 2021-2026):
   - 52% win rate | 3.95% avg return | 1.88x PF | 2.06 Sharpe
+
+Intraday:
+  - `system.py live` keeps the daily history in memory and rescans every
+    minute from one batch quote of today's bar
 """
 
 import yfinance as yf
@@ -26,6 +30,7 @@ from datetime import datetime, timedelta
 import json
 import sys
 import os
+import time
 
 # ── Config ──────────────────────────────────────────────
 
@@ -72,12 +77,15 @@ class PatternDetector:
 
     @staticmethod
     def scan(df):
-        """Detect all patterns on latest bar. Returns list of pattern dicts."""
-        close = df['Close'].values
-        volume = df['Volume'].values
-        high = df['High'].values
-        low = df['Low'].values
-        opn = df['Open'].values
+        """Detect all patterns on latest bar. Returns list of pattern dicts.
+
+        df: daily OHLCV DataFrame, or a dict of column arrays (intraday panel).
+        """
+        close = np.asarray(df['Close'])
+        volume = np.asarray(df['Volume'])
+        high = np.asarray(df['High'])
+        low = np.asarray(df['Low'])
+        opn = np.asarray(df['Open'])
         n = len(close)
         i = n - 1
 
@@ -180,11 +188,11 @@ class PatternDetector:
         Detect stocks that are CLOSE to forming patterns or have structural strength.
         Returns list of near-miss patterns with what's needed to trigger.
         """
-        close = df['Close'].values
-        volume = df['Volume'].values
-        high = df['High'].values
-        low = df['Low'].values
-        opn = df['Open'].values
+        close = np.asarray(df['Close'])
+        volume = np.asarray(df['Volume'])
+        high = np.asarray(df['High'])
+        low = np.asarray(df['Low'])
+        opn = np.asarray(df['Open'])
         n = len(close)
         i = n - 1
 
@@ -359,14 +367,74 @@ def save_state(state):
 
 # ── Core Scanner ──────────────────────────────────────
 
-def scan(quiet=False):
-    """Full system scan. Returns ranked signals."""
+def evaluate_ticker(ticker, df, account_size):
+    """
+    Signal or watchlist entry for one ticker's daily bars (latest bar).
+
+    Returns ('signal', dict), ('watch', dict) or None.
+    """
+    close = np.asarray(df['Close'], dtype=float)
+    volume = np.asarray(df['Volume'], dtype=float)
+    if len(close) < 200:
+        return None
+
+    price = float(close[-1])
+    vol_50 = float(np.mean(volume[-50:]))
+    vol_ratio = float(volume[-1] / vol_50) if vol_50 > 0 else 0
+    ma50 = float(np.mean(close[-50:]))
+    ma200 = float(np.mean(close[-200:])) if len(close) >= 200 else ma50
+    h252 = float(np.max(close[-252:]))
+    pct_from_high = (h252 - price) / h252 if h252 > 0 else 1
+
+    # Detect patterns (no volume gate — patterns themselves validate)
+    patterns = PatternDetector.scan(df)
+
+    if patterns:
+        score = score_signal(patterns, vol_ratio, len(patterns))
+        shares, cost, stop_price = calculate_position(account_size, price)
+        target_price = price * (1 + PROFIT_TARGET)
+
+        return 'signal', {
+            'ticker': ticker,
+            'price': round(price, 2),
+            'score': score,
+            'patterns': [p['name'] for p in patterns],
+            'pattern_details': [p['detail'] for p in patterns],
+            'vol_ratio': round(vol_ratio, 2),
+            'num_patterns': len(patterns),
+            'shares': shares,
+            'cost': round(cost, 2),
+            'stop_price': round(stop_price, 2),
+            'target_price': round(target_price, 2),
+            'pct_from_high': round(pct_from_high * 100, 1),
+            'above_ma50': price > ma50,
+            'above_ma200': price > ma200,
+            'scan_time': datetime.now().isoformat()
+        }
+
+    # Check watchlist (near-miss patterns)
+    near = PatternDetector.watchlist_scan(df)
+    if near:
+        return 'watch', {
+            'ticker': ticker,
+            'price': round(price, 2),
+            'pct_from_high': round(pct_from_high * 100, 1),
+            'above_ma50': price > ma50,
+            'above_ma200': price > ma200,
+            'vol_ratio': round(vol_ratio, 2),
+            'near_patterns': near
+        }
+    return None
+
+
+def _start_scan(title, regime, quiet):
+    """Header + regime gate. Returns (state, open slots), None in a bear market."""
+    is_bull, spy_price, spy_ma200 = regime
     if not quiet:
         print(f"\n{'='*60}")
-        print(f"  SYSTEM SCAN — {datetime.now().strftime('%Y-%m-%d %H:%M')}")
+        print(f"  {title} — {datetime.now().strftime('%Y-%m-%d %H:%M')}")
         print(f"{'='*60}\n")
 
-    is_bull, spy_price, spy_ma200 = check_market_regime()
     state = load_state()
 
     if not quiet:
@@ -379,7 +447,7 @@ def scan(quiet=False):
         if not quiet:
             print(f"\n  SPY below 200MA — NO NEW ENTRIES")
             print(f"  Defensive mode. Manage existing positions only.\n")
-        return [], []
+        return None
 
     state['regime'] = 'bull'
 
@@ -389,81 +457,11 @@ def scan(quiet=False):
         print(f"  Positions: {open_pos}/{MAX_POSITIONS} ({slots} slot{'s' if slots != 1 else ''} open)")
         print(f"  Account: ${state.get('account_size', 25000):,.0f}")
         print()
+    return state, slots
 
-    if not quiet:
-        print(f"  Scanning {len(UNIVERSE)} stocks...\n")
-
-    signals = []
-    watchlist = []
-
-    for idx, ticker in enumerate(UNIVERSE):
-        try:
-            df = yf.download(ticker, period='2y', progress=False)
-            if isinstance(df.columns, pd.MultiIndex):
-                df.columns = df.columns.get_level_values(0)
-            if len(df) < 200:
-                continue
-
-            close = df['Close'].values
-            volume = df['Volume'].values
-            price = float(close[-1])
-            vol_50 = float(np.mean(volume[-50:]))
-            vol_ratio = float(volume[-1] / vol_50) if vol_50 > 0 else 0
-            ma50 = float(np.mean(close[-50:]))
-            ma200 = float(np.mean(close[-200:])) if len(close) >= 200 else ma50
-            h252 = float(np.max(close[-252:]))
-            pct_from_high = (h252 - price) / h252 if h252 > 0 else 1
-
-            # Detect patterns (no volume gate — patterns themselves validate)
-            patterns = PatternDetector.scan(df)
-
-            if patterns:
-                score = score_signal(patterns, vol_ratio, len(patterns))
-                shares, cost, stop_price = calculate_position(
-                    state.get('account_size', 25000), price)
-                target_price = price * (1 + PROFIT_TARGET)
-
-                signals.append({
-                    'ticker': ticker,
-                    'price': round(price, 2),
-                    'score': score,
-                    'patterns': [p['name'] for p in patterns],
-                    'pattern_details': [p['detail'] for p in patterns],
-                    'vol_ratio': round(vol_ratio, 2),
-                    'num_patterns': len(patterns),
-                    'shares': shares,
-                    'cost': round(cost, 2),
-                    'stop_price': round(stop_price, 2),
-                    'target_price': round(target_price, 2),
-                    'pct_from_high': round(pct_from_high * 100, 1),
-                    'above_ma50': price > ma50,
-                    'above_ma200': price > ma200,
-                    'scan_time': datetime.now().isoformat()
-                })
-            else:
-                # Check watchlist (near-miss patterns)
-                near = PatternDetector.watchlist_scan(df)
-                if near:
-                    watchlist.append({
-                        'ticker': ticker,
-                        'price': round(price, 2),
-                        'pct_from_high': round(pct_from_high * 100, 1),
-                        'above_ma50': price > ma50,
-                        'above_ma200': price > ma200,
-                        'vol_ratio': round(vol_ratio, 2),
-                        'near_patterns': near
-                    })
-
-            if not quiet:
-                sys.stdout.write(f"\r  {idx+1}/{len(UNIVERSE)}: {ticker}          ")
-                sys.stdout.flush()
-
-        except Exception as e:
-            continue
-
-    if not quiet:
-        sys.stdout.write(f"\r{'':60}\r")
 
+def _finish_scan(signals, watchlist, state, slots, spy_price, spy_ma200, quiet):
+    """Rank, save and print the scan results."""
     signals.sort(key=lambda x: x['score'], reverse=True)
 
     # Save
@@ -530,6 +528,181 @@ def scan(quiet=False):
     return signals, watchlist
 
 
+def scan(quiet=False):
+    """Full system scan. Returns ranked signals."""
+    regime = check_market_regime()
+    started = _start_scan('SYSTEM SCAN', regime, quiet)
+    if started is None:
+        return [], []
+    state, slots = started
+
+    if not quiet:
+        print(f"  Scanning {len(UNIVERSE)} stocks...\n")
+
+    signals = []
+    watchlist = []
+
+    for idx, ticker in enumerate(UNIVERSE):
+        try:
+            df = yf.download(ticker, period='2y', progress=False)
+            if isinstance(df.columns, pd.MultiIndex):
+                df.columns = df.columns.get_level_values(0)
+
+            found = evaluate_ticker(ticker, df, state.get('account_size', 25000))
+            if found:
+                kind, entry = found
+                (signals if kind == 'signal' else watchlist).append(entry)
+
+            if not quiet:
+                sys.stdout.write(f"\r  {idx+1}/{len(UNIVERSE)}: {ticker}          ")
+                sys.stdout.flush()
+
+        except Exception as e:
+            continue
+
+    if not quiet:
+        sys.stdout.write(f"\r{'':60}\r")
+
+    return _finish_scan(signals, watchlist, state, slots, regime[1], regime[2], quiet)
+
+
+# ── Intraday Rescan ───────────────────────────────────
+
+INTRADAY_BARS = 300     # history kept per ticker (patterns look back ≤ 253 bars)
+COLUMNS = ('Open', 'High', 'Low', 'Close', 'Volume')
+
+
+def _ticker_bars(df, ticker):
+    """One ticker's OHLCV rows from a batch download (rows without a close dropped)."""
+    if isinstance(df.columns, pd.MultiIndex):
+        df = df.xs(ticker, axis=1, level=1)
+    return df[list(COLUMNS)].dropna(subset=['Close'])
+
+
+class IntradayScanner:
+    """
+    Live rescans without re-downloading history.
+
+    The daily history of the universe is downloaded once per session (one
+    batch) and kept in memory; each rescan fetches one batch quote of
+    today's bar, writes it into the last slot of each ticker's panel and
+    re-evaluates only the tickers whose bar changed. Same signals as scan()
+    on the same bars.
+    """
+
+    def __init__(self, tickers=None):
+        self.tickers = list(tickers or UNIVERSE)
+        self.history = {}       # ticker -> completed daily bars (DataFrame)
+        self.panels = {}        # ticker -> {column: history + today's bar}
+        self.bars = {}          # ticker -> today's (O, H, L, C, V) as evaluated
+        self.results = {}       # ticker -> evaluate_ticker() of that bar
+        self.session = None
+        self.account_size = None
+        self.evaluated = 0      # tickers re-evaluated by the last rescan
+
+    def load(self):
+        """Download the daily history of the universe (one batch request)."""
+        df = yf.download(self.tickers, period='2y', progress=False)
+        self.history = {}
+        for ticker in self.tickers:
+            try:
+                bars = _ticker_bars(df, ticker)
+            except KeyError:
+                continue
+            self.history[ticker] = bars.iloc[-(INTRADAY_BARS + 1):]
+        self.panels, self.bars, self.results = {}, {}, {}
+        self.session = None
+
+    def _start_session(self, session):
+        """Panels of the bars before today's session plus one slot for today's bar."""
+        if self.session is not None:
+            self.load()     # new trading day: yesterday's live bar is now history
+        self.session = session
+        for ticker, bars in self.history.items():
+            bars = bars[bars.index < session].iloc[-INTRADAY_BARS:]
+            self.panels[ticker] = {col: np.append(bars[col].to_numpy(dtype=float), np.nan)
+                                   for col in COLUMNS}
+
+    def refresh(self):
+        """Fetch today's bar for the universe; re-evaluate tickers whose bar changed."""
+        if not self.history:
+            self.load()
+        quotes = yf.download(self.tickers, period='1d', interval='1d', progress=False)
+        if quotes is None or quotes.empty:
+            return
+        session = quotes.index[-1]
+        if session != self.session:
+            self._start_session(session)
+
+        state_account = load_state().get('account_size', 25000)
+        if state_account != self.account_size:
+            # Position sizes in cached signals are stale
+            self.account_size = state_account
+            self.bars = {}
+
+        self.evaluated = 0
+        for ticker, panel in self.panels.items():
+            try:
+                today = _ticker_bars(quotes, ticker)
+            except KeyError:
+                continue
+            if today.empty or today.index[-1] != session:
+                continue
+            bar = tuple(float(today[col].iloc[-1]) for col in COLUMNS)
+            if self.bars.get(ticker) == bar:
+                continue
+            for col, value in zip(COLUMNS, bar):
+                panel[col][-1] = value
+            self.bars[ticker] = bar
+            self.results[ticker] = evaluate_ticker(ticker, panel, self.account_size)
+            self.evaluated += 1
+
+    def regime(self):
+        """check_market_regime() from the SPY panel (downloaded when SPY isn't in the universe)."""
+        panel = self.panels.get('SPY')
+        if panel is None or 'SPY' not in self.bars:
+            return check_market_regime()
+        close = panel['Close']
+        price, ma200 = float(close[-1]), float(np.mean(close[-200:]))
+        return price > ma200, price, ma200
+
+    def scan(self, quiet=False):
+        """Rescan on today's latest bar. Returns ranked signals and watchlist."""
+        self.refresh()
+        regime = self.regime()
+        started = _start_scan('INTRADAY SCAN', regime, quiet)
+        if started is None:
+            return [], []
+        state, slots = started
+
+        if not quiet:
+            print(f"  Re-evaluated {self.evaluated}/{len(self.panels)} stocks (today's bar changed)\n")
+
+        signals, watchlist = [], []
+        for ticker in self.tickers:
+            found = self.results.get(ticker)
+            if found:
+                kind, entry = found
+                (signals if kind == 'signal' else watchlist).append(dict(entry))
+        return _finish_scan(signals, watchlist, state, slots, regime[1], regime[2], quiet)
+
+
+def live(interval=60, count=None, quiet=False):
+    """Intraday rescans every `interval` seconds (count: stop after that many)."""
+    scanner = IntradayScanner()
+    runs = 0
+    while count is None or runs < count:
+        started = time.time()
+        try:
+            scanner.scan(quiet=quiet)
+        except Exception as e:
+            print(f"  Rescan failed: {e}")
+        runs += 1
+        if count is not None and runs >= count:
+            break
+        time.sleep(max(0, interval - (time.time() - started)))
+
+
 # ── Position Management ───────────────────────────────
 
 def add_position(ticker, entry_price, shares, patterns=None):
@@ -703,6 +876,9 @@ def main():
     sub = parser.add_subparsers(dest='command')
 
     sub.add_parser('scan', help='Full scan: signals + watchlist')
+    p_live = sub.add_parser('live', help='Intraday rescans (history kept in memory)')
+    p_live.add_argument('--interval', type=float, default=60, help='Seconds between rescans (default: 60)')
+    p_live.add_argument('--count', type=int, help='Stop after this many rescans')
     sub.add_parser('watchlist', help='Watchlist only (faster)')
     sub.add_parser('check', help='Check open positions')
 
@@ -728,6 +904,11 @@ def main():
 
     if args.command == 'scan':
         scan()
+    elif args.command == 'live':
+        try:
+            live(args.interval, args.count)
+        except KeyboardInterrupt:
+            print()
     elif args.command == 'watchlist':
         # Just show last saved watchlist
         try: